@@ -17,51 +17,41 @@ from flask_socketio import SocketIO, emit
 from flask_cors import CORS
 from config import Config
 from extensions import mongo, mail, bcrypt
-from auth.routes import auth_bp
-from central import central_bp
-from manager.pmarch import pm_arch_bp
-from manager.market_manager import market_manager_bp
-
-from employee.employee_dashboard import employee_dashboard_bp
-from employee.employee_leaderboard import employee_leaderboard_bp
-from employee.employee_history import employee_history_bp
-from employee.employee_attachments import employee_attachments_bp
-from employee.employee_filters import employee_filters_bp
-from employee.employee_api import employee_api_bp
-from employee.employee_raise_request import employee_raise_request_bp
-from employee.employee_points_total import employee_points_total_bp
-
-from hr.hr_registration import hr_registration_bp
-from hr.hr_analytics import hr_analytics_bp
-from hr.hr_employee_management import hr_employee_mgmt_bp
-from hr.hr_points_management import hr_points_mgmt_bp
-from hr.hr_rr_review import hr_rr_review_bp
-from hr.hr_categories import hr_categories_bp
-from hr.pending_points_tracker import pending_tracker_bp
-
-from pm.pm_main import pm_bp
-from ta import ta_bp
-from pmo import pmo_bp
-from presales.presales_main import presales_bp
-from pmarch.pmarch_main import pmarch_bp as pm_arch_bp
 from services.redis_service import redis_service
 from services.socketio_service import SocketIORealtimeService
-
-from dp.dp_dashboard import dp_bp
-from marketing.marketing_dashboard import marketing_dashboard_bp
-from hr.hr_main import hr_bp
-from ld import ld_bp
-from utils.duplicate_api import duplicate_api_bp
+from services.leader_election import RedisLeaderLock
+from services.job_service import job_service
+from services.query_monitor import query_monitor
+from services.metrics import init_metrics, mongo_command_metrics
+from services.slow_query_log import slow_query_log
+from services.request_profiler import request_profiler
+from services.tracing import tracer
+from services.memory_profiler import memory_profiler
+from utils.blueprint_loader import blueprint_loader
+from services.static_assets import static_assets
+from services.compression import response_compression
+from utils.json_provider import BSONJSONProvider
 
 def create_app():
     
     app = Flask(__name__)
     app.config.from_object(Config)
+    # ✅ jsonify() serializes ObjectId & co. itself, through orjson when installed
+    app.json = BSONJSONProvider(app)
 
     CORS(app)
 
     # Initialize extensions
-    mongo.init_app(app)
+    # ✅ Every Mongo client reports its commands to the query monitor, /metrics, the slow query log and tracing
+    mongo.init_app(app, event_listeners=[query_monitor, mongo_command_metrics, slow_query_log, tracer])
+    # ✅ First hooks registered: the request span covers every other before/after_request hook
+    tracer.init_app(app)
+    # ✅ Registered next, so compression is the last after_request hook before the span ends
+    response_compression.init_app(app)
+    query_monitor.init_app(app)
+    slow_query_log.init_app(app)
+    request_profiler.init_app(app)
+    memory_profiler.init_app(app)
     mail.init_app(app)
     bcrypt.init_app(app)
     
@@ -73,7 +63,9 @@ def create_app():
         logger=False,
         engineio_logger=False,
         ping_timeout=60,
-        ping_interval=25
+        ping_interval=25,
+        # ✅ Multi-worker mode: rooms and emits go through Redis to every worker
+        message_queue=app.config.get('SOCKETIO_MESSAGE_QUEUE')
     )
     
     # ✅ MAKE REDIS SERVICE AVAILABLE
@@ -85,50 +77,36 @@ def create_app():
     def index():
         return redirect(url_for('auth.login'))
 
-    # Register blueprints
-    app.register_blueprint(auth_bp)
-    app.register_blueprint(pm_arch_bp)
-   
-    app.register_blueprint(market_manager_bp)
-    app.register_blueprint(central_bp)
-
-    app.register_blueprint(hr_registration_bp)
-    app.register_blueprint(hr_analytics_bp)
-    app.register_blueprint(hr_employee_mgmt_bp)
-    app.register_blueprint(hr_points_mgmt_bp)
-    app.register_blueprint(hr_rr_review_bp)
-    app.register_blueprint(hr_categories_bp)
-    app.register_blueprint(pending_tracker_bp)
-
-    app.register_blueprint(employee_dashboard_bp)
-    app.register_blueprint(employee_leaderboard_bp)
-    app.register_blueprint(employee_history_bp)
-    app.register_blueprint(employee_attachments_bp)
-    app.register_blueprint(employee_filters_bp)
-    app.register_blueprint(employee_api_bp)
-    app.register_blueprint(employee_raise_request_bp)
-    app.register_blueprint(employee_points_total_bp)
-
-    app.register_blueprint(pm_bp)
-    app.register_blueprint(ta_bp)
-
-
-    app.register_blueprint(ld_bp)
-    app.register_blueprint(hr_bp)
-
-
-    app.register_blueprint(presales_bp)
+    # Register blueprints (utils/blueprint_loader.py; LAZY_BLUEPRINTS defers them to first use)
+    blueprint_loader.init_app(app)
+    # ✅ Fingerprinted, precompressed static files (python -m services.static_assets builds them)
+    static_assets.init_app(app)
 
-    app.register_blueprint(pmo_bp)
+    # ✅ PROMETHEUS /metrics: route latency, Mongo, Redis, SMTP, Socket.IO rooms, greenlets
+    try:
+        init_metrics(app, socketio)
+    except Exception as e:
+        import traceback
+        traceback.print_exc()
 
-    app.register_blueprint(dp_bp)
-    
-    app.register_blueprint(marketing_dashboard_bp)
-    
-    app.register_blueprint(duplicate_api_bp)
+    # ✅ PER-ROUTE-CLASS BULKHEADS: exports/analytics can't starve interactive requests
+    try:
+        from utils.admission_control import init_admission_control
+        init_admission_control(app)
+    except Exception as e:
+        import traceback
+        traceback.print_exc()
 
     # ✅ INITIALIZE SOCKETIO SERVICE
-    socketio_service = SocketIORealtimeService(socketio, redis_service)
+    # Multi-worker mode: only the elected leader fans Redis pub/sub out to the rooms
+    leader_lock = None
+    if app.config.get('SOCKETIO_MESSAGE_QUEUE'):
+        leader_lock = RedisLeaderLock(
+            redis_service.redis,
+            'realtime_listener',
+            ttl_seconds=app.config.get('REALTIME_LEADER_TTL_SECONDS', 10)
+        )
+    socketio_service = SocketIORealtimeService(socketio, redis_service, leader_lock=leader_lock)
     
     # ✅ SOCKETIO EVENT HANDLERS
     @socketio.on('connect')
@@ -159,18 +137,63 @@ def create_app():
         import traceback
         traceback.print_exc()
     
-    # ✅ VALIDATE AND FIX CATEGORIES ON STARTUP
-    # This runs on EVERY system where the app is deployed
-    # Shows analysis and fixes missing categories automatically
+    # ✅ LOG GREENLETS THAT HOLD THE EVENTLET HUB TOO LONG
+    try:
+        from services.hub_monitor import start_hub_block_detector
+        start_hub_block_detector(app.config.get('HUB_BLOCK_THRESHOLD_MS'))
+    except Exception as e:
+        import traceback
+        traceback.print_exc()
+    
+    # ✅ START BACKGROUND JOB WORKERS (progress goes to the user_<id> Socket.IO rooms)
     try:
-        from utils.category_validator import validate_and_fix_categories
+        job_service.init_app(app, socketio_service)
+        job_service.start_workers()
+    except Exception as e:
+        import traceback
+        traceback.print_exc()
+    
+    # ✅ ENSURE DB-ENFORCED UNIQUE INDEXES (request dedupe key, attachment content hash),
+    # the indexes behind the hot queries and the capped slow query log
+    try:
+        from utils.request_dedupe import ensure_dedupe_index
+        from utils.attachment_store import ensure_attachment_indexes
+        from utils.db_indexes import ensure_hot_indexes
+        # Imported in every worker so its maintenance job handlers are registered there
+        import utils.category_validator  # noqa: F401
         with app.app_context():
-            # show_analysis=False to disable verbose category distribution logs
-            validate_and_fix_categories(show_analysis=False)
+            ensure_dedupe_index()
+            ensure_attachment_indexes()
+            ensure_hot_indexes()
+            slow_query_log.ensure_collection(app.config.get('SLOW_QUERY_LOG_BYTES'))
     except Exception as e:
         import traceback
-        print("⚠️  Category validation failed (non-critical):")
         traceback.print_exc()
+    
+    # ✅ STARTUP MAINTENANCE JOBS (off with STARTUP_JOBS_ENABLED, e.g. for benchmarks)
+    if app.config.get('STARTUP_JOBS_ENABLED', True):
+        # Key existing active utilization requests in the background.
+        # Queued once for all workers; only requests without a dedupe key are visited
+        try:
+            from utils.request_dedupe import queue_dedupe_backfill
+            with app.app_context():
+                queue_dedupe_backfill()
+        except Exception as e:
+            import traceback
+            print("⚠️  Could not queue the dedupe key backfill (non-critical):")
+            traceback.print_exc()
+        
+        # Validate and fix categories in the background.
+        # Queued once for all workers (idempotency key) and incremental: only requests
+        # added since the last run are checked. Full run: python -m utils.category_validator --full
+        try:
+            from utils.category_validator import queue_category_validation
+            with app.app_context():
+                queue_category_validation(batch_size=app.config.get('CATEGORY_VALIDATION_BATCH_SIZE', 20000))
+        except Exception as e:
+            import traceback
+            print("⚠️  Could not queue category validation (non-critical):")
+            traceback.print_exc()
 
     return app, socketio
 
@@ -180,17 +203,23 @@ app, socketio = create_app()
 
 
 if __name__ == '__main__':
+    import os
+    # ✅ run_workers.py starts one process per port via PBS_PORT
+    port = int(os.environ.get('PBS_PORT', 3500))
+    
     print("=" * 60)
     print("PBS APPLICATION WITH REAL-TIME UPDATES")
     print("=" * 60)
-    print("Server: http://0.0.0.0:3500")
+    print(f"Server: http://0.0.0.0:{port}")
+    if app.config.get('SOCKETIO_MESSAGE_QUEUE'):
+        print(f"Socket.IO message queue: {app.config['SOCKETIO_MESSAGE_QUEUE']}")
     print("=" * 60)
     
     # ✅ DISABLE RELOADER TO PREVENT DOUBLE STARTUP
     socketio.run(
         app,
         host='0.0.0.0',
-        port=3500,
+        port=port,
         debug=False,  # Set to False to reduce verbose logging
         use_reloader=False
     )
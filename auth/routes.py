@@ -1,5 +1,5 @@
 from flask import Blueprint, render_template, request, redirect, url_for, session, flash, jsonify, make_response
-from extensions import mongo, mail, bcrypt
+from extensions import mongo, mail
 from datetime import datetime, timedelta
 import random
 import re
@@ -8,6 +8,7 @@ import string
 from flask_mail import Message
 from bson.objectid import ObjectId
 from functools import wraps
+from utils.cpu_offload import hash_password, verify_password
 import hashlib
 import uuid
 import hmac
@@ -316,7 +317,7 @@ def check_password_history(user_id, new_password):
     
     # Check against last 3 passwords
     for old_hash in password_history[-3:]:
-        if bcrypt.check_password_hash(old_hash, new_password):
+        if verify_password(old_hash, new_password):
             return False
     
     return True
@@ -383,7 +384,7 @@ def login():
             return render_template('login.html')
         
         # Verify password
-        if not bcrypt.check_password_hash(user['password_hash'], password):
+        if not verify_password(user['password_hash'], password):
             # Track failed attempt (for monitoring only)
             increment_failed_login(email)
             flash('Invalid credentials. Please check your email or password.', 'danger')
@@ -510,7 +511,7 @@ def reset_password():
         # ============================================================
         # STEP 4: Update Password
         # ============================================================
-        password_hash = bcrypt.generate_password_hash(new_password).decode('utf-8')
+        password_hash = hash_password(new_password)
         
         # Add old password to history
         if user.get('password_hash'):
@@ -724,7 +725,7 @@ def forgot_reset_password():
         # ============================================================
         # STEP 4: Update Password
         # ============================================================
-        password_hash = bcrypt.generate_password_hash(new_password).decode('utf-8')
+        password_hash = hash_password(new_password)
         
         # Add old password to history
         if user.get('password_hash'):
@@ -798,8 +799,8 @@ def check_session_validity():
     if request.endpoint and request.endpoint.startswith('auth.'):
         return
     
-    # Skip check for static files
-    if request.endpoint and request.endpoint == 'static':
+    # Skip check for static files (and the fingerprinted assets of services/static_assets.py)
+    if request.endpoint and request.endpoint in ('static', 'assets'):
         return
     
     # Check if user is logged in
@@ -0,0 +1,12 @@
+"""
+Performance Benchmarks
+Seeded data generator (benchmarks/datagen.py) and timed scenarios
+(benchmarks/run.py) for the hot paths of PBS, run against a local mongod:
+
+    python -m benchmarks.run seed --scale medium --seed 42
+    python -m benchmarks.run run --save benchmarks/baselines/main.json
+    python -m benchmarks.run compare benchmarks/baselines/main.json results.json
+
+The same seed and scale always produce the same dataset, so two result files
+taken on the same machine can be diffed to catch regressions.
+"""
@@ -0,0 +1,351 @@
+"""
+Benchmark Data Generator
+Builds a reproducible PBS dataset in a scratch database: users across every
+grade/department/location with their managers, DPs and HR/Central staff,
+hr_categories and legacy categories, and points_request/points history spread
+over several fiscal years (April-March), plus login sessions (user_sessions).
+
+Everything - ObjectIds included - comes from one ``random.Random(seed)``, so a
+seed, scale, year count and fiscal year always give the same documents.
+"""
+
+import calendar
+import hashlib
+import random
+import struct
+from datetime import datetime, timedelta
+from bson import ObjectId
+
+# Refuse to drop collections in a database whose name does not contain this
+SAFE_DB_MARKER = 'bench'
+
+BATCH_SIZE = 10000
+
+SCALES = {
+    # employees, points_request documents, legacy points documents
+    'small': {'users': 500, 'requests': 50000, 'legacy_points': 10000},
+    'medium': {'users': 2000, 'requests': 200000, 'legacy_points': 50000},
+    'large': {'users': 5000, 'requests': 500000, 'legacy_points': 100000},
+}
+
+GRADES = ['A1', 'B1', 'B2', 'C1', 'C2', 'D1', 'D2', 'E1', 'E2', 'EL1', 'EL2', 'EL3']
+DEPARTMENTS = ['Management', 'IT', 'Admin', 'Marketing', 'Sales', 'HR', 'Finance']
+LOCATIONS = ['US', 'Non-US', 'India', 'UK', 'Canada', 'Australia']
+
+# name, category_code, category_department, base points, is_bonus, weight
+HR_CATEGORIES = [
+    ('Utilization Billable', 'utilization_billable', 'pmo', 0, False, 12),
+    ('Client Appreciation', 'client_appreciation', 'pmo', 100, False, 8),
+    ('Project Delivery Excellence', 'project_delivery', 'pmo', 250, False, 4),
+    ('Interview Panel', 'interview_panel', 'ta', 50, False, 10),
+    ('Referral Hire', 'referral_hire', 'ta', 500, True, 2),
+    ('Training Delivered', 'training_delivered', 'ld', 150, False, 6),
+    ('Certification', 'certification', 'ld', 300, False, 5),
+    ('Mentoring', 'mentoring', 'hr', 100, False, 8),
+    ('Value Add', 'value_add', 'hr', 75, False, 10),
+    ('Team Event Volunteer', 'team_event', 'hr', 25, False, 9),
+    ('Spot Award', 'spot_award', 'hr', 200, True, 3),
+    ('Blog Post', 'blog_post', 'marketing', 100, False, 5),
+    ('Case Study', 'case_study', 'marketing', 200, False, 2),
+    ('Proposal Support', 'proposal_support', 'presales', 150, False, 4),
+    ('Solution Demo', 'solution_demo', 'presales', 250, False, 2),
+    ('Employee Raised Request', 'employee_raised', 'hr', 50, False, 10),
+]
+
+# name, code, category_department, is_bonus (pre-hr_categories collection)
+LEGACY_CATEGORIES = [
+    ('Utilization Billable', 'utilization_billable', 'pmo', False),
+    ('Client Feedback', 'client_feedback', 'pmo', False),
+    ('Interviews', 'interviews', 'ta', False),
+    ('Knowledge Sharing', 'knowledge_sharing', 'ld', False),
+    ('Extra Mile', 'extra_mile', 'hr', True),
+    ('Innovation', 'innovation', 'hr', False),
+]
+
+# points_request status mix
+STATUS_WEIGHTS = [('Approved', 85), ('Pending', 8), ('Rejected', 7)]
+SOURCES = ['hr_bulk_upload', 'manager_request', 'employee_request', 'updater_request']
+
+
+def fiscal_year_start(year):
+    """April 1st of the fiscal year that starts in ``year``"""
+    return datetime(year, 4, 1)
+
+
+def current_fiscal_year(now=None):
+    now = now or datetime.utcnow()
+    return now.year if now.month >= 4 else now.year - 1
+
+
+class DatasetGenerator:
+    """Seeded generator of one benchmark dataset"""
+
+    def __init__(self, db, seed=42, scale='medium', years=3, fiscal_year=None):
+        if scale not in SCALES:
+            raise ValueError(f"Unknown scale '{scale}' (choose from {', '.join(SCALES)})")
+        if SAFE_DB_MARKER not in db.name:
+            raise ValueError(f"Refusing to overwrite database '{db.name}': its name must contain '{SAFE_DB_MARKER}'")
+        self.db = db
+        self.seed = seed
+        self.scale = scale
+        self.sizes = SCALES[scale]
+        self.years = years
+        self.fiscal_year = fiscal_year or current_fiscal_year()
+        self.rng = random.Random(seed)
+        self.period_start = fiscal_year_start(self.fiscal_year - years + 1)
+        self.period_end = fiscal_year_start(self.fiscal_year + 1) - timedelta(seconds=1)
+        self.counts = {}
+
+    # ------------------------------------------------------------- helpers
+
+    def _object_id(self, when):
+        """ObjectId with ``when`` as its timestamp and seeded remaining bytes"""
+        return ObjectId(struct.pack('>I', calendar.timegm(when.utctimetuple())) + self.rng.getrandbits(64).to_bytes(8, 'big'))
+
+    def _random_date(self):
+        span = (self.period_end - self.period_start).total_seconds()
+        return self.period_start + timedelta(seconds=int(self.rng.random() * span))
+
+    def _insert(self, collection, documents):
+        for start in range(0, len(documents), BATCH_SIZE):
+            self.db[collection].insert_many(documents[start:start + BATCH_SIZE], ordered=False)
+        self.counts[collection] = self.counts.get(collection, 0) + len(documents)
+
+    def _user(self, index, name, role, dashboard_access, department=None, grade=None, manager_id=None, dp_id=None):
+        joined = self.period_start - timedelta(days=self.rng.randint(30, 3000))
+        return {
+            '_id': self._object_id(joined),
+            'name': name,
+            'email': f'bench.user{index:06d}@example.com',
+            'phone': f'9{self.rng.randint(100000000, 999999999)}',
+            'employee_id': f'BEN{index:06d}',
+            # Benchmarks log in through the session, never with a password
+            'password_hash': '!',
+            'role': role,
+            'grade': grade or self.rng.choice(GRADES),
+            'department': department or self.rng.choice(DEPARTMENTS),
+            'location': self.rng.choice(LOCATIONS),
+            'employee_level': self.rng.choice(['Junior', 'Mid', 'Senior', 'Lead']),
+            'manager_id': manager_id,
+            'dp_id': dp_id,
+            'is_active': True,
+            'dashboard_access': dashboard_access,
+            'joining_date': joined,
+            'created_at': joined
+        }
+
+    # ----------------------------------------------------------- datasets
+
+    def reset(self):
+        for name in ('users', 'hr_config', 'hr_categories', 'categories', 'points_request', 'points',
+                     'user_sessions', 'bench_meta'):
+            self.db.drop_collection(name)
+
+    def generate(self):
+        """Drop and rebuild the dataset; returns the bench_meta document"""
+        self.reset()
+        self.db.hr_config.insert_one({
+            'config_type': 'registration',
+            'grades': GRADES,
+            'departments': DEPARTMENTS,
+            'locations': LOCATIONS
+        })
+
+        staff, employees = self._generate_users()
+        hr_categories, legacy_categories = self._generate_categories()
+        self._generate_requests(staff, employees, hr_categories)
+        self._generate_legacy_points(staff, employees, legacy_categories)
+        self._generate_sessions(employees)
+
+        meta = {
+            '_id': 'dataset',
+            'seed': self.seed,
+            'scale': self.scale,
+            'years': self.years,
+            'fiscal_year': self.fiscal_year,
+            'period_start': self.period_start,
+            'period_end': self.period_end,
+            'counts': self.counts,
+            'fixtures': {role: user['_id'] for role, user in staff.items()},
+            'generated_at': datetime.utcnow()
+        }
+        self.db.bench_meta.insert_one(meta)
+        return meta
+
+    def _generate_users(self):
+        index = 0
+        staff = {}
+        for role, name, access, department in [
+            ('central', 'Bench Central Admin', ['central'], 'Management'),
+            ('hr', 'Bench HR Admin', ['hr'], 'HR'),
+            ('hr_validator', 'Bench HR Validator', ['hr_va'], 'HR'),
+            ('hr_updater', 'Bench HR Updater', ['hr_up'], 'HR'),
+            ('pmo_validator', 'Bench PMO Validator', ['pmo_va'], 'IT'),
+            ('ta_validator', 'Bench TA Validator', ['ta_va'], 'HR'),
+            ('ld_validator', 'Bench L&D Validator', ['ld_va'], 'HR'),
+            ('pm', 'Bench Project Manager', ['pm'], 'IT'),
+        ]:
+            index += 1
+            staff[role] = self._user(index, name, 'Manager', access, department=department, grade='EL1')
+
+        managers = []
+        for _ in range(max(5, self.sizes['users'] // 20)):
+            index += 1
+            managers.append(self._user(index, f'Bench Manager {index}', 'Manager', ['pm'], grade=self.rng.choice(GRADES[-5:])))
+        dps = []
+        for _ in range(max(2, self.sizes['users'] // 100)):
+            index += 1
+            dps.append(self._user(index, f'Bench DP {index}', 'Manager', ['dp'], grade=self.rng.choice(GRADES[-3:])))
+
+        employees = []
+        for _ in range(self.sizes['users']):
+            index += 1
+            manager = self.rng.choice(managers)
+            employees.append(self._user(
+                index, f'Bench Employee {index}', 'Employee', [],
+                department=manager['department'],
+                manager_id=manager['_id'],
+                dp_id=self.rng.choice(dps)['_id']
+            ))
+        # The PM fixture manages a slice of employees so its dashboards have data
+        for employee in employees[:50]:
+            employee['manager_id'] = staff['pm']['_id']
+
+        self._insert('users', list(staff.values()) + managers + dps + employees)
+        return staff, employees
+
+    def _generate_categories(self):
+        created = self.period_start - timedelta(days=30)
+        hr_categories = []
+        for name, code, department, base, is_bonus, weight in HR_CATEGORIES:
+            points_per_unit = {'base': base}
+            for position, grade in enumerate(GRADES):
+                points_per_unit[grade] = base + (base * position) // 10
+            hr_categories.append({
+                '_id': self._object_id(created),
+                'name': name,
+                'description': f'{name} (benchmark category)',
+                'points_per_unit': points_per_unit,
+                'min_points_per_frequency': base,
+                'frequency': self.rng.choice(['Monthly', 'Quarterly', 'Yearly']),
+                'category_status': 'active',
+                'category_department': department,
+                'category_type': 'Bonus' if is_bonus else 'Regular',
+                'category_code': code,
+                'is_bonus': is_bonus,
+                'created_at': created,
+                '_weight': weight
+            })
+        legacy_categories = [{
+            '_id': self._object_id(created),
+            'name': name,
+            'code': code,
+            'category_department': department,
+            'is_bonus': is_bonus,
+            'created_at': created
+        } for name, code, department, is_bonus in LEGACY_CATEGORIES]
+
+        weights = [category.pop('_weight') for category in hr_categories]
+        self._insert('hr_categories', hr_categories)
+        self._insert('categories', legacy_categories)
+        return list(zip(hr_categories, weights)), legacy_categories
+
+    def _generate_requests(self, staff, employees, hr_categories):
+        categories = [category for category, _ in hr_categories]
+        weights = [weight for _, weight in hr_categories]
+        statuses = [status for status, _ in STATUS_WEIGHTS]
+        status_weights = [weight for _, weight in STATUS_WEIGHTS]
+
+        # Department queues go to their own validator, everything else to HR
+        validators = {
+            'pmo': staff['pmo_validator']['_id'],
+            'ta': staff['ta_validator']['_id'],
+            'ld': staff['ld_validator']['_id'],
+        }
+
+        requests, points = [], []
+        for _ in range(self.sizes['requests']):
+            employee = self.rng.choice(employees)
+            category = self.rng.choices(categories, weights)[0]
+            status = self.rng.choices(statuses, status_weights)[0]
+            event_date = self._random_date()
+            request_date = event_date + timedelta(days=self.rng.randint(0, 10))
+            base = category['points_per_unit'].get(employee['grade']) or self.rng.randint(1, 100)
+            department = category['category_department']
+            validator_id = validators.get(department, staff['hr_validator']['_id'])
+            request_doc = {
+                '_id': self._object_id(request_date),
+                'user_id': employee['_id'],
+                'category_id': category['_id'],
+                'points': base * self.rng.randint(1, 3),
+                'status': status,
+                'request_date': request_date,
+                'event_date': event_date,
+                'source': self.rng.choice(SOURCES),
+                'is_bonus': category['is_bonus'],
+                'submission_notes': 'Benchmark request',
+                'processed_department': department,
+                'assigned_validator_id': validator_id
+            }
+            if department == 'hr':
+                request_doc['created_by_hr_id'] = staff['hr_updater']['_id']
+            if status != 'Pending':
+                response_date = request_date + timedelta(days=self.rng.randint(0, 14))
+                request_doc.update({
+                    'response_date': response_date,
+                    'response_notes': f'Benchmark {status.lower()}',
+                    'processed_by': validator_id
+                })
+            if status == 'Approved':
+                request_doc['award_date'] = event_date
+                points.append({
+                    '_id': self._object_id(request_doc['response_date']),
+                    'user_id': employee['_id'],
+                    'category_id': category['_id'],
+                    'points': request_doc['points'],
+                    'award_date': event_date,
+                    'awarded_by': validator_id,
+                    'notes': 'Benchmark approval',
+                    'request_id': request_doc['_id'],
+                    'created_at': request_doc['response_date']
+                })
+            requests.append(request_doc)
+
+        self._insert('points_request', requests)
+        self._insert('points', points)
+
+    def _generate_legacy_points(self, staff, employees, legacy_categories):
+        legacy = []
+        for _ in range(self.sizes['legacy_points']):
+            award_date = self._random_date()
+            category = self.rng.choice(legacy_categories)
+            legacy.append({
+                '_id': self._object_id(award_date),
+                'user_id': self.rng.choice(employees)['_id'],
+                'category_id': category['_id'],
+                'points': self.rng.choice([10, 25, 50, 100, 250]),
+                'award_date': award_date,
+                'awarded_by': staff['pm']['_id'],
+                'notes': 'Benchmark legacy award',
+                'created_at': award_date
+            })
+        self._insert('points', legacy)
+
+    def _generate_sessions(self, employees):
+        sessions = []
+        for employee in employees:
+            for _ in range(self.rng.randint(0, 3)):
+                created = self._random_date()
+                token = '%032x' % self.rng.getrandbits(128)
+                sessions.append({
+                    '_id': self._object_id(created),
+                    'session_token': f'{token[:8]}-{token[8:12]}-{token[12:16]}-{token[16:20]}-{token[20:]}',
+                    'user_id': str(employee['_id']),
+                    'client_fingerprint': hashlib.sha256(token.encode()).hexdigest(),
+                    'ip_address': '127.0.0.1',
+                    'user_agent': 'benchmark',
+                    'created_at': created,
+                    'last_activity': created + timedelta(minutes=self.rng.randint(1, 240)),
+                    'is_active': self.rng.random() < 0.3
+                })
+        self._insert('user_sessions', sessions)
@@ -0,0 +1,77 @@
+"""
+Import Time Report
+Imports every blueprint module (utils/blueprint_loader.py) in a fresh
+interpreter under ``python -X importtime`` and breaks the time down by module:
+
+    python -m benchmarks.run imports --top 25 --max-ms 1500
+
+Repository modules are ranked by cumulative time (their own code plus every
+module they were the first to import), third-party packages by the time their
+modules spent executing. ``--max-ms`` fails the run when the whole import takes
+longer, so a module that starts doing I/O or heavy work at import shows up.
+"""
+
+import os
+import subprocess
+import sys
+from collections import defaultdict, namedtuple
+
+ImportEntry = namedtuple('ImportEntry', 'module self_us cumulative_us')
+
+# Same start-up as a worker: eventlet patches first, then the blueprints
+IMPORT_SCRIPT = (
+    "import eventlet; eventlet.monkey_patch()\n"
+    "from utils.blueprint_loader import BLUEPRINTS, import_blueprint\n"
+    "for spec in BLUEPRINTS: import_blueprint(spec)\n"
+)
+
+
+def parse_importtime(output):
+    """Entries of ``-X importtime`` output, in the order the imports finished"""
+    entries = []
+    for line in output.splitlines():
+        if not line.startswith('import time:'):
+            continue
+        fields = line[len('import time:'):].split('|')
+        if len(fields) != 3 or not fields[0].strip().isdigit():
+            continue  # header line
+        entries.append(ImportEntry(fields[2].strip(), int(fields[0]), int(fields[1])))
+    return entries
+
+
+def measure_imports(repo_dir, python=sys.executable):
+    """Run the blueprint imports under -X importtime; returns the parsed entries"""
+    result = subprocess.run([python, '-X', 'importtime', '-W', 'ignore', '-c', IMPORT_SCRIPT],
+                            cwd=repo_dir, capture_output=True, text=True)
+    if result.returncode != 0:
+        raise RuntimeError(f"Importing the blueprints failed:\n{result.stderr[-2000:]}")
+    return parse_importtime(result.stderr)
+
+
+def summarize(entries, repo_dir, top=25):
+    """
+    Group import times by repository module and third-party package.
+
+    Returns:
+        dict: total_ms, repo modules by cumulative ms, packages by own ms
+    """
+    local_packages = {name.split('.')[0] for name in os.listdir(repo_dir)
+                      if name.endswith('.py') or os.path.isdir(os.path.join(repo_dir, name))}
+    repo_modules, packages = [], defaultdict(int)
+    for entry in entries:
+        package = entry.module.split('.')[0]
+        if package in local_packages:
+            repo_modules.append(entry)
+        else:
+            packages[package] += entry.self_us
+
+    repo_modules.sort(key=lambda entry: entry.cumulative_us, reverse=True)
+    return {
+        'total_ms': round(sum(entry.self_us for entry in entries) / 1000, 1),
+        'repo_ms': round(sum(entry.self_us for entry in repo_modules) / 1000, 1),
+        'modules': [{'module': entry.module,
+                     'self_ms': round(entry.self_us / 1000, 1),
+                     'cumulative_ms': round(entry.cumulative_us / 1000, 1)} for entry in repo_modules[:top]],
+        'packages': [{'package': package, 'self_ms': round(us / 1000, 1)}
+                     for package, us in sorted(packages.items(), key=lambda item: item[1], reverse=True)[:top]]
+    }
@@ -0,0 +1,72 @@
+"""
+Query Budget Check
+Views declare the most Mongo queries they may send with ``@query_budget(n)``
+(services/query_monitor.py). This drives every budgeted endpoint against the
+seeded benchmark dataset - with data large enough that a per-row lookup would
+show - and fails when one goes over its budget:
+
+    python -m benchmarks.run budgets
+
+A budgeted endpoint without an entry in ``budget_probes`` fails too, so a new
+budget cannot go unchecked.
+"""
+
+from services.query_monitor import endpoint_budgets
+
+
+class QueryBudgetExceeded(AssertionError):
+    pass
+
+
+def request_with_budget(client, path, method='GET', budget=None, **kwargs):
+    """
+    Send one request through a Flask test client and check its view's query budget.
+
+    Args:
+        client: Test client (QUERY_DEBUG_HEADERS must be on)
+        path: URL to request
+        method: HTTP method
+        budget: Overrides the budget declared on the view
+        **kwargs: Passed to client.open (json=, data=, ...)
+
+    Returns:
+        tuple: (response, queries sent by the view)
+    """
+    response = client.open(path, method=method, **kwargs)
+    response.get_data()
+    if 'X-DB-View-Queries' not in response.headers:
+        raise QueryBudgetExceeded(
+            f"{method} {path} returned {response.status_code} without X-DB-View-Queries "
+            f"(no @query_budget on the view, QUERY_DEBUG_HEADERS off, or the request never reached it)"
+        )
+    queries = int(response.headers['X-DB-View-Queries'])
+    if budget is None:
+        budget = int(response.headers['X-DB-Query-Budget'])
+    if queries > budget:
+        raise QueryBudgetExceeded(f"{method} {path} sent {queries} queries, over its budget of {budget}")
+    return response, queries
+
+
+def budget_probes(meta):
+    """
+    Requests exercising each budgeted endpoint.
+
+    Returns:
+        dict: endpoint -> (fixture role, method, path)
+    """
+    # Everything since the start of the dataset counts as "new", so the lists are long
+    since = meta['period_start'].strftime('%Y-%m-%dT%H:%M:%S')
+    return {
+        'employee_dashboard.dashboard': ('employee', 'GET', '/employee/dashboard'),
+        'employee_api.dashboard_updates': ('employee', 'GET', '/employee/api/dashboard-updates'),
+        'pmo.get_pending_count': ('pmo_validator', 'GET', '/pmo/validator/pending-count'),
+        'ta.check_new_requests': ('ta_validator', 'GET',
+                                  f'/talent-acquisition/validator/check-new-requests?last_check={since}'),
+        'ld.check_new_requests': ('ld_validator', 'GET',
+                                  f'/learning-development/validator/check-new-requests?last_check={since}'),
+    }
+
+
+def unprobed_endpoints(app, probes):
+    """Budgeted endpoints that budget_probes does not exercise"""
+    return sorted(set(endpoint_budgets(app)) - set(probes))
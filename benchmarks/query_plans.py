@@ -0,0 +1,165 @@
+"""
+Query-Plan Regression Check
+Drives the hot endpoints (HR/PMO/TA/L&D validator pending queues, employee history,
+leaderboard, duplicate checks - and session validation, which runs before each
+of them) against the seeded benchmark dataset, captures every find/aggregate/
+count/distinct they send to the watched collections, and explains each distinct
+query shape with executionStats.
+
+A query fails when its winning plan
+  - contains a COLLSCAN that discards most of what it reads (a scan that keeps
+    at least ``collscan_keep`` of the documents - e.g. a full user listing - is
+    not something an index would fix), or
+  - examines more than ``max_ratio`` documents per returned document.
+
+    python -m benchmarks.run plans
+"""
+
+import uuid
+from datetime import datetime
+from pymongo import monitoring
+from services.query_monitor import query_shape
+from services.slow_query_log import EXPLAINABLE_FIELDS, summarize_plan
+
+WATCHED_COLLECTIONS = ('points_request', 'points', 'users', 'user_sessions')
+DEFAULT_MAX_RATIO = 10
+DEFAULT_COLLSCAN_KEEP = 0.5
+
+
+class PlanCapture(monitoring.CommandListener):
+    """Records the first command of each query shape sent while a probe is active"""
+
+    def __init__(self, collections=WATCHED_COLLECTIONS):
+        self.collections = set(collections)
+        self.probe = None
+        self.captured = {}
+
+    def started(self, event):
+        if self.probe is None or event.command_name not in EXPLAINABLE_FIELDS:
+            return
+        if event.command.get(event.command_name) not in self.collections:
+            return
+        shape = query_shape(event.command_name, event.command)
+        self.captured.setdefault(shape, {
+            'probe': self.probe,
+            'command_name': event.command_name,
+            'collection': event.command.get(event.command_name),
+            'database': event.database_name,
+            'command': event.command,
+            'shape': shape
+        })
+
+    def succeeded(self, event):
+        pass
+
+    def failed(self, event):
+        pass
+
+
+def hot_probes(fixtures, employee, category_id, request_id, fiscal_year):
+    """
+    Requests covering the hot queries.
+
+    Returns:
+        list: (label, fixture role, method, path, request kwargs)
+    """
+    event_date = datetime(fiscal_year, 6, 15).strftime('%Y-%m-%d')
+    duplicate_row = {'employee_id': employee['employee_id'], 'category_id': str(category_id), 'event_date': event_date}
+    return [
+        ('hr_validator_queue', 'hr_validator', 'GET', '/hr_roles/validator/dashboard', {}),
+        ('pmo_validator_queue', 'pmo_validator', 'GET', '/pmo/validator/dashboard', {}),
+        ('ta_validator_queue', 'ta_validator', 'GET', '/talent-acquisition/validator/dashboard', {}),
+        ('ld_validator_queue', 'ld_validator', 'GET', '/learning-development/validator/dashboard', {}),
+        ('employee_points_history', 'employee', 'GET', '/employee/points-history', {}),
+        ('employee_request_history', 'employee', 'GET', '/employee/history', {}),
+        ('employee_leaderboard', 'employee', 'GET',
+         f'/employee/get-leaderboard-data?year={fiscal_year}&quarter=all', {}),
+        ('leaderboard_filters', 'employee', 'GET', '/employee/get-leaderboard-filters', {}),
+        ('duplicate_check_single', 'hr_updater', 'POST', '/api/duplicate/check-single', {'json': duplicate_row}),
+        ('duplicate_check_bulk', 'hr_updater', 'POST', '/api/duplicate/check-bulk', {'json': {'rows': [duplicate_row]}}),
+        ('duplicate_check_validator_action', 'hr_validator', 'POST', '/api/duplicate/check-validator-action',
+         {'json': {'request_id': str(request_id), 'action': 'approve'}}),
+    ]
+
+
+def session_client(app, user):
+    """Test client holding a fully validated login session (user_sessions row + fingerprint)"""
+    from extensions import mongo
+    from auth.routes import get_client_fingerprint
+
+    # test_request_context builds the same default headers as the test client
+    with app.test_request_context():
+        fingerprint = get_client_fingerprint()
+    token = str(uuid.uuid4())
+    with app.app_context():
+        mongo.db.user_sessions.insert_one({
+            'session_token': token,
+            'user_id': str(user['_id']),
+            'client_fingerprint': fingerprint,
+            'ip_address': '127.0.0.1',
+            'user_agent': 'benchmark',
+            'created_at': datetime.utcnow(),
+            'last_activity': datetime.utcnow(),
+            'is_active': True
+        })
+
+    client = app.test_client()
+    with client.session_transaction() as session:
+        session['user_id'] = str(user['_id'])
+        session['session_token'] = token
+        session['client_fingerprint'] = fingerprint
+        session['last_activity'] = datetime.utcnow().isoformat()
+    return client, token
+
+
+def _execution_stats(explain):
+    """executionStats of a find/count/distinct explain, or of the $cursor stage of an aggregate"""
+    if 'executionStats' in explain:
+        return explain['executionStats']
+    for stage in explain.get('stages', []):
+        cursor = stage.get('$cursor')
+        if cursor and 'executionStats' in cursor:
+            return cursor['executionStats']
+    return None
+
+
+def _returned(stats):
+    stage = stats.get('executionStages', {})
+    # COUNT returns no documents; what it counted is what its input stage returned
+    if stage.get('stage') == 'COUNT' and 'inputStage' in stage:
+        return stage['inputStage'].get('nReturned', 0)
+    return stats.get('nReturned', 0)
+
+
+def check_query(db_client, record, max_ratio=DEFAULT_MAX_RATIO, collscan_keep=DEFAULT_COLLSCAN_KEEP):
+    """
+    Explain one captured command.
+
+    Returns:
+        dict: record summary with plan, examined/returned and a list of problems
+    """
+    command = record['command']
+    explained = {field: command[field] for field in EXPLAINABLE_FIELDS[record['command_name']] if field in command}
+    if record['command_name'] == 'aggregate':
+        explained['cursor'] = {}
+    explain = db_client[record['database']].command({'explain': explained, 'verbosity': 'executionStats'})
+
+    plan = summarize_plan(explain) or '?'
+    stats = _execution_stats(explain) or {}
+    examined = stats.get('totalDocsExamined', 0)
+    returned = _returned(stats)
+
+    problems = []
+    if 'COLLSCAN' in plan and returned < collscan_keep * examined:
+        problems.append(f"COLLSCAN keeping {returned} of {examined} documents")
+    if examined > max_ratio * max(returned, 1):
+        problems.append(f"{examined} documents examined for {returned} returned")
+    return {
+        'probe': record['probe'],
+        'collection': record['collection'],
+        'shape': record['shape'],
+        'plan': plan,
+        'examined': examined,
+        'returned': returned,
+        'problems': problems
+    }
@@ -0,0 +1,541 @@
+"""
+Benchmark Runner
+Seeds the benchmark database, times the PBS hot paths against it and diffs
+result files:
+
+    python -m benchmarks.run seed --scale medium --seed 42 --years 3
+    python -m benchmarks.run run --repeat 5 --save benchmarks/baselines/<name>.json
+    python -m benchmarks.run compare benchmarks/baselines/main.json benchmarks/baselines/<name>.json
+    python -m benchmarks.run plans
+    python -m benchmarks.run budgets
+    python -m benchmarks.run imports
+
+``run`` builds the real app (create_app) with MONGO_URI pointed at the benchmark
+database - never at production - and with the response cache, slow query log
+and admission control switched off, so every sample recomputes its result.
+No background job workers run and the startup maintenance jobs (dedupe key
+backfill, category validation) are not queued, so nothing but the timed
+requests touches the database; the startup index sync still runs, before any
+timing, since ``plans`` relies on those indexes.
+Mail goes to a closed local port. Each scenario runs once to warm up, then
+``--repeat`` times; the median, p95 and Mongo command count are recorded.
+``compare`` exits with status 1 when a scenario's median got slower than
+``--threshold`` (default 20%) or it issues more Mongo commands. ``plans``
+explains the queries of the hot endpoints (benchmarks/query_plans.py) and exits
+with status 1 when one of them stopped using an index. ``budgets`` does the same
+when an endpoint sends more queries than its ``@query_budget``
+(benchmarks/query_budgets.py). ``imports`` needs no database: it reports
+where the blueprint imports spend their time (benchmarks/import_times.py).
+"""
+
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+from datetime import datetime, timedelta
+
+from benchmarks.datagen import SCALES, DatasetGenerator, fiscal_year_start
+
+DEFAULT_MONGO_URI = os.environ.get('PBS_BENCH_MONGO_URI', 'mongodb://127.0.0.1:27017/pbs_bench')
+DEFAULT_REPEAT = 5
+DEFAULT_THRESHOLD = 0.2
+BULK_APPROVE_SIZE = 100
+BULK_UPLOAD_ROWS = 200
+BENCH_NOTE = 'Benchmark run'
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+class BenchmarkError(Exception):
+    pass
+
+
+class Scenario:
+    """
+    One timed entry point.
+
+    Args:
+        name: Key in the results file
+        run: Callable doing the timed work; returns the Mongo command count
+        reset: Untimed callable run before every sample (restores mutated data)
+    """
+
+    def __init__(self, name, run, reset=None):
+        self.name = name
+        self.run = run
+        self.reset = reset
+
+    def measure(self, repeat, warmup=1):
+        durations, commands = [], []
+        for index in range(warmup + repeat):
+            if self.reset:
+                self.reset()
+            started = time.perf_counter()
+            count = self.run()
+            elapsed = (time.perf_counter() - started) * 1000.0
+            if index >= warmup:
+                durations.append(elapsed)
+                commands.append(count)
+        if self.reset:
+            self.reset()
+        durations.sort()
+        return {
+            'runs': repeat,
+            'min_ms': round(durations[0], 1),
+            'median_ms': round(statistics.median(durations), 1),
+            'p95_ms': round(durations[min(len(durations) - 1, int(round(0.95 * (len(durations) - 1))))], 1),
+            'max_ms': round(durations[-1], 1),
+            'mongo_commands': max(commands)
+        }
+
+
+class _BenchJob:
+    """Stands in for job_service's JobContext: the handler only reports progress"""
+
+    def progress(self, done, total=None, message=None):
+        pass
+
+
+# ---------------------------------------------------------------- app setup
+
+def _load_app(mongo_uri):
+    """Build the real app against the benchmark database"""
+    import eventlet
+    eventlet.monkey_patch()
+
+    from config import Config
+    Config.MONGO_URI = mongo_uri
+    Config.RESPONSE_CACHE_ENABLED = False
+    Config.ADMISSION_CONTROL_ENABLED = False
+    Config.SLOW_QUERY_THRESHOLD_MS = 0
+    Config.QUERY_DEBUG_HEADERS = True
+    Config.SOCKETIO_MESSAGE_QUEUE = None
+    # No background work competing with the timed requests: no job workers, no startup jobs
+    Config.JOB_WORKER_COUNT = 0
+    Config.STARTUP_JOBS_ENABLED = False
+    # Every route must exist up front: budgets and plans walk app.view_functions
+    Config.LAZY_BLUEPRINTS = False
+    # Approval mails must not reach the real SMTP server
+    Config.MAIL_SERVER = '127.0.0.1'
+    Config.MAIL_PORT = 9
+
+    from app import app
+    return app
+
+
+def _client_for(app, user_id):
+    client = app.test_client()
+    with client.session_transaction() as session:
+        session['user_id'] = str(user_id)
+    return client
+
+
+def _request(client, path, method='GET', expect=200, **kwargs):
+    response = client.open(path, method=method, **kwargs)
+    # Streamed bodies (the Excel export) are only produced when read
+    response.get_data()
+    if response.status_code != expect:
+        raise BenchmarkError(f"{method} {path} returned {response.status_code}, expected {expect}")
+    return int(response.headers.get('X-DB-Commands', 0))
+
+
+def _call(app, profile, func, *args, **kwargs):
+    """Call ``func`` in a request context on Mongo profile ``profile``; returns its command count"""
+    from flask import g
+    from extensions import mongo
+    from services.query_monitor import RequestQueries
+
+    with app.test_request_context():
+        g.db_queries = RequestQueries()
+        with mongo.use_profile(profile):
+            func(*args, **kwargs)
+        return g.db_queries.commands
+
+
+# ---------------------------------------------------------------- scenarios
+
+def build_scenarios(app, meta):
+    """Scenarios over the seeded dataset described by ``meta`` (its bench_meta document)"""
+    from extensions import mongo
+    from employee.employee_leaderboard import get_all_approved_points_for_leaderboard
+    from utils.points_calculator import calculate_multiple_users_points
+    from pm.pm_bulk import run_pm_bulk_upload
+
+    fixtures = meta['fixtures']
+    fiscal_year = meta['fiscal_year']
+    year_start = fiscal_year_start(fiscal_year)
+    year_end = fiscal_year_start(fiscal_year + 1) - timedelta(microseconds=1)
+
+    with app.app_context():
+        db = mongo.db
+        employee_ids = [user['_id'] for user in db.users.find({'role': 'Employee'}, {'_id': 1}).sort('_id', 1)]
+        hr_category_ids = [category['_id'] for category in db.hr_categories.find({'category_department': 'hr'}, {'_id': 1})]
+        approve_ids = [doc['_id'] for doc in db.points_request.find(
+            {'status': 'Pending', 'category_id': {'$in': hr_category_ids}}, {'_id': 1}
+        ).sort('_id', 1).limit(BULK_APPROVE_SIZE)]
+        upload_category = db.categories.find_one({'code': 'knowledge_sharing'})
+
+    upload_rows = [{
+        'category_id': str(upload_category['_id']),
+        'mongo_id': str(user_id),
+        'points': 50,
+        'notes': BENCH_NOTE
+    } for user_id in employee_ids[:BULK_UPLOAD_ROWS]]
+
+    def reset_bulk_approve():
+        with app.app_context():
+            mongo.db.points_request.update_many(
+                {'_id': {'$in': approve_ids}},
+                {'$set': {'status': 'Pending'},
+                 '$unset': {'response_date': '', 'response_notes': '', 'processed_by': ''}}
+            )
+            mongo.db.points.delete_many({'request_id': {'$in': approve_ids}})
+
+    def reset_bulk_upload():
+        with app.app_context():
+            mongo.db.points.delete_many({'uploaded_via_csv': True, 'notes': BENCH_NOTE})
+
+    central = _client_for(app, fixtures['central'])
+    hr = _client_for(app, fixtures['hr'])
+    validator = _client_for(app, fixtures['hr_validator'])
+    export_range = f"start_date={meta['period_start']:%Y-%m-%d}&end_date={meta['period_end']:%Y-%m-%d}"
+
+    return [
+        Scenario('leaderboard_all_time', lambda: _call(
+            app, 'analytics', get_all_approved_points_for_leaderboard, {})),
+        Scenario('leaderboard_fiscal_year', lambda: _call(
+            app, 'analytics', get_all_approved_points_for_leaderboard,
+            {'year': str(fiscal_year), 'quarter': 'all'})),
+        Scenario('leaderboard_quarter_department', lambda: _call(
+            app, 'analytics', get_all_approved_points_for_leaderboard,
+            {'year': str(fiscal_year), 'quarter': 'Q1', 'department': 'IT'})),
+        Scenario('calculate_multiple_users_points', lambda: _call(
+            app, 'analytics', calculate_multiple_users_points, employee_ids, year_start, year_end)),
+        Scenario('central_export_excel', lambda: _request(central, f'/central/export/excel?{export_range}')),
+        Scenario('central_dashboard', lambda: _request(central, '/central/dashboard')),
+        Scenario('hr_dashboard', lambda: _request(hr, '/hr/dashboard')),
+        Scenario('hr_bulk_approve', lambda: _request(
+            validator, '/hr_roles/validator/dashboard', method='POST', expect=302,
+            data={'action_type': 'bulk_approve',
+                  'selected_requests': [str(request_id) for request_id in approve_ids],
+                  'approval_notes': BENCH_NOTE}
+        ), reset=reset_bulk_approve),
+        Scenario('pm_bulk_upload', lambda: _call(
+            app, 'batch', run_pm_bulk_upload, _BenchJob(), upload_rows, str(fixtures['pm'])
+        ), reset=reset_bulk_upload),
+    ]
+
+
+# ----------------------------------------------------------------- results
+
+def _git_commit():
+    try:
+        result = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=REPO_DIR,
+                                capture_output=True, text=True, timeout=10)
+        return result.stdout.strip() or None
+    except Exception:
+        return None
+
+
+def _dataset_summary(meta):
+    return {
+        'seed': meta['seed'],
+        'scale': meta['scale'],
+        'years': meta['years'],
+        'fiscal_year': meta['fiscal_year'],
+        'counts': meta['counts']
+    }
+
+
+def compare_results(baseline, current, threshold=DEFAULT_THRESHOLD):
+    """
+    Diff two result files.
+
+    Returns:
+        tuple: (printable report lines, list of regressed scenario names)
+    """
+    lines, regressions = [], []
+    if baseline['meta'].get('dataset') != current['meta'].get('dataset'):
+        lines.append('⚠️  The results were taken on different datasets; timings are not comparable')
+
+    lines.append(f"{'scenario':34} {'base ms':>10} {'now ms':>10} {'change':>8} {'commands':>13}")
+    for name, now in current['scenarios'].items():
+        base = baseline['scenarios'].get(name)
+        if base is None:
+            lines.append(f"{name:34} {'-':>10} {now['median_ms']:>10} {'new':>8} {now['mongo_commands']:>13}")
+            continue
+        change = (now['median_ms'] - base['median_ms']) / base['median_ms'] if base['median_ms'] else 0.0
+        slower = change > threshold
+        more_queries = now['mongo_commands'] > base['mongo_commands']
+        if slower or more_queries:
+            regressions.append(name)
+        commands = f"{base['mongo_commands']} -> {now['mongo_commands']}"
+        flag = '  ❌' if slower or more_queries else ''
+        lines.append(f"{name:34} {base['median_ms']:>10} {now['median_ms']:>10} {change:>+8.0%} {commands:>13}{flag}")
+    for name in baseline['scenarios']:
+        if name not in current['scenarios']:
+            lines.append(f"{name:34} missing from the new results")
+    return lines, regressions
+
+
+def _load_results(path):
+    with open(path) as handle:
+        return json.load(handle)
+
+
+# --------------------------------------------------------------------- CLI
+
+def cmd_seed(args):
+    from pymongo import MongoClient
+
+    client = MongoClient(args.mongo_uri)
+    generator = DatasetGenerator(client.get_default_database(), seed=args.seed, scale=args.scale,
+                                 years=args.years, fiscal_year=args.fiscal_year)
+    started = time.perf_counter()
+    meta = generator.generate()
+    print(f"Seeded {generator.db.name} in {time.perf_counter() - started:.1f}s "
+          f"(seed {meta['seed']}, scale {meta['scale']}, FY{meta['fiscal_year']} back {meta['years']} years)")
+    for collection, count in meta['counts'].items():
+        print(f"  {collection:16} {count:>9}")
+    return 0
+
+
+def cmd_run(args):
+    app = _load_app(args.mongo_uri)
+
+    from extensions import mongo
+    with app.app_context():
+        meta = mongo.db.bench_meta.find_one({'_id': 'dataset'})
+        server_version = mongo.cx.server_info().get('version')
+    if meta is None:
+        raise BenchmarkError("No benchmark dataset found: run 'python -m benchmarks.run seed' first")
+
+    results = {
+        'meta': {
+            'dataset': _dataset_summary(meta),
+            'git_commit': _git_commit(),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'mongodb': server_version,
+            'repeat': args.repeat,
+            'created_at': datetime.utcnow().isoformat(timespec='seconds')
+        },
+        'scenarios': {}
+    }
+    for scenario in build_scenarios(app, meta):
+        if args.only and scenario.name not in args.only:
+            continue
+        stats = scenario.measure(args.repeat)
+        results['scenarios'][scenario.name] = stats
+        print(f"{scenario.name:34} median {stats['median_ms']:>9} ms  p95 {stats['p95_ms']:>9} ms  "
+              f"{stats['mongo_commands']:>6} commands")
+
+    if args.save:
+        os.makedirs(os.path.dirname(os.path.abspath(args.save)), exist_ok=True)
+        with open(args.save, 'w') as handle:
+            json.dump(results, handle, indent=2, sort_keys=True)
+        print(f"Results saved to {args.save}")
+
+    if args.compare:
+        lines, regressions = compare_results(_load_results(args.compare), results, args.threshold)
+        print('\n'.join(lines))
+        return 1 if regressions else 0
+    return 0
+
+
+def cmd_compare(args):
+    lines, regressions = compare_results(_load_results(args.baseline), _load_results(args.current), args.threshold)
+    print('\n'.join(lines))
+    if regressions:
+        print(f"{len(regressions)} regression(s): {', '.join(regressions)}")
+        return 1
+    return 0
+
+
+def cmd_plans(args):
+    # Patch before pymongo is imported: the capture listener must see every client create_app builds
+    import eventlet
+    eventlet.monkey_patch()
+    from pymongo import monitoring
+    from benchmarks.query_plans import PlanCapture, check_query, hot_probes, session_client
+
+    capture = PlanCapture(args.collections)
+    monitoring.register(capture)
+    app = _load_app(args.mongo_uri)
+
+    from extensions import mongo
+    with app.app_context():
+        db = mongo.db
+        meta = db.bench_meta.find_one({'_id': 'dataset'})
+        if meta is None:
+            raise BenchmarkError("No benchmark dataset found: run 'python -m benchmarks.run seed' first")
+        users = {role: db.users.find_one({'_id': user_id}) for role, user_id in meta['fixtures'].items()}
+        users['employee'] = db.users.find_one({'role': 'Employee'}, sort=[('_id', 1)])
+        category = db.hr_categories.find_one({'category_department': 'hr', 'is_bonus': False}, sort=[('_id', 1)])
+        pending = db.points_request.find_one({'status': 'Pending', 'category_id': category['_id']}, sort=[('_id', 1)])
+
+    clients, tokens = {}, []
+    try:
+        for label, role, method, path, kwargs in hot_probes(
+                meta['fixtures'], users['employee'], category['_id'], pending['_id'], meta['fiscal_year']):
+            if role not in clients:
+                clients[role], token = session_client(app, users[role])
+                tokens.append(token)
+            capture.probe = label
+            try:
+                _request(clients[role], path, method=method, **kwargs)
+            finally:
+                capture.probe = None
+
+        with app.app_context():
+            results = [check_query(mongo.cx, record, args.max_ratio, args.collscan_keep)
+                       for record in capture.captured.values()]
+    finally:
+        with app.app_context():
+            mongo.db.user_sessions.delete_many({'session_token': {'$in': tokens}})
+
+    failures = [result for result in results if result['problems']]
+    for result in sorted(results, key=lambda item: (item['probe'], item['collection'])):
+        mark = '❌' if result['problems'] else '✅'
+        print(f"{mark} {result['probe']:32} {result['collection']:15} {result['plan']}")
+        if result['problems'] or args.verbose:
+            print(f"     {result['shape']}")
+        for problem in result['problems']:
+            print(f"     {problem}")
+    print(f"{len(results)} query shapes checked, {len(failures)} failing")
+    return 1 if failures else 0
+
+
+def cmd_budgets(args):
+    from benchmarks.query_budgets import (QueryBudgetExceeded, budget_probes, request_with_budget,
+                                          unprobed_endpoints)
+    from benchmarks.query_plans import session_client
+    from services.query_monitor import endpoint_budgets
+
+    app = _load_app(args.mongo_uri)
+    from extensions import mongo
+    with app.app_context():
+        db = mongo.db
+        meta = db.bench_meta.find_one({'_id': 'dataset'})
+        if meta is None:
+            raise BenchmarkError("No benchmark dataset found: run 'python -m benchmarks.run seed' first")
+        users = {role: db.users.find_one({'_id': user_id}) for role, user_id in meta['fixtures'].items()}
+        users['employee'] = db.users.find_one({'role': 'Employee'}, sort=[('_id', 1)])
+
+    probes = budget_probes(meta)
+    budgets = endpoint_budgets(app)
+    failures = 0
+    for endpoint in unprobed_endpoints(app, probes):
+        failures += 1
+        print(f"❌ {endpoint:40} has a query budget but no probe in benchmarks/query_budgets.py")
+
+    clients, tokens = {}, []
+    try:
+        for endpoint, (role, method, path) in sorted(probes.items()):
+            if endpoint not in budgets:
+                failures += 1
+                print(f"❌ {endpoint:40} is probed but declares no @query_budget")
+                continue
+            if role not in clients:
+                clients[role], token = session_client(app, users[role])
+                tokens.append(token)
+            try:
+                response, queries = request_with_budget(clients[role], path, method=method)
+            except QueryBudgetExceeded as e:
+                failures += 1
+                print(f"❌ {endpoint:40} {e}")
+                continue
+            if response.status_code >= 400:
+                failures += 1
+                print(f"❌ {endpoint:40} {method} {path} returned {response.status_code}")
+                continue
+            print(f"✅ {endpoint:40} {queries:3} / {budgets[endpoint]} queries")
+    finally:
+        with app.app_context():
+            mongo.db.user_sessions.delete_many({'session_token': {'$in': tokens}})
+
+    print(f"{len(probes)} endpoints checked, {failures} failing")
+    return 1 if failures else 0
+
+
+def cmd_imports(args):
+    from benchmarks.import_times import measure_imports, summarize
+
+    report = summarize(measure_imports(REPO_DIR), REPO_DIR, top=args.top)
+    print(f"{'cumulative ms':>14} {'self ms':>8}  repository module")
+    for entry in report['modules']:
+        print(f"{entry['cumulative_ms']:14.1f} {entry['self_ms']:8.1f}  {entry['module']}")
+    print(f"\n{'self ms':>14}  third-party package")
+    for entry in report['packages']:
+        print(f"{entry['self_ms']:14.1f}  {entry['package']}")
+    print(f"\nBlueprint imports: {report['total_ms']:.0f} ms ({report['repo_ms']:.0f} ms in repository modules)")
+    if args.max_ms and report['total_ms'] > args.max_ms:
+        print(f"❌ Over the {args.max_ms:.0f} ms import budget")
+        return 1
+    return 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m benchmarks.run', description='PBS performance benchmarks')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    seed = subparsers.add_parser('seed', help='(Re)generate the benchmark dataset')
+    seed.add_argument('--mongo-uri', default=DEFAULT_MONGO_URI,
+                      help='Benchmark database URI; its name must contain "bench" (default: %(default)s)')
+    seed.add_argument('--seed', type=int, default=42)
+    seed.add_argument('--scale', choices=sorted(SCALES), default='medium')
+    seed.add_argument('--years', type=int, default=3, help='Fiscal years of history')
+    seed.add_argument('--fiscal-year', type=int, default=None,
+                      help='Latest fiscal year (start year); defaults to the current one')
+    seed.set_defaults(func=cmd_seed)
+
+    run = subparsers.add_parser('run', help='Time every scenario')
+    run.add_argument('--mongo-uri', default=DEFAULT_MONGO_URI, help='Benchmark database URI (default: %(default)s)')
+    run.add_argument('--repeat', type=int, default=DEFAULT_REPEAT, help='Timed samples per scenario')
+    run.add_argument('--only', nargs='+', metavar='SCENARIO', help='Run only these scenarios')
+    run.add_argument('--save', metavar='PATH', help='Write the results as JSON (e.g. benchmarks/baselines/main.json)')
+    run.add_argument('--compare', metavar='BASELINE', help='Diff against this results file afterwards')
+    run.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD,
+                     help='Median slowdown counted as a regression (default: %(default)s)')
+    run.set_defaults(func=cmd_run)
+
+    compare = subparsers.add_parser('compare', help='Diff two results files')
+    compare.add_argument('baseline')
+    compare.add_argument('current')
+    compare.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD,
+                         help='Median slowdown counted as a regression (default: %(default)s)')
+    compare.set_defaults(func=cmd_compare)
+
+    plans = subparsers.add_parser('plans', help='Fail when a hot query stops using an index')
+    plans.add_argument('--mongo-uri', default=DEFAULT_MONGO_URI, help='Benchmark database URI (default: %(default)s)')
+    plans.add_argument('--collections', nargs='+', default=['points_request', 'points', 'users', 'user_sessions'],
+                       help='Collections whose queries are checked (default: %(default)s)')
+    plans.add_argument('--max-ratio', type=int, default=10,
+                       help='Documents examined per returned document allowed (default: %(default)s)')
+    plans.add_argument('--collscan-keep', type=float, default=0.5,
+                       help='Fraction of scanned documents a COLLSCAN must return to pass (default: %(default)s)')
+    plans.add_argument('--verbose', action='store_true', help='Print the shape of passing queries too')
+    plans.set_defaults(func=cmd_plans)
+
+    budgets = subparsers.add_parser('budgets', help='Fail when an endpoint sends more queries than its @query_budget')
+    budgets.add_argument('--mongo-uri', default=DEFAULT_MONGO_URI, help='Benchmark database URI (default: %(default)s)')
+    budgets.set_defaults(func=cmd_budgets)
+
+    imports = subparsers.add_parser('imports', help='Break the blueprint import time down by module')
+    imports.add_argument('--top', type=int, default=25, help='Modules and packages listed (default: %(default)s)')
+    imports.add_argument('--max-ms', type=float, default=None, help='Fail when the imports take longer')
+    imports.set_defaults(func=cmd_imports)
+
+    args = parser.parse_args(argv)
+    try:
+        return args.func(args)
+    except (BenchmarkError, ValueError, RuntimeError) as e:
+        print(f"❌ {e}", file=sys.stderr)
+        return 2
+
+
+if __name__ == '__main__':
+    sys.exit(main())
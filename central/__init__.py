@@ -17,5 +17,6 @@ from . import central_config
 from . import central_bonus
 from . import central_export
 from . import central_leaderboard  # Optimized leaderboard with batch queries
+from . import central_diagnostics  # Per-worker query/N+1 diagnostics
 
 __all__ = ['central_bp']
\ No newline at end of file
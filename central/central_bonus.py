@@ -11,6 +11,8 @@ from .central_utils import (
     check_bonus_awarded_for_quarter, debug_print, error_print
 )
 from .central_email import send_bonus_eligibility_email
+from services.job_service import job_service, job_handler
+from utils.response_cache import invalidate_points_change
 
 def get_fiscal_quarter_from_date(date):
     """Get fiscal quarter number (1-4) from a date based on April-March fiscal year"""
@@ -125,6 +127,9 @@ def award_bonus(employee_id):
             }
             mongo.db.points.insert_one(points_entry)
             
+            # ✅ Cached analytics/leaderboards that include this bonus go stale
+            invalidate_points_change(points_request["request_date"], user.get("department"), bonus_category_id)
+            
             # ✅ SEND REAL-TIME NOTIFICATION TO EMPLOYEE
             try:
                 redis_service = current_app.config.get('redis_service')
@@ -789,7 +794,7 @@ def employee_details(employee_id):
 
 @central_bp.route('/send-bonus-analysis', methods=['POST'])
 def send_bonus_analysis():
-    """Send bonus analysis emails to all eligible employees for the current quarter"""
+    """Queue bonus analysis emails to all eligible employees for the current quarter"""
     # Check dashboard access
     has_access, current_user = check_central_access()
     
@@ -797,166 +802,192 @@ def send_bonus_analysis():
         return jsonify({'error': 'Not authorized'}), 403
     
     try:
-        # Get current quarter and year
-        current_qtr_name, current_qtr, current_year = get_current_quarter()
-        qtr_start, qtr_end = get_quarter_date_range(current_qtr, current_year)
+        current_qtr_name, _, _ = get_current_quarter()
+        
+        # ✅ Runs as a background job, once per quarter at a time: a second click - by any Central
+        # user - while it runs returns the same job (shared with the Central dashboard) instead of
+        # emailing every employee twice
+        job, created = job_service.enqueue(
+            'central.bonus_analysis',
+            user_id=current_user['_id'],
+            idempotency_key=current_qtr_name,
+            shared_with='central',
+            description=f'Bonus analysis emails for {current_qtr_name}'
+        )
         
-        # Get all eligible users
-        all_users = get_eligible_users()
-        
-        # Get reward configuration
-        config = get_reward_config()
-        grade_targets = config.get("grade_targets", {})
-        
-        # Find utilization category
-        categories_hr = list(mongo.db.hr_categories.find())
-        categories_old = list(mongo.db.categories.find())
+        return jsonify({
+            'success': True,
+            'job_id': str(job['_id']),
+            'created': created,
+            'message': 'Bonus analysis started' if created else 'Bonus analysis is already running'
+        }), 202
         
-        utilization_category_id = None
-        for cat in categories_hr:
+    except Exception as e:
+        error_print("Error queuing bonus analysis", e)
+        return jsonify({'error': f'Server error: {str(e)}'}), 500
+
+
+@job_handler('central.bonus_analysis')
+def run_bonus_analysis(job):
+    """Background job: send bonus analysis emails to all eligible employees for the current quarter"""
+    # Get current quarter and year
+    current_qtr_name, current_qtr, current_year = get_current_quarter()
+    qtr_start, qtr_end = get_quarter_date_range(current_qtr, current_year)
+    
+    # Get all eligible users
+    all_users = get_eligible_users()
+    
+    # Get reward configuration
+    config = get_reward_config()
+    grade_targets = config.get("grade_targets", {})
+    
+    # Find utilization category
+    categories_hr = list(mongo.db.hr_categories.find())
+    categories_old = list(mongo.db.categories.find())
+    
+    utilization_category_id = None
+    for cat in categories_hr:
+        if cat.get("name") == "Utilization/Billable":
+            utilization_category_id = cat["_id"]
+            break
+    if not utilization_category_id:
+        for cat in categories_old:
             if cat.get("name") == "Utilization/Billable":
                 utilization_category_id = cat["_id"]
                 break
-        if not utilization_category_id:
-            for cat in categories_old:
-                if cat.get("name") == "Utilization/Billable":
-                    utilization_category_id = cat["_id"]
-                    break
-        
-        eligible_employees = []
-        emails_sent = 0
-        emails_failed = 0
-        
-        # Process each user to find eligible ones
-        for emp in all_users:
-            emp_id = emp["_id"]
-            emp_grade = emp.get("grade", "Unknown")
-            emp_name = emp.get("name", "Unknown")
-            
-            # Calculate quarterly points (excluding utilization)
-            quarterly_points = 0
-            regular_requests = mongo.db.points_request.find({
+    
+    eligible_employees = []
+    emails_sent = 0
+    emails_failed = 0
+    
+    # Process each user to find eligible ones
+    for index, emp in enumerate(all_users):
+        emp_id = emp["_id"]
+        emp_grade = emp.get("grade", "Unknown")
+        emp_name = emp.get("name", "Unknown")
+        job.progress(index, len(all_users), f'Checking {emp_name} ({emails_sent} emails sent)')
+        
+        # Calculate quarterly points (excluding utilization)
+        quarterly_points = 0
+        regular_requests = mongo.db.points_request.find({
+            "user_id": emp_id,
+            "status": "Approved",
+            "request_date": {"$gte": qtr_start, "$lte": qtr_end},
+            "is_bonus": {"$ne": True}
+        })
+        
+        for req in regular_requests:
+            category_id = req.get("category_id")
+            if category_id != utilization_category_id:
+                quarterly_points += req.get("points", 0)
+        
+        # Calculate utilization
+        utilization_avg = 0.0
+        if utilization_category_id:
+            utilization_records = list(mongo.db.points_request.find({
                 "user_id": emp_id,
-                "status": "Approved",
                 "request_date": {"$gte": qtr_start, "$lte": qtr_end},
+                "status": "Approved",
+                "category_id": utilization_category_id
+            }))
+            
+            if utilization_records:
+                total_util = 0.0
+                count_util = 0
+                
+                for util_rec in utilization_records:
+                    util_val = None
+                    if 'utilization_value' in util_rec:
+                        util_val = util_rec.get('utilization_value')
+                    elif 'submission_data' in util_rec:
+                        submission_data = util_rec.get('submission_data', {})
+                        if isinstance(submission_data, dict):
+                            util_val = submission_data.get('utilization_value') or submission_data.get('utilization')
+                    
+                    if util_val is None or util_val == 0:
+                        points = util_rec.get('points', 0)
+                        if points > 0 and points <= 100:
+                            util_val = points / 100.0
+                    
+                    if util_val is not None and util_val > 0:
+                        if util_val > 1:
+                            util_val = util_val / 100.0
+                        total_util += util_val
+                        count_util += 1
+                
+                if count_util > 0:
+                    utilization_avg = round((total_util / count_util) * 100, 2)
+        
+        # Calculate yearly bonus points
+        yearly_bonus_points = calculate_yearly_bonus_points(emp_id, current_year)
+        
+        # Check if bonus already awarded
+        bonus_already_awarded = check_bonus_awarded_for_quarter(emp_id, current_qtr_name)
+        
+        # Check eligibility
+        is_eligible, reason = check_bonus_eligibility(
+            quarterly_points,
+            emp_grade,
+            utilization_avg,
+            bonus_already_awarded,
+            yearly_bonus_points
+        )
+        
+        if is_eligible:
+            # ✅ FIXED: Calculate total FISCAL yearly points for milestone calculation
+            total_yearly_points = 0
+            yearly_requests = mongo.db.points_request.find({
+                "user_id": emp_id,
+                "status": "Approved",
+                "request_date": {"$gte": datetime(current_year, 4, 1), "$lte": datetime(current_year + 1, 3, 31, 23, 59, 59, 999999)},
                 "is_bonus": {"$ne": True}
             })
             
-            for req in regular_requests:
+            for req in yearly_requests:
                 category_id = req.get("category_id")
                 if category_id != utilization_category_id:
-                    quarterly_points += req.get("points", 0)
-            
-            # Calculate utilization
-            utilization_avg = 0.0
-            if utilization_category_id:
-                utilization_records = list(mongo.db.points_request.find({
-                    "user_id": emp_id,
-                    "request_date": {"$gte": qtr_start, "$lte": qtr_end},
-                    "status": "Approved",
-                    "category_id": utilization_category_id
-                }))
-                
-                if utilization_records:
-                    total_util = 0.0
-                    count_util = 0
-                    
-                    for util_rec in utilization_records:
-                        util_val = None
-                        if 'utilization_value' in util_rec:
-                            util_val = util_rec.get('utilization_value')
-                        elif 'submission_data' in util_rec:
-                            submission_data = util_rec.get('submission_data', {})
-                            if isinstance(submission_data, dict):
-                                util_val = submission_data.get('utilization_value') or submission_data.get('utilization')
-                        
-                        if util_val is None or util_val == 0:
-                            points = util_rec.get('points', 0)
-                            if points > 0 and points <= 100:
-                                util_val = points / 100.0
-                        
-                        if util_val is not None and util_val > 0:
-                            if util_val > 1:
-                                util_val = util_val / 100.0
-                            total_util += util_val
-                            count_util += 1
-                    
-                    if count_util > 0:
-                        utilization_avg = round((total_util / count_util) * 100, 2)
-            
-            # Calculate yearly bonus points
-            yearly_bonus_points = calculate_yearly_bonus_points(emp_id, current_year)
-            
-            # Check if bonus already awarded
-            bonus_already_awarded = check_bonus_awarded_for_quarter(emp_id, current_qtr_name)
-            
-            # Check eligibility
-            is_eligible, reason = check_bonus_eligibility(
-                quarterly_points,
-                emp_grade,
-                utilization_avg,
-                bonus_already_awarded,
-                yearly_bonus_points
+                    total_yearly_points += req.get("points", 0)
+            
+            quarterly_target = grade_targets.get(emp_grade, 0)
+            yearly_target = quarterly_target * 4
+            
+            # Calculate bonus using milestone logic
+            milestone_bonus, achieved_milestones = calculate_bonus_points(
+                total_yearly_points,
+                yearly_target,
+                current_qtr
             )
             
-            if is_eligible:
-                # ✅ FIXED: Calculate total FISCAL yearly points for milestone calculation
-                total_yearly_points = 0
-                yearly_requests = mongo.db.points_request.find({
-                    "user_id": emp_id,
-                    "status": "Approved",
-                    "request_date": {"$gte": datetime(current_year, 4, 1), "$lte": datetime(current_year + 1, 3, 31, 23, 59, 59, 999999)},
-                    "is_bonus": {"$ne": True}
-                })
-                
-                for req in yearly_requests:
-                    category_id = req.get("category_id")
-                    if category_id != utilization_category_id:
-                        total_yearly_points += req.get("points", 0)
+            # Check if yearly bonus limit would be exceeded
+            if (yearly_bonus_points + milestone_bonus) <= config.get("yearly_bonus_limit", 10000):
+                emp_info = {
+                    "email": emp.get("email", ""),
+                    "name": emp_name,
+                    "role": emp.get("role", "Employee"),
+                    "grade": emp_grade,
+                    "department": emp.get("department", "Unassigned"),
+                    "potential_bonus": milestone_bonus,
+                    "quarterly_points": quarterly_points,
+                    "utilization": utilization_avg,
+                    "achieved_milestones": achieved_milestones
+                }
                 
-                quarterly_target = grade_targets.get(emp_grade, 0)
-                yearly_target = quarterly_target * 4
+                eligible_employees.append(emp_info)
                 
-                # Calculate bonus using milestone logic
-                milestone_bonus, achieved_milestones = calculate_bonus_points(
-                    total_yearly_points,
-                    yearly_target,
-                    current_qtr
-                )
+                # Send email
+                milestones_text = ", ".join([m.get("name", "") for m in achieved_milestones])
+                notes = f"Quarterly Points: {quarterly_points}, Utilization: {utilization_avg}%, Milestones: {milestones_text}"
                 
-                # Check if yearly bonus limit would be exceeded
-                if (yearly_bonus_points + milestone_bonus) <= config.get("yearly_bonus_limit", 10000):
-                    emp_info = {
-                        "email": emp.get("email", ""),
-                        "name": emp_name,
-                        "role": emp.get("role", "Employee"),
-                        "grade": emp_grade,
-                        "department": emp.get("department", "Unassigned"),
-                        "potential_bonus": milestone_bonus,
-                        "quarterly_points": quarterly_points,
-                        "utilization": utilization_avg,
-                        "achieved_milestones": achieved_milestones
-                    }
-                    
-                    eligible_employees.append(emp_info)
-                    
-                    # Send email
-                    milestones_text = ", ".join([m.get("name", "") for m in achieved_milestones])
-                    notes = f"Quarterly Points: {quarterly_points}, Utilization: {utilization_avg}%, Milestones: {milestones_text}"
-                    
-                    if send_bonus_eligibility_email(emp_info, current_qtr_name, notes):
-                        emails_sent += 1
-                    else:
-                        emails_failed += 1
-        
-        return jsonify({
-            'success': True,
-            'message': f'Bonus analysis sent to {emails_sent} eligible employees',
-            'emails_sent': emails_sent,
-            'emails_failed': emails_failed,
-            'eligible_count': len(eligible_employees)
-        })
-        
-    except Exception as e:
-        error_print("Error sending bonus analysis", e)
-        return jsonify({'error': f'Server error: {str(e)}'}), 500
+                if send_bonus_eligibility_email(emp_info, current_qtr_name, notes):
+                    emails_sent += 1
+                else:
+                    emails_failed += 1
+    
+    job.progress(len(all_users), len(all_users), 'Done')
+    
+    return {
+        'message': f'Bonus analysis sent to {emails_sent} eligible employees',
+        'emails_sent': emails_sent,
+        'emails_failed': emails_failed,
+        'eligible_count': len(eligible_employees)
+    }
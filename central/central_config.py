@@ -4,6 +4,7 @@ from datetime import datetime
 from bson.objectid import ObjectId
 from . import central_bp
 from .central_utils import check_central_access, error_print
+from utils.response_cache import invalidate_tags, ALL_POINTS_TAG
 
 @central_bp.route('/config', methods=['GET', 'POST'])
 def reward_config():
@@ -77,6 +78,9 @@ def reward_config():
                     }}
                 )
                 
+                # ✅ Leaderboard progress uses the grade targets
+                invalidate_tags(ALL_POINTS_TAG)
+                
                 flash('Grade targets updated successfully', 'success')
                 return redirect(url_for('central.reward_config'))
                 
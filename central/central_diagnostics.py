@@ -0,0 +1,221 @@
+"""
+Central Diagnostics
+Runtime diagnostics of this worker process for Central users.
+"""
+
+from flask import jsonify, request, render_template, redirect, url_for, flash, send_file
+from . import central_bp
+from .central_utils import check_central_access, error_print
+from services.query_monitor import query_monitor
+from services.slow_query_log import slow_query_log
+from services.request_profiler import request_profiler
+from services.tracing import tracer
+from services.memory_profiler import memory_profiler, DEFAULT_TOP
+from utils.blueprint_loader import blueprint_loader
+
+
+def _require_central_json():
+    """Return an error response unless the session user has Central access"""
+    has_access, user = check_central_access()
+    if not user:
+        return jsonify({'error': 'Not authenticated'}), 401
+    if not has_access:
+        return jsonify({'error': 'Access denied'}), 403
+    return None
+
+
+@central_bp.route('/diagnostics/queries', methods=['GET'])
+def query_diagnostics():
+    """Per-endpoint Mongo command counts, DB time and N+1 shapes (?sort=commands|db_ms|requests)"""
+    error = _require_central_json()
+    if error:
+        return error
+    sort = request.args.get('sort', 'db_ms')
+    if sort not in ('db_ms', 'avg_db_ms', 'commands', 'avg_commands', 'max_commands', 'requests'):
+        sort = 'db_ms'
+    return jsonify(query_monitor.snapshot(sort=sort))
+
+
+@central_bp.route('/diagnostics/queries/reset', methods=['POST'])
+def reset_query_diagnostics():
+    """Start a fresh measurement window"""
+    error = _require_central_json()
+    if error:
+        return error
+    query_monitor.reset()
+    return jsonify({'success': True})
+
+
+@central_bp.route('/diagnostics/slow-queries', methods=['GET'])
+def slow_queries():
+    """Slowest Mongo query shapes from the slow query log (?sort=total_ms|count|p95_ms|max_ms, ?route=<endpoint>)"""
+    has_access, user = check_central_access()
+    if not has_access:
+        if not user:
+            flash('You need to log in first', 'warning')
+        else:
+            flash('You do not have permission to access the Central dashboard', 'danger')
+        return redirect(url_for('auth.login'))
+
+    sort = request.args.get('sort', 'total_ms')
+    endpoint = request.args.get('route') or None
+    try:
+        offenders = slow_query_log.top_offenders(sort=sort, endpoint=endpoint)
+    except Exception as e:
+        error_print("Error loading slow queries", e)
+        offenders = []
+        flash('Could not load the slow query log', 'danger')
+
+    if request.args.get('format') == 'json':
+        return jsonify({'stats': slow_query_log.stats(), 'offenders': offenders})
+    return render_template(
+        'central_slow_queries.html',
+        user=user,
+        offenders=offenders,
+        sort=sort,
+        endpoint=endpoint,
+        stats=slow_query_log.stats()
+    )
+
+
+@central_bp.route('/diagnostics/profiles', methods=['GET'])
+def request_profiles():
+    """Stored request profiles, newest first (request any page with 'X-PBS-Profile: 1' to add one)"""
+    error = _require_central_json()
+    if error:
+        return error
+    return jsonify({'enabled': request_profiler.enabled, 'profiles': request_profiler.list_profiles()})
+
+
+@central_bp.route('/diagnostics/profiles/<profile_id>.<extension>', methods=['GET'])
+def download_request_profile(profile_id, extension):
+    """One profile file: .collapsed (flamegraph input) or .txt (summary)"""
+    error = _require_central_json()
+    if error:
+        return error
+    path = request_profiler.profile_path(profile_id, extension)
+    if not path:
+        return jsonify({'error': 'Profile not found'}), 404
+    return send_file(path, mimetype='text/plain', as_attachment=extension == 'collapsed',
+                     download_name=f"{profile_id}.{extension}")
+
+
+def _central_page_user():
+    """(user, None) for a Central user, else (None, redirect to login with a flash message)"""
+    has_access, user = check_central_access()
+    if has_access:
+        return user, None
+    if not user:
+        flash('You need to log in first', 'warning')
+    else:
+        flash('You do not have permission to access the Central dashboard', 'danger')
+    return None, redirect(url_for('auth.login'))
+
+
+@central_bp.route('/diagnostics/traces', methods=['GET'])
+def traces():
+    """Recent traces of every worker (?q=<name text>, ?min_ms=<root duration>)"""
+    user, response = _central_page_user()
+    if response:
+        return response
+
+    search = request.args.get('q', '').strip() or None
+    min_ms = request.args.get('min_ms', 0, type=float) or 0
+    try:
+        recent = tracer.recent_traces(search=search, min_ms=min_ms)
+    except Exception as e:
+        error_print("Error loading traces", e)
+        recent = []
+        flash('Could not read the trace files', 'danger')
+
+    if request.args.get('format') == 'json':
+        return jsonify({'stats': tracer.stats(), 'traces': recent})
+    return render_template('central_traces.html', user=user, traces=recent, search=search,
+                           min_ms=min_ms, stats=tracer.stats())
+
+
+@central_bp.route('/diagnostics/traces/<trace_id>', methods=['GET'])
+def trace_waterfall(trace_id):
+    """Waterfall of one trace"""
+    user, response = _central_page_user()
+    if response:
+        return response
+
+    trace = tracer.trace_waterfall(trace_id)
+    if request.args.get('format') == 'json':
+        return (jsonify(trace), 200) if trace else (jsonify({'error': 'Trace not found'}), 404)
+    if not trace:
+        flash('Trace not found (it may have been rotated out)', 'warning')
+        return redirect(url_for('central.traces'))
+    return render_template('central_trace.html', user=user, trace=trace)
+
+
+def _memory_profiling_off():
+    if memory_profiler.enabled:
+        return None
+    return jsonify({'error': 'Memory profiling is off in this worker (set MEMORY_PROFILING_ENABLED=1)'}), 400
+
+
+@central_bp.route('/diagnostics/memory', methods=['GET'])
+def memory_diagnostics():
+    """RSS, traced memory and per-endpoint peak allocation (?sort=max_peak_kb|avg_peak_kb|retained_kb|requests)"""
+    error = _require_central_json()
+    if error:
+        return error
+    sort = request.args.get('sort', 'max_peak_kb')
+    if sort not in ('max_peak_kb', 'avg_peak_kb', 'last_peak_kb', 'retained_kb', 'requests'):
+        sort = 'max_peak_kb'
+    return jsonify(memory_profiler.summary(sort=sort))
+
+
+@central_bp.route('/diagnostics/memory/top', methods=['GET'])
+def memory_top_sites():
+    """Largest allocation sites right now (?limit=25, ?group_by=lineno|filename|traceback)"""
+    error = _require_central_json() or _memory_profiling_off()
+    if error:
+        return error
+    limit = min(request.args.get('limit', DEFAULT_TOP, type=int) or DEFAULT_TOP, 200)
+    return jsonify({'sites': memory_profiler.top_sites(limit, request.args.get('group_by', 'lineno'))})
+
+
+@central_bp.route('/diagnostics/memory/snapshots', methods=['POST'])
+def take_memory_snapshot():
+    """Keep a snapshot to diff against later (optional 'label')"""
+    error = _require_central_json() or _memory_profiling_off()
+    if error:
+        return error
+    data = request.get_json(silent=True) or request.form
+    return jsonify({'success': True, 'snapshot': memory_profiler.take_snapshot(data.get('label'))})
+
+
+@central_bp.route('/diagnostics/memory/diff', methods=['GET'])
+def memory_snapshot_diff():
+    """Growth between two snapshots (?from=<id>, ?to=<id> or omitted for now, ?limit, ?group_by)"""
+    error = _require_central_json() or _memory_profiling_off()
+    if error:
+        return error
+    limit = min(request.args.get('limit', DEFAULT_TOP, type=int) or DEFAULT_TOP, 200)
+    result = memory_profiler.diff(request.args.get('from'), request.args.get('to') or None,
+                                  limit, request.args.get('group_by', 'lineno'))
+    if result is None:
+        return jsonify({'error': 'Unknown snapshot', 'snapshots': memory_profiler.list_snapshots()}), 404
+    return jsonify(result)
+
+
+@central_bp.route('/diagnostics/memory/reset', methods=['POST'])
+def reset_memory_diagnostics():
+    """Forget per-endpoint peaks and snapshots"""
+    error = _require_central_json()
+    if error:
+        return error
+    memory_profiler.reset()
+    return jsonify({'success': True})
+
+
+@central_bp.route('/diagnostics/startup', methods=['GET'])
+def startup_diagnostics():
+    """Blueprint import/registration times of this worker and the blueprints still deferred"""
+    error = _require_central_json()
+    if error:
+        return error
+    return jsonify(blueprint_loader.report())
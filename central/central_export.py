@@ -1,22 +1,140 @@
 from flask import request, jsonify, send_file
 from extensions import mongo
-from datetime import datetime, timedelta
-from bson import ObjectId
-import io
+from datetime import datetime
+import os
+import tempfile
 import xlsxwriter
 import traceback
 from . import central_bp
 from .central_utils import (
     check_central_access, get_eligible_users, get_reward_config,
-    get_quarter_date_range, calculate_quarter_utilization,
-    calculate_yearly_bonus_points, check_bonus_eligibility,
-    get_monthly_billable_utilization, error_print, debug_print
+    get_quarter_date_range, check_bonus_eligibility, error_print, debug_print
 )
+from services.job_service import job_service, job_handler
+from utils.cpu_offload import offload, cooperative
+
+# Cursor batch size for the streamed export passes
+EXPORT_BATCH_SIZE = 2000
+
+DEFAULT_EXPORT_CATEGORIES = sorted(['Bonus Points', 'Client Appreciation', 'Feedback',
+                                    'Initiative (AI Adoption)', 'Interviews', 'Mentoring',
+                                    'Mindshare Content (Blogs, White Papers & Community activities)',
+                                    'Next Level Certification', 'Pre-Sales Contribution (Ad-hoc Support)',
+                                    'Pre-Sales Contribution (End to End with Ownership)',
+                                    'Pre-Sales Contribution (Partial)', 'Pre-Sales/RFP', 'R&R',
+                                    'Spot Award', 'Technical Sessions', 'Utilization/Billable',
+                                    'Value Add (Accelerator Solutions)'])
+
+# Effective date of a record: event_date, then request_date, then award_date (first one that is a date)
+EFFECTIVE_DATE_EXPR = {
+    "$switch": {
+        "branches": [
+            {"case": {"$eq": [{"$type": "$event_date"}, "date"]}, "then": "$event_date"},
+            {"case": {"$eq": [{"$type": "$request_date"}, "date"]}, "then": "$request_date"},
+            {"case": {"$eq": [{"$type": "$award_date"}, "date"]}, "then": "$award_date"}
+        ],
+        "default": None
+    }
+}
+
+EXCEL_MIMETYPE = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+
+
+def parse_export_dates(start_date_str, end_date_str):
+    """
+    Validate the export date range.
+
+    Returns:
+        tuple: (start_dt, end_dt, error message or None)
+    """
+    if not start_date_str or not end_date_str:
+        return None, None, 'Start date and end date are required'
+
+    # Validate date format
+    try:
+        start_dt = datetime.strptime(start_date_str, '%Y-%m-%d')
+        end_dt = datetime.strptime(end_date_str, '%Y-%m-%d')
+        end_dt = end_dt.replace(hour=23, minute=59, second=59, microsecond=999999)
+    except ValueError:
+        return None, None, 'Invalid date format. Use YYYY-MM-DD.'
+
+    # Validate date range
+    if start_dt > end_dt:
+        return None, None, 'Start date cannot be after end date'
+
+    # ✅ REMOVED: Future date validation - now supports past, current, and future dates
+    # Users can now export data for any date range including future dates
+    return start_dt, end_dt, None
+
+
+def write_export_workbook(output_path, context, start_dt, end_dt, start_date_str, end_date_str, progress=None):
+    """
+    Write the four-sheet report to ``output_path`` in constant_memory mode.
+
+    Args:
+        progress (callable, optional): progress(done, total, message) hook, called between sheets
+            and every EXPORT_BATCH_SIZE breakdown rows (used by the background job)
+    """
+    progress = progress or (lambda done, total, message: None)
+    workbook = xlsxwriter.Workbook(output_path, {'constant_memory': True})
+    
+    # --- Cell Formats ---
+    title_format = workbook.add_format({'bold': True, 'font_size': 14, 'align': 'center', 'valign': 'vcenter', 'bg_color': '#4F81BD', 'font_color': 'white'})
+    header_format = workbook.add_format({'bold': True, 'bg_color': '#DCE6F1', 'border': 1, 'align': 'center', 'valign': 'vcenter', 'text_wrap': True})
+    data_format = workbook.add_format({'border': 1, 'valign': 'vcenter'})
+    number_format = workbook.add_format({'border': 1, 'num_format': '#,##0.00', 'valign': 'vcenter'})
+    percent_format = workbook.add_format({'border': 1, 'num_format': '0.0%', 'valign': 'vcenter'})
+    total_format = workbook.add_format({'bold': True, 'bg_color': '#E8F1FF', 'border': 1, 'num_format': '#,##0.00'})
+
+    # Sheets are added in display order; each one is written top to bottom
+    worksheet_summary = workbook.add_worksheet('Employee Points Data')
+    worksheet_breakdown = workbook.add_worksheet('Point Breakdown')
+    worksheet_category = workbook.add_worksheet('Category Summary')
+    worksheet_util = workbook.add_worksheet('Monthly Utilization')
+
+    def tracked_rows(rows):
+        for count, row in enumerate(rows, 1):
+            if count % EXPORT_BATCH_SIZE == 0:
+                progress(1, 4, f'Point breakdown: {count} requests written')
+            yield row
+
+    # --- Worksheet 2: Point Breakdown (streamed while the per-employee totals are collected) ---
+    progress(1, 4, 'Writing point breakdown')
+    totals_by_user = {}
+    create_breakdown_worksheet(worksheet_breakdown,
+                               tracked_rows(iter_export_points(context, start_dt, end_dt, totals_by_user)),
+                               start_date_str, end_date_str,
+                               title_format, header_format, data_format, number_format)
+
+    employee_data = build_employee_export_rows(context, totals_by_user, start_dt, end_dt)
+    all_categories = context['all_categories']
+
+    # --- Worksheet 1: Employee Points Data ---
+    progress(2, 4, 'Writing employee summary')
+    create_summary_worksheet(worksheet_summary, employee_data, all_categories, start_date_str, end_date_str,
+                            title_format, header_format, data_format, number_format, percent_format, total_format)
+
+    # --- Worksheet 3: Category Summary ---
+    create_category_summary_worksheet(worksheet_category, employee_data, all_categories, start_date_str, end_date_str,
+                                    title_format, header_format, data_format, number_format)
+    
+    # --- Worksheet 4: Monthly Utilization ---
+    progress(3, 4, 'Writing monthly utilization')
+    create_utilization_worksheet(workbook, worksheet_util, employee_data, start_date_str, end_date_str,
+                                title_format, header_format, data_format, number_format)
+
+    # Zip compression of the sheets is the CPU-heavy part - keep it off the hub
+    offload(workbook.close)
+
 
 @central_bp.route('/export/excel', methods=['GET'])
 def export_excel():
     """
     Handles the GET request to generate and download an Excel report using MongoDB.
+
+    The workbook is built in xlsxwriter's constant_memory mode into a temp file
+    from a handful of aggregation passes, then streamed to the client, so memory
+    stays flat regardless of how many requests fall in the date range.
     """
     try:
         # --- Authorization ---
@@ -28,88 +146,105 @@ def export_excel():
         # --- Get and Validate Date Parameters ---
         start_date_str = request.args.get('start_date')
         end_date_str = request.args.get('end_date')
+        start_dt, end_dt, date_error = parse_export_dates(start_date_str, end_date_str)
+        if date_error:
+            return jsonify({'error': date_error}), 400
 
-        if not start_date_str or not end_date_str:
-            return jsonify({'error': 'Start date and end date are required'}), 400
-
-        # Validate date format
-        try:
-            start_dt = datetime.strptime(start_date_str, '%Y-%m-%d')
-            end_dt = datetime.strptime(end_date_str, '%Y-%m-%d')
-            end_dt = end_dt.replace(hour=23, minute=59, second=59, microsecond=999999)
-        except ValueError:
-            return jsonify({'error': 'Invalid date format. Use YYYY-MM-DD.'}), 400
-
-        # Validate date range
-        if start_dt > end_dt:
-            return jsonify({'error': 'Start date cannot be after end date'}), 400
-
-        # ✅ REMOVED: Future date validation - now supports past, current, and future dates
-        # Users can now export data for any date range including future dates
-
-        # --- Fetch Data From MongoDB ---
+        # --- Load Per-User Lookups From MongoDB ---
         try:
-            employee_data, all_categories = get_all_employee_data_for_export(start_dt, end_dt)
+            context = load_export_context(start_dt, end_dt)
         except Exception as e:
             error_print("Error fetching data from MongoDB", e)
             return jsonify({'error': 'Failed to fetch employee data'}), 500
 
-        if not employee_data:
+        if not context['users']:
             return jsonify({'error': 'No employee data found for the selected date range'}), 404
 
-        # --- Generate Excel File in Memory ---
-        output = io.BytesIO()
+        # --- Generate Excel File on Disk (constant memory) ---
+        fd, output_path = tempfile.mkstemp(suffix='.xlsx')
+        os.close(fd)
         try:
-            workbook = xlsxwriter.Workbook(output, {'in_memory': True})
-            
-            # --- Cell Formats ---
-            title_format = workbook.add_format({'bold': True, 'font_size': 14, 'align': 'center', 'valign': 'vcenter', 'bg_color': '#4F81BD', 'font_color': 'white'})
-            header_format = workbook.add_format({'bold': True, 'bg_color': '#DCE6F1', 'border': 1, 'align': 'center', 'valign': 'vcenter', 'text_wrap': True})
-            data_format = workbook.add_format({'border': 1, 'valign': 'vcenter'})
-            number_format = workbook.add_format({'border': 1, 'num_format': '#,##0.00', 'valign': 'vcenter'})
-            percent_format = workbook.add_format({'border': 1, 'num_format': '0.0%', 'valign': 'vcenter'})
-            total_format = workbook.add_format({'bold': True, 'bg_color': '#E8F1FF', 'border': 1, 'num_format': '#,##0.00'})
-
-            # --- Worksheet 1: Employee Points Data ---
-            worksheet_summary = workbook.add_worksheet('Employee Points Data')
-            create_summary_worksheet(worksheet_summary, employee_data, all_categories, start_date_str, end_date_str,
-                                    title_format, header_format, data_format, number_format, percent_format, total_format)
-
-            # --- Worksheet 2: Point Breakdown ---
-            worksheet_breakdown = workbook.add_worksheet('Point Breakdown')
-            create_breakdown_worksheet(worksheet_breakdown, employee_data, start_date_str, end_date_str,
-                                      title_format, header_format, data_format, number_format)
-
-            # --- Worksheet 3: Category Summary ---
-            worksheet_category = workbook.add_worksheet('Category Summary')
-            create_category_summary_worksheet(worksheet_category, employee_data, all_categories, start_date_str, end_date_str,
-                                            title_format, header_format, data_format, number_format)
-            
-            # --- Worksheet 4: Monthly Utilization ---
-            worksheet_util = workbook.add_worksheet('Monthly Utilization')
-            create_utilization_worksheet(workbook, worksheet_util, employee_data, start_date_str, end_date_str,
-                                        title_format, header_format, data_format, number_format)
-
-            workbook.close()
-            output.seek(0)
+            write_export_workbook(output_path, context, start_dt, end_dt, start_date_str, end_date_str)
         except Exception as e:
+            os.remove(output_path)
             error_print("Error generating Excel file", e)
             return jsonify({'error': f'Failed to generate Excel file: {str(e)}'}), 500
 
-        # --- Send File to User ---
+        # --- Stream File to User ---
         filename = f'Employee_Points_Report_{start_date_str}_to_{end_date_str}.xlsx'
-        return send_file(
-            output,
-            mimetype='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+        response = send_file(
+            output_path,
+            mimetype=EXCEL_MIMETYPE,
             as_attachment=True,
             download_name=filename
         )
+        response.call_on_close(lambda: os.path.exists(output_path) and os.remove(output_path))
+        return response
 
     except Exception as e:
         error_print("FATAL ERROR IN /export/excel", e)
 
         return jsonify({'error': 'An internal server error occurred. Please check the server logs.'}), 500
 
+
+@central_bp.route('/export/excel/job', methods=['POST'])
+def export_excel_job():
+    """Queue the Excel report as a background job; download it from /jobs/<job_id>/download"""
+    try:
+        has_access, user = check_central_access()
+        
+        if not has_access:
+            return jsonify({'error': 'Not authorized'}), 403
+
+        data = request.get_json(silent=True) or request.form
+        start_date_str = data.get('start_date')
+        end_date_str = data.get('end_date')
+        start_dt, end_dt, date_error = parse_export_dates(start_date_str, end_date_str)
+        if date_error:
+            return jsonify({'error': date_error}), 400
+
+        job, created = job_service.enqueue(
+            'central.excel_export',
+            {'start_date': start_date_str, 'end_date': end_date_str},
+            user_id=user['_id'],
+            idempotency_key=f"{user['_id']}:{start_date_str}:{end_date_str}",
+            description=f'Employee points report {start_date_str} to {end_date_str}'
+        )
+        return jsonify({'success': True, 'job_id': str(job['_id']), 'created': created}), 202
+
+    except Exception as e:
+        error_print("Error queuing Excel export", e)
+        return jsonify({'error': 'An internal server error occurred. Please check the server logs.'}), 500
+
+
+@job_handler('central.excel_export')
+def run_excel_export(job, start_date, end_date):
+    """Background job: build the Excel report into a job result file"""
+    start_dt, end_dt, date_error = parse_export_dates(start_date, end_date)
+    if date_error:
+        raise ValueError(date_error)
+
+    job.progress(0, 4, 'Loading employee data')
+    context = load_export_context(start_dt, end_dt)
+    if not context['users']:
+        raise ValueError('No employee data found for the selected date range')
+
+    output_path = job.result_path('.xlsx')
+    try:
+        write_export_workbook(output_path, context, start_dt, end_dt, start_date, end_date, progress=job.progress)
+    except Exception:
+        if os.path.exists(output_path):
+            os.remove(output_path)
+        raise
+    job.progress(4, 4, 'Report ready')
+
+    return {
+        'file_path': output_path,
+        'download_name': f'Employee_Points_Report_{start_date}_to_{end_date}.xlsx',
+        'mimetype': EXCEL_MIMETYPE,
+        'employee_count': len(context['users'])
+    }
+
 def create_summary_worksheet(worksheet, employee_data, all_categories, start_date_str, end_date_str,
                             title_format, header_format, data_format, number_format, percent_format, total_format):
     """Create the employee summary worksheet"""
@@ -220,9 +355,9 @@ def create_summary_worksheet(worksheet, employee_data, all_categories, start_dat
             width = max(15, min(len(category) * 0.8, 30))
             worksheet.set_column(start_col + i, start_col + i, width)
 
-def create_breakdown_worksheet(worksheet, employee_data, start_date_str, end_date_str,
+def create_breakdown_worksheet(worksheet, breakdown_rows, start_date_str, end_date_str,
                                title_format, header_format, data_format, number_format):
-    """Create the point breakdown worksheet"""
+    """Create the point breakdown worksheet from an iterable of (name, email, point) rows"""
     row, col = 0, 0
     breakdown_headers = ['Employee Name', 'Email', 'Category', 'Points', 'Request Date', 'Bonus']
     
@@ -235,16 +370,15 @@ def create_breakdown_worksheet(worksheet, employee_data, start_date_str, end_dat
         worksheet.write(row, col, header, header_format)
     row += 1
     
-    for emp_data in employee_data:
-        for point in emp_data.get('point_breakdown', []):
-            col = 0
-            worksheet.write(row, col, emp_data.get('name', ''), data_format); col += 1
-            worksheet.write(row, col, emp_data.get('email', ''), data_format); col += 1
-            worksheet.write(row, col, point.get('category', ''), data_format); col += 1
-            worksheet.write(row, col, point.get('points', 0), number_format); col += 1
-            worksheet.write(row, col, point.get('request_date', ''), data_format); col += 1
-            worksheet.write(row, col, 'Yes' if point.get('is_bonus', False) else 'No', data_format); col += 1
-            row += 1
+    for emp_name, emp_email, point in breakdown_rows:
+        col = 0
+        worksheet.write(row, col, emp_name, data_format); col += 1
+        worksheet.write(row, col, emp_email, data_format); col += 1
+        worksheet.write(row, col, point.get('category', ''), data_format); col += 1
+        worksheet.write(row, col, point.get('points', 0), number_format); col += 1
+        worksheet.write(row, col, point.get('request_date', ''), data_format); col += 1
+        worksheet.write(row, col, 'Yes' if point.get('is_bonus', False) else 'No', data_format); col += 1
+        row += 1
     
     worksheet.set_column('A:A', 25)
     worksheet.set_column('B:B', 30)
@@ -334,166 +468,244 @@ def create_utilization_worksheet(workbook, worksheet, employee_data, start_date_
     if all_months:
         worksheet.set_column(3, 3 + len(all_months) - 1, 15)
 
-def get_all_employee_data_for_export(start_dt, end_dt):
-    """Orchestrates fetching all data from MongoDB for the report."""
-    try:
-        # Fetch categories from both collections
-        db_categories_old = [cat.get('name', '').strip() 
-                            for cat in mongo.db.categories.find({"status": "active"}, {"name": 1}) 
-                            if cat.get('name', '').strip()]
-        
-        db_categories_hr = [cat.get('name', '').strip() 
-                           for cat in mongo.db.hr_categories.find({"status": "active"}, {"name": 1}) 
-                           if cat.get('name', '').strip()]
-        
-        # Combine and deduplicate
-        all_categories = sorted(list(set(db_categories_old + db_categories_hr)))
-        
-        # If no categories found, use standard list as fallback
-        if not all_categories:
-            all_categories = sorted(['Bonus Points', 'Client Appreciation', 'Feedback', 
-                                    'Initiative (AI Adoption)', 'Interviews', 'Mentoring', 
-                                    'Mindshare Content (Blogs, White Papers & Community activities)', 
-                                    'Next Level Certification', 'Pre-Sales Contribution (Ad-hoc Support)', 
-                                    'Pre-Sales Contribution (End to End with Ownership)', 
-                                    'Pre-Sales Contribution (Partial)', 'Pre-Sales/RFP', 'R&R', 
-                                    'Spot Award', 'Technical Sessions', 'Utilization/Billable', 
-                                    'Value Add (Accelerator Solutions)'])
-    except Exception as e:
-        error_print("Error fetching categories from MongoDB", e)
-        all_categories = sorted(['Bonus Points', 'Client Appreciation', 'Feedback', 
-                                'Initiative (AI Adoption)', 'Interviews', 'Mentoring', 
-                                'Mindshare Content (Blogs, White Papers & Community activities)', 
-                                'Next Level Certification', 'Pre-Sales Contribution (Ad-hoc Support)', 
-                                'Pre-Sales Contribution (End to End with Ownership)', 
-                                'Pre-Sales Contribution (Partial)', 'Pre-Sales/RFP', 'R&R', 
-                                'Spot Award', 'Technical Sessions', 'Utilization/Billable', 
-                                'Value Add (Accelerator Solutions)'])
+def _date_range_prefilter(start_dt, end_dt):
+    """Index-friendly superset of "effective date in range": at least one of the date fields is in range"""
+    date_range = {"$gte": start_dt, "$lte": end_dt}
+    return [{"event_date": date_range}, {"request_date": date_range}, {"award_date": date_range}]
+
+
+def _utilization_percentage(record):
+    """Utilization of a record as a percentage (0-100), or None when it carries no value"""
+    utilization_value = None
     
-    try:
-        all_users = get_eligible_users()
-    except Exception as e:
-        error_print("Error fetching eligible users", e)
-        raise
+    # Try 1: Direct field
+    if record.get('utilization_value'):
+        utilization_value = record.get('utilization_value')
     
-    if not all_users:
-        return [], all_categories
+    # Try 2: submission_data
+    elif isinstance(record.get('submission_data'), dict):
+        submission_data = record['submission_data']
+        utilization_value = submission_data.get('utilization_value') or submission_data.get('utilization')
     
-    employee_data_list = [
-        processed_data 
-        for user in all_users 
-        if (processed_data := process_employee_for_export(user, all_categories, start_dt, end_dt)) is not None
-    ]
+    # Try 3: points field (as percentage) - for old records
+    if utilization_value is None or utilization_value == 0:
+        points = record.get('points', 0)
+        if points > 0 and points <= 100:
+            utilization_value = points / 100.0
     
-    return employee_data_list, all_categories
+    if utilization_value is None or utilization_value <= 0:
+        return None
+    return utilization_value * 100 if utilization_value <= 1 else utilization_value
 
-def process_employee_for_export(user, all_categories, start_dt, end_dt):
-    """Processes a single employee's points and data for the export using MongoDB."""
-    try:
-        user_id = user['_id']
-        user_name = user.get('name', 'Unknown')
+
+def _months_in_range(start_dt, end_dt):
+    """Number of calendar months touched by [start_dt, end_dt]"""
+    return (end_dt.year - start_dt.year) * 12 + end_dt.month - start_dt.month + 1
+
+
+def load_export_context(start_dt, end_dt):
+    """
+    Load everything the export needs besides the request rows: categories,
+    eligible users, reward config, yearly bonus totals and historical utilization.
+
+    Replaces the per-employee lookups with one query per collection and two
+    aggregations over all eligible users.
+
+    Returns:
+        dict: users, category lookups, config and per-user bonus/utilization maps
+    """
+    category_map = {}
+    quarter_util_ids = set()
+    monthly_util_ids = []
+    all_categories = set()
+    
+    # categories first so hr_categories win on (unlikely) shared ids - same order as before
+    for collection, code_field in ((mongo.db.categories, 'code'), (mongo.db.hr_categories, 'category_code')):
+        monthly_util_id = None
+        for cat in collection.find({}, {"name": 1, "status": 1, code_field: 1}):
+            name = cat.get('name', 'Unknown')
+            category_map[cat['_id']] = (name or 'Unknown').strip()
+            if cat.get('status') == 'active' and (name or '').strip():
+                all_categories.add(name.strip())
+            if cat.get(code_field) == 'utilization_billable' or name == 'Utilization/Billable':
+                quarter_util_ids.add(cat['_id'])
+            if cat.get(code_field) == 'utilization_billable' and monthly_util_id is None:
+                monthly_util_id = cat['_id']
+        if monthly_util_id is not None:
+            monthly_util_ids.append(monthly_util_id)
+    
+    # If no categories found, use standard list as fallback
+    all_categories = sorted(all_categories) or list(DEFAULT_EXPORT_CATEGORIES)
+    
+    users = get_eligible_users()
+    user_ids = [user['_id'] for user in users]
+    
+    # ✅ Yearly (fiscal, April-March) bonus totals for every user in one aggregation
+    fiscal_start = datetime(start_dt.year, 4, 1)
+    fiscal_end = datetime(start_dt.year + 1, 3, 31, 23, 59, 59, 999999)
+    yearly_bonus = {}
+    if user_ids:
+        for doc in mongo.db.points_request.aggregate([
+            {"$match": {"status": "Approved", "is_bonus": True, "user_id": {"$in": user_ids},
+                        "$or": _date_range_prefilter(fiscal_start, fiscal_end)}},
+            {"$addFields": {"bonus_date": {"$ifNull": ["$event_date", {"$ifNull": ["$request_date", "$award_date"]}]}}},
+            {"$match": {"bonus_date": {"$gte": fiscal_start, "$lte": fiscal_end}}},
+            {"$group": {"_id": "$user_id", "total": {"$sum": "$points"}}}
+        ], allowDiskUse=True):
+            yearly_bonus[doc['_id']] = doc['total']
+    
+    # ✅ Historical utilization from the points collection (points_request rows come with the main pass)
+    historical_utilization = {}
+    if user_ids and quarter_util_ids:
+        cursor = mongo.db.points.aggregate([
+            {"$match": {"user_id": {"$in": user_ids}, "category_id": {"$in": list(quarter_util_ids)},
+                        "$or": _date_range_prefilter(start_dt, end_dt)}},
+            {"$addFields": {"effective_date": EFFECTIVE_DATE_EXPR}},
+            {"$match": {"effective_date": {"$gte": start_dt, "$lte": end_dt}}},
+            {"$project": {"user_id": 1, "effective_date": 1, "points": 1,
+                          "utilization_value": 1, "submission_data": 1}}
+        ], allowDiskUse=True, batchSize=EXPORT_BATCH_SIZE)
+        for record in cursor:
+            percentage = _utilization_percentage(record)
+            if percentage is not None:
+                month_key = f"{record['effective_date'].year}-{record['effective_date'].month}"
+                historical_utilization.setdefault(record['user_id'], {})[month_key] = percentage
+    
+    return {
+        'users': users,
+        'all_categories': all_categories,
+        'category_map': category_map,
+        'quarter_util_ids': quarter_util_ids,
+        'monthly_util_ids': set(monthly_util_ids),
+        'config': get_reward_config(),
+        'yearly_bonus': yearly_bonus,
+        'historical_utilization': historical_utilization
+    }
+
+
+def iter_export_points(context, start_dt, end_dt, totals_by_user):
+    """
+    Stream approved points_request rows in the date range as breakdown rows.
+
+    One aggregation over all eligible users, ordered by user then request date.
+    Per-employee category/point totals and utilization months are accumulated
+    into ``totals_by_user`` as rows go by, so only one row is held at a time.
+
+    Yields:
+        tuple: (employee name, employee email, point dict)
+    """
+    users_by_id = {user['_id']: user for user in context['users']}
+    category_map = context['category_map']
+    category_lookup = {}
+    for category in context['all_categories']:
+        category_lookup.setdefault(category.lower(), category)
+    
+    cursor = mongo.db.points_request.aggregate([
+        {"$match": {"status": "Approved", "user_id": {"$in": list(users_by_id)},
+                    "$or": _date_range_prefilter(start_dt, end_dt)}},
+        {"$addFields": {"effective_date": EFFECTIVE_DATE_EXPR}},
+        {"$match": {"effective_date": {"$gte": start_dt, "$lte": end_dt}}},
+        {"$sort": {"user_id": 1, "request_date": 1}},
+        {"$project": {"user_id": 1, "category_id": 1, "points": 1, "is_bonus": 1, "effective_date": 1,
+                      "event_date": 1, "request_date": 1, "utilization_value": 1, "submission_data": 1}}
+    ], allowDiskUse=True, batchSize=EXPORT_BATCH_SIZE)
+    
+    for record in cooperative(cursor):
+        user = users_by_id.get(record['user_id'])
+        if not user:
+            continue
+        totals = totals_by_user.setdefault(record['user_id'], {
+            'categories': {}, 'total': 0, 'regular': 0, 'bonus': 0,
+            'quarter_utilization': {}, 'monthly_utilization': {}
+        })
+        effective_date = record['effective_date']
+        category_id = record.get('category_id')
         
-        category_points = {category: 0 for category in all_categories}
+        # ✅ Utilization months (quarter average uses any effective date, monthly view only event/request date)
+        if category_id in context['quarter_util_ids'] or category_id in context['monthly_util_ids']:
+            percentage = _utilization_percentage(record)
+            if percentage is not None:
+                if category_id in context['quarter_util_ids']:
+                    totals['quarter_utilization'][f"{effective_date.year}-{effective_date.month}"] = percentage
+                monthly_date = record.get('event_date') if isinstance(record.get('event_date'), datetime) else \
+                    record.get('request_date') if isinstance(record.get('request_date'), datetime) else None
+                if category_id in context['monthly_util_ids'] and monthly_date:
+                    totals['monthly_utilization'][f"{monthly_date.year}-{monthly_date.month:02d}"] = round(percentage, 2)
         
-        # Build category map from both collections
-        category_map = {}
-        for cat in mongo.db.categories.find():
-            category_map[str(cat['_id'])] = cat.get('name', 'Unknown')
-        for cat in mongo.db.hr_categories.find():
-            category_map[str(cat['_id'])] = cat.get('name', 'Unknown')
+        points_val = record.get('points', 0)
+        # Skip if no points value
+        if points_val == 0:
+            continue
         
-        total_points, regular_points, bonus_points = 0, 0, 0
-        point_breakdown = []
-        processed_request_ids = set()
+        category_name = category_map.get(category_id, 'Unknown')
+        is_bonus = record.get('is_bonus', False)
         
-        # ✅ STEP 1: Get approved points_request in the date range
-        # Use event_date as primary, fallback to request_date
-        pr_query = {
-            "user_id": user_id, 
-            "status": "Approved"
-        }
+        # Match category name to the standard categories list
+        matched_category = category_lookup.get(category_name.lower())
+        if matched_category:
+            totals['categories'][matched_category] = totals['categories'].get(matched_category, 0) + points_val
         
-        points_request_results = list(mongo.db.points_request.find(pr_query).sort('request_date', 1))
+        totals['total'] += points_val
+        if is_bonus:
+            totals['bonus'] += points_val
+        else:
+            totals['regular'] += points_val
         
-        for point_record in points_request_results:
-            # Get effective date (prioritize event_date)
-            event_date = point_record.get('event_date')
-            request_date = point_record.get('request_date')
-            award_date = point_record.get('award_date')
-            
-            effective_date = event_date if event_date and isinstance(event_date, datetime) else \
-                            request_date if request_date and isinstance(request_date, datetime) else \
-                            award_date if award_date and isinstance(award_date, datetime) else None
-            
-            # Check if effective date is in range
-            if not effective_date or not (start_dt <= effective_date <= end_dt):
-                continue
-            
-            # Mark as processed
-            processed_request_ids.add(point_record['_id'])
-            
-            points_val = point_record.get('points', 0)
-            category_id = point_record.get('category_id')
-            category_name = category_map.get(str(category_id), 'Unknown').strip()
-            is_bonus = point_record.get('is_bonus', False)
+        yield user.get('name', ''), user.get('email', ''), {
+            'category': category_name,
+            'points': points_val,
+            'request_date': effective_date.strftime('%Y-%m-%d'),
+            'is_bonus': is_bonus
+        }
+
+
+def build_employee_export_rows(context, totals_by_user, start_dt, end_dt):
+    """Build the per-employee summary rows (one small dict per user) from the streamed totals"""
+    config = context['config']
+    all_categories = context['all_categories']
+    month_count = _months_in_range(start_dt, end_dt)
+    employee_data_list = []
+    
+    for user in context['users']:
+        try:
+            user_id = user['_id']
+            totals = totals_by_user.get(user_id, {})
+            regular_points = totals.get('regular', 0)
+            total_points = totals.get('total', 0)
             
-            # Skip if no points value
-            if points_val == 0:
-                continue
+            grade = user.get("grade", "Unknown")
+            quarterly_target = config.get("grade_targets", {}).get(grade, 0)
+            yearly_target = quarterly_target * 4
             
-            # Match category name to the standard categories list
-            matched_category = next((cat for cat in all_categories if cat.lower() == category_name.lower()), None)
-            if matched_category:
-                category_points[matched_category] += points_val
+            # Historical points records override points_request for the same month
+            quarter_months = dict(totals.get('quarter_utilization', {}))
+            quarter_months.update(context['historical_utilization'].get(user_id, {}))
+            utilization = round(sum(quarter_months.values()) / month_count, 2) if month_count else 0
+            yearly_bonus = context['yearly_bonus'].get(user_id, 0)
             
-            total_points += points_val
-            if is_bonus:
-                bonus_points += points_val
-            else:
-                regular_points += points_val
+            is_eligible, reason = check_bonus_eligibility(regular_points, grade, utilization, False, yearly_bonus,
+                                                          config=config)
+            target_achievement = (total_points / yearly_target * 100) if yearly_target > 0 else 0
             
-            point_breakdown.append({
-                'category': category_name,
-                'points': points_val,
-                'request_date': effective_date.strftime('%Y-%m-%d') if effective_date else '',
-                'is_bonus': is_bonus
+            category_points = totals.get('categories', {})
+            employee_data_list.append({
+                'name': user.get('name', ''),
+                'email': user.get('email', ''),
+                'department': user.get('department', ''),
+                'grade': grade,
+                'categories': {category: category_points.get(category, 0) for category in all_categories},
+                'total_points_in_period': total_points,
+                'points_in_period_regular': regular_points,
+                'points_in_period_bonus': totals.get('bonus', 0),
+                'yearly_target': yearly_target,
+                'quarterly_target': quarterly_target,
+                'target_achievement_percentage': target_achievement,
+                'yearly_bonus_total': yearly_bonus,
+                'utilization': utilization,
+                'eligibility_status': "Eligible" if is_eligible else f"Not Eligible ({reason})",
+                'monthly_utilization': totals.get('monthly_utilization', {})
             })
-        
-        # ✅ REMOVED: No longer fetching from points collection (historical data)
-        # Only use points_request collection for consistency with leaderboard, analytics, and dashboard
-        
-        config = get_reward_config()
-        grade = user.get("grade", "Unknown")
-        quarterly_target = config.get("grade_targets", {}).get(grade, 0)
-        yearly_target = quarterly_target * 4
-        
-        utilization = calculate_quarter_utilization(user_id, start_dt, end_dt)
-        yearly_bonus = calculate_yearly_bonus_points(user_id, start_dt.year)
-        
-        is_eligible, reason = check_bonus_eligibility(regular_points, grade, utilization, False, yearly_bonus)
-        target_achievement = (total_points / yearly_target * 100) if yearly_target > 0 else 0
-        
-        # Get monthly utilization data
-        monthly_utilization_data = get_monthly_billable_utilization(user_id, start_dt, end_dt)
-
-        return {
-            'name': user.get('name', ''),
-            'email': user.get('email', ''),
-            'department': user.get('department', ''),
-            'grade': grade,
-            'categories': category_points,
-            'total_points_in_period': total_points,
-            'points_in_period_regular': regular_points,
-            'points_in_period_bonus': bonus_points,
-            'yearly_target': yearly_target,
-            'quarterly_target': quarterly_target,
-            'target_achievement_percentage': target_achievement,
-            'yearly_bonus_total': yearly_bonus,
-            'utilization': utilization,
-            'eligibility_status': "Eligible" if is_eligible else f"Not Eligible ({reason})",
-            'point_breakdown': point_breakdown,
-            'monthly_utilization': monthly_utilization_data
-        }
-    except Exception as e:
-        error_print(f"Error processing employee '{user.get('name', 'Unknown')}' for export", e)
-        return None
\ No newline at end of file
+        except Exception as e:
+            error_print(f"Error processing employee '{user.get('name', 'Unknown')}' for export", e)
+    
+    return employee_data_list
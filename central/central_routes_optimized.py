@@ -21,7 +21,9 @@ from .central_utils import (
     check_bonus_eligibility, calculate_bonus_points, check_bonus_awarded_for_quarter,
     debug_print, error_print
 )
+from utils.single_flight import coalesced
 
+@coalesced('central.points_aggregated')
 def get_all_points_aggregated(user_ids, quarters, utilization_category_id):
     """
     OPTIMIZED: Get all points for all users in ONE aggregation query
@@ -177,6 +179,7 @@ def get_all_points_aggregated(user_ids, quarters, utilization_category_id):
     return points_data
 
 
+@coalesced('central.category_breakdown')
 def get_category_breakdown_aggregated(user_ids, utilization_category_id, quarters):
     """
     OPTIMIZED: Get category breakdown for all users by quarter in ONE query
@@ -283,6 +286,7 @@ def get_category_breakdown_aggregated(user_ids, utilization_category_id, quarter
     return category_data
 
 
+@coalesced('central.utilization')
 def get_utilization_aggregated(user_ids, qtr_start, qtr_end, utilization_category_id):
     """
     OPTIMIZED: Get utilization for all users - ✅ FIXED to fetch ALL records (including old ones)
@@ -418,14 +418,14 @@ def calculate_yearly_points(employee_id, year):
     
     return total_points
 
-def check_bonus_eligibility(employee_points, employee_grade, utilization_avg=None, bonus_already_awarded=False, yearly_bonus_points=None):
-    """Check if an employee is eligible for bonus"""
+def check_bonus_eligibility(employee_points, employee_grade, utilization_avg=None, bonus_already_awarded=False, yearly_bonus_points=None, config=None):
+    """Check if an employee is eligible for bonus (pass ``config`` to reuse an already loaded reward config)"""
     # If bonus already awarded this quarter, not eligible
     if bonus_already_awarded:
         return False, "Bonus already awarded this quarter"
         
     # Get current configuration
-    config = get_reward_config()
+    config = config or get_reward_config()
     grade_targets = config.get("grade_targets", {})
     utilization_threshold = config.get("utilization_threshold", 80)
     yearly_bonus_limit = config.get("yearly_bonus_limit", 10000)
@@ -3,6 +3,7 @@ from extensions import mongo
 from datetime import datetime
 from bson.objectid import ObjectId
 import os
+from utils.response_cache import cached_compute, scope_tags, dp_team_tag
 
 # Define Blueprint
 current_dir = os.path.dirname(os.path.abspath(__file__))
@@ -495,14 +496,11 @@ def employee_details(employee_id):
     })
 
 
-@dp_bp.route('/api/employees-points-summary')
-def employees_points_summary():
-    """API endpoint to get updated points summary for all assigned employees"""
-    user_id = session.get('user_id')
-    
-    if not user_id:
-        return jsonify({'error': 'Unauthorized'}), 401
-    
+def build_employees_points_summary(user_id):
+    """
+    Quarterly and all-time points of every employee assigned to a DP
+    (cached per DP by the summary API)
+    """
     # Get current quarter details
     current_quarter_name, current_quarter_num, fiscal_year = get_current_fiscal_quarter_details()
     year_start = datetime(fiscal_year, 4, 1)
@@ -608,10 +606,28 @@ def employees_points_summary():
             'total_points': emp_total_points
         })
     
-    return jsonify({
+    return {
         'employees': employees_summary,
         'fiscal_year': fiscal_year
-    })
+    }
+
+
+@dp_bp.route('/api/employees-points-summary')
+def employees_points_summary():
+    """API endpoint to get updated points summary for all assigned employees"""
+    user_id = session.get('user_id')
+    
+    if not user_id:
+        return jsonify({'error': 'Unauthorized'}), 401
+    
+    # ✅ Served from the response cache; refreshed in the background after points or team changes
+    summary = cached_compute(
+        'dp.employees_points_summary',
+        {'dp_id': user_id},
+        lambda: build_employees_points_summary(user_id),
+        tags=scope_tags() + [dp_team_tag(user_id)]
+    )
+    return jsonify(summary)
 
 
 @dp_bp.route('/api/employees-count')
@@ -4,6 +4,7 @@ from datetime import datetime, timedelta
 import sys
 import traceback
 from bson.objectid import ObjectId
+from services.query_monitor import query_budget
 
 employee_api_bp = Blueprint('employee_api', __name__, url_prefix='/employee')
 
@@ -312,6 +313,7 @@ def get_request_history():
                 return jsonify({'error': 'Server error'}), 500
 
 @employee_api_bp.route('/api/dashboard-updates')
+@query_budget(4)
 def dashboard_updates():
     user_id = session.get('user_id')
     if not user_id:
@@ -343,10 +345,17 @@ def dashboard_updates():
         new_rejections = []
         ids_to_mark_as_notified = []
         
+        # ✅ One lookup for the categories of every processed request
+        category_ids = list({req['category_id'] for req in newly_processed_requests})
+        categories_map = {
+            category['_id']: category
+            for category in mongo.db.categories.find({"_id": {"$in": category_ids}})
+        } if category_ids else {}
+        
         for req in newly_processed_requests:
             source = determine_request_source(req, current_user_id)
             
-            category = mongo.db.categories.find_one({"_id": req['category_id']})
+            category = categories_map.get(req['category_id'])
             category_name = category['name'] if category else "Unknown Category"
             category_code = category.get('code') if category else None
             
@@ -1,10 +1,9 @@
-from flask import Blueprint, request, session, redirect, url_for, flash, send_file
+from flask import Blueprint, request, session, redirect, url_for, flash
 from extensions import mongo
-import io
 import sys
 import traceback
 from bson.objectid import ObjectId
-from gridfs import GridFS
+from utils.attachment_stream import open_gridfs_file, send_gridfs_file
 
 employee_attachments_bp = Blueprint('employee_attachments', __name__, url_prefix='/employee')
 
@@ -53,24 +52,15 @@ def get_attachment(request_id):
                 flash('You do not have permission to access this attachment', 'danger')
                 return redirect(url_for('employee_dashboard.dashboard'))
         
-        fs = GridFS(mongo.db)
-        
-        attachment_id = request_data['attachment_id']
-        if not fs.exists(ObjectId(attachment_id)):
+        grid_out = open_gridfs_file(request_data['attachment_id'])
+        if not grid_out:
             flash('Attachment file not found', 'warning')
             return redirect(url_for('employee_dashboard.dashboard'))
         
-        grid_out = fs.get(ObjectId(attachment_id))
-        
-        file_stream = io.BytesIO(grid_out.read())
-        file_stream.seek(0)
-        
-        original_filename = grid_out.metadata.get('original_filename', 'attachment')
-        content_type = grid_out.content_type
+        original_filename = request_data.get('attachment_filename') or (grid_out.metadata or {}).get('original_filename', 'attachment')
         
-        return send_file(
-            file_stream,
-            mimetype=content_type,
+        return send_gridfs_file(
+            grid_out,
             download_name=original_filename,
             as_attachment=True
         )
@@ -9,6 +9,7 @@ import sys
 from bson.objectid import ObjectId
 from collections import defaultdict
 from dashboard_config import get_user_dashboard_configs
+from services.query_monitor import query_budget
 
 current_dir = os.path.dirname(os.path.abspath(__file__))
 
@@ -38,6 +39,40 @@ def get_validator_details(validator_id):
     except Exception as e:
                 return None
 
+def get_validators_details(validator_ids):
+    """get_validator_details for many validators in one query, keyed by str id"""
+    object_ids = set()
+    for validator_id in validator_ids:
+        try:
+            object_ids.add(ObjectId(validator_id))
+        except Exception:
+            continue
+    if not object_ids:
+        return {}
+    try:
+        return {
+            str(validator["_id"]): {
+                "id": str(validator["_id"]),
+                "name": validator.get("name", "Unknown Validator"),
+                "email": validator.get("email", "N/A"),
+                "dashboard_access": validator.get("dashboard_access", [])
+            }
+            for validator in mongo.db.users.find({"_id": {"$in": list(object_ids)}})
+        }
+    except Exception as e:
+        return {}
+
+def get_categories_by_id(category_ids, collections=('categories', 'hr_categories')):
+    """{category _id: category} looked up in one query per collection; later collections win"""
+    category_ids = [category_id for category_id in set(category_ids) if category_id]
+    categories_map = {}
+    if not category_ids:
+        return categories_map
+    for collection in collections:
+        for category in mongo.db[collection].find({'_id': {'$in': category_ids}}):
+            categories_map[category['_id']] = category
+    return categories_map
+
 def get_validator_by_id_for_template(validator_id_str):
     if isinstance(validator_id_str, ObjectId):
         validator_id_str = str(validator_id_str)
@@ -274,6 +309,8 @@ Dashboard URL: {template_vars['dashboard_url']}
         return False
 
 @employee_dashboard_bp.route('/dashboard', methods=['GET', 'POST'])
+# ✅ Flat cost: leaderboard and filter aggregations plus one lookup per collection, not per request
+@query_budget(45)
 def dashboard():
     PRESALES_CATEGORY_CODES = ['presales_e2e', 'presales_partial', 'presales_adhoc']
     
@@ -388,6 +425,9 @@ def dashboard():
                 "status": "Approved"
             }))
             
+            # ✅ One lookup for every category (hr_categories first, as before)
+            approved_categories = get_categories_by_id(req.get('category_id') for req in approved_requests)
+            
             # ✅ FIXED: Separate regular and bonus points tracking
             total_regular_points = 0
             
@@ -402,10 +442,8 @@ def dashboard():
                 if category_id in utilization_category_ids:
                     continue
                 
-                # Fetch category from both collections
-                category = mongo.db.hr_categories.find_one({'_id': category_id})
-                if not category:
-                    category = mongo.db.categories.find_one({'_id': category_id})
+                # Category from either collection
+                category = approved_categories.get(category_id)
                 
                 # Check if bonus
                 is_bonus = req.get('is_bonus', False)
@@ -439,9 +477,18 @@ def dashboard():
                     {"ta_id": {"$exists": True}}
                 ]
             }).sort("request_date", -1)
+            all_requests = list(all_requests_cursor)
+            
+            # ✅ Categories and validators of the whole history in one query each
+            history_categories = get_categories_by_id((req['category_id'] for req in all_requests), ('categories',))
+            history_validators = get_validators_details(
+                req.get('processed_by') if req.get('status') != 'Pending' and req.get('processed_by')
+                else req.get('assigned_validator_id')
+                for req in all_requests
+            )
             
-            for req in all_requests_cursor:
-                category = mongo.db.categories.find_one({"_id": req['category_id']})
+            for req in all_requests:
+                category = history_categories.get(req['category_id'])
                 category_name = category['name'] if category else "Unknown Category"
                 
                 is_ta_awarded_interview = bool(req.get('ta_id'))
@@ -476,12 +523,12 @@ def dashboard():
                 actioner_dashboard_access = []
                 
                 if req.get('status') != 'Pending' and req.get('processed_by'):
-                    processor_details = get_validator_details(req.get('processed_by'))
+                    processor_details = history_validators.get(str(req.get('processed_by')))
                     if processor_details:
                         actioner_name_display = processor_details.get('name', 'N/A')
                         actioner_dashboard_access = processor_details.get('dashboard_access', [])
                 elif req.get('assigned_validator_id'):
-                    assigned_validator_details = get_validator_details(req.get('assigned_validator_id'))
+                    assigned_validator_details = history_validators.get(str(req.get('assigned_validator_id')))
                     if assigned_validator_details:
                         actioner_name_display = assigned_validator_details.get('name', 'N/A')
                         actioner_dashboard_access = assigned_validator_details.get('dashboard_access', [])
@@ -606,9 +653,7 @@ def dashboard():
                 # Check if bonus
                 is_bonus = req.get('is_bonus', False)
                 if not is_bonus:
-                    category = mongo.db.hr_categories.find_one({'_id': category_id})
-                    if not category:
-                        category = mongo.db.categories.find_one({'_id': category_id})
+                    category = approved_categories.get(category_id)
                     if category and category.get('is_bonus'):
                         is_bonus = True
                 
@@ -677,7 +722,7 @@ def dashboard():
 
         if request.method == 'POST':
             try:
-                from gridfs import GridFS
+                from utils.attachment_store import store_attachment
                 
                 category_id = request.form.get('category_id')
                 notes = request.form.get('notes', '')
@@ -700,9 +745,9 @@ def dashboard():
                     file_extension = original_filename.rsplit('.', 1)[1].lower() if '.' in original_filename else ''
                     unique_filename = f"{uuid.uuid4().hex}.{file_extension}" if file_extension else f"{uuid.uuid4().hex}"
                     
-                    fs = GridFS(mongo.db)
-                    
-                    with fs.new_file(
+                    # ✅ Content-addressed: identical files are stored once and shared
+                    attachment_id = store_attachment(
+                        attachment,
                         filename=unique_filename,
                         content_type=attachment.content_type,
                         metadata={
@@ -710,9 +755,7 @@ def dashboard():
                             'user_id': user_id,
                             'upload_date': datetime.utcnow()
                         }
-                    ) as f:
-                        f.write(attachment.read())
-                        attachment_id = f._id
+                    )
                     
                     attachment_filename = original_filename
                                     
@@ -1278,8 +1321,7 @@ def get_request_attachment(request_id):
         return redirect(url_for('auth.login'))
     
     try:
-        from gridfs import GridFS
-        import io
+        from utils.attachment_stream import open_gridfs_file, send_gridfs_file
 
         # ✅ FIXED: Only query points_request collection (consistent with other fixes)
         req = mongo.db.points_request.find_one({
@@ -1301,29 +1343,17 @@ def get_request_attachment(request_id):
             flash('Attachment ID missing', 'warning')
             return redirect(url_for('employee_dashboard.dashboard'))
         
-        # Get from GridFS
-        fs = GridFS(mongo.db)
-        
-        if isinstance(attachment_id, str):
-            attachment_id = ObjectId(attachment_id)
-
-        if not fs.exists(attachment_id):
+        # Open from GridFS (single lookup, streamed below)
+        grid_out = open_gridfs_file(attachment_id)
+        if not grid_out:
 
             flash('Attachment file not found in storage', 'warning')
             return redirect(url_for('employee_dashboard.dashboard'))
-
-        grid_out = fs.get(attachment_id)
-        file_data = grid_out.read()
-
-        file_stream = io.BytesIO(file_data)
-        file_stream.seek(0)
         
-        original_filename = grid_out.metadata.get('original_filename', req.get('attachment_filename', 'attachment'))
-        content_type = grid_out.content_type or 'application/octet-stream'
+        original_filename = req.get('attachment_filename') or (grid_out.metadata or {}).get('original_filename', 'attachment')
 
-        return send_file(
-            file_stream,
-            mimetype=content_type,
+        return send_gridfs_file(
+            grid_out,
             download_name=original_filename,
             as_attachment=True
         )
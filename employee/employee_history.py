@@ -29,7 +29,7 @@ def get_category_for_employee(category_id):
     """
     Fetch category for employee data
     Priority: hr_categories (new data) → categories (old data)
-    Note: Missing categories are auto-fixed on app startup by utils.category_validator
+    Note: Requests of deleted categories are re-categorized by the category validation jobs (utils.category_validator)
     """
     if not category_id:
         return None
@@ -5,6 +5,7 @@ import sys
 import traceback
 from bson.objectid import ObjectId
 from collections import defaultdict
+from utils.response_cache import cached_compute, scope_tags
 
 employee_leaderboard_bp = Blueprint('employee_leaderboard', __name__, url_prefix='/employee')
 
@@ -139,7 +140,7 @@ def get_fiscal_period_date_range(fiscal_quarter, fiscal_year_start_calendar_year
 def get_category_for_leaderboard(category_id):
     """
     Get category from either hr_categories or old categories collection
-    Note: Missing categories are auto-fixed on app startup by utils.category_validator
+    Note: Requests of deleted categories are re-categorized by the category validation jobs (utils.category_validator)
     """
     if not category_id:
         return None
@@ -608,11 +609,24 @@ def get_specific_user_points(user_id, filters):
     
     return aggregated_points
 
+def get_cached_leaderboard(filters=None):
+    """
+    Ranked leaderboard shared by every viewer with the same filters, served from the
+    response cache (stale-while-revalidate). Don't mutate the returned list.
+    """
+    filters = filters or {}
+    return cached_compute(
+        'employee.leaderboard',
+        filters,
+        lambda: get_all_approved_points_for_leaderboard(filters),
+        tags=scope_tags(filters.get('year'), filters.get('department'), filters.get('category'))
+    )
+
 def get_leaderboard_data_with_rank(user_id_to_find_rank_str, filters=None):
     """
     Get complete leaderboard data with user's rank
     """
-    all_ranked_employees = get_all_approved_points_for_leaderboard(filters)
+    all_ranked_employees = get_cached_leaderboard(filters)
     
     user_rank_details = None
     person_above = None
@@ -1,9 +1,9 @@
-from flask import Blueprint, render_template, request, session, redirect, url_for, jsonify, send_file, flash
+from flask import Blueprint, render_template, request, session, redirect, url_for, jsonify, flash
 from extensions import mongo
 from datetime import datetime, timedelta
 from bson.objectid import ObjectId
 from gridfs import GridFS
-import io
+from utils.attachment_stream import open_gridfs_file, send_gridfs_file
 import traceback
 
 employee_points_total_bp = Blueprint(
@@ -31,7 +31,7 @@ def get_category_for_employee(category_id):
     """
     Fetch category for employee data with robust error handling
     Priority: hr_categories (new data) → categories (old data)
-    Note: Missing categories are auto-fixed on app startup by utils.category_validator
+    Note: Requests of deleted categories are re-categorized by the category validation jobs (utils.category_validator)
     """
     if not category_id:
         return None
@@ -52,7 +52,7 @@ def get_category_for_employee(category_id):
             return category
         
         # If still not found, return placeholder to prevent crashes
-        # This should rarely happen as categories are auto-fixed on startup
+        # Rare: requests of deleted categories are re-categorized in the background
         return {'name': 'Uncategorized', 'code': 'N/A'}
         
     except Exception as e:
@@ -1127,53 +1127,26 @@ def get_attachment(request_id):
             flash('Attachment ID missing', 'warning')
             return redirect(url_for('employee_points_total.points_total'))
         
-        fs = GridFS(mongo.db)
-        
-        # ✅ Try both ObjectId and string formats
-        attachment_found = False
-        grid_out = None
-        
-        # Try as ObjectId first
-        try:
-            if isinstance(attachment_id, str):
-                oid = ObjectId(attachment_id)
-            else:
-                oid = attachment_id
-                
-            if fs.exists(oid):
-                grid_out = fs.get(oid)
-                attachment_found = True
-        except:
-            pass
+        # ✅ Try by id first
+        grid_out = open_gridfs_file(attachment_id)
         
         # If not found, try searching by filename in GridFS
-        if not attachment_found and req.get('attachment_filename'):
+        if not grid_out and req.get('attachment_filename'):
             try:
-                grid_out = fs.find_one({'filename': req.get('attachment_filename')})
-                if grid_out:
-                    attachment_found = True
+                grid_out = GridFS(mongo.db).find_one({'filename': req.get('attachment_filename')})
             except:
                 pass
         
         # If still not found, return error
-        if not attachment_found or not grid_out:
+        if not grid_out:
             flash('Attachment file not found in storage. The file may have been deleted or corrupted. Please contact support.', 'warning')
             return redirect(url_for('employee_points_total.points_total'))
         
-        # Get the file from GridFS
-        grid_out = fs.get(attachment_id)
-        file_data = grid_out.read()
-        
-        file_stream = io.BytesIO(file_data)
-        file_stream.seek(0)
-        
-        # Get original filename and content type
-        original_filename = grid_out.metadata.get('original_filename', req.get('attachment_filename', 'attachment'))
-        content_type = grid_out.content_type or 'application/octet-stream'
+        # Get original filename
+        original_filename = req.get('attachment_filename') or (grid_out.metadata or {}).get('original_filename', 'attachment')
         
-        return send_file(
-            file_stream,
-            mimetype=content_type,
+        return send_gridfs_file(
+            grid_out,
             download_name=original_filename,
             as_attachment=True
         )
@@ -1,11 +1,12 @@
-from flask import Blueprint, render_template, request, redirect, url_for, session, flash, jsonify, send_file
+from flask import Blueprint, render_template, request, redirect, url_for, session, flash, jsonify
 from flask_mail import Message
 from extensions import mongo, mail
 from datetime import datetime
 from bson.objectid import ObjectId
 from werkzeug.utils import secure_filename
-from gridfs import GridFS
-import io
+from utils.attachment_stream import open_gridfs_file, send_gridfs_file
+from utils.attachment_store import store_attachment
+from services.tracing import tracer
 import smtplib
 import email.utils
 from email.mime.text import MIMEText
@@ -492,10 +493,10 @@ def submit_request():
                 if file_size > 5 * 1024 * 1024:
                     flash('Attachment file size exceeds 5MB limit. Request will be submitted without attachment.', 'warning')
                 elif file_size > 0:
-                    fs = GridFS(mongo.db)
                     secure_name = secure_filename(attachment.filename)
                     
-                    attachment_id = fs.put(
+                    # ✅ Content-addressed: identical files are stored once and shared
+                    attachment_id = store_attachment(
                         file_data,
                         filename=secure_name,
                         content_type=attachment.content_type or 'application/octet-stream',
@@ -558,11 +559,10 @@ def submit_request():
         # Send email notification to assigned validator (single email, no duplicates)
         # ✅ EVENTLET COMPATIBLE: Use eventlet.spawn for background tasks
         try:
-            import eventlet
             validator_user = mongo.db.users.find_one({"_id": ObjectId(validator_id)})
             if validator_user:
-                # Use eventlet.spawn for non-blocking email sending
-                eventlet.spawn(send_validator_notification, request_doc, user, validator_user, category)
+                # Non-blocking email sending (tracer.spawn is eventlet.spawn keeping this request's trace)
+                tracer.spawn(send_validator_notification, request_doc, user, validator_user, category)
         except Exception as e:
             pass
         
@@ -788,25 +788,14 @@ def get_attachment(request_id):
             flash('Attachment not found', 'warning')
             return redirect(url_for('employee_raise_request.raise_request'))
         
-        attachment_id = req.get('attachment_id')
-        if isinstance(attachment_id, str):
-            attachment_id = ObjectId(attachment_id)
-        
-        fs = GridFS(mongo.db)
-        if not fs.exists(attachment_id):
+        grid_out = open_gridfs_file(req.get('attachment_id'))
+        if not grid_out:
             flash('Attachment file not found in storage', 'warning')
             return redirect(url_for('employee_raise_request.raise_request'))
         
-        grid_out = fs.get(attachment_id)
-        file_data = grid_out.read()
-        
-        file_stream = io.BytesIO(file_data)
-        file_stream.seek(0)
-        
-        return send_file(
-            file_stream,
-            mimetype=grid_out.content_type or 'application/octet-stream',
-            download_name=grid_out.metadata.get('original_filename', req.get('attachment_filename', 'attachment')),
+        return send_gridfs_file(
+            grid_out,
+            download_name=req.get('attachment_filename') or (grid_out.metadata or {}).get('original_filename', 'attachment'),
             as_attachment=True
         )
         
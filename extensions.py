@@ -1,9 +1,10 @@
 # extensions.py
-from flask_pymongo import PyMongo
 from flask_mail import Mail
 from flask_bcrypt import Bcrypt
+from utils.mongo_profiles import ProfiledMongo
 
 # Create instances of all extensions
-mongo = PyMongo()
+# One MongoClient per workload profile (config.MONGO_PROFILES); mongo.db follows the request's route class
+mongo = ProfiledMongo()
 mail = Mail()
 bcrypt = Bcrypt()
\ No newline at end of file
@@ -4,6 +4,8 @@ from datetime import datetime
 from bson.objectid import ObjectId
 import os
 from .hr_utils import check_hr_access
+from utils.cpu_offload import cooperative
+from utils.response_cache import cached_compute, scope_tags, fiscal_years_for_range
 
 current_dir = os.path.dirname(os.path.abspath(__file__))
 
@@ -429,7 +431,7 @@ def get_quarterly_performance_data_fixed(filter_start_date=None, filter_end_date
         
         approved_requests = list(mongo.db.points_request.find(pr_query))
         
-        for req in approved_requests:
+        for req in cooperative(approved_requests):
             event_date = extract_event_date(req)
             entry_with_dates = {
                 'event_date': event_date,
@@ -511,7 +513,7 @@ def get_grade_participation_fixed(start_date, end_date, location_filter=None):
         # ✅ Query points_request collection
         points_data = list(mongo.db.points_request.find(query))
         
-        for entry in points_data:
+        for entry in cooperative(points_data):
             if start_date and end_date:
                 event_date = extract_event_date(entry)
                 entry_with_dates = {
@@ -599,7 +601,7 @@ def get_activity_participation_fixed(start_date, end_date, location_filter=None)
         # ✅ Query points_request collection
         points_data = list(mongo.db.points_request.find(query))
         
-        for entry in points_data:
+        for entry in cooperative(points_data):
             # ✅ FIXED: Only validate dates if filter is applied
             if start_date and end_date:
                 event_date = extract_event_date(entry)
@@ -705,7 +707,7 @@ def get_top_performers_fixed(start_date, end_date, location_filter=None):
     
     approved_requests = list(mongo.db.points_request.find(pr_query))
     
-    for req in approved_requests:
+    for req in cooperative(approved_requests):
         # ✅ FIXED: Only validate dates if filter is applied
         if start_date and end_date:
             event_date = extract_event_date(req)
@@ -734,7 +736,7 @@ def get_top_performers_fixed(start_date, end_date, location_filter=None):
     # This ensures all dashboards show the same point totals
     
     performers = []
-    for user in eligible_users:
+    for user in cooperative(eligible_users):
         user_id_str = str(user["_id"])
         if user_id_str in user_points and user_points[user_id_str] > 0:
             user["total_points"] = user_points[user_id_str]
@@ -864,7 +866,7 @@ def get_grade_participation_percentage_fixed(start_date, end_date, location_filt
             # ✅ Query points_request collection
             points_data = list(mongo.db.points_request.find(query))
             
-            for entry in points_data:
+            for entry in cooperative(points_data):
                 # ✅ FIXED: Only validate dates if filter is applied
                 if start_date and end_date:
                     event_date = extract_event_date(entry)
@@ -988,7 +990,7 @@ def get_utilization_participation_data(start_date, end_date, location_filter=Non
     # Query points_request collection for approved utilization records
     all_data = list(mongo.db.points_request.find(query))
 
-    for entry in all_data:
+    for entry in cooperative(all_data):
         # If date range is specified, filter by effective date
         if start_date and end_date:
             event_date = extract_event_date(entry)
@@ -1042,6 +1044,32 @@ def get_utilization_participation_data(start_date, end_date, location_filter=Non
     return utilization_data
 
 
+def get_analytics_payload(start_date, end_date, location_filter=None):
+    """
+    All viewer-independent analytics data for a filter, shared by the dashboard
+    page and the JSON API through the response cache (stale-while-revalidate).
+    The returned dict is shared between viewers - don't mutate it.
+    """
+    def compute():
+        return {
+            "quarterly_data": get_quarterly_performance_data_fixed(start_date, end_date, location_filter),
+            "grade_participation": get_grade_participation_fixed(start_date, end_date, location_filter),
+            "top_performers": get_top_performers_fixed(start_date, end_date, location_filter),
+            "activity_participation": get_activity_participation_fixed(start_date, end_date, location_filter),
+            "grade_participation_percent": get_grade_participation_percentage_fixed(start_date, end_date, location_filter),
+            "utilization_data": get_utilization_participation_data(start_date, end_date, location_filter),
+            "summary_for_selected_period": calculate_summary_for_period(start_date, end_date, location_filter),
+            "categories": get_all_categories()
+        }
+
+    return cached_compute(
+        'hr_analytics.payload',
+        {'start_date': start_date, 'end_date': end_date, 'location': location_filter},
+        compute,
+        tags=scope_tags(fiscal_years_for_range(start_date, end_date))
+    )
+
+
 # ==========================================
 # ROUTES
 # ==========================================
@@ -1219,11 +1247,12 @@ def pbs_analytics():
         start_date_str = ""
         end_date_str = ""
 
-    quarterly_data = get_quarterly_performance_data_fixed(start_date_obj, end_date_obj, location_filter)
-    grade_participation = get_grade_participation_fixed(start_date_obj, end_date_obj, location_filter)
-    top_performers = get_top_performers_fixed(start_date_obj, end_date_obj, location_filter)
-    activity_participation = get_activity_participation_fixed(start_date_obj, end_date_obj, location_filter)
-    grade_participation_percent = get_grade_participation_percentage_fixed(start_date_obj, end_date_obj, location_filter)
+    payload = get_analytics_payload(start_date_obj, end_date_obj, location_filter)
+    quarterly_data = payload["quarterly_data"]
+    grade_participation = payload["grade_participation"]
+    top_performers = payload["top_performers"]
+    activity_participation = payload["activity_participation"]
+    grade_participation_percent = payload["grade_participation_percent"]
     
     most_active_grade_name = "N/A"
     if grade_participation_percent:
@@ -1259,8 +1288,8 @@ def pbs_analytics():
             # Use 2 decimal places to show small percentages (e.g., 0.05%)
             avg_participation_rate_value = round(total_rate_sum / activity_count, 2)
 
-    utilization_data = get_utilization_participation_data(start_date_obj, end_date_obj, location_filter)
-    categories = get_all_categories()
+    utilization_data = payload["utilization_data"]
+    categories = payload["categories"]
     
     # Get current quarter and month for header display
     now = datetime.utcnow()
@@ -1284,7 +1313,7 @@ def pbs_analytics():
         location_filter=location_filter,
         display_quarter=display_quarter,
         display_month=display_month,
-        summary_for_selected_period=calculate_summary_for_period(start_date_obj, end_date_obj, location_filter),
+        summary_for_selected_period=payload["summary_for_selected_period"],
         user=user
     )
     
@@ -1326,13 +1355,14 @@ def api_analytics_data():
         except ValueError:
             pass
 
-    quarterly_data = get_quarterly_performance_data_fixed(start_date_obj, end_date_obj, location_filter)
-    grade_participation = get_grade_participation_fixed(start_date_obj, end_date_obj, location_filter)
-    top_performers = get_top_performers_fixed(start_date_obj, end_date_obj, location_filter)
-    activity_participation = get_activity_participation_fixed(start_date_obj, end_date_obj, location_filter)
-    grade_participation_percent = get_grade_participation_percentage_fixed(start_date_obj, end_date_obj, location_filter)
-    utilization_data = get_utilization_participation_data(start_date_obj, end_date_obj, location_filter)
-    summary_for_selected_period = calculate_summary_for_period(start_date_obj, end_date_obj, location_filter)
+    payload = get_analytics_payload(start_date_obj, end_date_obj, location_filter)
+    quarterly_data = payload["quarterly_data"]
+    grade_participation = payload["grade_participation"]
+    top_performers = payload["top_performers"]
+    activity_participation = payload["activity_participation"]
+    grade_participation_percent = payload["grade_participation_percent"]
+    utilization_data = payload["utilization_data"]
+    summary_for_selected_period = payload["summary_for_selected_period"]
 
     most_active_grade_name = "N/A"
     avg_participation_rate_value = 0
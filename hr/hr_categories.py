@@ -5,6 +5,9 @@ from bson.objectid import ObjectId
 import os
 from .hr_utils import check_hr_access  # Import from hr_utils like other HR modules
 from .hr_analytics import get_financial_quarter_and_label
+# Category names/codes appear in cached analytics and leaderboards
+from utils.response_cache import invalidate_tags, ALL_POINTS_TAG
+from utils.category_validator import queue_deleted_category_fix
 
 # Get the current directory path
 current_dir = os.path.dirname(os.path.abspath(__file__))
@@ -132,6 +135,7 @@ def create_category():
         }
         
         mongo.db.hr_categories.insert_one(new_category)
+        invalidate_tags(ALL_POINTS_TAG)
         flash('Category created successfully!', 'success')
         
     except Exception as e:
@@ -196,6 +200,7 @@ def edit_category(category_id):
         }
         
         mongo.db.hr_categories.update_one({'_id': ObjectId(category_id)}, {'$set': update_data})
+        invalidate_tags(ALL_POINTS_TAG)
         flash('Category updated successfully!', 'success')
         
     except Exception as e:
@@ -216,6 +221,9 @@ def delete_category(category_id):
     try:
         result = mongo.db.hr_categories.delete_one({'_id': ObjectId(category_id)})
         if result.deleted_count > 0:
+            # Requests of the category are moved to the best matching one in the background
+            queue_deleted_category_fix(category_id, user_id=current_user['_id'])
+            invalidate_tags(ALL_POINTS_TAG)
             flash('Category deleted successfully!', 'success')
         else:
             flash('Category not found', 'danger')
@@ -248,6 +256,7 @@ def toggle_category_status(category_id):
                 'updated_by': current_user.get('email', 'Unknown')
             }}
         )
+        invalidate_tags(ALL_POINTS_TAG)
         
         return jsonify({'success': True, 'new_status': new_status})
     except Exception as e:
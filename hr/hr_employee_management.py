@@ -6,6 +6,7 @@ import csv
 import io
 import os
 from .hr_utils import check_hr_access  # Changed to relative import
+from utils.attachment_store import release_request_attachments
 from .hr_analytics import get_financial_quarter_and_label
 
 current_dir = os.path.dirname(os.path.abspath(__file__))
@@ -284,6 +285,7 @@ def delete_user(user_id):
                 return redirect(url_for('hr_employee_mgmt.manager_employees', manager_id=user_id))
         
         mongo.db.points.delete_many({'user_id': ObjectId(user_id)})
+        release_request_attachments({'user_id': ObjectId(user_id)})
         mongo.db.points_request.delete_many({'user_id': ObjectId(user_id)})
         
         mongo.db.users.delete_one({'_id': ObjectId(user_id)})
@@ -422,6 +424,7 @@ def bulk_delete_users():
                     )
                 else:
                     mongo.db.points.delete_many({'user_id': ObjectId(user_id)})
+                    release_request_attachments({'user_id': ObjectId(user_id)})
                     mongo.db.points_request.delete_many({'user_id': ObjectId(user_id)})
                     
                     mongo.db.users.delete_one({'_id': ObjectId(user_id)})
@@ -1,11 +1,14 @@
 from flask import Blueprint, render_template, request, redirect, session, url_for, flash, send_file, jsonify
-from extensions import mongo, bcrypt
+from extensions import mongo
 from datetime import datetime
 from bson.objectid import ObjectId
 import csv
+import hashlib
 import io
 import os
 from .hr_utils import check_hr_access  # Changed to relative import
+from services.job_service import job_service, job_handler
+from utils.cpu_offload import hash_password
 from .hr_analytics import get_financial_quarter_and_label
 
 # Get the current directory path
@@ -98,7 +101,7 @@ def dashboard():
             flash('Employee ID already exists', 'danger')
             return redirect(url_for('hr_registration.dashboard'))
 
-        hashed = bcrypt.generate_password_hash(password).decode('utf-8')
+        hashed = hash_password(password)
         
         # Convert manager_id to ObjectId if it's not empty and validate
         if manager_id:
@@ -236,7 +239,7 @@ def dashboard():
                         else:
                             error_messages.append(f"Row {row_num}: Warning - DP '{dp_name}' not found with DP dashboard access")
 
-                    password_hash = bcrypt.generate_password_hash(row['password']).decode('utf-8')
+                    password_hash = hash_password(row['password'])
                     
                     joining_date = None
                     if row.get('joining_date'):
@@ -394,7 +397,7 @@ def register_manager():
             flash('Employee ID already exists', 'danger')
             return redirect(url_for('hr_registration.register_manager'))
 
-        hashed = bcrypt.generate_password_hash(password).decode('utf-8')
+        hashed = hash_password(password)
         
         if manager_id:
             try:
@@ -562,7 +565,7 @@ def register_dp():
             flash('Employee ID already exists', 'danger')
             return redirect(url_for('hr_registration.register_dp'))
 
-        hashed = bcrypt.generate_password_hash(password).decode('utf-8')
+        hashed = hash_password(password)
         
         if manager_id:
             try:
@@ -764,7 +767,7 @@ def update_user():
                 
                 new_password = request.form.get('password')
                 if new_password:
-                    update_data['password_hash'] = bcrypt.generate_password_hash(new_password).decode('utf-8')
+                    update_data['password_hash'] = hash_password(new_password)
                     update_data['is_first_login'] = True
 
                 mongo.db.users.update_one(
@@ -1003,111 +1006,142 @@ def bulk_update():
 
         try:
             file.stream.seek(0)
-            csv_reader = csv.DictReader(file.read().decode('utf-8').splitlines())
+            csv_bytes = file.read()
+            csv_bytes.decode('utf-8')  # reject a non UTF-8 file now rather than in the job
+
+            # ✅ Processed by a background job; the same file uploaded twice while it runs is queued once.
+            # The CSV can carry passwords: it goes to the job's private input file, not the job document
+            job, created = job_service.enqueue(
+                'hr.bulk_update_users',
+                user_id=current_user['_id'],
+                idempotency_key=f"{current_user['_id']}:{hashlib.sha256(csv_bytes).hexdigest()}",
+                description=f'Bulk user update ({file.filename})',
+                input_data=csv_bytes
+            )
+            if created:
+                flash('Bulk update started. You will be notified when it finishes.', 'info')
+            else:
+                flash('This file is already being processed.', 'info')
 
-            updated, skipped = 0, 0
-            row_num = 1
-            error_messages = []
+        except Exception as e:
+            flash(f'Critical error processing CSV: {str(e)}', 'danger')
 
-            for row in csv_reader:
-                row_num += 1
-                try:
-                    # Find user by email or employee_id
-                    identifier = row.get('email') or row.get('employee_id')
-                    if not identifier:
-                        skipped += 1
-                        error_messages.append(f"Row {row_num}: Skipped (no email or employee_id)")
-                        continue
-                    
-                    user = mongo.db.users.find_one({
-                        '$or': [
-                            {'email': identifier},
-                            {'employee_id': identifier}
-                        ]
-                    })
-                    
-                    if not user:
-                        skipped += 1
-                        error_messages.append(f"Row {row_num}: User not found ({identifier})")
-                        continue
-                    
-                    update_data = {'updated_at': datetime.now()}
-                    
-                    # Update only provided fields
-                    if row.get('name'):
-                        update_data['name'] = row['name']
-                    if row.get('phone'):
-                        update_data['phone'] = row['phone']
-                    if row.get('grade'):
-                        update_data['grade'] = row['grade']
-                    if row.get('department'):
-                        update_data['department'] = row['department']
-                    if row.get('location'):
-                        update_data['location'] = row['location']
-                    if row.get('employee_level'):
-                        update_data['employee_level'] = row['employee_level']
-                    if row.get('is_active'):
-                        is_active_str = row['is_active'].lower()
-                        update_data['is_active'] = is_active_str in ['true', 'yes', '1', 'on', 'active']
-                    if row.get('dashboard_access'):
-                        dashboard_access = [x.strip() for x in row['dashboard_access'].split(',')]
-                        if 'employee_db' not in dashboard_access:
-                            dashboard_access.append('employee_db')
-                        update_data['dashboard_access'] = dashboard_access
-                    
-                    # Handle manager update (must have 'pm' in dashboard_access)
-                    if row.get('manager_name'):
-                        manager = mongo.db.users.find_one({
-                            '$or': [
-                                {'name': row['manager_name']},
-                                {'email': row['manager_name']}
-                            ],
-                            'dashboard_access': 'pm'
-                        })
-                        if manager:
-                            update_data['manager_id'] = manager['_id']
-                    
-                    # Handle DP update (must have 'dp' in dashboard_access)
-                    if row.get('dp_name'):
-                        dp = mongo.db.users.find_one({
-                            '$or': [
-                                {'name': row['dp_name']},
-                                {'email': row['dp_name']}
-                            ],
-                            'dashboard_access': 'dp'
-                        })
-                        if dp:
-                            update_data['dp_id'] = dp['_id']
-                    
-                    # Handle dates
-                    if row.get('joining_date'):
-                        update_data['joining_date'] = datetime.strptime(row['joining_date'], '%Y-%m-%d')
-                    if row.get('exit_date'):
-                        update_data['exit_date'] = datetime.strptime(row['exit_date'], '%Y-%m-%d')
-                    
-                    # Handle password update
-                    if row.get('password'):
-                        update_data['password_hash'] = bcrypt.generate_password_hash(row['password']).decode('utf-8')
-                        update_data['is_first_login'] = True
-                    
-                    mongo.db.users.update_one(
-                        {'_id': user['_id']},
-                        {'$set': update_data}
-                    )
-                    updated += 1
+        return redirect(url_for('hr_registration.bulk_update'))
 
-                except Exception as row_err:
-                    skipped += 1
-                    error_messages.append(f"Row {row_num}: Error - {str(row_err)}")
-                    continue
+    return render_template('bulk_update.html')
 
-            flash(f'{updated} users updated, {skipped} skipped.', 'success')
-            for msg in error_messages:
-                flash(msg, 'warning')
 
-        except Exception as e:
-            flash(f'Critical error processing CSV: {str(e)}', 'danger')
+@job_handler('hr.bulk_update_users')
+def run_bulk_update(job):
+    """Background job: apply a bulk user update CSV (the job's input file)"""
+    with open(job.input_path, encoding='utf-8') as f:
+        lines = f.read().splitlines()
+    total_rows = max(len(lines) - 1, 0)
+    csv_reader = csv.DictReader(lines)
 
-        return redirect(url_for('hr_registration.bulk_update'))
+    updated, skipped = 0, 0
+    row_num = 1
+    error_messages = []
 
-    return render_template('bulk_update.html')
\ No newline at end of file
+    for row in csv_reader:
+        row_num += 1
+        job.progress(row_num - 1, total_rows, f'{updated} updated, {skipped} skipped')
+        try:
+            # Find user by email or employee_id
+            identifier = row.get('email') or row.get('employee_id')
+            if not identifier:
+                skipped += 1
+                error_messages.append(f"Row {row_num}: Skipped (no email or employee_id)")
+                continue
+            
+            user = mongo.db.users.find_one({
+                '$or': [
+                    {'email': identifier},
+                    {'employee_id': identifier}
+                ]
+            })
+            
+            if not user:
+                skipped += 1
+                error_messages.append(f"Row {row_num}: User not found ({identifier})")
+                continue
+            
+            update_data = {'updated_at': datetime.now()}
+            
+            # Update only provided fields
+            if row.get('name'):
+                update_data['name'] = row['name']
+            if row.get('phone'):
+                update_data['phone'] = row['phone']
+            if row.get('grade'):
+                update_data['grade'] = row['grade']
+            if row.get('department'):
+                update_data['department'] = row['department']
+            if row.get('location'):
+                update_data['location'] = row['location']
+            if row.get('employee_level'):
+                update_data['employee_level'] = row['employee_level']
+            if row.get('is_active'):
+                is_active_str = row['is_active'].lower()
+                update_data['is_active'] = is_active_str in ['true', 'yes', '1', 'on', 'active']
+            if row.get('dashboard_access'):
+                dashboard_access = [x.strip() for x in row['dashboard_access'].split(',')]
+                if 'employee_db' not in dashboard_access:
+                    dashboard_access.append('employee_db')
+                update_data['dashboard_access'] = dashboard_access
+            
+            # Handle manager update (must have 'pm' in dashboard_access)
+            if row.get('manager_name'):
+                manager = mongo.db.users.find_one({
+                    '$or': [
+                        {'name': row['manager_name']},
+                        {'email': row['manager_name']}
+                    ],
+                    'dashboard_access': 'pm'
+                })
+                if manager:
+                    update_data['manager_id'] = manager['_id']
+            
+            # Handle DP update (must have 'dp' in dashboard_access)
+            if row.get('dp_name'):
+                dp = mongo.db.users.find_one({
+                    '$or': [
+                        {'name': row['dp_name']},
+                        {'email': row['dp_name']}
+                    ],
+                    'dashboard_access': 'dp'
+                })
+                if dp:
+                    update_data['dp_id'] = dp['_id']
+            
+            # Handle dates
+            if row.get('joining_date'):
+                update_data['joining_date'] = datetime.strptime(row['joining_date'], '%Y-%m-%d')
+            if row.get('exit_date'):
+                update_data['exit_date'] = datetime.strptime(row['exit_date'], '%Y-%m-%d')
+            
+            # Handle password update
+            if row.get('password'):
+                update_data['password_hash'] = hash_password(row['password'])
+                update_data['is_first_login'] = True
+            
+            mongo.db.users.update_one(
+                {'_id': user['_id']},
+                {'$set': update_data}
+            )
+            updated += 1
+
+        except Exception as row_err:
+            skipped += 1
+            error_messages.append(f"Row {row_num}: Error - {str(row_err)}")
+            continue
+
+    job.progress(total_rows, total_rows, f'{updated} updated, {skipped} skipped')
+
+    return {
+        'message': f'{updated} users updated, {skipped} skipped.',
+        'updated': updated,
+        'skipped': skipped,
+        # Keep the job document small - the first rows are enough to fix a file
+        'errors': error_messages[:200]
+    }
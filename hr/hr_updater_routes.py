@@ -14,6 +14,7 @@ from .hr_email_service import (
     send_new_request_email, send_bulk_request_email
 )
 from utils.error_handling import error_print
+from utils.cpu_offload import parse_csv_upload
 
 @hr_bp.route('/updater/dashboard', methods=['GET', 'POST'])
 def updater_dashboard():
@@ -328,7 +329,7 @@ def validate_bulk_upload():
             return jsonify({'success': False, 'error': 'No file uploaded'})
         
         csv_content = file.read().decode('utf-8')
-        csv_reader = csv.DictReader(io.StringIO(csv_content))
+        csv_reader = parse_csv_upload(csv_content)
         
         expected_headers = ['employee_id', 'validator_employee_id', 'event_date', 'category_code', 'department', 'notes']
         if csv_reader.fieldnames != expected_headers:
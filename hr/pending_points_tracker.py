@@ -258,7 +258,7 @@ def get_category_info(category_id):
     If category not found in database, return 'No Category' instead of 'Unknown Category'
     Handles both ObjectId and string types for category_id
     
-    Note: Missing categories are auto-fixed on app startup by utils.category_validator
+    Note: Requests of deleted categories are re-categorized by the category validation jobs (utils.category_validator)
     """
     if not category_id:
         return {'name': 'No Category', 'code': 'N/A'}
@@ -288,7 +288,7 @@ def get_category_info(category_id):
         }
     
     # Category ID exists but not found in database - return 'No Category'
-    # This should rarely happen as categories are auto-fixed on startup
+    # Rare: requests of deleted categories are re-categorized in the background
     return {'name': 'No Category', 'code': 'N/A'}
 
 
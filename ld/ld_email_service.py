@@ -9,9 +9,12 @@ from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 from flask import current_app
 from utils.error_handling import error_print
+from services.metrics import register_email_queue
+from services.tracing import tracer
 
 # Large thread pool for maximum parallelism
 email_executor = ThreadPoolExecutor(max_workers=10, thread_name_prefix="ld_email")
+register_email_queue('ld', email_executor)
 
 def truncate_notes(notes, max_length=200):
     """Truncate notes to maximum length for email templates"""
@@ -69,7 +72,7 @@ def send_email(to_email, subject, html_body):
         msg.attach(html_part)
         
         # Fire and forget - INSTANT
-        email_executor.submit(send_single_email, app, msg, to_email)
+        email_executor.submit(tracer.bind(send_single_email), app, msg, to_email)
         
     except Exception as e:
         error_print(f"Email queue error for {to_email}", e)
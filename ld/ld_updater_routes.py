@@ -15,6 +15,7 @@ from .ld_helpers import (
     get_category_by_id, emit_updater_own_request_created, get_quarter_label_from_date
 )
 from utils.error_handling import error_print
+from utils.cpu_offload import parse_csv_upload
 
 
 @ld_bp.route('/updater/dashboard', methods=['GET', 'POST'])
@@ -399,7 +400,7 @@ def validate_bulk_upload():
 
         # Parse CSV
         csv_content = file.read().decode('utf-8')
-        csv_reader = csv.DictReader(io.StringIO(csv_content))
+        csv_reader = parse_csv_upload(csv_content)
 
         # Validate headers - normalize by stripping whitespace and converting to lowercase
         expected_headers = ['employee_id', 'validator_employee_id', 'category_name', 'event_date', 'quantity', 'notes']
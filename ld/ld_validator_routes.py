@@ -10,6 +10,7 @@ from .ld_helpers import (
     get_quarter_label_from_date, get_all_ld_category_ids, get_ld_category_ids
 )
 from utils.error_handling import error_print
+from services.query_monitor import query_budget
 
 
 @ld_bp.route('/validator/dashboard', methods=['GET', 'POST'])
@@ -540,6 +541,7 @@ def handle_bulk_approve(user):
     if approved_requests_data:
         from flask import current_app
         from threading import Thread
+        from services.tracing import tracer
         from ld.ld_email_service import send_bulk_approval_emails, send_approval_email_to_employee
         
         # Get updater from first request (all should have same updater in bulk)
@@ -550,7 +552,7 @@ def handle_bulk_approve(user):
         if updater_data and updater_data.get('email'):
             # Send emails in background thread to avoid blocking
             app = current_app._get_current_object()
-            thread = Thread(target=send_bulk_approval_emails, args=(app, mongo, approved_requests_data, user, updater_data))
+            thread = Thread(target=tracer.bind(send_bulk_approval_emails), args=(app, mongo, approved_requests_data, user, updater_data))
             thread.daemon = True
             thread.start()
         
@@ -646,6 +648,7 @@ def handle_bulk_reject(user):
     if rejected_requests_data:
         from flask import current_app
         from threading import Thread
+        from services.tracing import tracer
         from ld.ld_email_service import send_bulk_rejection_email
         
         # Get updater from first request (all should have same updater in bulk)
@@ -655,7 +658,7 @@ def handle_bulk_reject(user):
         if updater_data and updater_data.get('email'):
             # Send email in background thread to avoid blocking
             app = current_app._get_current_object()
-            thread = Thread(target=send_bulk_rejection_email, args=(app, mongo, rejected_requests_data, user, updater_data, response_notes))
+            thread = Thread(target=tracer.bind(send_bulk_rejection_email), args=(app, mongo, rejected_requests_data, user, updater_data, response_notes))
             thread.daemon = True
             thread.start()
         else:
@@ -754,6 +757,7 @@ def get_pending_requests():
 
 
 @ld_bp.route('/validator/check-new-requests')
+@query_budget(6)
 def check_new_requests():
     """Check for new pending requests"""
     has_access, user = check_ld_validator_access()
@@ -808,11 +812,19 @@ def check_new_requests():
                 }  # OLD field
             ]
         }).sort("request_date", -1)
+        new_requests_data = list(new_requests_cursor)
+        
+        # ✅ Employees in one lookup; categories are the (normalized) L&D ones fetched above
+        employee_ids = list({req_data["user_id"] for req_data in new_requests_data})
+        employees_map = {
+            emp["_id"]: emp for emp in mongo.db.users.find({"_id": {"$in": employee_ids}})
+        } if employee_ids else {}
+        categories_map = {cat["_id"]: cat for cat in ld_categories}
         
         new_requests = []
-        for req_data in new_requests_cursor:
-            employee = mongo.db.users.find_one({"_id": req_data["user_id"]})
-            category = get_category_by_id(req_data["category_id"])
+        for req_data in new_requests_data:
+            employee = employees_map.get(req_data["user_id"])
+            category = categories_map.get(req_data["category_id"])
             
             if employee and category:
                 # Support both old (request_notes) and new (submission_notes) field names
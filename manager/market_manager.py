@@ -13,7 +13,6 @@ from email.utils import formataddr
 from jinja2 import Template
 from bson.objectid import ObjectId
 from gridfs import GridFS, NoFile  # Updated import
-from io import BytesIO
 from werkzeug.utils import secure_filename
 import uuid
 from flask import (
@@ -26,10 +25,11 @@ from flask import (
     render_template,
     jsonify,
     Response,
-    current_app,
-    send_file
+    current_app
 )
 from extensions import mongo
+from utils.attachment_stream import send_gridfs_file
+from utils.attachment_store import store_attachment
 
 # Configure logging
 logging.basicConfig(
@@ -1224,21 +1224,14 @@ def get_attachment(request_id):
         
         # Get the original filename
         filename_for_download = grid_out.filename # Default to GridFS filename
-        if grid_out.metadata and 'original_filename' in grid_out.metadata:
-            filename_for_download = grid_out.metadata['original_filename']
-        elif request_data.get('attachment_filename'): # Fallback to request_data if metadata is missing
+        if request_data.get('attachment_filename'): # Deduplicated files are shared - prefer this request's name
             filename_for_download = request_data.get('attachment_filename')
+        elif grid_out.metadata and 'original_filename' in grid_out.metadata:
+            filename_for_download = grid_out.metadata['original_filename']
 
         # Ensure filename is secure
         filename_for_download = secure_filename(filename_for_download)
         
-        # Read file data completely
-        file_data = grid_out.read()
-        
-        # Create BytesIO object
-        file_stream = BytesIO(file_data)
-        file_stream.seek(0)
-        
         # Determine content type
         content_type = grid_out.content_type
         if not content_type:
@@ -1260,22 +1253,15 @@ def get_attachment(request_id):
             content_type = mime_types.get(extension, 'application/octet-stream')
         
         # Log info
-        logger.debug(f"Serving file: {filename_for_download}, type: {content_type}, size: {len(file_data)}")
+        logger.debug(f"Serving file: {filename_for_download}, type: {content_type}, size: {grid_out.length}")
         
-        # Send the file
-        response = send_file(
-            file_stream,
+        # Stream the file chunk by chunk (ETag/Range aware, long private cache)
+        return send_gridfs_file(
+            grid_out,
             mimetype=content_type,
             download_name=filename_for_download,
             as_attachment=True
         )
-        
-        # Add cache control headers
-        response.headers['Cache-Control'] = 'no-cache, no-store, must-revalidate'
-        response.headers['Pragma'] = 'no-cache'
-        response.headers['Expires'] = '0'
-        
-        return response
 
     except Exception as e:
         logger.error(f"Error retrieving attachment: {str(e)}")
@@ -1312,13 +1298,6 @@ def download_attachment(attachment_id):
         # Ensure filename is secure
         filename_for_download = secure_filename(filename_for_download)
         
-        # Important: Read the entire file into memory first
-        file_data = grid_out.read()
-        
-        # Create BytesIO object and reset position
-        data = BytesIO(file_data)
-        data.seek(0)
-        
         # Determine content type
         content_type = grid_out.content_type
         if not content_type:
@@ -1340,22 +1319,15 @@ def download_attachment(attachment_id):
             content_type = mime_types.get(extension, 'application/octet-stream')
         
         # Log detailed information about the file being served
-        logger.debug(f"Serving file: {filename_for_download}, type: {content_type}, size: {len(file_data)}")
+        logger.debug(f"Serving file: {filename_for_download}, type: {content_type}, size: {grid_out.length}")
 
-        # Send file with appropriate headers
-        response = send_file(
-            data,
+        # Stream the file chunk by chunk (ETag/Range aware, long private cache)
+        return send_gridfs_file(
+            grid_out,
             mimetype=content_type,
-            as_attachment=True,
-            download_name=filename_for_download
+            download_name=filename_for_download,
+            as_attachment=True
         )
-        
-        # Add cache control headers to prevent browser caching issues
-        response.headers['Cache-Control'] = 'no-cache, no-store, must-revalidate'
-        response.headers['Pragma'] = 'no-cache'
-        response.headers['Expires'] = '0'
-        
-        return response
 
     except Exception as e:
         logger.error(f"Error downloading attachment: {str(e)}")
@@ -1694,9 +1666,8 @@ def raise_points_request():
 
         # Handle attachment if provided
         if attachment and attachment.filename:
-            fs = GridFS(mongo.db)
-            file_id = fs.put(
-                attachment.read(),
+            file_id = store_attachment(
+                attachment,
                 filename=secure_filename(attachment.filename),
                 content_type=attachment.content_type,
                 metadata={'original_filename': attachment.filename}
@@ -10,8 +10,7 @@ import io
 from werkzeug.utils import secure_filename
 from flask import Blueprint
 from flask import Flask, render_template
-from gridfs import GridFS  # Add this import
-from flask import send_file
+from utils.attachment_stream import open_gridfs_file, send_gridfs_file
 
 # Javeed added this: Imports for email notifications
 import smtplib
@@ -1504,30 +1503,18 @@ def get_attachment(request_id):
             flash('No attachment found for this request', 'warning')
             return redirect(url_for('pm_arch.dashboard'))
         
-        # Create GridFS instance
-        fs = GridFS(mongo.db)
-        
-        # Get the file from GridFS
-        attachment_id = request_data['attachment_id']
-        if not fs.exists(ObjectId(attachment_id)):
+        # Open the file from GridFS (single lookup, streamed below)
+        grid_out = open_gridfs_file(request_data['attachment_id'])
+        if not grid_out:
             flash('Attachment file not found', 'warning')
             return redirect(url_for('pm_arch.dashboard'))
         
-        # Get the file and its metadata
-        grid_out = fs.get(ObjectId(attachment_id))
-        
-        # Prepare the response
-        file_stream = io.BytesIO(grid_out.read())
-        file_stream.seek(0)
-        
         # Get the original filename from metadata
-        original_filename = grid_out.metadata.get('original_filename', 'attachment')
-        content_type = grid_out.content_type
+        original_filename = request_data.get('attachment_filename') or (grid_out.metadata or {}).get('original_filename', 'attachment')
         
-        # Send the file to the user
-        return send_file(
-            file_stream,
-            mimetype=content_type,
+        # Stream the file to the user
+        return send_gridfs_file(
+            grid_out,
             download_name=original_filename,
             as_attachment=True
         )
@@ -2069,22 +2056,15 @@ def validator_get_attachment(request_id):
             debug_print(f"PM_ARCH_VALIDATOR: Attachment Auth fail. Request assigned_validator_id: {request_data.get('assigned_validator_id')}, current validator: {user_id}")
             return redirect(url_for('pm_arch.validator_dashboard'))
 
-        fs = GridFS(mongo.db)
-        attachment_id = request_data['attachment_id']
-        if not fs.exists(ObjectId(attachment_id)):
+        grid_out = open_gridfs_file(request_data['attachment_id'])
+        if not grid_out:
             flash('Attachment file not found', 'warning')
             return redirect(url_for('pm_arch.validator_dashboard'))
         
-        grid_out = fs.get(ObjectId(attachment_id))
-        file_stream = io.BytesIO(grid_out.read())
-        file_stream.seek(0)
-        
-        original_filename = grid_out.metadata.get('original_filename', 'attachment')
-        content_type = grid_out.content_type
+        original_filename = request_data.get('attachment_filename') or (grid_out.metadata or {}).get('original_filename', 'attachment')
         
-        return send_file(
-            file_stream,
-            mimetype=content_type,
+        return send_gridfs_file(
+            grid_out,
             download_name=original_filename,
             as_attachment=True
         )
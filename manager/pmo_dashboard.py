@@ -13,6 +13,9 @@ from email.mime.multipart import MIMEMultipart
 from email.utils import formataddr
 from jinja2 import Template
 from config import Config
+from utils.request_dedupe import (
+    insert_unique_request, find_active_utilization, DuplicateRequestError
+)
 
 # Define Blueprint 
 current_dir = os.path.dirname(os.path.abspath(__file__))
@@ -80,19 +83,8 @@ def get_fiscal_quarter_date_range(quarter_num, fiscal_year):
 
 def has_existing_utilization_record(employee_id, category_id, event_date):
     """Check if an employee already has a utilization_billable record for the specified month."""
-    start_of_month = event_date.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
-    next_month = (start_of_month.replace(month=start_of_month.month % 12 + 1) if start_of_month.month < 12 else start_of_month.replace(year=start_of_month.year + 1, month=1))
-    
-    existing_record = mongo.db.points_request.find_one({
-        "user_id": ObjectId(employee_id),
-        "category_id": ObjectId(category_id),
-        "event_date": {
-            "$gte": start_of_month,
-            "$lt": next_month
-        },
-        "status": {"$in": ["Approved", "Pending"]} # Check for both approved and pending
-    })
-    return existing_record
+    # Pending and Approved, keyed or not yet backfilled (see utils.request_dedupe)
+    return find_active_utilization(employee_id, category_id, event_date)
  
 def _process_bulk_award_upload(file, user, pmo_validator_manager_id):
     """Helper function to process bulk award upload (Spot Award, Client Appreciation, R&R)"""
@@ -386,12 +378,6 @@ def _process_utilization_upload(file, user, pmo_validator_manager_id):
                     error_count += 1
                     continue
                 
-                existing_record = has_existing_utilization_record(employee["_id"], category["_id"], event_date)
-                if existing_record:
-                    errors.append(f"Row {row_num}: Utilization record for {employee_id} already exists for the month of {event_date.strftime('%B %Y')}.")
-                    error_count += 1
-                    continue
-                
                 try:
                     utilization_cleaned = utilization_str.replace('%', '').strip()
                     utilization_value = float(utilization_cleaned)
@@ -420,7 +406,12 @@ def _process_utilization_upload(file, user, pmo_validator_manager_id):
                     "pending_validator_id": ObjectId(pmo_validator_manager_id)
                 }
                 
-                mongo.db.points_request.insert_one(request_data)
+                try:
+                    insert_unique_request(request_data)
+                except DuplicateRequestError:
+                    errors.append(f"Row {row_num}: Utilization record for {employee_id} already exists for the month of {event_date.strftime('%B %Y')}.")
+                    error_count += 1
+                    continue
                 
                 successful_requests.append({
                     "employee_id": employee_id,
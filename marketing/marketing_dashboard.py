@@ -5,6 +5,7 @@ from bson.objectid import ObjectId
 import sys
 import traceback
 from threading import Thread
+from services.tracing import tracer
 
 # ✅ USE UNIVERSAL REAL-TIME EVENTS
 from services.realtime_events import publish_request_approved, publish_request_rejected
@@ -600,7 +601,7 @@ def process_request(request_id):
             points_request["response_notes"] = notes
             
             # ✅ Send email notifications asynchronously (non-blocking) - matches pmarch/presales/pm
-            Thread(target=send_approval_notification, args=(
+            Thread(target=tracer.bind(send_approval_notification), args=(
                 points_request, employee, user, category
             ), daemon=True).start()
             
@@ -626,7 +627,7 @@ def process_request(request_id):
             points_request["response_notes"] = notes
             
             # ✅ Send email notifications asynchronously (non-blocking) - matches pmarch/presales/pm
-            Thread(target=send_rejection_notification, args=(
+            Thread(target=tracer.bind(send_rejection_notification), args=(
                 points_request, employee, user, category
             ), daemon=True).start()
             
@@ -769,9 +770,7 @@ def processed_requests():
 @marketing_dashboard_bp.route('/get_attachment/<request_id>')
 def get_attachment(request_id):
     """Download attachment"""
-    from gridfs import GridFS
-    from flask import send_file
-    import io
+    from utils.attachment_stream import open_gridfs_file, send_gridfs_file
     
     has_access, user = check_marketing_access()
     if not has_access:
@@ -784,25 +783,16 @@ def get_attachment(request_id):
             flash('Attachment not found', 'warning')
             return redirect(url_for('marketing_dashboard.dashboard'))
         
-        fs = GridFS(mongo.db)
-        attachment_id = req.get('attachment_id')
-        if isinstance(attachment_id, str):
-            attachment_id = ObjectId(attachment_id)
-        
-        if not fs.exists(attachment_id):
+        grid_out = open_gridfs_file(req.get('attachment_id'))
+        if not grid_out:
             flash('Attachment file not found', 'warning')
             return redirect(url_for('marketing_dashboard.dashboard'))
         
-        grid_out = fs.get(attachment_id)
-        file_data = grid_out.read()
-        file_stream = io.BytesIO(file_data)
-        file_stream.seek(0)
-        
-        original_filename = grid_out.metadata.get('original_filename', req.get('attachment_filename', 'attachment'))
+        original_filename = req.get('attachment_filename') or (grid_out.metadata or {}).get('original_filename', 'attachment')
         content_type = grid_out.content_type or 'application/octet-stream'
         
-        return send_file(
-            file_stream,
+        return send_gridfs_file(
+            grid_out,
             mimetype=content_type,
             download_name=original_filename,
             as_attachment=True
@@ -987,14 +977,13 @@ def raise_request():
         if 'attachment' in request.files:
             file = request.files['attachment']
             if file and file.filename:
-                from gridfs import GridFS
                 from werkzeug.utils import secure_filename
+                from utils.attachment_store import store_attachment
                 
-                fs = GridFS(mongo.db)
                 filename = secure_filename(file.filename)
                 
-                # Store file in GridFS
-                attachment_id = fs.put(
+                # Store file in GridFS (identical content is stored once)
+                attachment_id = store_attachment(
                     file,
                     filename=filename,
                     content_type=file.content_type,
@@ -1,8 +1,7 @@
-from flask import request, session, redirect, url_for, flash, send_file
+from flask import request, session, redirect, url_for, flash
 from extensions import mongo
 from bson.objectid import ObjectId
-from gridfs import GridFS
-import io
+from utils.attachment_stream import open_gridfs_file, send_gridfs_file
 import traceback
 
 def register_attachment_routes(bp):
@@ -57,35 +56,19 @@ def register_attachment_routes(bp):
                 flash('Attachment ID is missing', 'warning')
                 return redirect(url_for('pm.pending_requests'))
             
-            # Create GridFS instance
-            fs = GridFS(mongo.db)
-            
-            # Convert to ObjectId if string
-            if isinstance(attachment_id, str):
-                attachment_id = ObjectId(attachment_id)
-
-            # Get the file from GridFS
-            if not fs.exists(attachment_id):
+            # Open the file from GridFS (single lookup, streamed below)
+            grid_out = open_gridfs_file(attachment_id)
+            if not grid_out:
 
                 flash('Attachment file not found in storage', 'warning')
                 return redirect(url_for('pm.pending_requests'))
-
-            # Get the file and its metadata
-            grid_out = fs.get(attachment_id)
-            file_data = grid_out.read()
-
-            # Prepare the response
-            file_stream = io.BytesIO(file_data)
-            file_stream.seek(0)
             
             # Get the original filename from metadata
-            original_filename = grid_out.metadata.get('original_filename', request_data.get('attachment_filename', 'attachment'))
-            content_type = grid_out.content_type or 'application/octet-stream'
+            original_filename = request_data.get('attachment_filename') or (grid_out.metadata or {}).get('original_filename', 'attachment')
 
-            # Send the file to the user
-            return send_file(
-                file_stream,
-                mimetype=content_type,
+            # Stream the file to the user
+            return send_gridfs_file(
+                grid_out,
                 download_name=original_filename,
                 as_attachment=True
             )
@@ -6,7 +6,9 @@ import sys
 import io
 import csv
 import json
+import hashlib
 from .pm_main import pm_bp
+from services.job_service import job_service, job_handler
 
 def error_print(message, error=None):
     pass
@@ -274,45 +276,18 @@ def bulk_upload():
             flash('No valid data to process', 'warning')
             return redirect(url_for('pm.bulk_upload_form'))
         
-        # Get quarter info
-        quarter_start, quarter_end, current_quarter, year = get_current_quarter_date_range()
-        
-        # Process each row
-        success_count = 0
-        
-        for row in valid_rows:
-            try:
-                # Get category
-                category = mongo.db.categories.find_one({
-                    "$or": [
-                        {"_id": ObjectId(row["category_id"]) if ObjectId.is_valid(row["category_id"]) else None},
-                        {"code": row["category_id"]}
-                    ]
-                })
-                
-                if not category:
-                    continue
-                
-                # Create points entry
-                points_entry = {
-                    "user_id": ObjectId(row["mongo_id"]),
-                    "category_id": category["_id"],
-                    "points": row["points"],
-                    "award_date": datetime.utcnow(),
-                    "awarded_by": ObjectId(user["_id"]),
-                    "notes": row["notes"],
-                    "uploaded_via_csv": True,
-                    "quarter": current_quarter,
-                    "year": year
-                }
-                
-                mongo.db.points.insert_one(points_entry)
-                success_count += 1
-                
-            except Exception as e:
-                error_print(f"Error processing row", e)
-        
-        flash(f'Successfully awarded points to {success_count} employees', 'success')
+        # ✅ Awarding runs as a background job; re-submitting the same data while it runs is queued once
+        job, created = job_service.enqueue(
+            'pm.bulk_upload',
+            {'valid_rows': valid_rows, 'awarded_by': str(user['_id'])},
+            user_id=user['_id'],
+            idempotency_key=f"{user['_id']}:{hashlib.sha256(processed_data.encode('utf-8')).hexdigest()}",
+            description=f'Bulk points upload ({len(valid_rows)} rows)'
+        )
+        if created:
+            flash(f'Awarding points to {len(valid_rows)} employees. You will be notified when it finishes.', 'info')
+        else:
+            flash('This upload is already being processed.', 'info')
         return redirect(url_for('pm.dashboard'))
         
     except Exception as e:
@@ -320,6 +295,55 @@ def bulk_upload():
         flash('An error occurred while processing the upload', 'danger')
         return redirect(url_for('pm.bulk_upload_form'))
 
+
+@job_handler('pm.bulk_upload')
+def run_pm_bulk_upload(job, valid_rows, awarded_by):
+    """Background job: award points for the validated bulk upload rows"""
+    # Get quarter info
+    quarter_start, quarter_end, current_quarter, year = get_current_quarter_date_range()
+    
+    # Process each row
+    success_count = 0
+    
+    for index, row in enumerate(valid_rows):
+        job.progress(index, len(valid_rows), f'{success_count} awarded')
+        try:
+            # Get category
+            category = mongo.db.categories.find_one({
+                "$or": [
+                    {"_id": ObjectId(row["category_id"]) if ObjectId.is_valid(row["category_id"]) else None},
+                    {"code": row["category_id"]}
+                ]
+            })
+            
+            if not category:
+                continue
+            
+            # Create points entry
+            points_entry = {
+                "user_id": ObjectId(row["mongo_id"]),
+                "category_id": category["_id"],
+                "points": row["points"],
+                "award_date": datetime.utcnow(),
+                "awarded_by": ObjectId(awarded_by),
+                "notes": row["notes"],
+                "uploaded_via_csv": True,
+                "quarter": current_quarter,
+                "year": year
+            }
+            
+            mongo.db.points.insert_one(points_entry)
+            success_count += 1
+            
+        except Exception as e:
+            error_print(f"Error processing row", e)
+
+    job.progress(len(valid_rows), len(valid_rows), f'{success_count} awarded')
+    return {
+        'message': f'Successfully awarded points to {success_count} employees',
+        'success_count': success_count
+    }
+
 @pm_bp.route('/download-template')
 def download_template():
     has_access, user = check_pm_access()
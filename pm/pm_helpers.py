@@ -1,12 +1,13 @@
-from flask import Blueprint, render_template, request, redirect, url_for, session, flash, jsonify, send_file
+from flask import Blueprint, render_template, request, redirect, url_for, session, flash, jsonify
 from extensions import mongo
 from datetime import datetime
 from bson.objectid import ObjectId
 from werkzeug.utils import secure_filename
-from gridfs import GridFS
-import io
+from utils.attachment_stream import open_gridfs_file, send_gridfs_file
+from utils.attachment_store import store_attachment
 import logging
 from threading import Thread
+from services.tracing import tracer
 
 logger = logging.getLogger(__name__)
 
@@ -125,14 +126,12 @@ def submit_request():
                 file_data = attachment.read()
                 
                 if len(file_data) > 0:
-                    fs = GridFS(mongo.db)
-                    
                     # Secure the filename
                     secure_name = secure_filename(attachment.filename)
                     original_filename = secure_name
                     
-                    # Save to GridFS
-                    attachment_id = fs.put(
+                    # Save to GridFS (identical content is stored once and shared)
+                    attachment_id = store_attachment(
                         file_data,
                         filename=original_filename,
                         content_type=attachment.content_type or 'application/octet-stream',
@@ -194,7 +193,7 @@ def submit_request():
                         'attachment_filename': attachment_filename
                     }
                     
-                    Thread(target=send_new_request_notification, args=(
+                    Thread(target=tracer.bind(send_new_request_notification), args=(
                         email_request_data,
                         user,
                         validator,
@@ -330,29 +329,16 @@ def get_attachment(request_id):
             flash('Attachment ID missing', 'warning')
             return redirect(url_for('employee_raise_request.raise_request'))
         
-        # Get from GridFS
-        fs = GridFS(mongo.db)
-        
-        # Convert to ObjectId if needed
-        if isinstance(attachment_id, str):
-            attachment_id = ObjectId(attachment_id)
-        
-        if not fs.exists(attachment_id):
+        # Open from GridFS (single lookup, streamed below)
+        grid_out = open_gridfs_file(attachment_id)
+        if not grid_out:
             flash('Attachment file not found in storage', 'warning')
             return redirect(url_for('employee_raise_request.raise_request'))
         
-        grid_out = fs.get(attachment_id)
-        file_data = grid_out.read()
-        
-        file_stream = io.BytesIO(file_data)
-        file_stream.seek(0)
-        
-        original_filename = grid_out.metadata.get('original_filename', req.get('attachment_filename', 'attachment'))
-        content_type = grid_out.content_type or 'application/octet-stream'
+        original_filename = req.get('attachment_filename') or (grid_out.metadata or {}).get('original_filename', 'attachment')
         
-        return send_file(
-            file_stream,
-            mimetype=content_type,
+        return send_gridfs_file(
+            grid_out,
             download_name=original_filename,
             as_attachment=True
         )
@@ -5,6 +5,7 @@ from bson.objectid import ObjectId
 import sys
 import logging
 from threading import Thread
+from services.tracing import tracer
 from .pm_main import pm_bp
 
 # ✅ IMPORT REAL-TIME PUBLISHER
@@ -240,7 +241,7 @@ def process_request(request_id):
             points_request["response_notes"] = notes
             
             # ✅ Send email notifications asynchronously (non-blocking) - matches pmarch/presales
-            Thread(target=send_approval_notification, args=(
+            Thread(target=tracer.bind(send_approval_notification), args=(
                 points_request, employee, user, category
             ), daemon=True).start()
             
@@ -273,7 +274,7 @@ def process_request(request_id):
             points_request["response_notes"] = notes
             
             # ✅ Send email notifications asynchronously (non-blocking) - matches pmarch/presales
-            Thread(target=send_rejection_notification, args=(
+            Thread(target=tracer.bind(send_rejection_notification), args=(
                 points_request, employee, user, category
             ), daemon=True).start()
             
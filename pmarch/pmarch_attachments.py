@@ -2,11 +2,10 @@
 PM/Arch Attachments Module
 Handles file attachment upload, download, and management for PM/Arch requests
 """
-from flask import request, session, redirect, url_for, flash, send_file
+from flask import request, session, redirect, url_for, flash
 from extensions import mongo
 from bson.objectid import ObjectId
-from gridfs import GridFS
-import io
+from utils.attachment_stream import open_gridfs_file, send_gridfs_file
 import traceback
 import logging
 
@@ -92,36 +91,19 @@ def register_attachment_routes(bp):
                 flash('Attachment ID is missing', 'warning')
                 return redirect(url_for('pm_arch.dashboard'))
             
-            # Create GridFS instance
-            fs = GridFS(mongo.db)
-            
-            # Convert to ObjectId if string
-            if isinstance(attachment_id, str):
-                attachment_id = ObjectId(attachment_id)
-            
             logger.debug(f"📥 PMARCH: Looking for file with ID: {attachment_id}")
             
-            # Get the file from GridFS
-            if not fs.exists(attachment_id):
+            # Open the file from GridFS (single lookup, streamed below)
+            grid_out = open_gridfs_file(attachment_id)
+            if not grid_out:
                 logger.error(f"❌ PMARCH: File doesn't exist in GridFS")
                 flash('Attachment file not found in storage', 'warning')
                 return redirect(url_for('pm_arch.dashboard'))
             
-            logger.debug(f"✅ PMARCH: File exists, retrieving...")
-            
-            # Get the file and its metadata
-            grid_out = fs.get(attachment_id)
-            file_data = grid_out.read()
-            
-            logger.debug(f"✅ PMARCH: File retrieved, size: {len(file_data)} bytes")
-            
-            # Prepare the response
-            file_stream = io.BytesIO(file_data)
-            file_stream.seek(0)
+            logger.debug(f"✅ PMARCH: File found, size: {grid_out.length} bytes")
             
             # Get the original filename from metadata
-            original_filename = grid_out.metadata.get('original_filename', 
-                                                     request_data.get('attachment_filename', 'attachment'))
+            original_filename = request_data.get('attachment_filename') or (grid_out.metadata or {}).get('original_filename', 'attachment')
             content_type = grid_out.content_type or 'application/octet-stream'
             
             logger.debug(f"✅ PMARCH: Sending file: {original_filename}, content_type: {content_type}")
@@ -130,9 +112,9 @@ def register_attachment_routes(bp):
             viewable_types = ['image/jpeg', 'image/png', 'image/gif', 'image/webp', 'application/pdf']
             as_attachment = content_type not in viewable_types
             
-            # Send the file to the user
-            return send_file(
-                file_stream,
+            # Stream the file to the user
+            return send_gridfs_file(
+                grid_out,
                 mimetype=content_type,
                 download_name=original_filename,
                 as_attachment=as_attachment
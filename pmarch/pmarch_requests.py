@@ -8,6 +8,7 @@ from datetime import datetime
 from bson.objectid import ObjectId
 import logging
 from threading import Thread
+from services.tracing import tracer
 
 from .pmarch_main import pmarch_bp
 from .pmarch_helpers import (
@@ -78,7 +79,7 @@ def process_request(request_id):
             points_request["response_notes"] = notes
             
             # Send email notifications asynchronously (non-blocking)
-            Thread(target=send_approval_notification, args=(
+            Thread(target=tracer.bind(send_approval_notification), args=(
                 points_request, employee, user, category
             ), daemon=True).start()
             
@@ -99,7 +100,7 @@ def process_request(request_id):
             points_request["response_notes"] = notes
             
             # Send email notifications asynchronously (non-blocking)
-            Thread(target=send_rejection_notification, args=(
+            Thread(target=tracer.bind(send_rejection_notification), args=(
                 points_request, employee, user, category
             ), daemon=True).start()
             
@@ -14,6 +14,10 @@ from .pmo_email_service import (
     send_new_request_email, send_bulk_request_email
 )
 from utils.error_handling import error_print
+from utils.cpu_offload import parse_csv_upload
+from utils.request_dedupe import (
+    insert_unique_request, find_active_utilization, find_awarded_utilization, DuplicateRequestError
+)
 
 @pmo_bp.route('/updater/dashboard', methods=['GET', 'POST'])
 def updater_dashboard():
@@ -369,27 +373,10 @@ def handle_single_assignment(user):
         # For utilization, points are 0 (stored as percentage only)
         points = 0
         
-        # Check for existing utilization record in the same month
-        start_of_month = event_date.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
-        next_month = (start_of_month.replace(month=start_of_month.month % 12 + 1) if start_of_month.month < 12 
-                     else start_of_month.replace(year=start_of_month.year + 1, month=1))
-        
-        # Check in points_request collection for Pending or Approved records
-        existing_request = mongo.db.points_request.find_one({
-            "user_id": ObjectId(employee["_id"]),
-            "category_id": ObjectId(category["_id"]),
-            "event_date": {"$gte": start_of_month, "$lt": next_month},
-            "status": {"$in": ["Approved", "Pending"]}
-        })
-        
-        # Also check in points collection (approved records that were moved)
-        existing_point = mongo.db.points.find_one({
-            "user_id": ObjectId(employee["_id"]),
-            "category_id": ObjectId(category["_id"]),
-            "award_date": {"$gte": start_of_month, "$lt": next_month}
-        })
-        
-        if existing_request or existing_point:
+        # Check for existing utilization in the same month (requests not keyed yet, and
+        # approved records that were moved to the points collection)
+        if (find_active_utilization(employee["_id"], category["_id"], event_date, {"_id": 1}) or
+                find_awarded_utilization(employee["_id"], category["_id"], event_date)):
             month_year = event_date.strftime('%B %Y')
             flash(f'⚠️ Already available in processing for {month_year}. Only one utilization request per employee per month is allowed.', 'warning')
             return redirect(url_for('pmo.updater_dashboard', tab='single-request'))
@@ -409,8 +396,14 @@ def handle_single_assignment(user):
     
     if utilization_value is not None:
         request_data['utilization_value'] = utilization_value
-    
-    result = mongo.db.points_request.insert_one(request_data)
+        # ✅ One utilization per employee per month - enforced by the dedupe index
+        try:
+            result = insert_unique_request(request_data)
+        except DuplicateRequestError as dup:
+            flash(f'⚠️ Already available in processing for {dup.period_label}. Only one utilization request per employee per month is allowed.', 'warning')
+            return redirect(url_for('pmo.updater_dashboard', tab='single-request'))
+    else:
+        result = mongo.db.points_request.insert_one(request_data)
     
     from services.realtime_events import publish_request_raised
     request_data['_id'] = result.inserted_id
@@ -455,7 +448,7 @@ def validate_bulk_upload():
             return jsonify({'success': False, 'error': 'No file uploaded'})
         
         csv_content = file.read().decode('utf-8')
-        csv_reader = csv.DictReader(io.StringIO(csv_content))
+        csv_reader = parse_csv_upload(csv_content)
         
         expected_headers = ['employee_id', 'validator_employee_id', 'event_date', 'category_code', 'department', 'notes']
         if csv_reader.fieldnames != expected_headers:
@@ -769,7 +762,7 @@ def validate_utilization_upload():
             return jsonify({'success': False, 'error': 'Utilization category not found in PMO categories'})
         
         csv_content = file.read().decode('utf-8')
-        csv_reader = csv.DictReader(io.StringIO(csv_content))
+        csv_reader = parse_csv_upload(csv_content)
         
         expected_headers = ['employee_id', 'validator_employee_id', 'event_date', 'category_code', 'department', 'utilization', 'notes']
         if csv_reader.fieldnames != expected_headers:
@@ -849,22 +842,11 @@ def validate_utilization_upload():
                 # Track this employee-month combination
                 employee_month_tracker[month_key] = row_num
                 
-                # ✅ MODIFIED: Check for existing utilization record in the same month
-                # Now allows multiple uploads per month - system will analyze and handle per-month data
-                start_of_month = event_date.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
-                next_month = (start_of_month.replace(month=start_of_month.month % 12 + 1) if start_of_month.month < 12 
-                             else start_of_month.replace(year=start_of_month.year + 1, month=1))
+                # ✅ Preview only - the insert itself is guarded atomically by the dedupe index
+                existing_active = find_active_utilization(employee["_id"], category["_id"], event_date, {"status": 1})
                 
-                # Check for existing APPROVED record in the same month (prevent duplicate approved records)
-                existing_approved = mongo.db.points_request.find_one({
-                    "user_id": ObjectId(employee["_id"]),
-                    "category_id": ObjectId(category["_id"]),
-                    "event_date": {"$gte": start_of_month, "$lt": next_month},
-                    "status": "Approved"
-                })
-                
-                if existing_approved:
-                    raise ValueError(f"⚠️ Utilization already approved for {event_date.strftime('%B %Y')}. Cannot upload duplicate approved records.")
+                if existing_active:
+                    raise ValueError(f"⚠️ Utilization already {existing_active.get('status', 'Pending').lower()} for {event_date.strftime('%B %Y')}. Only one utilization per employee per month is allowed.")
                 
                 # Parse utilization value
                 try:
@@ -968,7 +950,11 @@ def handle_utilization_upload_confirmed(user):
                     "created_by_pmo_id": ObjectId(user['_id'])
                 }
                 
-                result = mongo.db.points_request.insert_one(request_data)
+                try:
+                    result = insert_unique_request(request_data)
+                except DuplicateRequestError as dup:
+                    error_print(f"Skipped utilization row {row.get('row_number')}: already in processing for {dup.period_label}")
+                    continue
                 request_data['_id'] = result.inserted_id
                 
                 from services.realtime_events import publish_request_raised
@@ -1213,25 +1199,9 @@ def check_utilization_duplicate():
         if not event_date:
             return jsonify({'success': True, 'duplicate': False})
         
-        # Check for existing utilization in the same month
-        start_of_month = event_date.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
-        next_month = (start_of_month.replace(month=start_of_month.month % 12 + 1) if start_of_month.month < 12 
-                     else start_of_month.replace(year=start_of_month.year + 1, month=1))
-        
-        # Check in points_request collection
-        existing_request = mongo.db.points_request.find_one({
-            "user_id": ObjectId(employee["_id"]),
-            "category_id": ObjectId(category_id),
-            "event_date": {"$gte": start_of_month, "$lt": next_month},
-            "status": {"$in": ["Approved", "Pending"]}
-        })
-        
-        # Check in points collection
-        existing_point = mongo.db.points.find_one({
-            "user_id": ObjectId(employee["_id"]),
-            "category_id": ObjectId(category_id),
-            "award_date": {"$gte": start_of_month, "$lt": next_month}
-        })
+        # Check in points_request (Pending/Approved) and in points (approved records that were moved)
+        existing_request = find_active_utilization(employee["_id"], category_id, event_date, {"_id": 1})
+        existing_point = find_awarded_utilization(employee["_id"], category_id, event_date)
         
         if existing_request or existing_point:
             month_year = event_date.strftime('%B %Y')
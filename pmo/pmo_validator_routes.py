@@ -14,6 +14,8 @@ from .pmo_email_service import (
     send_bulk_rejection_email_to_updater
 )
 from utils.error_handling import error_print
+from utils.request_dedupe import RELEASE_DEDUPE_KEY
+from services.query_monitor import query_budget
 
 @pmo_bp.route('/validator/dashboard', methods=['GET', 'POST'])
 def validator_dashboard():
@@ -463,7 +465,8 @@ def handle_single_action(user):
                     "response_notes": response_notes,
                     "processed_by": ObjectId(user['_id']),
                     "processed_department": "pmo"  # ✅ Store which department processed this
-                }}
+                },
+                 "$unset": RELEASE_DEDUPE_KEY}  # ✅ Free the utilization slot for a resubmission
             )
             
             # Update request_doc with response_notes for real-time notification
@@ -654,7 +657,8 @@ def handle_bulk_reject(user):
                     "response_notes": rejection_notes,
                     "processed_by": ObjectId(user['_id']),
                     "processed_department": "pmo"  # ✅ Store which department processed this
-                }}
+                },
+                 "$unset": RELEASE_DEDUPE_KEY}  # ✅ Free the utilization slot for a resubmission
             )
             
             # Update request_doc with response_notes for real-time notification
@@ -833,6 +837,7 @@ def update_utilization():
 
 
 @pmo_bp.route('/validator/pending-count', methods=['GET'])
+@query_budget(3)
 def get_pending_count():
     """Get pending requests count for real-time updates"""
     has_access, user = check_pmo_validator_access()
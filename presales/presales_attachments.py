@@ -2,11 +2,10 @@
 Presales Attachments Module
 Handles file attachment upload, download, and management for presales requests
 """
-from flask import request, session, redirect, url_for, flash, send_file
+from flask import request, session, redirect, url_for, flash
 from extensions import mongo
 from bson.objectid import ObjectId
-from gridfs import GridFS
-import io
+from utils.attachment_stream import open_gridfs_file, send_gridfs_file
 import traceback
 import logging
 
@@ -66,38 +65,23 @@ def register_attachment_routes(bp):
                 flash('Attachment ID is missing', 'warning')
                 return redirect(url_for('presales.dashboard'))
             
-            # Create GridFS instance
-            fs = GridFS(mongo.db)
-            
-            # Convert to ObjectId if string
-            if isinstance(attachment_id, str):
-                attachment_id = ObjectId(attachment_id)
-            
-            # Get the file from GridFS
-            if not fs.exists(attachment_id):
+            # Open the file from GridFS (single lookup, streamed below)
+            grid_out = open_gridfs_file(attachment_id)
+            if not grid_out:
                 flash('Attachment file not found in storage', 'warning')
                 return redirect(url_for('presales.dashboard'))
             
-            # Get the file and its metadata
-            grid_out = fs.get(attachment_id)
-            file_data = grid_out.read()
-            
-            # Prepare the response
-            file_stream = io.BytesIO(file_data)
-            file_stream.seek(0)
-            
             # Get the original filename from metadata
-            original_filename = grid_out.metadata.get('original_filename', 
-                                                     request_data.get('attachment_filename', 'attachment'))
+            original_filename = request_data.get('attachment_filename') or (grid_out.metadata or {}).get('original_filename', 'attachment')
             content_type = grid_out.content_type or 'application/octet-stream'
             
             # Determine if file should be displayed inline or downloaded
             viewable_types = ['image/jpeg', 'image/png', 'image/gif', 'image/webp', 'application/pdf']
             as_attachment = content_type not in viewable_types
             
-            # Send the file to the user
-            return send_file(
-                file_stream,
+            # Stream the file to the user
+            return send_gridfs_file(
+                grid_out,
                 mimetype=content_type,
                 download_name=original_filename,
                 as_attachment=as_attachment
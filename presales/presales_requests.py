@@ -8,6 +8,7 @@ from datetime import datetime
 from bson.objectid import ObjectId
 import logging
 from threading import Thread
+from services.tracing import tracer
 
 from .presales_main import presales_bp
 from .presales_helpers import (
@@ -87,7 +88,7 @@ def process_request(request_id):
             points_request["response_notes"] = notes
             
             # Send email notifications asynchronously (non-blocking)
-            Thread(target=send_approval_notification, args=(
+            Thread(target=tracer.bind(send_approval_notification), args=(
                 points_request, employee, user, category
             ), daemon=True).start()
             
@@ -118,7 +119,7 @@ def process_request(request_id):
             points_request["response_notes"] = notes
             
             # Send email notifications asynchronously (non-blocking)
-            Thread(target=send_rejection_notification, args=(
+            Thread(target=tracer.bind(send_rejection_notification), args=(
                 points_request, employee, user, category
             ), daemon=True).start()
             
@@ -0,0 +1,117 @@
+"""
+Multi-Worker Launcher
+Starts N independent eventlet workers of app.py (one per port) that share
+Socket.IO rooms through a Redis message queue, so throughput scales with cores.
+
+    python run_workers.py --workers 4 --base-port 3500
+    python run_workers.py --workers 4 --message-queue redis://127.0.0.1:6379/0
+
+Each worker is a plain ``python app.py`` with PBS_PORT and SOCKETIO_MESSAGE_QUEUE
+set; crashed workers are restarted. Socket.IO long-polling needs every request
+of a session to reach the same worker, so put a sticky load balancer in front
+(the printed nginx snippet uses ip_hash).
+"""
+
+import argparse
+import os
+import signal
+import subprocess
+import sys
+import time
+
+APP_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_MESSAGE_QUEUE = 'redis://127.0.0.1:6379/0'
+RESTART_DELAY_SECONDS = 2
+
+
+def nginx_upstream_snippet(ports, listen_port=80):
+    """Sticky-session nginx config for the worker ports"""
+    servers = '\n'.join(f'    server 127.0.0.1:{port};' for port in ports)
+    return f"""upstream pbs_workers {{
+    ip_hash;   # sticky sessions: Socket.IO polling must hit one worker
+{servers}
+}}
+
+server {{
+    listen {listen_port};
+    client_max_body_size 50m;
+
+    # Prometheus scrapes each worker port directly
+    location /metrics {{
+        deny all;
+    }}
+
+    location / {{
+        proxy_pass http://pbs_workers;
+        proxy_set_header Host $host;
+        proxy_set_header X-Forwarded-For $proxy_add_x_forwarded_for;
+    }}
+
+    location /socket.io {{
+        proxy_pass http://pbs_workers/socket.io;
+        proxy_http_version 1.1;
+        proxy_buffering off;
+        proxy_set_header Upgrade $http_upgrade;
+        proxy_set_header Connection "Upgrade";
+        proxy_set_header Host $host;
+        proxy_read_timeout 86400;
+    }}
+}}"""
+
+
+def start_worker(port, message_queue):
+    """Spawn one app.py worker on ``port``"""
+    env = dict(os.environ, PBS_PORT=str(port), SOCKETIO_MESSAGE_QUEUE=message_queue)
+    return subprocess.Popen([sys.executable, 'app.py'], cwd=APP_DIR, env=env)
+
+
+def run(workers, base_port, message_queue):
+    ports = [base_port + index for index in range(workers)]
+    processes = {port: start_worker(port, message_queue) for port in ports}
+    stopping = False
+
+    def stop(signum, frame):
+        nonlocal stopping
+        stopping = True
+
+    signal.signal(signal.SIGINT, stop)
+    signal.signal(signal.SIGTERM, stop)
+
+    print("=" * 60)
+    print(f"PBS: {workers} workers on ports {ports[0]}-{ports[-1]}")
+    print(f"Socket.IO message queue: {message_queue}")
+    print("=" * 60)
+    print("Sticky-session load balancer (nginx):")
+    print(nginx_upstream_snippet(ports))
+    print("=" * 60)
+
+    try:
+        while not stopping:
+            time.sleep(1)
+            for port, process in list(processes.items()):
+                if process.poll() is not None and not stopping:
+                    print(f"⚠️  Worker on port {port} exited with {process.returncode}, restarting")
+                    time.sleep(RESTART_DELAY_SECONDS)
+                    processes[port] = start_worker(port, message_queue)
+    finally:
+        for process in processes.values():
+            if process.poll() is None:
+                process.terminate()
+        for process in processes.values():
+            try:
+                process.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                process.kill()
+        print("✅ All workers stopped")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Run several PBS eventlet workers')
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 2,
+                        help='Number of worker processes (default: CPU count)')
+    parser.add_argument('--base-port', type=int, default=3500,
+                        help='Port of the first worker; the others use the following ports')
+    parser.add_argument('--message-queue', default=os.environ.get('SOCKETIO_MESSAGE_QUEUE') or DEFAULT_MESSAGE_QUEUE,
+                        help='Redis URL shared by the workers for Socket.IO')
+    args = parser.parse_args()
+    run(max(1, args.workers), args.base_port, args.message_queue)
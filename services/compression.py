@@ -0,0 +1,117 @@
+"""
+Response Compression
+Compresses JSON, HTML and other text responses of at least
+``COMPRESSION_MIN_BYTES`` with the best encoding the browser accepts: brotli
+when the optional ``brotli`` package is installed, else gzip. Dashboard APIs
+return large, repetitive JSON lists, which typically shrink 5-10x.
+
+Bodies of ``COMPRESSION_OFFLOAD_BYTES`` or more are compressed in the native
+thread pool (utils/cpu_offload.py) - zlib and brotli release the GIL - so a
+multi-megabyte export does not hold the eventlet hub. Streamed responses,
+files (``send_file``) and anything already encoded are left alone, as are
+responses marked ``Cache-Control: no-transform``.
+"""
+
+import gzip
+import logging
+from flask import request
+from services.metrics import compressed_response_bytes, uncompressed_response_bytes
+from utils.cpu_offload import OffloadQueueFull, offload
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+logger = logging.getLogger('pbs.compression')
+
+DEFAULT_MIMETYPES = (
+    'application/json', 'text/html', 'text/css', 'text/plain', 'text/csv',
+    'text/javascript', 'application/javascript', 'image/svg+xml'
+)
+SKIPPED_STATUSES = (204, 206, 304)
+
+
+class ResponseCompression:
+    """after_request hook compressing eligible responses (see module docstring)"""
+
+    def __init__(self):
+        self.enabled = False
+        self.min_bytes = 1024
+        self.offload_bytes = 256 * 1024
+        self.gzip_level = 6
+        self.brotli_quality = 4
+        self.mimetypes = frozenset(DEFAULT_MIMETYPES)
+
+    def init_app(self, app):
+        self.enabled = app.config.get('COMPRESSION_ENABLED', True)
+        self.min_bytes = app.config.get('COMPRESSION_MIN_BYTES', self.min_bytes)
+        self.offload_bytes = app.config.get('COMPRESSION_OFFLOAD_BYTES', self.offload_bytes)
+        self.gzip_level = app.config.get('COMPRESSION_GZIP_LEVEL', self.gzip_level)
+        self.brotli_quality = app.config.get('COMPRESSION_BROTLI_QUALITY', self.brotli_quality)
+        self.mimetypes = frozenset(app.config.get('COMPRESSION_MIMETYPES', DEFAULT_MIMETYPES))
+        if self.enabled:
+            app.after_request(self._compress)
+
+    def _encoding(self):
+        """Best encoding the client accepts, or None"""
+        if brotli is not None and request.accept_encodings['br'] > 0:
+            return 'br'
+        if request.accept_encodings['gzip'] > 0:
+            return 'gzip'
+        return None
+
+    def _compress_bytes(self, data, encoding):
+        if encoding == 'br':
+            return brotli.compress(data, quality=self.brotli_quality)
+        return gzip.compress(data, compresslevel=self.gzip_level)
+
+    def _eligible(self, response):
+        return not (
+            response.direct_passthrough
+            or response.is_streamed
+            or response.status_code < 200
+            or response.status_code in SKIPPED_STATUSES
+            or request.method == 'HEAD'
+            or 'Content-Encoding' in response.headers
+            or response.mimetype not in self.mimetypes
+            or 'no-transform' in response.headers.get('Cache-Control', '')
+        )
+
+    def _compress(self, response):
+        if not self._eligible(response):
+            return response
+        data = response.get_data()
+        if len(data) < self.min_bytes:
+            return response
+
+        # Other clients get a compressed variant: shared caches must key on Accept-Encoding
+        response.vary.add('Accept-Encoding')
+        encoding = self._encoding()
+        if encoding is None:
+            return response
+
+        compressed = None
+        if len(data) >= self.offload_bytes:
+            try:
+                compressed = offload(self._compress_bytes, data, encoding)
+            except OffloadQueueFull:
+                pass
+        if compressed is None:
+            compressed = self._compress_bytes(data, encoding)
+        if len(compressed) >= len(data):
+            return response
+
+        response.set_data(compressed)
+        response.headers['Content-Encoding'] = encoding
+        etag, weak = response.get_etag()
+        if etag:
+            # Same entity, different bytes: the validator must differ per encoding
+            response.set_etag(f'{etag}-{encoding}', weak)
+        uncompressed_response_bytes.inc(len(data), encoding=encoding)
+        compressed_response_bytes.inc(len(compressed), encoding=encoding)
+        return response
+
+
+# Global instance
+response_compression = ResponseCompression()
@@ -0,0 +1,102 @@
+"""
+Eventlet Hub Blocking Detector
+
+A greenlet ticks a timestamp every few milliseconds; a real OS thread (not a
+green one) watches it. When the tick is older than the threshold, some greenlet
+is holding the hub - the watchdog logs that greenlet's current stack once per
+episode, and again how long the hub stayed blocked once it recovers.
+
+Enabled with ``HUB_BLOCK_THRESHOLD_MS`` in config (0/None disables it).
+"""
+
+import logging
+import sys
+import time
+import traceback
+import eventlet
+from eventlet import patcher
+
+# Unpatched modules: the watchdog must keep running while the hub is stuck
+_real_thread = patcher.original('_thread')
+_real_threading = patcher.original('threading')
+_real_time = patcher.original('time')
+
+logger = logging.getLogger('pbs.hub')
+
+
+class HubBlockDetector:
+    """Logs any greenlet that holds the eventlet hub longer than a threshold"""
+
+    def __init__(self, threshold_ms=500, tick_ms=50):
+        self.threshold = threshold_ms / 1000.0
+        self.tick = tick_ms / 1000.0
+        self.running = False
+        self.hub_thread_id = None
+        self.last_tick = time.monotonic()
+        self.block_count = 0
+        self.max_block_ms = 0.0
+        self.total_block_ms = 0.0
+
+    def start(self):
+        """Start the ticker greenlet and the watchdog thread (idempotent)"""
+        if self.running:
+            return
+        self.running = True
+        self.hub_thread_id = _real_thread.get_ident()
+        self.last_tick = time.monotonic()
+        eventlet.spawn(self._tick)
+        watchdog = _real_threading.Thread(target=self._watch, name='hub-block-detector', daemon=True)
+        watchdog.start()
+
+    def stop(self):
+        self.running = False
+
+    def _tick(self):
+        while self.running:
+            self.last_tick = time.monotonic()
+            eventlet.sleep(self.tick)
+
+    def _watch(self):
+        blocked_since = None
+        while self.running:
+            _real_time.sleep(min(self.threshold / 4, 0.1))
+            lag = time.monotonic() - self.last_tick
+
+            if lag > self.threshold and blocked_since is None:
+                blocked_since = self.last_tick
+                self.block_count += 1
+                frame = sys._current_frames().get(self.hub_thread_id)
+                stack = ''.join(traceback.format_stack(frame)) if frame else '(stack unavailable)'
+                logger.warning(f"⚠️  Eventlet hub blocked for {lag * 1000:.0f} ms by:\n{stack}")
+
+            elif lag <= self.threshold and blocked_since is not None:
+                # The ticker ran again: the block ended roughly at its previous tick
+                blocked_ms = (self.last_tick - blocked_since) * 1000
+                self.max_block_ms = max(self.max_block_ms, blocked_ms)
+                self.total_block_ms += blocked_ms
+                logger.warning(f"⚠️  Eventlet hub unblocked after {blocked_ms:.0f} ms")
+                blocked_since = None
+
+    def stats(self):
+        """Counters for diagnostics/metrics"""
+        return {
+            'block_count': self.block_count,
+            'max_block_ms': round(self.max_block_ms, 1),
+            'total_block_ms': round(self.total_block_ms, 1),
+            'threshold_ms': self.threshold * 1000
+        }
+
+
+# Global instance, started by create_app when HUB_BLOCK_THRESHOLD_MS is set
+hub_block_detector = None
+
+
+def start_hub_block_detector(threshold_ms):
+    """Create and start the process-wide detector"""
+    global hub_block_detector
+    if not threshold_ms:
+        return None
+    if hub_block_detector is None:
+        hub_block_detector = HubBlockDetector(threshold_ms)
+        hub_block_detector.start()
+    return hub_block_detector
@@ -0,0 +1,474 @@
+"""
+Background Job Service for long-running admin actions
+
+Heavy routes (bonus analysis emails, Excel export, bulk uploads/updates) enqueue
+a job and return its id immediately instead of holding the HTTP request open on
+the eventlet hub. Jobs live in the ``background_jobs`` collection and are picked
+up by worker greenlets started with the app:
+
+- A job is claimed atomically (find_one_and_update queued -> running), so several
+  workers - or several app processes - never run the same job twice.
+- ``idempotency_key`` is unique while a job is queued/running: a double click or
+  a retried POST returns the job that is already in flight.
+- Cancellation is cooperative: the cancel route flags the job and the handler
+  stops at its next ``job.progress()`` / ``job.check_cancelled()`` call.
+- Progress is emitted to the owner's ``user_<id>`` Socket.IO room and stored on
+  the job document for polling via ``GET /jobs/<job_id>``.
+- A heartbeat greenlet keeps ``heartbeat_at`` fresh while the handler runs, so
+  a long step without ``job.progress()`` is not mistaken for a dead worker.
+- Uploads that must not be stored in Mongo (e.g. CSVs with passwords) are passed
+  as ``input_data``: written to a private file in ``JOB_RESULT_DIR``, read by the
+  handler through ``job.input_path`` and deleted when the job ends.
+
+Handlers are registered next to the routes that enqueue them::
+
+    @job_handler('central.bonus_analysis')
+    def run_bonus_analysis(job, **params):
+        for i, emp in enumerate(users):
+            job.progress(i, len(users))
+        return {'emails_sent': sent}
+"""
+
+import os
+import socket
+import time
+import eventlet
+from datetime import datetime, timedelta
+from bson import ObjectId
+from bson.errors import InvalidId
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
+from extensions import mongo
+from utils.error_handling import error_print
+from services.tracing import tracer
+
+JOB_COLLECTION = 'background_jobs'
+IDEMPOTENCY_INDEX_NAME = 'idempotency_key_unique'
+
+STATUS_QUEUED = 'queued'
+STATUS_RUNNING = 'running'
+STATUS_SUCCEEDED = 'succeeded'
+STATUS_FAILED = 'failed'
+STATUS_CANCELLED = 'cancelled'
+ACTIVE_STATUSES = (STATUS_QUEUED, STATUS_RUNNING)
+FINISHED_STATUSES = (STATUS_SUCCEEDED, STATUS_FAILED, STATUS_CANCELLED)
+
+# Socket.IO events sent to the job owner's room
+JOB_PROGRESS_EVENT = 'job_progress'
+JOB_FINISHED_EVENT = 'job_finished'
+
+
+class JobCancelled(Exception):
+    """Raised inside a handler when the job has been cancelled"""
+
+
+class JobContext:
+    """Handle passed to a job handler: progress reporting, cancellation and result files"""
+
+    # Minimum seconds between progress writes/emits (the final update is always sent)
+    PROGRESS_INTERVAL = 0.5
+    CANCEL_CHECK_INTERVAL = 1.0
+
+    def __init__(self, service, job):
+        self.service = service
+        self.job = job
+        self.job_id = job['_id']
+        self.user_id = job.get('user_id')
+        self._last_progress = 0
+        self._last_cancel_check = 0
+
+    def progress(self, done, total=None, message=None):
+        """
+        Report progress; also the point where cancellation is honoured.
+
+        Args:
+            done (int): Units of work completed
+            total (int, optional): Total units of work
+            message (str, optional): Short status line shown to the user
+        """
+        now = time.monotonic()
+        finished = total is not None and done >= total
+        if finished or now - self._last_progress >= self.PROGRESS_INTERVAL:
+            self._last_progress = now
+            progress = {
+                'done': done,
+                'total': total,
+                'percent': round(done * 100.0 / total, 1) if total else None,
+                'message': message
+            }
+            self.service.collection.update_one(
+                {'_id': self.job_id},
+                {'$set': {'progress': progress, 'heartbeat_at': datetime.utcnow()}}
+            )
+            self.service.emit(self.job, JOB_PROGRESS_EVENT, {'status': STATUS_RUNNING, 'progress': progress})
+        self.check_cancelled()
+        # Give other greenlets a turn between units of work
+        eventlet.sleep(0)
+
+    def check_cancelled(self):
+        """Raise JobCancelled when a cancel was requested (checked at most once per interval)"""
+        now = time.monotonic()
+        if now - self._last_cancel_check < self.CANCEL_CHECK_INTERVAL:
+            return
+        self._last_cancel_check = now
+        job = self.service.collection.find_one({'_id': self.job_id}, {'cancel_requested': 1})
+        if job and job.get('cancel_requested'):
+            raise JobCancelled()
+
+    @property
+    def input_path(self):
+        """File holding the ``input_data`` the job was queued with"""
+        return self.service.input_path(self.job_id)
+
+    def result_path(self, suffix=''):
+        """Path for a result file owned by this job (removed with the job)"""
+        os.makedirs(self.service.result_dir, exist_ok=True)
+        return os.path.join(self.service.result_dir, f'{self.job_id}{suffix}')
+
+
+class BackgroundJobService:
+    """Mongo-backed job queue with in-process worker greenlets"""
+
+    def __init__(self):
+        self.handlers = {}
+        self.app = None
+        self.socketio_service = None
+        self.workers = []
+        self.running = False
+        self.worker_id = f'{socket.gethostname()}:{os.getpid()}'
+        self.poll_interval = 1.0
+        self.stale_after = 300
+        self.retention_days = 7
+        self.result_dir = os.path.join(os.getcwd(), 'Uploads', 'jobs')
+
+    @property
+    def collection(self):
+        return mongo.db[JOB_COLLECTION]
+
+    def register(self, job_type, handler):
+        """Register the function that runs jobs of ``job_type``"""
+        self.handlers[job_type] = handler
+        return handler
+
+    def init_app(self, app, socketio_service=None):
+        """Read settings from app config and create the job indexes"""
+        self.app = app
+        self.socketio_service = socketio_service
+        self.poll_interval = app.config.get('JOB_POLL_INTERVAL', self.poll_interval)
+        self.stale_after = app.config.get('JOB_STALE_AFTER', self.stale_after)
+        self.retention_days = app.config.get('JOB_RETENTION_DAYS', self.retention_days)
+        self.result_dir = app.config.get('JOB_RESULT_DIR') or self.result_dir
+        try:
+            with app.app_context():
+                self.collection.create_index(
+                    [('idempotency_key', 1)],
+                    name=IDEMPOTENCY_INDEX_NAME,
+                    unique=True,
+                    partialFilterExpression={'idempotency_key': {'$exists': True}},
+                    background=True
+                )
+                self.collection.create_index([('status', 1), ('created_at', 1)], background=True)
+                self.collection.create_index([('user_id', 1), ('created_at', -1)], background=True)
+                # Finished jobs expire automatically after JOB_RETENTION_DAYS
+                self.collection.create_index([('expires_at', 1)], expireAfterSeconds=0, background=True)
+        except Exception as e:
+            error_print("Error creating background job indexes", e)
+
+    def start_workers(self, count=None):
+        """Spawn the worker greenlets (idempotent)"""
+        if self.running or not self.app:
+            return
+        self.running = True
+        count = count or self.app.config.get('JOB_WORKER_COUNT', 2)
+        for index in range(count):
+            self.workers.append(eventlet.spawn(self._worker_loop, index))
+
+    def stop_workers(self):
+        """Stop polling for new jobs; running jobs finish their current step"""
+        self.running = False
+
+    # ------------------------------------------------------------------
+    # Enqueue / query / cancel (called from routes)
+    # ------------------------------------------------------------------
+
+    def input_path(self, job_id):
+        return os.path.join(self.result_dir, f'{job_id}.input')
+
+    def _write_input(self, job_id, data):
+        """Write a job's private input file (owner read/write only)"""
+        os.makedirs(self.result_dir, exist_ok=True)
+        fd = os.open(self.input_path(job_id), os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+
+    def _remove_input(self, job_id):
+        try:
+            os.remove(self.input_path(job_id))
+        except FileNotFoundError:
+            pass
+
+    def enqueue(self, job_type, params=None, user_id=None, idempotency_key=None, description=None,
+                input_data=None, shared_with=None):
+        """
+        Queue a job.
+
+        Args:
+            job_type (str): Registered handler name
+            params (dict): Keyword arguments for the handler (must be BSON-serialisable)
+            user_id: Owner; receives progress events and is the only one allowed to see the job
+            idempotency_key (str, optional): Coalesces identical requests while a job is in flight
+            description (str, optional): Human readable label
+            input_data (bytes, optional): Private input kept out of the job document (see job.input_path)
+            shared_with (str, optional): Dashboard (dashboard_access value) whose users may also see the
+                job - for jobs keyed globally rather than per user
+
+        Returns:
+            tuple: (job document, created: bool)
+        """
+        if job_type not in self.handlers:
+            raise ValueError(f"Unknown job type: {job_type}")
+
+        now = datetime.utcnow()
+        job = {
+            '_id': ObjectId(),
+            'job_type': job_type,
+            'description': description or job_type,
+            'status': STATUS_QUEUED,
+            'params': params or {},
+            'user_id': str(user_id) if user_id else None,
+            'shared_with': shared_with,
+            'progress': {'done': 0, 'total': None, 'percent': None, 'message': 'Queued'},
+            'cancel_requested': False,
+            # Trace of the request that queued it: the job's spans continue it
+            'trace': tracer.context(),
+            'created_at': now,
+            'updated_at': now
+        }
+        if idempotency_key:
+            job['idempotency_key'] = f'{job_type}:{idempotency_key}'
+
+        if input_data is not None:
+            self._write_input(job['_id'], input_data)
+        try:
+            try:
+                self.collection.insert_one(job)
+                return job, True
+            except DuplicateKeyError:
+                existing = self.collection.find_one({'idempotency_key': job['idempotency_key']})
+                if existing:
+                    self._remove_input(job['_id'])
+                    return existing, False
+                # The in-flight job finished between insert and lookup - queue a fresh one
+                self.collection.insert_one(job)
+                return job, True
+        except Exception:
+            self._remove_input(job['_id'])
+            raise
+
+    def get_job(self, job_id, user_id=None):
+        """Fetch a job by id, optionally restricted to its owner (or users of the dashboard it is shared with)"""
+        try:
+            query = {'_id': ObjectId(job_id)}
+        except (InvalidId, TypeError):
+            return None
+        job = self.collection.find_one(query)
+        if job is None or user_id is None or job.get('user_id') == str(user_id):
+            return job
+        if job.get('shared_with') and job['shared_with'] in self._dashboard_access(user_id):
+            return job
+        return None
+
+    @staticmethod
+    def _dashboard_access(user_id):
+        """Lower-cased dashboard_access entries of a user (stored as a list or a comma separated string)"""
+        try:
+            user = mongo.db.users.find_one({'_id': ObjectId(user_id)}, {'dashboard_access': 1})
+        except (InvalidId, TypeError):
+            return []
+        access = (user or {}).get('dashboard_access') or []
+        if isinstance(access, str):
+            access = access.split(',')
+        return [str(entry).strip().lower() for entry in access]
+
+    def cancel(self, job_id, user_id=None):
+        """
+        Cancel a job: queued jobs stop immediately, running jobs at their next progress call.
+
+        Returns:
+            dict or None: Updated job document
+        """
+        job = self.get_job(job_id, user_id)
+        if not job or job['status'] in FINISHED_STATUSES:
+            return job
+
+        cancelled = self.collection.find_one_and_update(
+            {'_id': job['_id'], 'status': STATUS_QUEUED},
+            {'$set': self._finished_fields(STATUS_CANCELLED), '$unset': {'idempotency_key': ''}},
+            return_document=ReturnDocument.AFTER
+        )
+        if cancelled:
+            self._remove_input(cancelled['_id'])
+            self.emit(cancelled, JOB_FINISHED_EVENT, self.public_view(cancelled))
+            return cancelled
+
+        return self.collection.find_one_and_update(
+            {'_id': job['_id']},
+            {'$set': {'cancel_requested': True, 'updated_at': datetime.utcnow()}},
+            return_document=ReturnDocument.AFTER
+        )
+
+    @staticmethod
+    def public_view(job):
+        """JSON-safe job summary for API responses and Socket.IO events"""
+        result = job.get('result') or {}
+        return {
+            'job_id': str(job['_id']),
+            'job_type': job.get('job_type'),
+            'description': job.get('description'),
+            'status': job.get('status'),
+            'progress': job.get('progress'),
+            # File results are downloaded through /jobs/<id>/download, the path stays server-side
+            'result': {k: v for k, v in result.items() if k != 'file_path'},
+            'has_file': bool(result.get('file_path')),
+            'error': job.get('error'),
+            'cancel_requested': job.get('cancel_requested', False),
+            'created_at': job['created_at'].isoformat() if job.get('created_at') else None,
+            'finished_at': job['finished_at'].isoformat() if job.get('finished_at') else None
+        }
+
+    def emit(self, job, event, payload):
+        """Push a job event to the owner's user room"""
+        if not self.socketio_service or not job.get('user_id'):
+            return
+        try:
+            payload = dict(payload, job_id=str(job['_id']), job_type=job.get('job_type'))
+            self.socketio_service.emit_to_user(job['user_id'], event, payload)
+        except Exception:
+            pass
+
+    # ------------------------------------------------------------------
+    # Workers
+    # ------------------------------------------------------------------
+
+    def _finished_fields(self, status):
+        now = datetime.utcnow()
+        return {
+            'status': status,
+            'finished_at': now,
+            'updated_at': now,
+            'expires_at': now + timedelta(days=self.retention_days)
+        }
+
+    def _claim_next(self):
+        now = datetime.utcnow()
+        return self.collection.find_one_and_update(
+            {'status': STATUS_QUEUED},
+            {'$set': {'status': STATUS_RUNNING, 'started_at': now, 'heartbeat_at': now,
+                      'updated_at': now, 'worker_id': self.worker_id}},
+            sort=[('created_at', 1)],
+            return_document=ReturnDocument.AFTER
+        )
+
+    def _fail_stale_jobs(self):
+        """Jobs whose worker died (no heartbeat) are failed, not re-run: handlers may have side effects"""
+        cutoff = datetime.utcnow() - timedelta(seconds=self.stale_after)
+        stale_fields = self._finished_fields(STATUS_FAILED)
+        stale_fields['error'] = 'Worker stopped while the job was running'
+        self.collection.update_many(
+            {'status': STATUS_RUNNING, 'heartbeat_at': {'$lt': cutoff}},
+            {'$set': stale_fields, '$unset': {'idempotency_key': ''}}
+        )
+
+    def _heartbeat(self, job_id):
+        """Refresh a running job's heartbeat_at until killed (a third of JOB_STALE_AFTER apart)"""
+        interval = max(self.stale_after / 3.0, 1.0)
+        while True:
+            eventlet.sleep(interval)
+            try:
+                self.collection.update_one(
+                    {'_id': job_id, 'status': STATUS_RUNNING},
+                    {'$set': {'heartbeat_at': datetime.utcnow()}}
+                )
+            except Exception as e:
+                error_print(f"Error refreshing the heartbeat of job {job_id}", e)
+
+    def _remove_expired_results(self):
+        """Delete result files whose job document has expired"""
+        if not os.path.isdir(self.result_dir):
+            return
+        cutoff = time.time() - self.retention_days * 24 * 60 * 60
+        for name in os.listdir(self.result_dir):
+            path = os.path.join(self.result_dir, name)
+            try:
+                if os.path.getmtime(path) < cutoff:
+                    os.remove(path)
+            except OSError:
+                pass
+
+    def _worker_loop(self, index):
+        last_maintenance = 0
+        error_backoff = 0
+        while self.running:
+            try:
+                with self.app.app_context():
+                    # Worker 0 does housekeeping once a minute
+                    if index == 0 and time.monotonic() - last_maintenance > 60:
+                        last_maintenance = time.monotonic()
+                        self._fail_stale_jobs()
+                        self._remove_expired_results()
+
+                    job = self._claim_next()
+                    error_backoff = 0
+                    if job:
+                        self._run(job)
+                        continue
+            except Exception as e:
+                # Back off while MongoDB is unreachable instead of logging every poll
+                if not error_backoff:
+                    error_print("Background job worker error", e)
+                error_backoff = min(max(error_backoff * 2, self.poll_interval), 60)
+                eventlet.sleep(error_backoff)
+                continue
+            eventlet.sleep(self.poll_interval)
+
+    def _run(self, job):
+        handler = self.handlers.get(job['job_type'])
+        context = JobContext(self, job)
+        update = {'$unset': {'idempotency_key': ''}}
+        heartbeat = eventlet.spawn(self._heartbeat, job['_id'])
+        try:
+            if not handler:
+                raise ValueError(f"No handler registered for {job['job_type']}")
+            self.emit(job, JOB_PROGRESS_EVENT, {'status': STATUS_RUNNING, 'progress': job.get('progress')})
+            with tracer.span(f"job {job['job_type']}", 'job', parent=job.get('trace'), root=True,
+                             job_id=str(job['_id'])), mongo.use_profile('batch'):
+                result = handler(context, **job.get('params', {}))
+            update['$set'] = dict(self._finished_fields(STATUS_SUCCEEDED), result=result or {})
+        except JobCancelled:
+            update['$set'] = self._finished_fields(STATUS_CANCELLED)
+        except Exception as e:
+            error_print(f"Background job {job['_id']} ({job['job_type']}) failed", e)
+            update['$set'] = dict(self._finished_fields(STATUS_FAILED), error=str(e))
+        finally:
+            heartbeat.kill()
+            self._remove_input(job['_id'])
+
+        # Only a job still marked running is finished here: one failed as stale keeps its state
+        finished = self.collection.find_one_and_update(
+            {'_id': job['_id'], 'status': STATUS_RUNNING}, update, return_document=ReturnDocument.AFTER
+        )
+        if finished:
+            self.emit(finished, JOB_FINISHED_EVENT, self.public_view(finished))
+        else:
+            error_print(f"Background job {job['_id']} ({job['job_type']}) finished after it was failed as stale")
+
+
+# Global instance
+job_service = BackgroundJobService()
+
+
+def job_handler(job_type):
+    """Decorator registering a background job handler"""
+    def decorator(func):
+        return job_service.register(job_type, func)
+    return decorator
@@ -0,0 +1,85 @@
+"""
+Redis Leader Election
+Lets exactly one worker process own a singleton task (e.g. the Redis pub/sub
+listener that fans events out to Socket.IO) when the app runs as several
+eventlet workers behind a load balancer.
+
+The leader holds a Redis key with a short TTL and keeps renewing it; if the
+leader dies, the key expires and another worker takes over on its next attempt.
+"""
+
+import os
+import socket
+import uuid
+
+# Renew only if we still own the key (compare-and-expire in one round trip)
+_RENEW_SCRIPT = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('pexpire', KEYS[1], ARGV[2])
+end
+return 0
+"""
+
+# Delete only if we still own the key
+_RELEASE_SCRIPT = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('del', KEYS[1])
+end
+return 0
+"""
+
+
+def worker_identity():
+    """Unique, human-readable id of this worker process"""
+    return f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+
+class RedisLeaderLock:
+    """Lease-based leader lock on a single Redis key"""
+
+    def __init__(self, redis_client, name, ttl_seconds=10):
+        self.redis = redis_client
+        self.key = f'pbs:leader:{name}'
+        self.ttl_ms = int(ttl_seconds * 1000)
+        self.identity = worker_identity()
+        self.is_leader = False
+
+    @property
+    def renew_interval(self):
+        """Seconds between renewals - a third of the TTL leaves room for two misses"""
+        return self.ttl_ms / 3000.0
+
+    def acquire_or_renew(self):
+        """
+        Try to become (or stay) the leader.
+
+        Returns:
+            True if this process holds the lease after the call
+        """
+        try:
+            if self.is_leader:
+                renewed = self.redis.eval(_RENEW_SCRIPT, 1, self.key, self.identity, self.ttl_ms)
+                self.is_leader = bool(renewed)
+            if not self.is_leader:
+                self.is_leader = bool(self.redis.set(self.key, self.identity, nx=True, px=self.ttl_ms))
+        except Exception:
+            # Redis unreachable: step down, another worker may still see Redis
+            self.is_leader = False
+        return self.is_leader
+
+    def release(self):
+        """Give up the lease so another worker can take over immediately"""
+        if not self.is_leader:
+            return
+        self.is_leader = False
+        try:
+            self.redis.eval(_RELEASE_SCRIPT, 1, self.key, self.identity)
+        except Exception:
+            pass
+
+    def current_leader(self):
+        """Identity of the current leader, or None"""
+        try:
+            return self.redis.get(self.key)
+        except Exception:
+            return None
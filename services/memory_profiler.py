@@ -0,0 +1,220 @@
+"""
+Memory Profiling
+Optional tracemalloc instrumentation for tracking down worker RSS growth
+(routes that materialise whole collections with ``list(find(...))``):
+
+- per endpoint: the peak traced allocation while serving a request, and how
+  much of it was still allocated when the request finished
+- top allocation sites of the memory traced right now
+- named snapshots, and the diff between two of them (or one and now), to see
+  what grew in between
+
+Served to Central users under ``/central/diagnostics/memory``. tracemalloc
+slows every allocation, so it only runs with ``MEMORY_PROFILING_ENABLED``.
+The peak is process-wide: with concurrent requests a request's peak includes
+what the others allocated meanwhile, so look at the largest and most frequent
+offenders rather than single values.
+"""
+
+import itertools
+import logging
+import resource
+import sys
+import time
+import tracemalloc
+from collections import OrderedDict
+from flask import g, request
+
+logger = logging.getLogger('pbs.memory')
+
+MAX_SNAPSHOTS = 4
+DEFAULT_TOP = 25
+GROUP_BY = ('lineno', 'filename', 'traceback')
+
+# Allocations of the profiler itself and of the import system are noise
+_NOISE_FILTERS = (
+    tracemalloc.Filter(False, tracemalloc.__file__),
+    tracemalloc.Filter(False, '<frozen importlib._bootstrap>'),
+    tracemalloc.Filter(False, '<frozen importlib._bootstrap_external>'),
+    tracemalloc.Filter(False, '<unknown>'),
+)
+
+
+def rss_bytes():
+    """Resident set size of this process (current where /proc is available, else the peak)"""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * resource.getpagesize()
+    except (OSError, IndexError, ValueError):
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # ru_maxrss is in KiB on Linux, bytes on macOS
+        return peak if sys.platform == 'darwin' else peak * 1024
+
+
+class _EndpointMemory:
+    __slots__ = ('requests', 'max_peak', 'total_peak', 'retained', 'last_peak')
+
+    def __init__(self):
+        self.requests = 0
+        self.max_peak = 0
+        self.total_peak = 0
+        self.retained = 0
+        self.last_peak = 0
+
+    def as_dict(self):
+        return {
+            'requests': self.requests,
+            'max_peak_kb': round(self.max_peak / 1024, 1),
+            'avg_peak_kb': round(self.total_peak / self.requests / 1024, 1) if self.requests else 0,
+            'last_peak_kb': round(self.last_peak / 1024, 1),
+            # Net growth of traced memory across these requests (caches, leaks - or other requests)
+            'retained_kb': round(self.retained / 1024, 1)
+        }
+
+
+class MemoryProfiler:
+    """tracemalloc-based per-endpoint peaks, allocation sites and snapshot diffs"""
+
+    def __init__(self):
+        self.enabled = False
+        self.endpoints = {}
+        self.snapshots = OrderedDict()
+        self._ids = itertools.count(1)
+        self.started_at = None
+
+    def init_app(self, app):
+        self.enabled = app.config.get('MEMORY_PROFILING_ENABLED', False)
+        if not self.enabled:
+            return
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(app.config.get('MEMORY_TRACE_FRAMES', 10))
+        self.started_at = time.time()
+        app.before_request(self._begin)
+        app.teardown_request(self._finish)
+        logger.info(f"✅ tracemalloc tracing {tracemalloc.get_traceback_limit()} frames per allocation")
+
+    # -------------------------------------------------------------- request
+
+    def _begin(self):
+        current, _ = tracemalloc.get_traced_memory()
+        g.memory_at_start = current
+        tracemalloc.reset_peak()
+
+    def _finish(self, exc=None):
+        start = g.pop('memory_at_start', None)
+        endpoint = request.endpoint
+        if start is None or endpoint is None or not tracemalloc.is_tracing():
+            return
+        current, peak = tracemalloc.get_traced_memory()
+        request_peak = max(peak - start, 0)
+        totals = self.endpoints.get(endpoint)
+        if totals is None:
+            totals = self.endpoints[endpoint] = _EndpointMemory()
+        totals.requests += 1
+        totals.last_peak = request_peak
+        totals.total_peak += request_peak
+        totals.max_peak = max(totals.max_peak, request_peak)
+        totals.retained += current - start
+
+    # --------------------------------------------------------------- report
+
+    def summary(self, sort='max_peak_kb'):
+        """Traced/RSS totals and per-endpoint peaks, largest first"""
+        current, peak = tracemalloc.get_traced_memory() if tracemalloc.is_tracing() else (0, 0)
+        endpoints = {name: totals.as_dict() for name, totals in self.endpoints.items()}
+        ordered = sorted(endpoints.items(), key=lambda item: item[1].get(sort, 0), reverse=True)
+        return {
+            'enabled': self.enabled,
+            'since': self.started_at,
+            'rss_mb': round(rss_bytes() / 1024 / 1024, 1),
+            'traced_mb': round(current / 1024 / 1024, 1),
+            'traced_peak_mb': round(peak / 1024 / 1024, 1),
+            'traceback_frames': tracemalloc.get_traceback_limit() if tracemalloc.is_tracing() else 0,
+            'snapshots': self.list_snapshots(),
+            'endpoints': [dict(stats, endpoint=name) for name, stats in ordered]
+        }
+
+    @staticmethod
+    def _take():
+        return tracemalloc.take_snapshot().filter_traces(_NOISE_FILTERS)
+
+    @staticmethod
+    def _format(stat, group_by):
+        entry = {
+            'size_kb': round(stat.size / 1024, 1),
+            'count': stat.count,
+            'site': str(stat.traceback[0]) if group_by != 'traceback' else None
+        }
+        if group_by == 'traceback':
+            entry['traceback'] = stat.traceback.format()
+        if hasattr(stat, 'size_diff'):
+            entry['size_diff_kb'] = round(stat.size_diff / 1024, 1)
+            entry['count_diff'] = stat.count_diff
+        return entry
+
+    def top_sites(self, limit=DEFAULT_TOP, group_by='lineno'):
+        """Largest allocation sites of the memory traced right now"""
+        if not tracemalloc.is_tracing():
+            return []
+        group_by = group_by if group_by in GROUP_BY else 'lineno'
+        stats = self._take().statistics(group_by)
+        return [self._format(stat, group_by) for stat in stats[:limit]]
+
+    def take_snapshot(self, label=None):
+        """Keep a named snapshot for later diffs (the oldest is dropped beyond MAX_SNAPSHOTS)"""
+        if not tracemalloc.is_tracing():
+            return None
+        snapshot_id = str(next(self._ids))
+        current, _ = tracemalloc.get_traced_memory()
+        self.snapshots[snapshot_id] = {
+            'id': snapshot_id,
+            'label': label or f'snapshot {snapshot_id}',
+            'taken_at': time.time(),
+            'traced_mb': round(current / 1024 / 1024, 1),
+            'rss_mb': round(rss_bytes() / 1024 / 1024, 1),
+            'snapshot': self._take()
+        }
+        while len(self.snapshots) > MAX_SNAPSHOTS:
+            self.snapshots.popitem(last=False)
+        return self._public(self.snapshots[snapshot_id])
+
+    @staticmethod
+    def _public(entry):
+        return {key: value for key, value in entry.items() if key != 'snapshot'}
+
+    def list_snapshots(self):
+        return [self._public(entry) for entry in self.snapshots.values()]
+
+    def diff(self, from_id, to_id=None, limit=DEFAULT_TOP, group_by='lineno'):
+        """
+        What grew between two snapshots.
+
+        Args:
+            from_id: Older snapshot id
+            to_id: Newer snapshot id, or None for a snapshot taken now
+
+        Returns:
+            dict, or None when a snapshot id is unknown
+        """
+        older = self.snapshots.get(from_id)
+        newer = self.snapshots.get(to_id) if to_id else None
+        if older is None or (to_id and newer is None) or not tracemalloc.is_tracing():
+            return None
+        group_by = group_by if group_by in GROUP_BY else 'lineno'
+        newer_snapshot = newer['snapshot'] if newer else self._take()
+        stats = newer_snapshot.compare_to(older['snapshot'], group_by)
+        return {
+            'from': self._public(older),
+            'to': self._public(newer) if newer else 'now',
+            'size_diff_kb': round(sum(stat.size_diff for stat in stats) / 1024, 1),
+            'sites': [self._format(stat, group_by) for stat in stats[:limit]]
+        }
+
+    def reset(self):
+        self.endpoints.clear()
+        self.snapshots.clear()
+        self.started_at = time.time()
+
+
+# Global instance
+memory_profiler = MemoryProfiler()
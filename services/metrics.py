@@ -0,0 +1,396 @@
+"""
+Prometheus Metrics
+Process-local metrics in the Prometheus text format, served at ``/metrics``
+(scrape every worker port in multi-worker mode - Prometheus adds the
+``instance`` label).
+
+- ``pbs_http_request_duration_seconds``: latency histogram per blueprint endpoint
+- ``pbs_mongo_command_*``: command counts/latency/failures from a pymongo listener
+- ``pbs_redis_publish_*``: realtime publish latency and failures
+- ``pbs_email_*``: SMTP send latency/failures (all smtplib senders) and the queue
+  depth of each email thread pool
+- ``pbs_socketio_clients``: connected clients per room type
+- ``pbs_greenlets``, worker RSS, hub blocking, admission control, cache and single-flight stats
+
+Values that already live elsewhere (queue depths, rooms, stats() of other
+services) are read by collectors at scrape time instead of being duplicated.
+Access: ``METRICS_TOKEN`` as a bearer token if set, otherwise only clients from
+``METRICS_ALLOWED_NETWORKS``.
+"""
+
+import gc
+import ipaddress
+import smtplib
+import time
+from flask import Response, current_app, g, request
+from greenlet import greenlet
+from pymongo import monitoring
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+FAST_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 5)
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _format_labels(labels):
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in labels) + '}'
+
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    type_name = 'untyped'
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.values = {}
+
+    def _key(self, labels):
+        return tuple((name, labels.get(name, '')) for name in self.labelnames)
+
+    def samples(self):
+        return [(self.name, key, value) for key, value in self.values.items()]
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} {self.type_name}']
+        for name, labels, value in self.samples():
+            lines.append(f'{name}{_format_labels(labels)} {_format_value(value)}')
+        return lines
+
+
+class Counter(_Metric):
+    type_name = 'counter'
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        self.values[key] = self.values.get(key, 0) + amount
+
+    def set(self, value, **labels):
+        """Mirror a running total kept by another service's stats()"""
+        self.values[self._key(labels)] = value
+
+
+class Gauge(_Metric):
+    type_name = 'gauge'
+
+    def set(self, value, **labels):
+        self.values[self._key(labels)] = value
+
+    def clear(self):
+        self.values.clear()
+
+
+class Histogram(_Metric):
+    type_name = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(buckets) + (float('inf'),)
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        state = self.values.get(key)
+        if state is None:
+            state = self.values[key] = [[0] * len(self.buckets), 0.0, 0]
+        counts = state[0]
+        for index, bound in enumerate(self.buckets):
+            if value <= bound:
+                counts[index] += 1
+                break
+        state[1] += value
+        state[2] += 1
+
+    def samples(self):
+        samples = []
+        for key, (counts, total, count) in self.values.items():
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                samples.append((f'{self.name}_bucket', key + (('le', _format_value(float(bound))),), cumulative))
+            samples.append((f'{self.name}_sum', key, total))
+            samples.append((f'{self.name}_count', key, count))
+        return samples
+
+
+class MetricsRegistry:
+    """Metrics of this worker plus collectors that refresh gauges at scrape time"""
+
+    def __init__(self):
+        self.metrics = []
+        self.collectors = []
+
+    def _add(self, metric):
+        self.metrics.append(metric)
+        return metric
+
+    def counter(self, name, documentation, labelnames=()):
+        return self._add(Counter(name, documentation, labelnames))
+
+    def gauge(self, name, documentation, labelnames=()):
+        return self._add(Gauge(name, documentation, labelnames))
+
+    def histogram(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        return self._add(Histogram(name, documentation, labelnames, buckets))
+
+    def register_collector(self, collector):
+        """``collector()`` runs before each scrape to set gauges"""
+        self.collectors.append(collector)
+        return collector
+
+    def render(self):
+        for collector in self.collectors:
+            try:
+                collector()
+            except Exception:
+                # A broken collector must not take the whole scrape down
+                pass
+        lines = []
+        for metric in self.metrics:
+            lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+
+# Global registry (one per worker process)
+registry = MetricsRegistry()
+
+# ---------------------------------------------------------------- HTTP routes
+http_request_duration = registry.histogram(
+    'pbs_http_request_duration_seconds', 'Request latency by Flask endpoint',
+    ('endpoint', 'method', 'status'))
+
+# --------------------------------------------------------------------- Mongo
+mongo_command_duration = registry.histogram(
+    'pbs_mongo_command_duration_seconds', 'MongoDB command latency by command name',
+    ('command',), FAST_BUCKETS)
+mongo_command_failures = registry.counter(
+    'pbs_mongo_command_failures_total', 'MongoDB commands that returned an error', ('command',))
+
+# --------------------------------------------------------------------- Redis
+redis_publish_duration = registry.histogram(
+    'pbs_redis_publish_duration_seconds', 'Realtime event publish latency by event type',
+    ('event_type',), FAST_BUCKETS)
+redis_publish_failures = registry.counter(
+    'pbs_redis_publish_failures_total', 'Realtime events that failed to publish', ('event_type',))
+
+# --------------------------------------------------------------------- Email
+email_send_duration = registry.histogram(
+    'pbs_email_send_duration_seconds', 'SMTP sendmail latency', ())
+email_send_failures = registry.counter(
+    'pbs_email_send_failures_total', 'SMTP sends that raised', ())
+email_queue_depth = registry.gauge(
+    'pbs_email_queue_depth', 'Emails waiting in each email thread pool', ('queue',))
+
+# ------------------------------------------------------------ Socket.IO / hub
+socketio_clients = registry.gauge(
+    'pbs_socketio_clients', 'Socket.IO clients in rooms of each type (all = connected clients)',
+    ('room_type',))
+greenlet_count = registry.gauge('pbs_greenlets', 'Live greenlets in this worker')
+hub_blocks = registry.counter('pbs_hub_blocks_total', 'Times a greenlet held the eventlet hub over the threshold')
+hub_block_max_ms = registry.gauge('pbs_hub_block_max_milliseconds', 'Longest eventlet hub block')
+resident_memory = registry.gauge('pbs_process_resident_memory_bytes', 'Resident set size of this worker')
+
+# ----------------------------------------------- admission / cache / coalescing
+admission_active = registry.gauge('pbs_admission_active', 'Requests holding a slot', ('route_class',))
+admission_waiting = registry.gauge('pbs_admission_waiting', 'Requests waiting for a slot', ('route_class',))
+admission_shed = registry.counter('pbs_admission_shed_total', 'Requests rejected with 503', ('route_class',))
+cache_events = registry.counter('pbs_response_cache_total', 'Response cache lookups by result', ('result',))
+cache_entries = registry.gauge('pbs_response_cache_entries', 'Entries in the response cache')
+single_flight_calls = registry.counter('pbs_single_flight_calls_total', 'Single-flight calls by outcome', ('outcome',))
+uncompressed_response_bytes = registry.counter(
+    'pbs_compressed_response_input_bytes_total', 'Body bytes of compressed responses before compression', ('encoding',))
+compressed_response_bytes = registry.counter(
+    'pbs_compressed_response_output_bytes_total', 'Body bytes of compressed responses as sent', ('encoding',))
+
+
+# ============================================================================
+# Instrumentation
+# ============================================================================
+
+class MongoCommandMetrics(monitoring.CommandListener):
+    """pymongo listener feeding pbs_mongo_command_*"""
+
+    def started(self, event):
+        pass
+
+    def succeeded(self, event):
+        mongo_command_duration.observe(event.duration_micros / 1e6, command=event.command_name)
+
+    def failed(self, event):
+        mongo_command_duration.observe(event.duration_micros / 1e6, command=event.command_name)
+        mongo_command_failures.inc(command=event.command_name)
+
+
+mongo_command_metrics = MongoCommandMetrics()
+
+
+def observe_redis_publish(event_type, seconds, succeeded):
+    """Record one RedisRealtimeService.publish_event call"""
+    redis_publish_duration.observe(seconds, event_type=event_type)
+    if not succeeded:
+        redis_publish_failures.inc(event_type=event_type)
+
+
+_email_queues = {}
+
+
+def register_email_queue(name, executor):
+    """Expose the backlog of an email ThreadPoolExecutor as pbs_email_queue_depth"""
+    _email_queues[name] = executor
+
+
+def _instrument_smtp():
+    """Time every SMTP.sendmail (send_message goes through it), whichever module sends"""
+    if getattr(smtplib.SMTP.sendmail, '_pbs_metrics', False):
+        return
+    original = smtplib.SMTP.sendmail
+
+    def sendmail(self, *args, **kwargs):
+        started = time.monotonic()
+        try:
+            return original(self, *args, **kwargs)
+        except Exception:
+            email_send_failures.inc()
+            raise
+        finally:
+            email_send_duration.observe(time.monotonic() - started)
+
+    sendmail._pbs_metrics = True
+    smtplib.SMTP.sendmail = sendmail
+
+
+def _room_type(room):
+    if room.startswith('role_'):
+        return 'role'
+    return room.rsplit('_', 1)[0] if '_' in room else room
+
+
+# ============================================================================
+# Scrape-time collectors
+# ============================================================================
+
+@registry.register_collector
+def _collect_email_queues():
+    for name, executor in _email_queues.items():
+        email_queue_depth.set(executor._work_queue.qsize(), queue=name)
+
+
+@registry.register_collector
+def _collect_greenlets():
+    # Walks the heap: fine at scrape intervals, too slow for a request path
+    greenlet_count.set(sum(1 for obj in gc.get_objects() if isinstance(obj, greenlet)))
+
+
+@registry.register_collector
+def _collect_memory():
+    from services.memory_profiler import rss_bytes
+    resident_memory.set(rss_bytes())
+
+
+@registry.register_collector
+def _collect_hub():
+    from services.hub_monitor import hub_block_detector
+    if hub_block_detector is None:
+        return
+    stats = hub_block_detector.stats()
+    hub_blocks.set(stats.get('block_count', 0))
+    hub_block_max_ms.set(stats.get('max_block_ms', 0))
+
+
+@registry.register_collector
+def _collect_admission():
+    from utils.admission_control import admission_stats
+    for route_class, stats in admission_stats().items():
+        admission_active.set(stats['active'], route_class=route_class)
+        admission_waiting.set(stats['waiting'], route_class=route_class)
+        admission_shed.set(stats['shed'], route_class=route_class)
+
+
+@registry.register_collector
+def _collect_caches():
+    from utils.response_cache import response_cache
+    from utils.single_flight import single_flight_group
+    stats = response_cache.stats()
+    for result in ('hits', 'stale_hits', 'misses'):
+        cache_events.set(stats[result], result=result)
+    cache_entries.set(stats['entries'])
+    stats = single_flight_group.stats()
+    for outcome in ('leader_calls', 'coalesced_calls', 'remote_results'):
+        single_flight_calls.set(stats[outcome], outcome=outcome)
+
+
+def _collect_socketio(socketio):
+    def collect():
+        rooms = socketio.server.manager.rooms.get('/', {})
+        connected = rooms.get(None, {})
+        counts = {'all': len(connected)}
+        for room, participants in rooms.items():
+            # Every client also sits in a room named after its sid
+            if room is None or room in connected:
+                continue
+            room_type = _room_type(str(room))
+            counts[room_type] = counts.get(room_type, 0) + len(participants)
+        socketio_clients.clear()
+        for room_type, count in counts.items():
+            socketio_clients.set(count, room_type=room_type)
+    return collect
+
+
+# ============================================================================
+# Flask wiring
+# ============================================================================
+
+def _start_timer():
+    g.metrics_started = time.monotonic()
+
+
+def _observe_request(response):
+    started = g.pop('metrics_started', None)
+    if started is not None:
+        http_request_duration.observe(
+            time.monotonic() - started,
+            endpoint=request.endpoint or 'unmatched',
+            method=request.method,
+            status=response.status_code
+        )
+    return response
+
+
+def _allowed():
+    token = current_app.config.get('METRICS_TOKEN')
+    if token:
+        return request.headers.get('Authorization') == f'Bearer {token}'
+    try:
+        address = ipaddress.ip_address(request.remote_addr or '')
+    except ValueError:
+        return False
+    networks = current_app.config.get('METRICS_ALLOWED_NETWORKS') or ()
+    return any(address in ipaddress.ip_network(network) for network in networks)
+
+
+def metrics_view():
+    if not _allowed():
+        return Response('Forbidden\n', status=403, mimetype='text/plain')
+    return Response(registry.render(), content_type=CONTENT_TYPE)
+
+
+def init_metrics(app, socketio=None):
+    """Time every request, instrument SMTP and serve ``/metrics``"""
+    if not app.config.get('METRICS_ENABLED', True):
+        return
+    app.before_request(_start_timer)
+    app.after_request(_observe_request)
+    _instrument_smtp()
+    if socketio is not None:
+        registry.register_collector(_collect_socketio(socketio))
+    app.add_url_rule('/metrics', 'metrics', metrics_view)
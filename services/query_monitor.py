@@ -0,0 +1,271 @@
+"""
+Per-request MongoDB command instrumentation and N+1 detection
+
+A pymongo ``CommandListener`` attached to every Mongo client profile records,
+for each Flask request, how many commands it sent, how long the database took,
+and how often each *query shape* repeated. A shape is the command, collection
+and filter/pipeline with every value replaced by ``?``, so
+``find_one({"_id": a})`` and ``find_one({"_id": b})`` count as the same shape.
+
+A shape repeated ``QUERY_N_PLUS_ONE_THRESHOLD`` times in one request is the
+classic N+1 loop (one lookup per row) and is logged once per endpoint/shape.
+
+- Debug mode (or ``QUERY_DEBUG_HEADERS``): every response carries
+  ``X-DB-Commands``, ``X-DB-Time-Ms`` and, when flagged, ``X-DB-N-Plus-One``.
+- Production: per-endpoint totals at ``/central/diagnostics/queries``.
+
+Views can declare a query budget next to their route with ``@query_budget(n)``:
+the most queries (cursor bookkeeping excluded) the view itself may send,
+whatever the size of the data - before_request hooks such as session
+validation are not counted. Requests over budget are logged once per endpoint
+and counted in the diagnostics; ``python -m benchmarks.run budgets`` asserts
+every declared budget against the seeded benchmark dataset.
+
+Command events fire in the greenlet that issued the command, so the request's
+``g`` is the right place for the per-request counters.
+"""
+
+import json
+import logging
+import time
+from collections import Counter
+from functools import wraps
+from flask import g, has_request_context, request
+from pymongo import monitoring
+
+logger = logging.getLogger('pbs.queries')
+
+DEFAULT_N_PLUS_ONE_THRESHOLD = 10
+MAX_SHAPE_LENGTH = 300
+MAX_FLAGGED_SHAPES_PER_ENDPOINT = 20
+
+# Cursor bookkeeping, not separate queries
+UNSHAPED_COMMANDS = {'getMore', 'killCursors', 'endSessions'}
+
+
+def _shape_of(value):
+    """Structure of a filter/pipeline with every literal replaced by '?'"""
+    if isinstance(value, dict):
+        return {key: _shape_of(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        # $in/$or lists of any length are one shape
+        return [_shape_of(value[0])] if value else []
+    return '?'
+
+
+def query_shape(command_name, command):
+    """
+    Shape string of a command, e.g. ``find users {"_id": "?"}``.
+
+    Args:
+        command_name: Name of the command (find, aggregate, update...)
+        command: The command document from the CommandStartedEvent
+    """
+    collection = command.get(command_name)
+    if command_name == 'aggregate':
+        body = command.get('pipeline')
+    elif command_name == 'update':
+        body = [update.get('q') for update in command.get('updates', [])[:1]]
+    elif command_name == 'delete':
+        body = [delete.get('q') for delete in command.get('deletes', [])[:1]]
+    elif command_name == 'findAndModify':
+        body = command.get('query')
+    else:
+        body = command.get('filter', command.get('query'))
+    shape = f"{command_name} {collection}"
+    if body is not None:
+        shape += ' ' + json.dumps(_shape_of(body), sort_keys=True, default=str)
+    return shape[:MAX_SHAPE_LENGTH]
+
+
+def query_budget(max_queries):
+    """
+    Declare the most Mongo queries a view may send (put it under ``@bp.route``).
+
+    Args:
+        max_queries: Budget for the view body, independent of how many rows it shows
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            queries = g.get('db_queries')
+            before = queries.queries if queries is not None else 0
+            try:
+                return view(*args, **kwargs)
+            finally:
+                if queries is not None:
+                    queries.view_queries = queries.queries - before
+                    queries.budget = max_queries
+        wrapper.query_budget = max_queries
+        return wrapper
+    return decorator
+
+
+def endpoint_budgets(app):
+    """{endpoint: budget} of every view declared with @query_budget"""
+    return {endpoint: view.query_budget for endpoint, view in app.view_functions.items()
+            if getattr(view, 'query_budget', None) is not None}
+
+
+class RequestQueries:
+    """Commands issued while serving one request"""
+
+    __slots__ = ('commands', 'queries', 'db_ms', 'shapes', 'view_queries', 'budget')
+
+    def __init__(self):
+        self.commands = 0
+        # Commands other than cursor bookkeeping (getMore...)
+        self.queries = 0
+        self.db_ms = 0.0
+        self.shapes = Counter()
+        self.view_queries = None
+        self.budget = None
+
+    def repeated_shapes(self, threshold):
+        return [(shape, count) for shape, count in self.shapes.most_common() if count >= threshold]
+
+
+class _EndpointTotals:
+    __slots__ = ('requests', 'commands', 'db_ms', 'max_commands', 'flagged', 'budget', 'over_budget')
+
+    def __init__(self):
+        self.requests = 0
+        self.commands = 0
+        self.db_ms = 0.0
+        self.max_commands = 0
+        self.flagged = Counter()
+        self.budget = None
+        self.over_budget = 0
+
+    def as_dict(self):
+        return {
+            'requests': self.requests,
+            'commands': self.commands,
+            'avg_commands': round(self.commands / self.requests, 1) if self.requests else 0,
+            'max_commands': self.max_commands,
+            'db_ms': round(self.db_ms, 1),
+            'avg_db_ms': round(self.db_ms / self.requests, 2) if self.requests else 0,
+            'n_plus_one': [{'shape': shape, 'requests': count} for shape, count in self.flagged.most_common()],
+            'query_budget': self.budget,
+            'over_budget': self.over_budget
+        }
+
+
+class QueryMonitor(monitoring.CommandListener):
+    """CommandListener plus Flask hooks that attribute commands to requests"""
+
+    def __init__(self):
+        self.enabled = True
+        self.threshold = DEFAULT_N_PLUS_ONE_THRESHOLD
+        self.debug_headers = False
+        self.endpoints = {}
+        self.reported = set()
+        self.started_at = time.time()
+
+    # ------------------------------------------------------------ listener
+
+    def _current(self):
+        if not self.enabled or not has_request_context():
+            return None
+        return g.get('db_queries')
+
+    def started(self, event):
+        queries = self._current()
+        if queries is None:
+            return
+        queries.commands += 1
+        if event.command_name not in UNSHAPED_COMMANDS:
+            queries.queries += 1
+            shape = query_shape(event.command_name, event.command)
+            queries.shapes[shape] += 1
+
+    def succeeded(self, event):
+        queries = self._current()
+        if queries is not None:
+            queries.db_ms += event.duration_micros / 1000.0
+
+    def failed(self, event):
+        queries = self._current()
+        if queries is not None:
+            queries.db_ms += event.duration_micros / 1000.0
+
+    # ---------------------------------------------------------- Flask hooks
+
+    def init_app(self, app):
+        self.enabled = app.config.get('QUERY_MONITOR_ENABLED', True)
+        self.threshold = app.config.get('QUERY_N_PLUS_ONE_THRESHOLD', DEFAULT_N_PLUS_ONE_THRESHOLD)
+        debug_headers = app.config.get('QUERY_DEBUG_HEADERS')
+        self.debug_headers = app.debug if debug_headers is None else debug_headers
+        if not self.enabled:
+            return
+        app.before_request(self._begin)
+        app.after_request(self._add_headers)
+        app.teardown_request(self._finish)
+
+    def _begin(self):
+        g.db_queries = RequestQueries()
+
+    def _add_headers(self, response):
+        queries = g.get('db_queries')
+        if queries is not None and self.debug_headers:
+            response.headers['X-DB-Commands'] = str(queries.commands)
+            response.headers['X-DB-Time-Ms'] = f"{queries.db_ms:.1f}"
+            if queries.budget is not None:
+                response.headers['X-DB-View-Queries'] = str(queries.view_queries)
+                response.headers['X-DB-Query-Budget'] = str(queries.budget)
+            repeated = queries.repeated_shapes(self.threshold)
+            if repeated:
+                shape, count = repeated[0]
+                header = f"{count}x {shape}".encode('ascii', 'replace').decode('ascii')
+                response.headers['X-DB-N-Plus-One'] = header
+        return response
+
+    def _finish(self, exc=None):
+        queries = g.pop('db_queries', None)
+        endpoint = request.endpoint
+        if queries is None or endpoint is None:
+            return
+        totals = self.endpoints.get(endpoint)
+        if totals is None:
+            totals = self.endpoints[endpoint] = _EndpointTotals()
+        totals.requests += 1
+        totals.commands += queries.commands
+        totals.db_ms += queries.db_ms
+        totals.max_commands = max(totals.max_commands, queries.commands)
+
+        if queries.budget is not None:
+            totals.budget = queries.budget
+            if queries.view_queries > queries.budget:
+                totals.over_budget += 1
+                if (endpoint, None) not in self.reported:
+                    self.reported.add((endpoint, None))
+                    logger.warning(f"⚠️  {endpoint} sent {queries.view_queries} queries, "
+                                   f"over its budget of {queries.budget}")
+
+        for shape, count in queries.repeated_shapes(self.threshold):
+            if shape in totals.flagged or len(totals.flagged) < MAX_FLAGGED_SHAPES_PER_ENDPOINT:
+                totals.flagged[shape] += 1
+            if (endpoint, shape) not in self.reported:
+                self.reported.add((endpoint, shape))
+                logger.warning(f"⚠️  Possible N+1 in {endpoint}: {count} x {shape}")
+
+    # --------------------------------------------------------------- report
+
+    def snapshot(self, sort='db_ms'):
+        """Per-endpoint totals since start (or the last reset), heaviest first"""
+        endpoints = {name: totals.as_dict() for name, totals in self.endpoints.items()}
+        ordered = sorted(endpoints.items(), key=lambda item: item[1].get(sort, 0), reverse=True)
+        return {
+            'since': self.started_at,
+            'n_plus_one_threshold': self.threshold,
+            'endpoints': [dict(endpoint=name, **totals) for name, totals in ordered]
+        }
+
+    def reset(self):
+        self.endpoints.clear()
+        self.reported.clear()
+        self.started_at = time.time()
+
+
+# Global instance (one per worker process)
+query_monitor = QueryMonitor()
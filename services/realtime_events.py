@@ -8,6 +8,16 @@ from datetime import datetime
 from typing import Dict, Any, Optional
 import sys
 from bson import ObjectId
+from utils.response_cache import invalidate_points_change, invalidate_tags, dp_team_tag, ALL_POINTS_TAG
+
+
+def _effective_date(points_doc: Optional[Dict]):
+    """event_date > request_date > award_date, the date dashboards bucket points by"""
+    for field in ('event_date', 'request_date', 'award_date'):
+        value = (points_doc or {}).get(field)
+        if isinstance(value, datetime):
+            return value
+    return None
 
 
 def get_services():
@@ -174,6 +184,13 @@ def publish_request_approved(request_data: Dict, employee_data: Dict, approver_d
         # After approving request and creating points record
         publish_request_approved(request_doc, employee, approver, points_doc)
     """
+    # ✅ Cached analytics/leaderboards covering this period/department/category go stale
+    invalidate_points_change(
+        _effective_date(request_data) or _effective_date(points_award_data),
+        employee_data.get('department'),
+        request_data.get('category_id')
+    )
+    
     redis_service, _ = get_services()
     if not redis_service:
         return False
@@ -279,8 +296,8 @@ def publish_request_approved(request_data: Dict, employee_data: Dict, approver_d
 
         
     
-        # Also trigger leaderboard update
-        publish_leaderboard_update()
+        # Also trigger leaderboard update (cache already invalidated for this change)
+        publish_leaderboard_update(invalidate_cache=False)
         
         # ✅ 5. Notify DP if employee is assigned to a DP
         if employee_data.get('dp_id'):
@@ -452,6 +469,13 @@ def publish_points_awarded_direct(points_award_data: Dict, employee_data: Dict,
         # After creating points record directly
         publish_points_awarded_direct(points_doc, employee, awarder, category)
     """
+    # ✅ Cached analytics/leaderboards covering this period/department/category go stale
+    invalidate_points_change(
+        _effective_date(points_award_data),
+        employee_data.get('department'),
+        (category_data or {}).get('_id')
+    )
+    
     redis_service, _ = get_services()
     if not redis_service:
         return False
@@ -484,8 +508,8 @@ def publish_points_awarded_direct(points_award_data: Dict, employee_data: Dict,
             target_role='employee'
         )
         
-        # Also trigger leaderboard update
-        publish_leaderboard_update()
+        # Also trigger leaderboard update (cache already invalidated for this change)
+        publish_leaderboard_update(invalidate_cache=False)
         
         # ✅ Notify DP if employee is assigned to a DP
         if employee_data.get('dp_id'):
@@ -583,15 +607,22 @@ def publish_ta_working_notification(request_data: Dict, employee_data: Dict, val
         return False
 
 
-def publish_leaderboard_update():
+def publish_leaderboard_update(invalidate_cache: bool = True):
     """
     Published when: Any points are awarded (triggers leaderboard refresh for all users)
     Notifies: All connected users
     
+    Args:
+        invalidate_cache: Mark every cached analytics/leaderboard result stale. Callers
+                          that already invalidated the exact scope pass False.
+    
     Usage Example:
         # After any points award
         publish_leaderboard_update()
     """
+    if invalidate_cache:
+        invalidate_tags(ALL_POINTS_TAG)
+    
     redis_service, _ = get_services()
     if not redis_service:
         return False
@@ -621,6 +652,8 @@ def publish_dp_employee_list_update(dp_id: str):
         # After assigning/unassigning employee to/from DP
         publish_dp_employee_list_update(str(dp_id))
     """
+    invalidate_tags(dp_team_tag(dp_id))
+    
     redis_service, _ = get_services()
     if not redis_service:
         return False
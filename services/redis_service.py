@@ -7,6 +7,9 @@ import json
 from datetime import datetime
 from typing import Dict, Any, Optional
 import sys
+import time
+from services.metrics import observe_redis_publish
+from services.tracing import tracer
 
 
 class RedisRealtimeService:
@@ -23,11 +26,7 @@ class RedisRealtimeService:
             socket_timeout=5,
             retry_on_timeout=True
         )
-        
-        try:
-            self.redis.ping()
-        except Exception:
-            pass
+        # ✅ No ping here: the client connects on first use, so importing this module never waits on Redis
     
     def publish_event(self, event_type: str, data: Dict[str, Any], 
                      target_user_id: Optional[str] = None,
@@ -43,6 +42,10 @@ class RedisRealtimeService:
             target_role: Role to notify (e.g., 'employee', 'ta_updater', 'ta_validator', 'pm', 'manager')
             notify_only_assigned: If True, only notify the specific assigned user, not all users with that role
         """
+        started = time.monotonic()
+        span = tracer.start_span(f'redis publish {event_type}', 'redis', attributes={
+            'event_type': event_type, 'target_role': target_role
+        })
         try:
             message = {
                 'event_type': event_type,
@@ -112,9 +115,13 @@ class RedisRealtimeService:
                 else:
                     self.redis.publish('all:global_event', json.dumps(message))
             
+            observe_redis_publish(event_type, time.monotonic() - started, True)
+            tracer.finish(span)
             return True
         
-        except Exception:
+        except Exception as e:
+            observe_redis_publish(event_type, time.monotonic() - started, False)
+            tracer.finish(span, error=e)
             return False
 
 
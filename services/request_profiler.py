@@ -0,0 +1,261 @@
+"""
+On-demand Request Profiler
+
+A Central user adds ``X-PBS-Profile: 1`` (or ``?_profile=1``) to any request
+and it is served under a wall-clock sampling profiler. A real OS thread (not a
+green one) samples the stack of the worker thread every
+``PROFILER_SAMPLE_INTERVAL_MS``. Samples whose stack runs through this request
+are kept from the request's dispatch down; samples of other greenlets (or of
+the hub waiting on I/O for this one) are counted under ``[other greenlets /
+io wait]``.
+
+Each profile writes two files to ``PROFILER_OUTPUT_DIR``:
+
+- ``<id>.collapsed``: collapsed stacks, one ``frame;frame;frame count`` line per
+  stack - open in speedscope.app or pipe through flamegraph.pl for an SVG.
+- ``<id>.txt``: request summary and the top functions by own and total time.
+
+The response carries ``X-Profile-Id``; Central users list and download the files
+at ``/central/diagnostics/profiles``. One request per worker is profiled at a
+time, for at most ``PROFILER_MAX_SECONDS``.
+"""
+
+import logging
+import os
+import re
+import sys
+from collections import Counter
+from datetime import datetime
+from flask import Flask, g, request, session
+from eventlet import patcher
+
+# Unpatched modules: the sampler must keep running while the request holds the hub
+_real_thread = patcher.original('_thread')
+_real_threading = patcher.original('threading')
+_real_time = patcher.original('time')
+
+logger = logging.getLogger('pbs.profiler')
+
+PROFILE_HEADER = 'X-PBS-Profile'
+PROFILE_ARG = '_profile'
+OTHER_GREENLETS = '[other greenlets / io wait]'
+TOP_FUNCTIONS = 40
+
+# Samples are trimmed to the request's own frames, starting at Flask's dispatch
+_DISPATCH_CODE = Flask.full_dispatch_request.__code__
+_PATH_MARKERS = ('site-packages' + os.sep, os.path.dirname(os.path.dirname(os.path.abspath(__file__))) + os.sep)
+
+
+def _frame_label(code):
+    """function (path/file.py:line) - path shortened to the part below the repository or site-packages"""
+    filename = code.co_filename
+    for marker in _PATH_MARKERS:
+        position = filename.find(marker)
+        if position != -1:
+            filename = filename[position + len(marker):]
+            break
+    # ';' separates frames in the collapsed format
+    return f"{code.co_name} ({filename}:{code.co_firstlineno})".replace(';', ',')
+
+
+class _ProfileRun:
+    """Samples one request until stopped"""
+
+    def __init__(self, profile_id, anchor, interval, max_seconds):
+        self.profile_id = profile_id
+        self.anchor = anchor
+        self.interval = interval
+        self.max_seconds = max_seconds
+        self.thread_id = _real_thread.get_ident()
+        # stack -> wall seconds attributed to it
+        self.stacks = Counter()
+        self.samples = 0
+        self.started = _real_time.monotonic()
+        self.elapsed = 0.0
+        self.stopped = _real_threading.Event()
+        self.sampler = _real_threading.Thread(target=self._sample, name=f'profiler-{profile_id}', daemon=True)
+
+    def start(self):
+        self.sampler.start()
+
+    def stop(self):
+        self.stopped.set()
+        self.sampler.join(timeout=1)
+        self.elapsed = _real_time.monotonic() - self.started
+
+    def _sample(self):
+        deadline = self.started + self.max_seconds
+        previous = self.started
+        while not self.stopped.wait(self.interval):
+            now = _real_time.monotonic()
+            if now > deadline:
+                break
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                continue
+            # A request holding the GIL delays the sampler: weight each sample by the time it covers
+            weight, previous = now - previous, now
+            codes = []
+            while frame is not None and frame is not self.anchor:
+                codes.append(frame.f_code)
+                frame = frame.f_back
+            self.samples += 1
+            if frame is None:
+                self.stacks[(OTHER_GREENLETS,)] += weight
+            else:
+                codes.append(self.anchor.f_code)
+                self.stacks[tuple(_frame_label(code) for code in reversed(codes))] += weight
+
+    def collapsed(self):
+        """Collapsed stacks weighted in microseconds"""
+        return ''.join(f"{';'.join(stack)} {round(seconds * 1e6)}\n" for stack, seconds in self.stacks.most_common())
+
+    def top_functions(self, limit=TOP_FUNCTIONS):
+        """(label, own seconds, total seconds) per function, by own time"""
+        own, total = Counter(), Counter()
+        for stack, seconds in self.stacks.items():
+            own[stack[-1]] += seconds
+            for label in set(stack):
+                total[label] += seconds
+        return [(label, seconds, total[label]) for label, seconds in own.most_common(limit)]
+
+
+class RequestProfiler:
+    """Profiles flagged requests from Central users (see module docstring)"""
+
+    def __init__(self):
+        self.enabled = False
+        self.output_dir = None
+        self.interval = 0.005
+        self.max_seconds = 60
+        self.keep_files = 50
+        self.active = None
+
+    def init_app(self, app):
+        self.enabled = app.config.get('PROFILER_ENABLED', True)
+        self.output_dir = app.config.get('PROFILER_OUTPUT_DIR')
+        self.interval = app.config.get('PROFILER_SAMPLE_INTERVAL_MS', 5) / 1000.0
+        self.max_seconds = app.config.get('PROFILER_MAX_SECONDS', 60)
+        self.keep_files = app.config.get('PROFILER_KEEP_FILES', 50)
+        if not self.enabled or not self.output_dir:
+            return
+        app.before_request(self._begin)
+        app.after_request(self._add_header)
+        app.teardown_request(self._finish)
+
+    # -------------------------------------------------------------- request
+
+    @staticmethod
+    def _requested():
+        return request.headers.get(PROFILE_HEADER) or request.args.get(PROFILE_ARG)
+
+    @staticmethod
+    def _is_central():
+        if not session.get('user_id'):
+            return False
+        from central.central_utils import check_central_access
+        has_access, _ = check_central_access()
+        return has_access
+
+    def _begin(self):
+        if not self._requested() or not self._is_central():
+            return
+        if self.active is not None:
+            logger.warning(f"⚠️  Profile of {request.path} skipped: {self.active.profile_id} is still running")
+            return
+
+        anchor = sys._getframe()
+        while anchor is not None and anchor.f_code is not _DISPATCH_CODE:
+            anchor = anchor.f_back
+        if anchor is None:
+            return
+
+        endpoint = re.sub(r'[^A-Za-z0-9_.-]', '_', request.endpoint or 'unknown')
+        profile_id = f"{datetime.utcnow():%Y%m%d-%H%M%S-%f}_{endpoint}"
+        self.active = g.profile_run = _ProfileRun(profile_id, anchor, self.interval, self.max_seconds)
+        g.profile_run.start()
+
+    def _add_header(self, response):
+        run = g.get('profile_run')
+        if run is not None:
+            response.headers['X-Profile-Id'] = run.profile_id
+        return response
+
+    def _finish(self, exc=None):
+        run = g.pop('profile_run', None)
+        if run is None:
+            return
+        try:
+            run.stop()
+            self._write(run, exc)
+        except Exception as e:
+            logger.error(f"❌ Could not write profile {run.profile_id}: {e}")
+        finally:
+            self.active = None
+
+    # -------------------------------------------------------------- output
+
+    def _write(self, run, exc):
+        os.makedirs(self.output_dir, exist_ok=True)
+        with open(os.path.join(self.output_dir, f"{run.profile_id}.collapsed"), 'w', encoding='utf-8') as f:
+            f.write(run.collapsed())
+
+        queries = g.get('db_queries')
+        sampled = sum(run.stacks.values()) or 1
+        lines = [
+            f"{request.method} {request.full_path.rstrip('?')}",
+            f"endpoint:     {request.endpoint}",
+            f"user:         {session.get('user_email') or session.get('user_id')}",
+            f"profiled at:  {datetime.utcnow().isoformat()}Z",
+            f"wall time:    {run.elapsed * 1000:.1f} ms",
+            f"samples:      {run.samples} every {run.interval * 1000:g} ms",
+            f"off-request:  {run.stacks[(OTHER_GREENLETS,)] * 100 / sampled:.1f}% {OTHER_GREENLETS}",
+        ]
+        if queries is not None:
+            lines.append(f"mongo:        {queries.commands} commands, {queries.db_ms:.1f} ms")
+        if exc is not None:
+            lines.append(f"error:        {exc!r}")
+        lines += ['', f"{'own ms':>9} {'total ms':>9} {'own %':>6}  function"]
+        for label, own, total in run.top_functions():
+            lines.append(f"{own * 1000:9.1f} {total * 1000:9.1f} {own * 100 / sampled:6.1f}  {label}")
+        with open(os.path.join(self.output_dir, f"{run.profile_id}.txt"), 'w', encoding='utf-8') as f:
+            f.write('\n'.join(lines) + '\n')
+
+        logger.info(f"✅ Profiled {request.path} in {run.elapsed * 1000:.0f} ms: {run.profile_id}")
+        self._prune()
+
+    def _prune(self):
+        """Keep the newest PROFILER_KEEP_FILES profiles"""
+        profile_ids = sorted({name.rsplit('.', 1)[0] for name in os.listdir(self.output_dir)
+                              if name.endswith(('.collapsed', '.txt'))})
+        for profile_id in profile_ids[:-self.keep_files] if self.keep_files else []:
+            for extension in ('.collapsed', '.txt'):
+                try:
+                    os.remove(os.path.join(self.output_dir, profile_id + extension))
+                except OSError:
+                    pass
+
+    def list_profiles(self):
+        """Stored profiles, newest first"""
+        if not self.output_dir or not os.path.isdir(self.output_dir):
+            return []
+        profiles = []
+        for name in sorted(os.listdir(self.output_dir), reverse=True):
+            if not name.endswith('.txt'):
+                continue
+            path = os.path.join(self.output_dir, name)
+            with open(path, encoding='utf-8') as f:
+                summary = f.read().split('\n\n', 1)[0]
+            profiles.append({'id': name[:-len('.txt')], 'summary': summary.splitlines()})
+        return profiles
+
+    def profile_path(self, profile_id, extension):
+        """Path of a stored profile file, or None (ids are checked, not trusted)"""
+        if extension not in ('collapsed', 'txt') or not re.fullmatch(r'[A-Za-z0-9_.-]+', profile_id or ''):
+            return None
+        path = os.path.join(self.output_dir or '', f"{profile_id}.{extension}")
+        return path if self.output_dir and os.path.isfile(path) else None
+
+
+# Global instance
+request_profiler = RequestProfiler()
@@ -0,0 +1,262 @@
+"""
+Slow Query Log
+Records every MongoDB command slower than ``SLOW_QUERY_THRESHOLD_MS`` into the
+capped collection ``slow_queries``, with the Flask endpoint that issued it and
+its query shape (services/query_monitor.query_shape - values stripped, so no
+employee data is stored). The first slow sample of a shape in each
+``SLOW_QUERY_EXPLAIN_INTERVAL_SECONDS`` is explained (queryPlanner only, the
+query is not re-run) and its winning plan summarized, e.g.
+``FETCH <- IXSCAN {user_id: 1}`` or ``COLLSCAN``.
+
+Records are buffered and written by one background greenlet, so a slow request
+never waits on the log. ``top_offenders()`` aggregates the log per shape (count,
+p50/p95/max, endpoints, worst plan) for /central/diagnostics/slow-queries.
+"""
+
+import hashlib
+import time
+from datetime import datetime
+import eventlet
+from flask import has_request_context, request
+from pymongo import monitoring
+from pymongo.errors import CollectionInvalid
+from extensions import mongo
+from services.query_monitor import query_shape
+from utils.error_handling import error_print
+
+COLLECTION = 'slow_queries'
+DEFAULT_THRESHOLD_MS = 100
+DEFAULT_CAPPED_BYTES = 64 * 1024 * 1024
+DEFAULT_EXPLAIN_INTERVAL_SECONDS = 600
+FLUSH_INTERVAL_SECONDS = 5
+MAX_BUFFERED = 1000
+MAX_PENDING = 10000
+
+# Never logged: our own writes, explains, and cursor/session bookkeeping
+IGNORED_COMMANDS = {'explain', 'getMore', 'killCursors', 'endSessions', 'hello', 'isMaster', 'ping'}
+
+# Command fields kept for explain (everything else - $db, lsid, maxTimeMS... - is dropped)
+EXPLAINABLE_FIELDS = {
+    'find': ('find', 'filter', 'sort', 'projection', 'hint', 'skip', 'limit'),
+    'aggregate': ('aggregate', 'pipeline', 'hint', 'allowDiskUse'),
+    'count': ('count', 'query', 'hint'),
+    'distinct': ('distinct', 'key', 'query'),
+}
+
+
+def fingerprint(shape):
+    """Short stable id of a query shape"""
+    return hashlib.sha1(shape.encode('utf-8')).hexdigest()[:16]
+
+
+def _summarize_stage(stage):
+    name = stage.get('stage', '?')
+    if name == 'IXSCAN':
+        keys = ', '.join(f"{key}: {value}" for key, value in (stage.get('keyPattern') or {}).items())
+        name = f"IXSCAN {{{keys}}}"
+    children = []
+    if 'inputStage' in stage:
+        children.append(stage['inputStage'])
+    children.extend(stage.get('inputStages', []))
+    if not children:
+        return name
+    return f"{name} <- " + ' + '.join(_summarize_stage(child) for child in children)
+
+
+def summarize_plan(explain):
+    """One-line winning plan of an explain (find/count/distinct or aggregate) result"""
+    planner = explain.get('queryPlanner')
+    if planner is None:
+        for stage in explain.get('stages', []):
+            cursor = stage.get('$cursor')
+            if cursor and 'queryPlanner' in cursor:
+                planner = cursor['queryPlanner']
+                break
+    if not planner:
+        return None
+    winning = planner.get('winningPlan', {})
+    # Slot-based engine (MongoDB 5+) nests the classic tree under queryPlan
+    return _summarize_stage(winning.get('queryPlan', winning))
+
+
+def _percentile(sorted_values, fraction):
+    if not sorted_values:
+        return 0
+    index = min(len(sorted_values) - 1, int(round(fraction * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+class SlowQueryLog(monitoring.CommandListener):
+    """CommandListener that buffers slow commands and a greenlet that stores them"""
+
+    def __init__(self):
+        self.app = None
+        self.threshold_ms = DEFAULT_THRESHOLD_MS
+        self.explain_interval = DEFAULT_EXPLAIN_INTERVAL_SECONDS
+        self.pending = {}
+        self.buffer = []
+        self.explained_at = {}
+        self.dropped = 0
+        self.flusher = None
+
+    # ------------------------------------------------------------ listener
+
+    def started(self, event):
+        if self.app is None or event.command_name in IGNORED_COMMANDS:
+            return
+        if event.command.get(event.command_name) == COLLECTION:
+            return
+        if len(self.pending) >= MAX_PENDING:
+            return
+        endpoint = request.endpoint if has_request_context() else None
+        self.pending[(event.connection_id, event.request_id)] = (event.command, event.database_name, endpoint)
+
+    def succeeded(self, event):
+        self._finished(event, failed=False)
+
+    def failed(self, event):
+        self._finished(event, failed=True)
+
+    def _finished(self, event, failed):
+        started = self.pending.pop((event.connection_id, event.request_id), None)
+        if started is None:
+            return
+        duration_ms = event.duration_micros / 1000.0
+        if duration_ms < self.threshold_ms:
+            return
+        if len(self.buffer) >= MAX_BUFFERED:
+            self.dropped += 1
+            return
+        command, database_name, endpoint = started
+        shape = query_shape(event.command_name, command)
+        self.buffer.append({
+            'ts': datetime.utcnow(),
+            'endpoint': endpoint or '(background)',
+            'command': event.command_name,
+            'collection': command.get(event.command_name),
+            'database': database_name,
+            'shape': shape,
+            'fingerprint': fingerprint(shape),
+            'duration_ms': round(duration_ms, 1),
+            'failed': failed,
+            # Kept in memory only, for explain; never stored
+            '_command': command
+        })
+
+    # ------------------------------------------------------------- storage
+
+    def init_app(self, app):
+        self.threshold_ms = app.config.get('SLOW_QUERY_THRESHOLD_MS', DEFAULT_THRESHOLD_MS)
+        self.explain_interval = app.config.get('SLOW_QUERY_EXPLAIN_INTERVAL_SECONDS',
+                                               DEFAULT_EXPLAIN_INTERVAL_SECONDS)
+        if not self.threshold_ms:
+            return
+        self.app = app
+        if self.flusher is None:
+            self.flusher = eventlet.spawn(self._flush_loop)
+
+    def ensure_collection(self, capped_bytes=DEFAULT_CAPPED_BYTES):
+        """Create the capped collection and its lookup index (app context required)"""
+        try:
+            mongo.db.create_collection(COLLECTION, capped=True, size=capped_bytes or DEFAULT_CAPPED_BYTES)
+        except CollectionInvalid:
+            pass
+        mongo.db[COLLECTION].create_index([('fingerprint', 1), ('duration_ms', -1)])
+
+    def _explain(self, record):
+        command = record.pop('_command')
+        fields = EXPLAINABLE_FIELDS.get(record['command'])
+        if not fields:
+            return None
+        now = time.monotonic()
+        if now - self.explained_at.get(record['fingerprint'], -self.explain_interval) < self.explain_interval:
+            return None
+        self.explained_at[record['fingerprint']] = now
+        explained = {field: command[field] for field in fields if field in command}
+        if record['command'] == 'aggregate':
+            explained['cursor'] = {}
+        try:
+            result = mongo.cx[record['database']].command(
+                {'explain': explained, 'verbosity': 'queryPlanner'}
+            )
+            return summarize_plan(result)
+        except Exception:
+            return None
+
+    def flush(self):
+        """Explain new shapes and write buffered records (app context required)"""
+        if not self.buffer:
+            return
+        records, self.buffer = self.buffer, []
+        for record in records:
+            record['plan'] = self._explain(record)
+        mongo.db[COLLECTION].insert_many(records, ordered=False)
+
+    def _flush_loop(self):
+        while True:
+            eventlet.sleep(FLUSH_INTERVAL_SECONDS)
+            try:
+                with self.app.app_context():
+                    self.flush()
+            except Exception as e:
+                error_print("Slow query log flush failed", e)
+
+    # -------------------------------------------------------------- report
+
+    def top_offenders(self, sort='total_ms', limit=50, endpoint=None):
+        """
+        Slow queries grouped by shape, worst first.
+
+        Args:
+            sort: total_ms, count, p95_ms or max_ms
+            limit: Number of shapes returned
+            endpoint: Only samples issued by this endpoint
+        """
+        match = {'endpoint': endpoint} if endpoint else {}
+        pipeline = [
+            {'$match': match},
+            {'$sort': {'duration_ms': -1}},
+            {'$group': {
+                '_id': '$fingerprint',
+                'shape': {'$first': '$shape'},
+                'command': {'$first': '$command'},
+                'collection': {'$first': '$collection'},
+                'count': {'$sum': 1},
+                'total_ms': {'$sum': '$duration_ms'},
+                'durations': {'$push': '$duration_ms'},
+                'endpoints': {'$addToSet': '$endpoint'},
+                'failures': {'$sum': {'$cond': ['$failed', 1, 0]}},
+                'last_seen': {'$max': '$ts'},
+                'plans': {'$push': '$plan'}
+            }}
+        ]
+        offenders = []
+        for group in mongo.db[COLLECTION].aggregate(pipeline):
+            durations = sorted(group.pop('durations'))
+            # Samples are pushed slowest first: the first stored plan is the worst one
+            plans = [plan for plan in group.pop('plans') if plan]
+            group.update({
+                'fingerprint': group.pop('_id'),
+                'total_ms': round(group['total_ms'], 1),
+                'p50_ms': _percentile(durations, 0.5),
+                'p95_ms': _percentile(durations, 0.95),
+                'max_ms': durations[-1] if durations else 0,
+                'worst_plan': plans[0] if plans else None,
+                'collscan': any('COLLSCAN' in plan for plan in plans)
+            })
+            offenders.append(group)
+        if sort not in ('total_ms', 'count', 'p95_ms', 'max_ms'):
+            sort = 'total_ms'
+        offenders.sort(key=lambda item: item[sort], reverse=True)
+        return offenders[:limit]
+
+    def stats(self):
+        return {
+            'threshold_ms': self.threshold_ms,
+            'buffered': len(self.buffer),
+            'dropped': self.dropped
+        }
+
+
+# Global instance (one per worker process)
+slow_query_log = SlowQueryLog()
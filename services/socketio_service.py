@@ -1,14 +1,24 @@
 import json
+import time
 import eventlet
+from flask import session
 from flask_socketio import emit, join_room
 import sys
 
 class SocketIORealtimeService:
     """Eventlet-compatible SocketIO handler for all dashboards"""
     
-    def __init__(self, socketio, redis_service):
+    def __init__(self, socketio, redis_service, leader_lock=None):
+        """
+        Args:
+            socketio: Flask-SocketIO instance (with a message_queue in multi-worker mode)
+            redis_service: RedisRealtimeService whose channels are fanned out to rooms
+            leader_lock: RedisLeaderLock when several workers run; only the leader
+                         subscribes, the message queue delivers its emits to every worker
+        """
         self.socketio = socketio
         self.redis_service = redis_service
+        self.leader_lock = leader_lock
         self.pubsub = None
         self.listening = False
         self.listener_greenlet = None
@@ -17,7 +27,10 @@ class SocketIORealtimeService:
         """Start Redis subscriber in eventlet greenlet"""
         if not self.listening:
             self.listening = True
-            self._subscribe_to_all_channels()
+            
+            # Single worker: subscribe right away. Multi-worker: the election loop subscribes
+            if self.leader_lock is None:
+                self._subscribe_to_all_channels()
             
             # Use eventlet spawn instead of threading
             self.listener_greenlet = eventlet.spawn(self._listen_for_redis_messages)
@@ -30,10 +43,46 @@ class SocketIORealtimeService:
         except Exception:
             pass
     
+    def _unsubscribe_from_all_channels(self):
+        """Drop the subscription (lost leadership or shutting down)"""
+        if self.pubsub:
+            try:
+                self.pubsub.punsubscribe()
+                self.pubsub.close()
+            except Exception:
+                pass
+            self.pubsub = None
+    
+    def _check_leadership(self):
+        """
+        Multi-worker mode: subscribe while this worker holds the leader lease, otherwise
+        stay unsubscribed so every pub/sub message is emitted exactly once.
+        
+        Returns:
+            True if this worker should read from pub/sub
+        """
+        if self.leader_lock.acquire_or_renew():
+            if self.pubsub is None:
+                print(f"✅ Realtime listener leader: {self.leader_lock.identity}")
+                self._subscribe_to_all_channels()
+            return self.pubsub is not None
+        
+        if self.pubsub is not None:
+            print(f"⚠️  Realtime listener leadership lost: {self.leader_lock.identity}")
+            self._unsubscribe_from_all_channels()
+        return False
+    
     def _listen_for_redis_messages(self):
         """Listen for Redis messages with timeout handling"""
+        next_election = 0
         while self.listening:
             try:
+                if self.leader_lock is not None and time.monotonic() >= next_election:
+                    next_election = time.monotonic() + self.leader_lock.renew_interval
+                    if not self._check_leadership():
+                        eventlet.sleep(self.leader_lock.renew_interval)
+                        continue
+                
                 # Get message with timeout to prevent blocking
                 message = self.pubsub.get_message(timeout=1.0)
                 
@@ -112,6 +161,12 @@ class SocketIORealtimeService:
             room = f'{user_type}_{user_id}'
             join_room(room)
             
+            # ✅ Dashboard-independent room for per-user events (background job progress and results):
+            # joined for the logged-in session user only, never for the id the client sends
+            session_user_id = session.get('user_id')
+            if session_user_id:
+                join_room(f'user_{session_user_id}')
+            
             # Join role-based room if applicable
             if role:
                 join_room(f'role_{role}')
@@ -125,12 +180,18 @@ class SocketIORealtimeService:
         except Exception:
             pass
     
+    def emit_to_user(self, user_id: str, event_type: str, data: dict):
+        """Emit an event to every dashboard the user has open (room user_<id>)"""
+        self.socketio.emit(
+            event_type,
+            data,
+            room=f'user_{user_id}',
+            namespace='/'
+        )
+    
     def stop_listener(self):
         """Stop the Redis listener gracefully"""
         self.listening = False
-        if self.pubsub:
-            try:
-                self.pubsub.punsubscribe()
-                self.pubsub.close()
-            except Exception:
-                pass
\ No newline at end of file
+        self._unsubscribe_from_all_channels()
+        if self.leader_lock is not None:
+            self.leader_lock.release()
@@ -0,0 +1,226 @@
+"""
+Fingerprinted Static Assets
+Most dashboards ship their own static folder, and several are copies of each
+other (pm/, marketing/ and manager/static hold the same stylesheets), so
+browsers download and cache the same bytes once per blueprint URL - and
+revalidate them on every page load.
+
+The build step collects every static folder of the app and its blueprints into
+one directory (``STATIC_ASSETS_DIR``):
+
+    python -m services.static_assets
+
+- each file is stored once per content (identical copies share one file),
+  under a content-hashed name: ``pm_dashboard.c9c88971a665.css``
+- ``.gz`` and ``.br`` variants are written next to text assets (``.br`` when
+  the optional ``brotli`` package is installed)
+- ``manifest.json`` maps ``<endpoint>:<filename>`` to the hashed name
+
+At runtime templates keep calling ``url_for('pm.static', filename=...)``: when
+the manifest lists the file, the URL points at ``/assets/<hashed name>``, served
+with the best encoding the browser accepts and ``Cache-Control: immutable`` for
+a year. Files missing from the manifest (or without a build) fall back to the
+blueprint's own static route, so the build is safe to skip in development.
+Re-run it whenever static files change (it is part of the deploy).
+"""
+
+import gzip
+import hashlib
+import json
+import logging
+import mimetypes
+import os
+import shutil
+import time
+from flask import has_request_context, request, send_from_directory, url_for
+from werkzeug.exceptions import NotFound
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+logger = logging.getLogger('pbs.assets')
+
+MANIFEST_NAME = 'manifest.json'
+ASSET_ENDPOINT = 'assets'
+ASSET_EXTENSIONS = ('.css', '.js', '.map', '.svg', '.png', '.jpg', '.jpeg', '.gif', '.ico', '.woff', '.woff2')
+COMPRESSIBLE_EXTENSIONS = ('.css', '.js', '.map', '.svg')
+# User uploads live under some static folders - never fingerprint them
+SKIPPED_DIRECTORIES = ('uploads',)
+HASH_LENGTH = 12
+ONE_YEAR = 365 * 24 * 3600
+
+# Served encodings, best first: (Accept-Encoding token, file suffix)
+ENCODINGS = (('br', '.br'), ('gzip', '.gz'))
+
+
+def _static_folders():
+    """(static endpoint, folder) of the app and of every blueprint in utils/blueprint_loader.py"""
+    from utils.blueprint_loader import BLUEPRINTS, import_blueprint
+
+    repo_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    folders = [('static', os.path.join(repo_dir, 'static'))]
+    for spec in BLUEPRINTS:
+        blueprint, _ = import_blueprint(spec)
+        if blueprint.has_static_folder:
+            folders.append((f'{blueprint.name}.static', blueprint.static_folder))
+    return folders
+
+
+def _asset_files(folder):
+    """Relative (posix) paths of the fingerprinted files in a static folder"""
+    for root, directories, files in os.walk(folder):
+        directories[:] = sorted(name for name in directories if name not in SKIPPED_DIRECTORIES)
+        for name in sorted(files):
+            if name.lower().endswith(ASSET_EXTENSIONS):
+                yield os.path.relpath(os.path.join(root, name), folder).replace(os.sep, '/')
+
+
+def _write_compressed(path, data):
+    """Write the .gz/.br variants that are smaller than the original; returns their sizes"""
+    variants = {}
+    compressors = [('gzip', '.gz', lambda raw: gzip.compress(raw, compresslevel=9, mtime=0))]
+    if brotli is not None:
+        compressors.append(('br', '.br', lambda raw: brotli.compress(raw, quality=11)))
+    for encoding, suffix, compress in compressors:
+        compressed = compress(data)
+        if len(compressed) < len(data) * 0.9:
+            with open(path + suffix, 'wb') as f:
+                f.write(compressed)
+            variants[encoding] = len(compressed)
+    return variants
+
+
+def build(output_dir, folders=None):
+    """
+    Collect, deduplicate, fingerprint and precompress the static assets.
+
+    Args:
+        output_dir: Target directory (emptied first)
+        folders: (static endpoint, folder) pairs; defaults to the app's and every blueprint's
+
+    Returns:
+        dict: The manifest written to output_dir/manifest.json
+    """
+    folders = folders if folders is not None else _static_folders()
+    if os.path.isdir(output_dir):
+        shutil.rmtree(output_dir)
+    os.makedirs(output_dir)
+
+    assets, files, by_digest = {}, {}, {}
+    source_bytes = 0
+    for endpoint, folder in folders:
+        if not os.path.isdir(folder):
+            continue
+        for filename in _asset_files(folder):
+            with open(os.path.join(folder, filename), 'rb') as f:
+                data = f.read()
+            source_bytes += len(data)
+            digest = hashlib.sha256(data).hexdigest()[:HASH_LENGTH]
+
+            hashed = by_digest.get(digest)
+            if hashed is None:
+                stem, extension = os.path.splitext(filename)
+                hashed = by_digest[digest] = f'{stem}.{digest}{extension}'
+                path = os.path.join(output_dir, hashed)
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                with open(path, 'wb') as f:
+                    f.write(data)
+                files[hashed] = {'bytes': len(data)}
+                if filename.lower().endswith(COMPRESSIBLE_EXTENSIONS):
+                    files[hashed].update(_write_compressed(path, data))
+            assets[f'{endpoint}:{filename}'] = hashed
+
+    manifest = {
+        'built_at': time.time(),
+        'source_bytes': source_bytes,
+        'bytes': sum(entry['bytes'] for entry in files.values()),
+        'assets': assets,
+        'files': files
+    }
+    with open(os.path.join(output_dir, MANIFEST_NAME), 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=1, sort_keys=True)
+    return manifest
+
+
+class StaticAssets:
+    """Serves the built assets and points template url_for() at them"""
+
+    def __init__(self):
+        self.enabled = False
+        self.directory = None
+        self.max_age = ONE_YEAR
+        self.assets = {}
+        self.files = {}
+
+    def init_app(self, app):
+        self.directory = app.config.get('STATIC_ASSETS_DIR')
+        self.max_age = app.config.get('STATIC_ASSETS_MAX_AGE', ONE_YEAR)
+        manifest_path = os.path.join(self.directory or '', MANIFEST_NAME)
+        if not app.config.get('STATIC_ASSETS_ENABLED', True) or not os.path.isfile(manifest_path):
+            return
+        try:
+            with open(manifest_path, encoding='utf-8') as f:
+                manifest = json.load(f)
+        except (OSError, ValueError) as e:
+            logger.error(f"❌ Unreadable asset manifest {manifest_path}: {e}")
+            return
+
+        self.assets = manifest.get('assets', {})
+        self.files = manifest.get('files', {})
+        self.enabled = True
+        url_path = app.config.get('STATIC_ASSETS_URL_PATH', '/assets').rstrip('/')
+        app.add_url_rule(f'{url_path}/<path:filename>', endpoint=ASSET_ENDPOINT, view_func=self.serve)
+        app.jinja_env.globals['url_for'] = self.url_for
+        logger.info(f"✅ {len(self.files)} fingerprinted static assets for {len(self.assets)} static URLs")
+
+    def url_for(self, endpoint, **values):
+        """url_for() for templates: static files listed in the manifest go to their hashed URL"""
+        if (endpoint in ('static', '.static') or endpoint.endswith('.static')) and 'filename' in values:
+            if endpoint == '.static':
+                blueprint = request.blueprint if has_request_context() else None
+                endpoint = f'{blueprint}.static' if blueprint else 'static'
+            hashed = self.assets.get(f"{endpoint}:{values['filename']}")
+            if hashed is not None:
+                values['filename'] = hashed
+                return url_for(ASSET_ENDPOINT, **values)
+        return url_for(endpoint, **values)
+
+    def serve(self, filename):
+        """A hashed asset, precompressed when the browser accepts it; cached for a year"""
+        entry = self.files.get(filename)
+        if entry is None:
+            raise NotFound()
+
+        mimetype = mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+        served, content_encoding = filename, None
+        for encoding, suffix in ENCODINGS:
+            if encoding in entry and request.accept_encodings[encoding] > 0:
+                served, content_encoding = filename + suffix, encoding
+                break
+
+        response = send_from_directory(self.directory, served, mimetype=mimetype, max_age=self.max_age)
+        if content_encoding:
+            response.headers['Content-Encoding'] = content_encoding
+        if len(entry) > 1:
+            response.vary.add('Accept-Encoding')
+        response.headers['Cache-Control'] = f'public, max-age={self.max_age}, immutable'
+        return response
+
+
+# Global instance
+static_assets = StaticAssets()
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.WARNING)
+
+    from config import Config
+
+    manifest = build(Config.STATIC_ASSETS_DIR)
+    compressed = sum(1 for entry in manifest['files'].values() if len(entry) > 1)
+    print(f"✅ {len(manifest['assets'])} static files -> {len(manifest['files'])} fingerprinted assets "
+          f"({manifest['source_bytes'] / 1024:.0f} KB -> {manifest['bytes'] / 1024:.0f} KB, "
+          f"{compressed} precompressed{'' if brotli else ', gzip only: pip install brotli for .br'}) "
+          f"in {Config.STATIC_ASSETS_DIR}")
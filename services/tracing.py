@@ -0,0 +1,411 @@
+"""
+Local Tracing
+Spans for each Flask request, the Mongo commands, Redis publishes and SMTP
+sends it causes, and the background work it hands off - greenlets started with
+``tracer.spawn``, email thread-pool tasks and notification threads whose target
+is wrapped with ``tracer.bind``, and background jobs (the trace context is stored on the job document). An approval
+that fans out into DB writes, realtime publishes and emails shows up as one
+trace.
+
+Spans are buffered in memory and appended by a flusher greenlet as JSON lines
+to ``TRACE_DIR/spans-<pid>.jsonl`` (one file per worker process, rotated to
+``.1`` at ``TRACE_MAX_FILE_BYTES``). Central users browse recent traces and
+their waterfall at ``/central/diagnostics/traces``.
+
+``TRACE_SAMPLE_RATE`` of requests and jobs start a trace; Mongo/Redis/SMTP
+spans are only recorded inside one. A W3C ``traceparent`` request header
+continues the caller's trace; responses carry ``X-Trace-Id``.
+"""
+
+import atexit
+import glob
+import json
+import logging
+import os
+import random
+import smtplib
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
+import eventlet
+from flask import g, request
+from pymongo import monitoring
+from services.query_monitor import query_shape
+
+logger = logging.getLogger('pbs.tracing')
+
+FLUSH_INTERVAL_SECONDS = 1
+MAX_BUFFERED = 20000
+DEFAULT_MAX_FILE_BYTES = 16 * 1024 * 1024
+
+# Greenlets (and green threads) each get their own context, so the active span never leaks between requests
+_current_span = ContextVar('pbs_current_span', default=None)
+
+
+class Span:
+    """One timed operation of a trace"""
+
+    __slots__ = ('trace_id', 'span_id', 'parent_id', 'name', 'kind', 'start', 'started', 'attributes', 'error')
+
+    def __init__(self, name, kind, trace_id, parent_id=None, attributes=None):
+        self.trace_id = trace_id
+        self.span_id = os.urandom(8).hex()
+        self.parent_id = parent_id
+        self.name = name
+        self.kind = kind
+        self.start = time.time()
+        self.started = time.monotonic()
+        self.attributes = attributes or {}
+        self.error = None
+
+    def set(self, key, value):
+        self.attributes[key] = value
+
+    def context(self):
+        """Reference a span in another process or a stored document can continue from"""
+        return {'trace_id': self.trace_id, 'span_id': self.span_id}
+
+
+def _parse_traceparent(header):
+    """W3C traceparent (00-<trace id>-<parent id>-<flags>) as a span context, or None"""
+    parts = (header or '').strip().split('-')
+    if len(parts) != 4 or len(parts[1]) != 32 or len(parts[2]) != 16:
+        return None
+    try:
+        int(parts[1], 16), int(parts[2], 16)
+    except ValueError:
+        return None
+    return {'trace_id': parts[1], 'span_id': parts[2]}
+
+
+class Tracer(monitoring.CommandListener):
+    """Creates, propagates and stores spans (see module docstring); also a pymongo listener"""
+
+    def __init__(self):
+        self.enabled = False
+        self.sample_rate = 1.0
+        self.directory = None
+        self.max_file_bytes = DEFAULT_MAX_FILE_BYTES
+        self.buffer = []
+        self.dropped = 0
+        self.pending = {}
+        self.flusher = None
+
+    def init_app(self, app):
+        self.enabled = app.config.get('TRACING_ENABLED', False)
+        self.directory = app.config.get('TRACE_DIR')
+        self.sample_rate = app.config.get('TRACE_SAMPLE_RATE', 1.0)
+        self.max_file_bytes = app.config.get('TRACE_MAX_FILE_BYTES', DEFAULT_MAX_FILE_BYTES)
+        if not self.enabled or not self.directory:
+            self.enabled = False
+            return
+        os.makedirs(self.directory, exist_ok=True)
+        app.before_request(self._begin_request)
+        app.after_request(self._tag_response)
+        app.teardown_request(self._end_request)
+        _instrument_smtp(self)
+        if self.flusher is None:
+            self.flusher = eventlet.spawn(self._flush_loop)
+            atexit.register(self.flush)
+
+    # ---------------------------------------------------------------- spans
+
+    def current_span(self):
+        return _current_span.get()
+
+    def context(self):
+        """Context of the active span (to store on a job document), or None"""
+        span = _current_span.get()
+        return span.context() if span is not None else None
+
+    def start_span(self, name, kind='internal', parent=None, root=False, attributes=None):
+        """
+        Start a span without activating it.
+
+        Args:
+            name: Span name shown in the waterfall
+            kind: http, mongo, redis, smtp, greenlet, job or internal
+            parent: Span or span context dict; defaults to the active span
+            root: Start a new (sampled) trace when there is no parent
+            attributes: Extra key/values stored with the span
+
+        Returns:
+            Span, or None when tracing is off or this work is not traced
+        """
+        if not self.enabled:
+            return None
+        parent = parent or _current_span.get()
+        if parent is None:
+            if not root or random.random() >= self.sample_rate:
+                return None
+            return Span(name, kind, os.urandom(16).hex(), attributes=attributes)
+        if isinstance(parent, dict):
+            return Span(name, kind, parent['trace_id'], parent['span_id'], attributes)
+        return Span(name, kind, parent.trace_id, parent.span_id, attributes)
+
+    def finish(self, span, error=None, duration_ms=None):
+        """End a span and queue it for the sink"""
+        if span is None:
+            return
+        if duration_ms is None:
+            duration_ms = (time.monotonic() - span.started) * 1000
+        if len(self.buffer) >= MAX_BUFFERED:
+            self.dropped += 1
+            return
+        record = {
+            'trace_id': span.trace_id,
+            'span_id': span.span_id,
+            'parent_id': span.parent_id,
+            'name': span.name,
+            'kind': span.kind,
+            'start': round(span.start * 1000, 3),
+            'duration_ms': round(duration_ms, 3),
+            'pid': os.getpid()
+        }
+        if span.attributes:
+            record['attributes'] = span.attributes
+        error = error or span.error
+        if error:
+            record['error'] = error if isinstance(error, str) else repr(error)
+        self.buffer.append(record)
+
+    @contextmanager
+    def span(self, name, kind='internal', parent=None, root=False, **attributes):
+        """Run the block inside a new active span (a no-op outside a trace unless ``root``)"""
+        span = self.start_span(name, kind, parent, root, attributes)
+        if span is None:
+            yield None
+            return
+        token = _current_span.set(span)
+        try:
+            yield span
+        except BaseException as e:
+            span.error = repr(e)
+            raise
+        finally:
+            _current_span.reset(token)
+            self.finish(span)
+
+    def bind(self, func, name=None):
+        """
+        Carry the active span into another greenlet or thread: the returned callable runs
+        ``func`` in a child span (with the time it waited to start as ``queued_ms``).
+        """
+        parent = _current_span.get()
+        if parent is None:
+            return func
+        name = name or getattr(func, '__qualname__', repr(func))
+        queued_at = time.monotonic()
+
+        @wraps(func)
+        def traced(*args, **kwargs):
+            span = self.start_span(name, 'greenlet', parent,
+                                   attributes={'queued_ms': round((time.monotonic() - queued_at) * 1000, 3)})
+            token = _current_span.set(span)
+            try:
+                return func(*args, **kwargs)
+            except BaseException as e:
+                if span is not None:
+                    span.error = repr(e)
+                raise
+            finally:
+                _current_span.reset(token)
+                self.finish(span)
+        return traced
+
+    def spawn(self, func, *args, **kwargs):
+        """eventlet.spawn that keeps the caller's trace"""
+        return eventlet.spawn(self.bind(func), *args, **kwargs)
+
+    # ---------------------------------------------------------------- flask
+
+    def _begin_request(self):
+        parent = _parse_traceparent(request.headers.get('traceparent'))
+        rule = request.url_rule.rule if request.url_rule is not None else request.path
+        span = self.start_span(f"{request.method} {rule}", 'http', parent, root=True, attributes={
+            'path': request.path,
+            'endpoint': request.endpoint
+        })
+        if span is not None:
+            g.trace_span = span
+            g.trace_token = _current_span.set(span)
+
+    def _tag_response(self, response):
+        span = g.get('trace_span')
+        if span is not None:
+            span.set('status', response.status_code)
+            response.headers['X-Trace-Id'] = span.trace_id
+        return response
+
+    def _end_request(self, exc=None):
+        span = g.pop('trace_span', None)
+        if span is None:
+            return
+        try:
+            _current_span.reset(g.pop('trace_token'))
+        except ValueError:
+            # Torn down from another context (e.g. a copied request context): nothing to restore
+            _current_span.set(None)
+        self.finish(span, error=exc)
+
+    # ---------------------------------------------------------------- mongo
+
+    def started(self, event):
+        parent = _current_span.get()
+        if parent is None:
+            return
+        collection = event.command.get(event.command_name)
+        span = self.start_span(f"mongo {event.command_name}", 'mongo', parent, attributes={
+            'database': event.database_name,
+            'collection': collection if isinstance(collection, str) else None,
+            'shape': query_shape(event.command_name, event.command)
+        })
+        self.pending[(event.connection_id, event.request_id)] = span
+
+    def succeeded(self, event):
+        span = self.pending.pop((event.connection_id, event.request_id), None)
+        self.finish(span, duration_ms=event.duration_micros / 1000.0)
+
+    def failed(self, event):
+        span = self.pending.pop((event.connection_id, event.request_id), None)
+        self.finish(span, error=str(event.failure), duration_ms=event.duration_micros / 1000.0)
+
+    # ----------------------------------------------------------------- sink
+
+    def _path(self):
+        return os.path.join(self.directory, f"spans-{os.getpid()}.jsonl")
+
+    def flush(self):
+        """Append buffered spans to this worker's JSONL file"""
+        if not self.buffer or not self.directory:
+            return
+        records, self.buffer = self.buffer, []
+        path = self._path()
+        try:
+            if os.path.exists(path) and os.path.getsize(path) > self.max_file_bytes:
+                os.replace(path, path + '.1')
+            with open(path, 'a', encoding='utf-8') as f:
+                f.write(''.join(json.dumps(record, default=str) + '\n' for record in records))
+        except OSError as e:
+            self.dropped += len(records)
+            logger.error(f"❌ Could not write spans to {path}: {e}")
+
+    def _flush_loop(self):
+        while True:
+            eventlet.sleep(FLUSH_INTERVAL_SECONDS)
+            self.flush()
+
+    # --------------------------------------------------------------- viewer
+
+    def _read_spans(self):
+        if not self.directory:
+            return
+        for path in sorted(glob.glob(os.path.join(self.directory, 'spans-*.jsonl*'))):
+            try:
+                with open(path, encoding='utf-8') as f:
+                    for line in f:
+                        try:
+                            yield json.loads(line)
+                        except ValueError:
+                            continue
+            except OSError:
+                continue
+
+    def recent_traces(self, limit=100, search=None, min_ms=0):
+        """
+        Newest traces (all workers), as their root span plus span counts.
+
+        Args:
+            limit: Traces returned
+            search: Only traces whose root span name contains this text
+            min_ms: Only traces whose root span took at least this long
+        """
+        self.flush()
+        traces = {}
+        for record in self._read_spans():
+            trace = traces.setdefault(record['trace_id'], {'spans': 0, 'kinds': {}, 'errors': 0, 'root': None})
+            trace['spans'] += 1
+            trace['kinds'][record['kind']] = trace['kinds'].get(record['kind'], 0) + 1
+            if record.get('error'):
+                trace['errors'] += 1
+            # The root is the earliest span without a parent (or, for a continued trace, the earliest one)
+            rank = (record.get('parent_id') is not None, record['start'])
+            if trace['root'] is None or rank < trace['rank']:
+                trace['root'], trace['rank'] = record, rank
+
+        results = []
+        for trace_id, trace in traces.items():
+            root = trace['root']
+            if search and search.lower() not in root['name'].lower():
+                continue
+            if root['duration_ms'] < min_ms:
+                continue
+            trace.pop('rank')
+            results.append(dict(trace, trace_id=trace_id))
+        results.sort(key=lambda item: item['root']['start'], reverse=True)
+        return results[:limit]
+
+    def trace_waterfall(self, trace_id):
+        """
+        Spans of one trace in start order with depth and offsets for a waterfall.
+
+        Returns:
+            dict: trace_id, start, duration_ms and spans (each with depth, offset_ms, offset_pct, width_pct)
+        """
+        self.flush()
+        spans = [record for record in self._read_spans() if record['trace_id'] == trace_id]
+        if not spans:
+            return None
+        spans.sort(key=lambda record: record['start'])
+        by_id = {record['span_id']: record for record in spans}
+        start = spans[0]['start']
+        end = max(record['start'] + record['duration_ms'] for record in spans)
+        total = max(end - start, 0.001)
+
+        def depth(record):
+            level, parent = 0, by_id.get(record.get('parent_id'))
+            while parent is not None and level < 50:
+                level, parent = level + 1, by_id.get(parent.get('parent_id'))
+            return level
+
+        ordered, children = [], {}
+        for record in spans:
+            children.setdefault(record.get('parent_id') if record.get('parent_id') in by_id else None, []).append(record)
+
+        def walk(parent_id):
+            for record in children.get(parent_id, []):
+                ordered.append(record)
+                walk(record['span_id'])
+        walk(None)
+
+        for record in ordered:
+            record['depth'] = depth(record)
+            record['offset_ms'] = round(record['start'] - start, 3)
+            record['offset_pct'] = round((record['start'] - start) * 100 / total, 3)
+            record['width_pct'] = max(round(record['duration_ms'] * 100 / total, 3), 0.2)
+        return {'trace_id': trace_id, 'start': start, 'duration_ms': round(total, 3), 'spans': ordered}
+
+    def stats(self):
+        return {'enabled': self.enabled, 'buffered': len(self.buffer), 'dropped': self.dropped,
+                'sample_rate': self.sample_rate}
+
+
+def _instrument_smtp(tracer):
+    """A span around every SMTP.sendmail (send_message goes through it), whichever module sends"""
+    if getattr(smtplib.SMTP.sendmail, '_pbs_tracing', False):
+        return
+    original = smtplib.SMTP.sendmail
+
+    @wraps(original)
+    def sendmail(self, from_addr, to_addrs, *args, **kwargs):
+        recipients = 1 if isinstance(to_addrs, str) else len(to_addrs)
+        with tracer.span('smtp sendmail', 'smtp', host=getattr(self, '_host', None), recipients=recipients):
+            return original(self, from_addr, to_addrs, *args, **kwargs)
+
+    sendmail._pbs_tracing = True
+    smtplib.SMTP.sendmail = sendmail
+
+
+# Global instance
+tracer = Tracer()
@@ -0,0 +1,108 @@
+/**
+ * Background Jobs JavaScript Module
+ * Tracks jobs queued by heavy routes (bonus analysis, Excel export, bulk uploads)
+ * Compatible with ALL browsers: Chrome, Edge, Safari, Firefox, Opera Mini, IE11
+ *
+ * Usage:
+ *   PBSJobs.track(jobId, {
+ *       onProgress: function(job) { ... },   // job.progress.percent / job.progress.message
+ *       onFinished: function(job) { ... }    // job.status: succeeded / failed / cancelled
+ *   });
+ *   PBSJobs.cancel(jobId);
+ *   PBSJobs.downloadUrl(jobId);
+ *
+ * Progress is polled from /jobs/<id>. Pages with a Socket.IO connection can also
+ * call PBSJobs.attachSocket(socket) to get job_progress / job_finished pushes.
+ */
+
+(function() {
+    'use strict';
+
+    var POLL_INTERVAL_MS = 1500;
+    var FINISHED = ['succeeded', 'failed', 'cancelled'];
+    var trackers = {};
+
+    function isFinished(job) {
+        return FINISHED.indexOf(job.status) !== -1;
+    }
+
+    function getJSON(url, method, callback) {
+        var xhr = new XMLHttpRequest();
+        xhr.open(method, url, true);
+        xhr.setRequestHeader('Accept', 'application/json');
+        xhr.onreadystatechange = function() {
+            if (xhr.readyState !== 4) return;
+            var data = null;
+            try {
+                data = JSON.parse(xhr.responseText);
+            } catch (e) {
+                data = { error: 'Invalid server response' };
+            }
+            callback(xhr.status, data);
+        };
+        xhr.send();
+    }
+
+    function handleUpdate(jobId, job) {
+        var tracker = trackers[jobId];
+        if (!tracker) return;
+        if (isFinished(job)) {
+            clearTimeout(tracker.timer);
+            delete trackers[jobId];
+            if (tracker.options.onFinished) tracker.options.onFinished(job);
+        } else if (tracker.options.onProgress) {
+            tracker.options.onProgress(job);
+        }
+    }
+
+    function poll(jobId) {
+        var tracker = trackers[jobId];
+        if (!tracker) return;
+        getJSON('/jobs/' + jobId, 'GET', function(status, data) {
+            if (!trackers[jobId]) return;
+            if (status === 200 && data.job) {
+                handleUpdate(jobId, data.job);
+            } else if (status === 404 || status === 401) {
+                delete trackers[jobId];
+                if (tracker.options.onFinished) {
+                    tracker.options.onFinished({ job_id: jobId, status: 'failed', error: data.error || 'Job not found' });
+                }
+                return;
+            }
+            if (trackers[jobId]) {
+                tracker.timer = setTimeout(function() { poll(jobId); }, POLL_INTERVAL_MS);
+            }
+        });
+    }
+
+    var PBSJobs = {
+        track: function(jobId, options) {
+            trackers[jobId] = { options: options || {}, timer: null };
+            poll(jobId);
+        },
+
+        cancel: function(jobId, callback) {
+            getJSON('/jobs/' + jobId + '/cancel', 'POST', function(status, data) {
+                if (callback) callback(status === 200, data);
+            });
+        },
+
+        downloadUrl: function(jobId) {
+            return '/jobs/' + jobId + '/download';
+        },
+
+        attachSocket: function(socket) {
+            if (!socket || !socket.on) return;
+            socket.on('job_progress', function(data) {
+                if (data && data.job_id && trackers[data.job_id]) {
+                    handleUpdate(data.job_id, { job_id: data.job_id, status: data.status, progress: data.progress });
+                }
+            });
+            socket.on('job_finished', function(data) {
+                if (data && data.job_id) handleUpdate(data.job_id, data);
+            });
+        }
+    };
+
+    window.PBSJobs = PBSJobs;
+})();
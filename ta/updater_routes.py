@@ -15,6 +15,7 @@ from .helpers import (
 )
 from .ta_email_service import send_new_request_email, send_bulk_request_email
 from utils.error_handling import error_print
+from utils.cpu_offload import parse_csv_upload
 
 
 @ta_bp.route('/updater/dashboard', methods=['GET', 'POST'])
@@ -448,7 +449,7 @@ def validate_bulk_upload():
         
         # Parse CSV
         csv_content = file.read().decode('utf-8')
-        csv_reader = csv.DictReader(io.StringIO(csv_content))
+        csv_reader = parse_csv_upload(csv_content)
         
         # Validate headers
         expected_headers = ['employee_id', 'validator_employee_id', 'event_date', 'category_code', 'quantity', 'notes']
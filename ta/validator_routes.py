@@ -15,6 +15,7 @@ from .ta_email_service import (
     send_bulk_rejection_email_to_updater
 )
 from utils.error_handling import error_print
+from services.query_monitor import query_budget
 
 
 @ta_bp.route('/validator/dashboard', methods=['GET', 'POST'])
@@ -814,6 +815,7 @@ def get_pending_requests():
 
 
 @ta_bp.route('/validator/check-new-requests')
+@query_budget(7)
 def check_new_requests():
     """Check for new pending requests"""
     has_access, user = check_ta_validator_access()
@@ -859,15 +861,29 @@ def check_new_requests():
                 {"category_department": {"$regex": "^ta", "$options": "i"}}  # Employee-raised TA requests
             ]
         }).sort("request_date", -1)
+        new_requests_data = list(new_requests_cursor)
+        
+        # ✅ Employees and categories of all new requests in one lookup each
+        employee_ids = list({req_data["user_id"] for req_data in new_requests_data})
+        employees_map = {
+            emp["_id"]: emp for emp in mongo.db.users.find({"_id": {"$in": employee_ids}})
+        } if employee_ids else {}
+        
+        categories_map = {cat["_id"]: cat for cat in ta_categories}
+        missing_category_ids = list({
+            req_data.get("category_id") for req_data in new_requests_data
+            if req_data.get("category_id") not in categories_map
+        })
+        if missing_category_ids:
+            # Try hr_categories first, then fall back to old categories collection
+            for collection in (mongo.db.hr_categories, mongo.db.categories):
+                for cat in collection.find({"_id": {"$in": missing_category_ids}}):
+                    categories_map.setdefault(cat["_id"], cat)
         
         new_requests = []
-        for req_data in new_requests_cursor:
-            employee = mongo.db.users.find_one({"_id": req_data["user_id"]})
-            
-            # Try to get category from hr_categories first, then fall back to old categories collection
-            category = mongo.db.hr_categories.find_one({"_id": req_data.get("category_id")})
-            if not category:
-                category = mongo.db.categories.find_one({"_id": req_data.get("category_id")})
+        for req_data in new_requests_data:
+            employee = employees_map.get(req_data["user_id"])
+            category = categories_map.get(req_data.get("category_id"))
             
             if employee and category:
                 new_requests.append({
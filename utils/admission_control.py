@@ -0,0 +1,204 @@
+"""
+Admission control with per-route-class bulkheads
+
+Every request of a worker shares one greenlet hub and one Mongo connection
+pool, so a handful of Excel exports or analytics recomputes could starve the
+login page and the dashboards' polling endpoints. Requests are split into
+route classes, each with its own concurrency limit per worker:
+
+- ``interactive`` - everything not listed below (logins, dashboards, polling APIs)
+- ``analytics``   - analytics/leaderboard pages and their data APIs, pending tracker
+- ``batch``       - exports, bonus analysis, bulk uploads/validations
+
+A request waits at most ``queue_timeout`` seconds for a slot of its class and at
+most ``max_queue`` requests wait at once; otherwise it is shed with
+``503 Service Unavailable`` and ``Retry-After`` so heavy work backs off instead of
+degrading interactive latency. Limits come from ``ROUTE_CLASS_LIMITS`` in config.
+The route class also selects the request's Mongo client profile (utils/mongo_profiles.py).
+"""
+
+import time
+from eventlet.semaphore import Semaphore
+from flask import g, request, jsonify, make_response
+from extensions import mongo
+
+INTERACTIVE = 'interactive'
+ANALYTICS = 'analytics'
+BATCH = 'batch'
+
+DEFAULT_LIMITS = {
+    INTERACTIVE: {'concurrency': 200, 'max_queue': 400, 'queue_timeout': 10, 'retry_after': 2},
+    ANALYTICS: {'concurrency': 8, 'max_queue': 24, 'queue_timeout': 5, 'retry_after': 5},
+    BATCH: {'concurrency': 2, 'max_queue': 4, 'queue_timeout': 2, 'retry_after': 15},
+}
+
+# Full endpoint names of analytics routes
+ANALYTICS_ENDPOINTS = {
+    'hr_analytics.pbs_analytics',
+    'hr_analytics.api_analytics_data',
+    'central.dashboard',
+    'central.dashboard_optimized',
+    'central.analytics',
+    'central.leaderboard',
+    'employee_leaderboard.get_leaderboard_data_route',
+    'employee_leaderboard.get_leaderboard_summary',
+    'dp.employees_points_summary',
+    'dp.get_leaderboard_data',
+    'dp.leaderboard',
+    'pending_tracker.pending_points_tracker',
+    'central.slow_queries',
+}
+
+# View function names that are batch work in whichever blueprint they live
+BATCH_VIEWS = {
+    'export_excel',
+    'export_excel_job',
+    'send_bonus_analysis',
+    'bulk_upload',
+    'validate_bulk_upload',
+    'bulk_update',
+    'bulk_delete_users',
+    'check_bulk_duplicates',
+}
+
+# Never queued: static assets (including the fingerprinted /assets) and Socket.IO's own endpoint
+EXEMPT_ENDPOINTS = {None, 'static', 'assets'}
+
+
+def classify_endpoint(endpoint):
+    """Route class of a Flask endpoint name (None for exempt endpoints)"""
+    if endpoint in EXEMPT_ENDPOINTS or endpoint.endswith('.static'):
+        return None
+    if endpoint in ANALYTICS_ENDPOINTS:
+        return ANALYTICS
+    if endpoint.rsplit('.', 1)[-1] in BATCH_VIEWS:
+        return BATCH
+    return INTERACTIVE
+
+
+class Bulkhead:
+    """Concurrency limit plus bounded, time-limited wait queue for one route class"""
+
+    def __init__(self, name, concurrency, max_queue, queue_timeout, retry_after):
+        self.name = name
+        self.concurrency = concurrency
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.retry_after = retry_after
+        self.slots = Semaphore(concurrency)
+        self.active = 0
+        self.waiting = 0
+        self.admitted = 0
+        self.shed = 0
+
+    def acquire(self):
+        """
+        Take a slot, waiting up to queue_timeout.
+
+        Returns:
+            True if admitted, False if the request should be shed
+        """
+        if self.slots.acquire(blocking=False):
+            self._admitted()
+            return True
+        if self.waiting >= self.max_queue:
+            self.shed += 1
+            return False
+        self.waiting += 1
+        try:
+            acquired = self.slots.acquire(timeout=self.queue_timeout)
+        finally:
+            self.waiting -= 1
+        if not acquired:
+            self.shed += 1
+            return False
+        self._admitted()
+        return True
+
+    def _admitted(self):
+        self.active += 1
+        self.admitted += 1
+
+    def release(self):
+        self.active -= 1
+        self.slots.release()
+
+    def stats(self):
+        return {
+            'concurrency': self.concurrency,
+            'active': self.active,
+            'waiting': self.waiting,
+            'admitted': self.admitted,
+            'shed': self.shed
+        }
+
+
+# Global bulkheads (one set per worker process), built by init_admission_control
+bulkheads = {}
+
+
+def _wants_json():
+    if request.is_json or '/api/' in request.path:
+        return True
+    if request.headers.get('X-Requested-With') == 'XMLHttpRequest':
+        return True
+    best = request.accept_mimetypes.best_match(['application/json', 'text/html'])
+    return best == 'application/json'
+
+
+def _shed_response(bulkhead):
+    message = 'The server is busy with heavy requests, please retry shortly'
+    if _wants_json():
+        response = jsonify({'error': message, 'route_class': bulkhead.name, 'retry_after': bulkhead.retry_after})
+    else:
+        response = make_response(
+            f"<html><body style=\"font-family: sans-serif; padding: 20px;\"><h2>Server busy</h2>"
+            f"<p>{message}. This page will be available again in about {bulkhead.retry_after} seconds.</p>"
+            f"</body></html>"
+        )
+    response.status_code = 503
+    response.headers['Retry-After'] = str(bulkhead.retry_after)
+    return response
+
+
+def _admit():
+    route_class = classify_endpoint(request.endpoint)
+    g.route_class = route_class
+    if route_class:
+        # Each route class reads through its own Mongo client profile
+        g.mongo_profile = mongo.profile_for_route_class(route_class)
+    bulkhead = bulkheads.get(route_class)
+    if bulkhead is None:
+        return None
+    started = time.monotonic()
+    if not bulkhead.acquire():
+        return _shed_response(bulkhead)
+    g.admission_bulkhead = bulkhead
+    g.admission_wait_ms = (time.monotonic() - started) * 1000
+    return None
+
+
+def _release(exc=None):
+    bulkhead = g.pop('admission_bulkhead', None)
+    if bulkhead is not None:
+        bulkhead.release()
+
+
+def init_admission_control(app):
+    """
+    Create the bulkheads from config and hook them into the request cycle.
+    Requests are classified (and pick their Mongo profile) even with
+    ADMISSION_CONTROL_ENABLED off; only the concurrency limits are skipped.
+    """
+    if app.config.get('ADMISSION_CONTROL_ENABLED', True):
+        configured = app.config.get('ROUTE_CLASS_LIMITS') or {}
+        for name, defaults in DEFAULT_LIMITS.items():
+            limits = dict(defaults, **configured.get(name, {}))
+            bulkheads[name] = Bulkhead(name, **limits)
+    app.before_request(_admit)
+    app.teardown_request(_release)
+
+
+def admission_stats():
+    """Per-class counters for diagnostics/metrics"""
+    return {name: bulkhead.stats() for name, bulkhead in bulkheads.items()}
@@ -0,0 +1,465 @@
+"""
+Content-addressed attachment storage
+
+The same certificate or appreciation screenshot is often attached to many
+requests. Uploads are hashed with SHA-256 while they stream into GridFS; when
+the content already exists the new copy is dropped and the existing file id is
+reused. Each stored file keeps ``metadata.ref_count`` so an attachment is only
+removed from GridFS when the last request referencing it lets go of it.
+
+A unique partial index on ``fs.files.metadata.sha256`` makes the "first
+writer wins" decision atomic under concurrent uploads.
+
+Two backends are supported (``Config.ATTACHMENT_BACKEND``):
+
+- ``gridfs`` (default): bytes live in fs.chunks.
+- ``local``: bytes live in a content-addressed tree under
+  ``ATTACHMENT_LOCAL_ROOT/cas/ab/cd/<sha256>`` and are delivered by
+  send_file / X-Sendfile / nginx X-Accel-Redirect. The fs.files document stays
+  the catalog entry (same _id, filename, length, metadata) with
+  ``metadata.storage = 'local'``, so every stored ``attachment_id`` keeps working.
+
+``python -m utils.attachment_store migrate-local`` moves existing GridFS files
+to the local tree in batches.
+"""
+
+import argparse
+import hashlib
+import io
+import os
+import tempfile
+import uuid
+from datetime import datetime
+from flask import current_app
+from bson import ObjectId
+from gridfs import GridFS
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
+from extensions import mongo
+from utils.error_handling import error_print
+
+SHA256_FIELD = 'metadata.sha256'
+REF_COUNT_FIELD = 'metadata.ref_count'
+SHA256_INDEX_NAME = 'metadata_sha256_unique'
+
+LOCAL_STORAGE = 'local'
+STORAGE_FIELD = 'metadata.storage'
+LOCAL_PATH_FIELD = 'metadata.local_path'
+
+# GridFS default chunk size - reading the upload in the same unit keeps one chunk in memory
+UPLOAD_READ_SIZE = 255 * 1024
+
+
+def local_attachment_root():
+    """Root directory of the local attachment tree"""
+    return current_app.config.get('ATTACHMENT_LOCAL_ROOT') or os.path.join(os.getcwd(), 'Uploads', 'attachments')
+
+
+def local_relative_path(sha256):
+    """Content-addressed path relative to the local root, e.g. cas/ab/cd/abcd..."""
+    return '/'.join(('cas', sha256[:2], sha256[2:4], sha256))
+
+
+def local_attachment_path(relative_path):
+    """Absolute path for a stored relative path"""
+    return os.path.join(local_attachment_root(), *relative_path.split('/'))
+
+
+def is_local_attachment(file_doc_or_grid_out):
+    """True when a catalog entry (fs.files document or GridOut) is stored on local disk"""
+    metadata = (file_doc_or_grid_out.get('metadata') if isinstance(file_doc_or_grid_out, dict)
+                else file_doc_or_grid_out.metadata) or {}
+    return metadata.get('storage') == LOCAL_STORAGE
+
+
+def _write_local_temp(pieces):
+    """
+    Stream pieces into a temp file inside the local root while hashing them.
+
+    Returns:
+        tuple: (temp_path, sha256_hex, md5_hex, length)
+    """
+    tmp_dir = os.path.join(local_attachment_root(), 'tmp')
+    os.makedirs(tmp_dir, exist_ok=True)
+    sha256 = hashlib.sha256()
+    md5 = hashlib.md5()
+    length = 0
+    fd, tmp_path = tempfile.mkstemp(dir=tmp_dir)
+    try:
+        with os.fdopen(fd, 'wb') as out:
+            for piece in pieces:
+                sha256.update(piece)
+                md5.update(piece)
+                out.write(piece)
+                length += len(piece)
+    except Exception:
+        os.remove(tmp_path)
+        raise
+    return tmp_path, sha256.hexdigest(), md5.hexdigest(), length
+
+
+def _place_local_file(tmp_path, relative_path):
+    """Move a finished temp file to its content-addressed location (identical content may already be there)"""
+    final_path = local_attachment_path(relative_path)
+    if os.path.exists(final_path):
+        os.remove(tmp_path)
+        return final_path
+    os.makedirs(os.path.dirname(final_path), exist_ok=True)
+    os.replace(tmp_path, final_path)
+    return final_path
+
+
+def ensure_attachment_indexes():
+    """Create the unique partial index used for content deduplication"""
+    try:
+        mongo.db.fs.files.create_index(
+            [(SHA256_FIELD, 1)],
+            name=SHA256_INDEX_NAME,
+            unique=True,
+            partialFilterExpression={SHA256_FIELD: {"$exists": True}},
+            background=True
+        )
+        return True
+    except Exception as e:
+        error_print("Error creating attachment sha256 index", e)
+        return False
+
+
+def _iter_upload(data):
+    """Yield the upload in GridFS sized pieces (bytes, FileStorage or any file-like object)"""
+    stream = io.BytesIO(data) if isinstance(data, (bytes, bytearray)) else data
+    while True:
+        piece = stream.read(UPLOAD_READ_SIZE)
+        if not piece:
+            break
+        yield piece
+
+
+def _share_existing(sha256):
+    """
+    Add a reference to the stored file with this content.
+
+    Files whose count already dropped to 0 are being deleted by release_attachment
+    and are never revived.
+
+    Returns:
+        dict or None: {'_id': ...} of the shared file
+    """
+    return mongo.db.fs.files.find_one_and_update(
+        {SHA256_FIELD: sha256, REF_COUNT_FIELD: {"$gte": 1}},
+        {"$inc": {REF_COUNT_FIELD: 1}},
+        projection={"_id": 1}
+    )
+
+
+def store_attachment(data, filename, content_type=None, metadata=None):
+    """
+    Store an upload in GridFS, reusing an existing file with identical content.
+
+    Args:
+        data: bytes or a file-like object (e.g. werkzeug FileStorage)
+        filename (str): GridFS filename
+        content_type (str, optional): MIME type
+        metadata (dict, optional): Extra metadata (original_filename, user_id, ...)
+
+    Returns:
+        ObjectId: id of the stored (or reused) GridFS file
+    """
+    if current_app.config.get('ATTACHMENT_BACKEND') == LOCAL_STORAGE:
+        return _store_local_attachment(data, filename, content_type, metadata)
+
+    fs = GridFS(mongo.db)
+    digest = hashlib.sha256()
+
+    # Hash while streaming into GridFS so the upload is only read once
+    with fs.new_file(
+        filename=filename,
+        content_type=content_type or 'application/octet-stream',
+        metadata=dict(metadata or {})
+    ) as grid_in:
+        for piece in _iter_upload(data):
+            digest.update(piece)
+            grid_in.write(piece)
+    new_id = grid_in._id
+    sha256 = digest.hexdigest()
+
+    try:
+        # Claim the hash for this file - fails atomically if the content already exists
+        mongo.db.fs.files.update_one(
+            {"_id": new_id},
+            {"$set": {SHA256_FIELD: sha256, REF_COUNT_FIELD: 1}}
+        )
+        return new_id
+    except DuplicateKeyError:
+        existing = _share_existing(sha256)
+        if existing:
+            fs.delete(new_id)
+            return existing['_id']
+        # The original is being (or was) released between the two operations - keep our copy
+        try:
+            mongo.db.fs.files.update_one(
+                {"_id": new_id},
+                {"$set": {SHA256_FIELD: sha256, REF_COUNT_FIELD: 1}}
+            )
+        except DuplicateKeyError:
+            # Its catalog entry is not deleted yet: ours stays unshared until then
+            mongo.db.fs.files.update_one({"_id": new_id}, {"$set": {REF_COUNT_FIELD: 1}})
+        return new_id
+
+
+def _store_local_attachment(data, filename, content_type, metadata):
+    """Local backend for store_attachment: bytes on disk, catalog entry in fs.files"""
+    tmp_path, sha256, md5, length = _write_local_temp(_iter_upload(data))
+    try:
+        existing = _share_existing(sha256)
+        if existing:
+            return existing['_id']
+
+        relative_path = local_relative_path(sha256)
+        file_doc = {
+            "filename": filename,
+            "contentType": content_type or 'application/octet-stream',
+            "length": length,
+            "chunkSize": UPLOAD_READ_SIZE,
+            "uploadDate": datetime.utcnow(),
+            "md5": md5,
+            "metadata": dict(metadata or {}, sha256=sha256, ref_count=1,
+                             storage=LOCAL_STORAGE, local_path=relative_path)
+        }
+        try:
+            file_id = mongo.db.fs.files.insert_one(file_doc).inserted_id
+        except DuplicateKeyError:
+            # A concurrent upload of the same content won - share its entry (the bytes on disk are identical)
+            existing = _share_existing(sha256)
+            if existing:
+                return existing['_id']
+            # The original was released between the two operations - claim the hash for our entry,
+            # or keep it unshared while the released entry still holds it
+            file_doc.pop('_id', None)
+            try:
+                file_id = mongo.db.fs.files.insert_one(file_doc).inserted_id
+            except DuplicateKeyError:
+                file_doc.pop('_id', None)
+                del file_doc['metadata']['sha256']
+                file_id = mongo.db.fs.files.insert_one(file_doc).inserted_id
+
+        # Placed once the catalog entry exists: a release of the same content that is removing
+        # the file right now sees the entry and puts the file back (see _delete_attachment_bytes)
+        _place_local_file(tmp_path, relative_path)
+        return file_id
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+def _delete_attachment_bytes(file_doc):
+    """Remove the bytes of a deleted catalog entry (GridFS chunks or the local file when no longer shared)"""
+    mongo.db.fs.chunks.delete_many({"files_id": file_doc['_id']})
+    if not is_local_attachment(file_doc):
+        return
+    relative_path = file_doc['metadata'].get('local_path')
+    # Legacy duplicates migrated from GridFS can share one local file
+    if not relative_path or mongo.db.fs.files.count_documents({LOCAL_PATH_FIELD: relative_path}, limit=1):
+        return
+    path = local_attachment_path(relative_path)
+    doomed = f'{path}.{uuid.uuid4().hex}.deleting'
+    try:
+        os.rename(path, doomed)
+    except FileNotFoundError:
+        return
+    # An upload of the same content may have added its entry after the count - it keeps the file
+    if mongo.db.fs.files.count_documents({LOCAL_PATH_FIELD: relative_path}, limit=1):
+        os.replace(doomed, path)
+    else:
+        os.remove(doomed)
+
+
+def release_attachment(file_id):
+    """
+    Drop one reference to an attachment and delete it from GridFS when unused.
+
+    The count is decremented first and the catalog entry is deleted only while it
+    is still at 0, so a concurrent store_attachment of the same content either
+    shares the file before the decrement or stores a new copy - never an id that
+    is about to disappear. Files stored before deduplication have no ref_count
+    and are treated as having a single reference.
+
+    Returns:
+        bool: True when the GridFS file was deleted
+    """
+    if not file_id:
+        return False
+    try:
+        if isinstance(file_id, str):
+            file_id = ObjectId(file_id)
+        updated = mongo.db.fs.files.find_one_and_update(
+            {"_id": file_id, "metadata": {"$type": "object"}},
+            {"$inc": {REF_COUNT_FIELD: -1}},
+            projection={REF_COUNT_FIELD: 1},
+            return_document=ReturnDocument.AFTER
+        )
+        if updated and updated['metadata']['ref_count'] > 0:
+            return False
+        # Very old uploads have no metadata document: never hashed, so never shared
+        unused = ({"_id": file_id, REF_COUNT_FIELD: {"$lte": 0}} if updated
+                  else {"_id": file_id, "metadata": {"$not": {"$type": "object"}}})
+        file_doc = mongo.db.fs.files.find_one_and_delete(unused, projection={"metadata": 1})
+        if not file_doc:
+            return False
+        _delete_attachment_bytes(file_doc)
+        return True
+    except Exception as e:
+        error_print(f"Error releasing attachment {file_id}", e)
+        return False
+
+
+def release_request_attachments(query):
+    """
+    Release the attachments of every points_request matching ``query``.
+
+    Call before deleting requests so shared files lose one reference each and
+    files nobody references any more are removed from GridFS.
+
+    Returns:
+        int: number of GridFS files deleted
+    """
+    deleted = 0
+    for req in mongo.db.points_request.find(
+        dict(query, attachment_id={"$ne": None}), {"attachment_id": 1}
+    ):
+        if release_attachment(req.get('attachment_id')):
+            deleted += 1
+    return deleted
+
+
+def backfill_attachment_hashes():
+    """
+    Hash GridFS files stored before deduplication existed.
+
+    Identical legacy files are left as separate copies (requests point at them by
+    id), but later uploads of the same content will reuse the first hashed copy.
+
+    Returns:
+        tuple: (hashed_count, duplicate_count)
+    """
+    fs = GridFS(mongo.db)
+    hashed_count = 0
+    duplicate_count = 0
+    for file_doc in mongo.db.fs.files.find({SHA256_FIELD: {"$exists": False}}, {"_id": 1, "metadata": 1}):
+        digest = hashlib.sha256()
+        grid_out = fs.get(file_doc['_id'])
+        for piece in _iter_upload(grid_out):
+            digest.update(piece)
+        grid_out.close()
+
+        ref_count = mongo.db.points_request.count_documents({"attachment_id": file_doc['_id']}) or 1
+        hash_fields = {'sha256': digest.hexdigest(), 'ref_count': ref_count, 'hashed_at': datetime.utcnow()}
+        if isinstance(file_doc.get('metadata'), dict):
+            update = {"$set": {f"metadata.{key}": value for key, value in hash_fields.items()}}
+        else:
+            # Very old uploads have no metadata document to extend
+            update = {"$set": {"metadata": hash_fields}}
+        try:
+            mongo.db.fs.files.update_one({"_id": file_doc['_id']}, update)
+            hashed_count += 1
+        except DuplicateKeyError:
+            duplicate_count += 1
+    return hashed_count, duplicate_count
+
+
+def migrate_gridfs_to_local(batch_size=100, limit=None):
+    """
+    Move GridFS attachment bytes into the local content-addressed tree.
+
+    Files are processed in _id order, batch by batch. Each file is copied to a
+    temp file, verified against its stored length (and sha256 when known), moved
+    into place, flagged as local in fs.files and only then are its chunks removed,
+    so an interrupted run can simply be restarted.
+
+    Returns:
+        tuple: (moved_count, failed_count)
+    """
+    fs = GridFS(mongo.db)
+    moved_count = 0
+    failed_count = 0
+    last_id = None
+
+    while limit is None or moved_count + failed_count < limit:
+        query = {STORAGE_FIELD: {"$ne": LOCAL_STORAGE}}
+        if last_id is not None:
+            query["_id"] = {"$gt": last_id}
+        remaining = batch_size if limit is None else min(batch_size, limit - moved_count - failed_count)
+        batch = list(mongo.db.fs.files.find(query, {"_id": 1, "length": 1, "metadata": 1})
+                     .sort("_id", 1).limit(remaining))
+        if not batch:
+            break
+
+        for file_doc in batch:
+            last_id = file_doc['_id']
+            try:
+                grid_out = fs.get(file_doc['_id'])
+                tmp_path, sha256, md5, length = _write_local_temp(_iter_upload(grid_out))
+                grid_out.close()
+
+                known_sha256 = (file_doc.get('metadata') or {}).get('sha256')
+                if length != file_doc.get('length') or (known_sha256 and known_sha256 != sha256):
+                    os.remove(tmp_path)
+                    raise ValueError("content does not match the stored length/sha256")
+
+                relative_path = local_relative_path(sha256)
+                _place_local_file(tmp_path, relative_path)
+
+                local_fields = {'storage': LOCAL_STORAGE, 'local_path': relative_path}
+                if not known_sha256:
+                    local_fields.update(sha256=sha256, ref_count=mongo.db.points_request.count_documents(
+                        {"attachment_id": file_doc['_id']}) or 1)
+                if isinstance(file_doc.get('metadata'), dict):
+                    update = {"$set": {f"metadata.{key}": value for key, value in local_fields.items()}}
+                else:
+                    update = {"$set": {"metadata": local_fields}}
+                try:
+                    mongo.db.fs.files.update_one({"_id": file_doc['_id']}, update)
+                except DuplicateKeyError:
+                    # Legacy duplicate content: keep it unhashed, it still points at the shared local file
+                    update["$set"].pop("metadata.sha256", None)
+                    update["$set"].pop("metadata.ref_count", None)
+                    if "metadata" in update["$set"]:
+                        update["$set"]["metadata"] = {'storage': LOCAL_STORAGE, 'local_path': relative_path}
+                    mongo.db.fs.files.update_one({"_id": file_doc['_id']}, update)
+
+                mongo.db.fs.chunks.delete_many({"files_id": file_doc['_id']})
+                moved_count += 1
+            except Exception as e:
+                failed_count += 1
+                error_print(f"Error migrating attachment {file_doc['_id']} to local storage", e)
+
+        print(f"   ... {moved_count} moved, {failed_count} failed")
+
+    return moved_count, failed_count
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Attachment storage maintenance")
+    parser.add_argument('command', nargs='?', default='backfill-hashes',
+                        choices=['backfill-hashes', 'migrate-local'])
+    parser.add_argument('--batch-size', type=int, default=100)
+    parser.add_argument('--limit', type=int, default=None)
+    args = parser.parse_args()
+
+    # Only the database is needed: a bare app, not app.py (whose eventlet patching must run before
+    # any other import, which is already too late here)
+    from flask import Flask
+    from config import Config
+
+    app = Flask(__name__)
+    app.config.from_object(Config)
+    mongo.init_app(app)
+
+    with app.app_context():
+        ensure_attachment_indexes()
+        if args.command == 'migrate-local':
+            moved, failed = migrate_gridfs_to_local(batch_size=args.batch_size, limit=args.limit)
+            print(f"✅ Attachments moved to {local_attachment_root()}: {moved}, failed: {failed}")
+        else:
+            hashed, duplicates = backfill_attachment_hashes()
+            print(f"✅ Attachments hashed: {hashed}, legacy duplicates left as separate copies: {duplicates}")
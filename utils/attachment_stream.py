@@ -0,0 +1,182 @@
+"""
+Streaming GridFS attachment delivery
+
+Shared by every blueprint that serves request attachments. Files are streamed
+chunk by chunk straight from GridFS instead of being read into a BytesIO, so a
+large certificate or PDF never sits in worker memory as a whole. Supports
+single-range ``Range`` requests (resumable downloads, PDF viewers) and
+``If-None-Match`` revalidation using the GridFS md5 (or file id when md5 is not
+stored). Attachments are immutable once uploaded, so responses carry a long
+private cache lifetime.
+
+Catalog entries whose bytes live on local disk (``metadata.storage == 'local'``,
+see utils.attachment_store) are handed to the web server instead: an nginx
+``X-Accel-Redirect`` when ``ATTACHMENT_X_ACCEL_PREFIX`` is configured, otherwise
+send_file, which uses X-Sendfile (``USE_X_SENDFILE``) or the WSGI file wrapper.
+"""
+
+import unicodedata
+from urllib.parse import quote
+from bson import ObjectId
+from bson.errors import InvalidId
+from flask import current_app, request, Response, send_file
+from gridfs import GridFS, NoFile
+from extensions import mongo
+
+# Attachments never change after upload - let the browser keep them for a year
+ATTACHMENT_CACHE_MAX_AGE = 365 * 24 * 60 * 60
+
+
+def open_gridfs_file(file_id):
+    """
+    Open a GridFS file by id with a single query.
+
+    Args:
+        file_id: ObjectId or its string form
+
+    Returns:
+        GridOut or None when the id is invalid or the file does not exist
+    """
+    try:
+        if isinstance(file_id, str):
+            file_id = ObjectId(file_id)
+        return GridFS(mongo.db).get(file_id)
+    except (NoFile, InvalidId, TypeError):
+        return None
+
+
+def gridfs_etag(grid_out):
+    """Strong validator for a GridFS file: its md5 when stored, otherwise the upload id"""
+    return getattr(grid_out, 'md5', None) or str(grid_out._id)
+
+
+def _content_disposition(download_name, as_attachment):
+    """Build a Content-Disposition value the same way Flask's send_file does"""
+    disposition = 'attachment' if as_attachment else 'inline'
+    try:
+        download_name.encode('ascii')
+    except UnicodeEncodeError:
+        simple = unicodedata.normalize('NFKD', download_name).encode('ascii', 'ignore').decode('ascii')
+        quoted = quote(download_name, safe="!#$&+^`|~")
+        return f"{disposition}; filename=\"{simple}\"; filename*=UTF-8''{quoted}"
+    return f"{disposition}; filename=\"{download_name}\""
+
+
+def _iter_gridfs_range(grid_out, start, stop):
+    """Yield GridFS chunks covering bytes [start, stop)"""
+    chunk_size = grid_out.chunk_size or 255 * 1024
+    grid_out.seek(start)
+    remaining = stop - start
+    try:
+        while remaining > 0:
+            data = grid_out.read(min(chunk_size, remaining))
+            if not data:
+                break
+            remaining -= len(data)
+            yield data
+    finally:
+        grid_out.close()
+
+
+def _send_local_file(grid_out, download_name, mimetype, as_attachment):
+    """Zero-copy delivery of a locally stored attachment"""
+    from utils.attachment_store import local_attachment_path
+
+    relative_path = grid_out.metadata['local_path']
+    etag = gridfs_etag(grid_out)
+    grid_out.close()
+    cache_control = f'private, max-age={ATTACHMENT_CACHE_MAX_AGE}, immutable'
+
+    accel_prefix = current_app.config.get('ATTACHMENT_X_ACCEL_PREFIX')
+    if accel_prefix:
+        # nginx serves the bytes (ranges included) from an internal location
+        response = Response(mimetype=mimetype, headers={
+            'X-Accel-Redirect': accel_prefix.rstrip('/') + '/' + relative_path,
+            'Content-Disposition': _content_disposition(download_name, as_attachment),
+            'Cache-Control': cache_control,
+        })
+        response.set_etag(etag)
+        return response
+
+    response = send_file(
+        local_attachment_path(relative_path),
+        mimetype=mimetype,
+        as_attachment=as_attachment,
+        download_name=download_name,
+        conditional=True,
+        etag=etag,
+        last_modified=grid_out.upload_date,
+        max_age=ATTACHMENT_CACHE_MAX_AGE
+    )
+    response.headers['Cache-Control'] = cache_control
+    return response
+
+
+def send_gridfs_file(grid_out, download_name=None, mimetype=None, as_attachment=True):
+    """
+    Stream a GridFS file to the client.
+
+    Args:
+        grid_out: GridOut returned by open_gridfs_file
+        download_name (str, optional): Filename shown to the user
+        mimetype (str, optional): Overrides the stored content type
+        as_attachment (bool): Download (True) or display inline (False)
+
+    Returns:
+        Response: 200 full body, 206 partial body, 304 not modified or 416 bad range
+    """
+    length = grid_out.length
+    etag = gridfs_etag(grid_out)
+    if download_name is None:
+        download_name = (grid_out.metadata or {}).get('original_filename') or grid_out.filename or 'attachment'
+    mimetype = mimetype or grid_out.content_type or 'application/octet-stream'
+
+    if (grid_out.metadata or {}).get('storage') == 'local':
+        return _send_local_file(grid_out, download_name, mimetype, as_attachment)
+
+    headers = {
+        'Accept-Ranges': 'bytes',
+        'Cache-Control': f'private, max-age={ATTACHMENT_CACHE_MAX_AGE}, immutable',
+        'Content-Disposition': _content_disposition(download_name, as_attachment),
+    }
+
+    # ✅ Browser already has this exact file
+    if request.if_none_match and request.if_none_match.contains(etag):
+        grid_out.close()
+        response = Response(status=304, headers=headers)
+        response.set_etag(etag)
+        return response
+
+    start, stop, status = 0, length, 200
+    byte_range = request.range
+    # If-Range with a stale validator means "send the whole file"
+    if byte_range and request.if_range.etag and request.if_range.etag != etag:
+        byte_range = None
+
+    # Multipart (several ranges) responses are not supported: send the whole file, as RFC 7233 allows
+    if byte_range and len(byte_range.ranges) > 1:
+        byte_range = None
+
+    if byte_range:
+        bounds = byte_range.range_for_length(length)
+        if bounds is None:
+            grid_out.close()
+            headers['Content-Range'] = f'bytes */{length}'
+            return Response(status=416, headers=headers)
+        start, stop = bounds
+        status = 206
+        headers['Content-Range'] = f'bytes {start}-{stop - 1}/{length}'
+
+    headers['Content-Length'] = str(stop - start)
+
+    response = Response(
+        _iter_gridfs_range(grid_out, start, stop),
+        status=status,
+        mimetype=mimetype,
+        headers=headers,
+        direct_passthrough=True
+    )
+    response.set_etag(etag)
+    if grid_out.upload_date:
+        response.last_modified = grid_out.upload_date
+    return response
@@ -0,0 +1,189 @@
+"""
+Blueprint registry with optional lazy loading
+
+Every blueprint the app serves is listed in ``BLUEPRINTS`` with its name and
+URL prefix, so it can be registered without importing its module first.
+
+- Eager (the default): ``init_app`` imports and registers them all at startup,
+  timing each import.
+- ``LAZY_BLUEPRINTS``: only the blueprints marked ``eager`` are imported at
+  startup (auth installs app-wide hooks; central, hr_registration and pm own
+  background job handlers). The others are imported and registered by the first
+  request under their URL prefix, or by the first ``url_for`` of one of their
+  endpoints. Meant for development servers and test start-up; production
+  workers keep the eager default so no user pays for an import.
+
+The import time of each blueprint (including the modules it is the first to
+import) is kept for ``/central/diagnostics/startup``; for a full per-module
+breakdown run ``python -m benchmarks.run imports``.
+"""
+
+import importlib
+import logging
+import threading
+import time
+from collections import namedtuple
+
+logger = logging.getLogger('pbs.startup')
+
+BlueprintSpec = namedtuple('BlueprintSpec', 'name module attribute url_prefix eager')
+
+BLUEPRINTS = (
+    BlueprintSpec('auth', 'auth.routes', 'auth_bp', '/auth', True),
+    BlueprintSpec('pm_arch', 'pmarch.pmarch_main', 'pmarch_bp', '/pm-arch', False),
+    BlueprintSpec('market_manager', 'manager.market_manager', 'market_manager_bp', '/market_manager', False),
+    BlueprintSpec('central', 'central', 'central_bp', '/central', True),
+
+    BlueprintSpec('hr_registration', 'hr.hr_registration', 'hr_registration_bp', '/hr', True),
+    BlueprintSpec('hr_analytics', 'hr.hr_analytics', 'hr_analytics_bp', '/hr', False),
+    BlueprintSpec('hr_employee_mgmt', 'hr.hr_employee_management', 'hr_employee_mgmt_bp', '/hr', False),
+    BlueprintSpec('hr_points_mgmt', 'hr.hr_points_management', 'hr_points_mgmt_bp', '/hr', False),
+    BlueprintSpec('hr_rr_review', 'hr.hr_rr_review', 'hr_rr_review_bp', '/hr', False),
+    BlueprintSpec('hr_categories', 'hr.hr_categories', 'hr_categories_bp', '/hr/categories', False),
+    BlueprintSpec('pending_tracker', 'hr.pending_points_tracker', 'pending_tracker_bp', '/hr', False),
+
+    BlueprintSpec('employee_dashboard', 'employee.employee_dashboard', 'employee_dashboard_bp', '/employee', False),
+    BlueprintSpec('employee_leaderboard', 'employee.employee_leaderboard', 'employee_leaderboard_bp', '/employee', False),
+    BlueprintSpec('employee_history', 'employee.employee_history', 'employee_history_bp', '/employee', False),
+    BlueprintSpec('employee_attachments', 'employee.employee_attachments', 'employee_attachments_bp', '/employee', False),
+    BlueprintSpec('employee_filters', 'employee.employee_filters', 'employee_filters_bp', '/employee', False),
+    BlueprintSpec('employee_api', 'employee.employee_api', 'employee_api_bp', '/employee', False),
+    BlueprintSpec('employee_raise_request', 'employee.employee_raise_request', 'employee_raise_request_bp',
+                  '/employee', False),
+    BlueprintSpec('employee_points_total', 'employee.employee_points_total', 'employee_points_total_bp',
+                  '/employee', False),
+
+    BlueprintSpec('pm', 'pm.pm_main', 'pm_bp', '/pm', True),
+    BlueprintSpec('ta', 'ta', 'ta_bp', '/talent-acquisition', False),
+    BlueprintSpec('ld', 'ld', 'ld_bp', '/learning-development', False),
+    BlueprintSpec('hr_roles', 'hr.hr_main', 'hr_bp', '/hr_roles', False),
+    BlueprintSpec('presales', 'presales.presales_main', 'presales_bp', '/presales', False),
+    BlueprintSpec('pmo', 'pmo', 'pmo_bp', '/pmo', False),
+    BlueprintSpec('dp', 'dp.dp_dashboard', 'dp_bp', '/dp', False),
+    BlueprintSpec('marketing_dashboard', 'marketing.marketing_dashboard', 'marketing_dashboard_bp', '/marketing', False),
+    BlueprintSpec('duplicate_api', 'utils.duplicate_api', 'duplicate_api_bp', '/api/duplicate', False),
+    BlueprintSpec('job_api', 'utils.job_api', 'job_api_bp', '/jobs', False),
+)
+
+
+def import_blueprint(spec):
+    """Import a blueprint's module; returns (blueprint, import ms)"""
+    started = time.perf_counter()
+    module = importlib.import_module(spec.module)
+    blueprint = getattr(module, spec.attribute)
+    import_ms = (time.perf_counter() - started) * 1000
+    if blueprint.name != spec.name or blueprint.url_prefix != spec.url_prefix:
+        logger.warning(f"⚠️  BLUEPRINTS entry {spec.name} {spec.url_prefix} does not match "
+                       f"{spec.module}.{spec.attribute} ({blueprint.name} {blueprint.url_prefix})")
+    return blueprint, import_ms
+
+
+class BlueprintLoader:
+    """Registers ``BLUEPRINTS`` on the app, now or on first use (see module docstring)"""
+
+    def __init__(self):
+        self.app = None
+        self.lazy = False
+        self.pending = {}
+        self.timings = []
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        self.app = app
+        self.lazy = app.config.get('LAZY_BLUEPRINTS', False)
+        started = time.perf_counter()
+        for spec in BLUEPRINTS:
+            if self.lazy and not spec.eager:
+                self.pending[spec.name] = spec
+            else:
+                self._load(spec, on_demand=False)
+        boot_ms = (time.perf_counter() - started) * 1000
+
+        if self.pending:
+            app.wsgi_app = _LazyBlueprintMiddleware(app.wsgi_app, self)
+            app.url_build_error_handlers.append(self._build_error)
+        slowest = max(self.timings, key=lambda entry: entry['import_ms'])
+        logger.info(f"✅ {len(self.timings)} blueprints registered in {boot_ms:.0f} ms "
+                    f"(slowest import: {slowest['blueprint']} {slowest['import_ms']:.0f} ms)"
+                    + (f", {len(self.pending)} deferred until first use" if self.pending else ''))
+
+    # -------------------------------------------------------------- loading
+
+    def _load(self, spec, on_demand=True):
+        blueprint, import_ms = import_blueprint(spec)
+        started = time.perf_counter()
+        if on_demand:
+            # Flask refuses setup methods once it served a request. Registering only adds URL
+            # rules (no I/O), so no other greenlet runs while the flag is lowered
+            got_first_request = self.app._got_first_request
+            self.app._got_first_request = False
+            try:
+                self.app.register_blueprint(blueprint)
+            finally:
+                self.app._got_first_request = got_first_request
+        else:
+            self.app.register_blueprint(blueprint)
+        self.timings.append({
+            'blueprint': spec.name,
+            'module': spec.module,
+            'import_ms': round(import_ms, 1),
+            'register_ms': round((time.perf_counter() - started) * 1000, 1),
+            'on_demand': on_demand,
+            'loaded_at': time.time()
+        })
+        if on_demand:
+            logger.info(f"✅ Blueprint {spec.name} loaded on first use in {import_ms:.0f} ms")
+
+    def load(self, name):
+        """Register a deferred blueprint now (no-op when it already is)"""
+        with self._lock:
+            spec = self.pending.get(name)
+            if spec is not None:
+                self._load(spec)
+                del self.pending[name]
+
+    def load_all(self):
+        """Register every deferred blueprint (for code that walks app.view_functions)"""
+        for name in list(self.pending):
+            self.load(name)
+
+    def load_for_path(self, path):
+        for spec in list(self.pending.values()):
+            if path == spec.url_prefix or path.startswith(spec.url_prefix + '/'):
+                self.load(spec.name)
+
+    def _build_error(self, error, endpoint, values):
+        """url_for() of an endpoint of a deferred blueprint: load it and build again"""
+        name = endpoint.rpartition('.')[0]
+        if name not in self.pending:
+            return None
+        self.load(name)
+        return self.app.url_for(endpoint, **values)
+
+    # --------------------------------------------------------------- report
+
+    def report(self):
+        """Blueprint import/registration times, slowest first, and what is still deferred"""
+        return {
+            'lazy': self.lazy,
+            'loaded': sorted(self.timings, key=lambda entry: entry['import_ms'], reverse=True),
+            'import_ms': round(sum(entry['import_ms'] for entry in self.timings), 1),
+            'pending': sorted(self.pending)
+        }
+
+
+class _LazyBlueprintMiddleware:
+    """Loads the deferred blueprints owning a request's path before Flask routes it"""
+
+    def __init__(self, wsgi_app, loader):
+        self.wsgi_app = wsgi_app
+        self.loader = loader
+
+    def __call__(self, environ, start_response):
+        if self.loader.pending:
+            self.loader.load_for_path(environ.get('PATH_INFO', ''))
+        return self.wsgi_app(environ, start_response)
+
+
+# Global instance
+blueprint_loader = BlueprintLoader()
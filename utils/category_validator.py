@@ -1,172 +1,249 @@
 """
-Category Validator - Automatically fixes missing categories on app startup
+Category Validator - Fixes points requests whose category no longer exists
 This ensures all dashboards display correct categories
+
+Validation is incremental: a high-water mark (the last validated points_request
+``_id``) is kept in ``maintenance_state``, each batch of newer requests is
+grouped by category and checked against hr_categories/categories with one
+``$lookup`` aggregation, and only requests of missing categories are read.
+It runs as the ``maintenance.validate_categories`` background job (queued once
+at startup, shared by all workers) or from the command line. Older requests are
+not re-read by the incremental pass, so deleting a category queues
+``maintenance.fix_deleted_category`` for the requests that pointed at it.
+
+
+    python -m utils.category_validator            # requests added since the last run
+    python -m utils.category_validator --full     # re-check every request
+    python -m utils.category_validator --analysis # detailed report, no fixes
 """
 
+import argparse
 from extensions import mongo
 from bson.objectid import ObjectId
 from datetime import datetime
 from collections import defaultdict
 import logging
+from services.job_service import job_handler
 
 logger = logging.getLogger(__name__)
 
-def validate_and_fix_categories(show_analysis=True):
+STATE_COLLECTION = 'maintenance_state'
+STATE_ID = 'category_validation'
+JOB_TYPE = 'maintenance.validate_categories'
+DELETED_CATEGORY_JOB_TYPE = 'maintenance.fix_deleted_category'
+DEFAULT_BATCH_SIZE = 20000
+
+
+def _missing_categories_in_batch(last_id, batch_size):
     """
-    Validate all category references and fix missing ones
-    Runs automatically on app startup
-    
+    Categories referenced by the next batch of requests (by _id) that exist in neither collection.
+
+    Returns:
+        tuple: (missing category ids, requests in the batch, highest _id in the batch or None)
+    """
+    match = {'_id': {'$gt': last_id}} if last_id else {}
+    groups = list(mongo.db.points_request.aggregate([
+        {'$match': match},
+        {'$sort': {'_id': 1}},
+        {'$limit': batch_size},
+        {'$group': {'_id': '$category_id', 'count': {'$sum': 1}, 'max_id': {'$max': '$_id'}}},
+        {'$lookup': {'from': 'hr_categories', 'localField': '_id', 'foreignField': '_id', 'as': 'hr'}},
+        {'$lookup': {'from': 'categories', 'localField': '_id', 'foreignField': '_id', 'as': 'old'}},
+        {'$project': {'count': 1, 'max_id': 1, 'found': {'$add': [{'$size': '$hr'}, {'$size': '$old'}]}}}
+    ], allowDiskUse=True))
+
+    if not groups:
+        return [], 0, None
+    missing = [group['_id'] for group in groups
+               if not group['found'] and isinstance(group['_id'], ObjectId)]
+    scanned = sum(group['count'] for group in groups)
+    return missing, scanned, max(group['max_id'] for group in groups)
+
+
+def _fix_missing_category(cat_oid, reference_categories):
+    """Move every request of a missing category to the best matching one; returns the number updated"""
+    interviews_cat, presales_cat, client_cat, uncategorized_id = reference_categories
+
+    # Analyze requests to determine best category
+    points_dist = defaultdict(int)
+    has_interview_notes = False
+    has_presales_notes = False
+    has_client_notes = False
+
+    for req in mongo.db.points_request.find(
+            {'category_id': cat_oid}, {'points': 1, 'request_notes': 1, 'submission_notes': 1}):
+        points = req.get('points', 0)
+        points_dist[points] += 1
+
+        notes = (req.get('request_notes') or req.get('submission_notes') or '').lower()
+        if 'interview' in notes:
+            has_interview_notes = True
+        if 'presales' in notes or 'rfp' in notes or 'proposal' in notes:
+            has_presales_notes = True
+        if 'client' in notes or 'blue yonder' in notes or 'appreciation' in notes:
+            has_client_notes = True
+
+    # Determine target category
+    target_id = uncategorized_id
+    target_name = 'Uncategorized'
+
+    # Interview-related (100 points or interview notes)
+    if (100 in points_dist or has_interview_notes) and interviews_cat:
+        target_id = interviews_cat['_id']
+        target_name = 'Interviews'
+
+    # Pre-Sales related (500 points or presales notes)
+    elif (500 in points_dist or has_presales_notes) and presales_cat:
+        target_id = presales_cat['_id']
+        target_name = 'Pre-Sales Contribution'
+
+    # Client Appreciation (400 points or client notes)
+    elif (400 in points_dist or has_client_notes) and client_cat:
+        target_id = client_cat['_id']
+        target_name = 'Client Appreciation'
+
+    # Update all requests with this missing category
+    result = mongo.db.points_request.update_many(
+        {'category_id': cat_oid},
+        {'$set': {'category_id': target_id}}
+    )
+    if result.modified_count > 0:
+        logger.info(f"✅ Fixed {result.modified_count} requests: {str(cat_oid)[:8]}... → {target_name}")
+    return result.modified_count
+
+
+def _reference_categories():
+    """Target categories for fixes (creates 'Uncategorized' when needed)"""
+    interviews_cat = mongo.db.hr_categories.find_one({'name': 'Interviews'})
+    presales_cat = mongo.db.hr_categories.find_one({'name': {'$regex': 'Pre-Sales.*End to End', '$options': 'i'}})
+    client_cat = mongo.db.hr_categories.find_one({'name': 'Client Appreciation'})
+
+    # Create or get Uncategorized category
+    uncategorized_cat = mongo.db.hr_categories.find_one({'name': 'Uncategorized'})
+    if not uncategorized_cat:
+        new_category = {
+            'name': 'Uncategorized',
+            'description': 'Requests that need manual categorization',
+            'points_per_unit': {'base': 0},
+            'min_points_per_frequency': {},
+            'frequency': 'per_occurrence',
+            'category_status': 'active',
+            'category_department': 'HR',
+            'category_type': 'standard',
+            'created_at': datetime.now(),
+            'updated_at': datetime.now(),
+            'created_by': 'System (Auto-validator)'
+        }
+        result = mongo.db.hr_categories.insert_one(new_category)
+        uncategorized_id = result.inserted_id
+        logger.info(f"Created 'Uncategorized' category")
+    else:
+        uncategorized_id = uncategorized_cat['_id']
+    return interviews_cat, presales_cat, client_cat, uncategorized_id
+
+
+def validate_and_fix_categories(show_analysis=False, full=False, batch_size=DEFAULT_BATCH_SIZE, progress=None):
+    """
+    Validate category references of requests added since the last run and fix missing ones
+
     Args:
-        show_analysis: If True, shows detailed analysis of categories (default: True)
+        show_analysis: If True, logs the detailed category analysis first (reads every request)
+        full: Ignore the high-water mark and re-check every request
+        batch_size: Requests checked per aggregation
+        progress: Optional callable(scanned, message) called after each batch
+
+    Returns:
+        dict: scanned requests, missing categories, fixed requests and the new high-water mark
     """
-    try:
-        logger.info("=" * 60)
-        logger.info("CATEGORY VALIDATION: Checking for missing categories...")
-        logger.info("=" * 60)
-        
-        # Get all points requests
-        all_requests = list(mongo.db.points_request.find({}, {'category_id': 1, 'points': 1, 'request_notes': 1, 'submission_notes': 1}))
-        
-        if not all_requests:
-            logger.info("No requests found. Skipping category validation.")
-            return
-        
-        # Show analysis if requested
-        if show_analysis:
-            _show_category_analysis(all_requests)
-        
-        # Group by category_id
-        category_groups = defaultdict(list)
-        
-        for req in all_requests:
-            cat_id = req.get('category_id')
-            if cat_id:
-                category_groups[str(cat_id)].append(req)
-        
-        # Check which categories are missing
-        missing_categories = []
-        
-        for cat_id_str, requests in category_groups.items():
-            try:
-                cat_id = ObjectId(cat_id_str)
-            except:
-                missing_categories.append({'id': cat_id_str, 'requests': requests})
-                continue
-            
-            # Check in hr_categories
-            hr_cat = mongo.db.hr_categories.find_one({"_id": cat_id})
-            if hr_cat:
-                continue
-            
-            # Check in old categories
-            old_cat = mongo.db.categories.find_one({"_id": cat_id})
-            if old_cat:
-                continue
-            
-            # Category not found
-            missing_categories.append({'id': cat_id_str, 'requests': requests})
-        
-        if not missing_categories:
-            logger.info("✅ All categories are valid. No fixes needed.")
-            return
-        
-        # Fix missing categories
-        total_fixed = 0
-        logger.info(f"⚠️  Found {len(missing_categories)} missing categories. Auto-fixing...")
-        
-        # Get reference categories
-        interviews_cat = mongo.db.hr_categories.find_one({'name': 'Interviews'})
-        presales_cat = mongo.db.hr_categories.find_one({'name': {'$regex': 'Pre-Sales.*End to End', '$options': 'i'}})
-        client_cat = mongo.db.hr_categories.find_one({'name': 'Client Appreciation'})
-        
-        # Create or get Uncategorized category
-        uncategorized_cat = mongo.db.hr_categories.find_one({'name': 'Uncategorized'})
-        if not uncategorized_cat:
-            new_category = {
-                'name': 'Uncategorized',
-                'description': 'Requests that need manual categorization',
-                'points_per_unit': {'base': 0},
-                'min_points_per_frequency': {},
-                'frequency': 'per_occurrence',
-                'category_status': 'active',
-                'category_department': 'HR',
-                'category_type': 'standard',
-                'created_at': datetime.now(),
-                'updated_at': datetime.now(),
-                'created_by': 'System (Auto-validator)'
-            }
-            result = mongo.db.hr_categories.insert_one(new_category)
-            uncategorized_id = result.inserted_id
-            logger.info(f"Created 'Uncategorized' category")
-        else:
-            uncategorized_id = uncategorized_cat['_id']
-        
-        # Fix each missing category
-        for missing in missing_categories:
-            cat_id_str = missing['id']
-            requests = missing['requests']
-            
-            try:
-                cat_oid = ObjectId(cat_id_str)
-            except:
-                continue
-            
-            # Analyze requests to determine best category
-            points_dist = defaultdict(int)
-            has_interview_notes = False
-            has_presales_notes = False
-            has_client_notes = False
-            
-            for req in requests:
-                points = req.get('points', 0)
-                points_dist[points] += 1
-                
-                notes = (req.get('request_notes') or req.get('submission_notes') or '').lower()
-                if 'interview' in notes:
-                    has_interview_notes = True
-                if 'presales' in notes or 'rfp' in notes or 'proposal' in notes:
-                    has_presales_notes = True
-                if 'client' in notes or 'blue yonder' in notes or 'appreciation' in notes:
-                    has_client_notes = True
-            
-            # Determine target category
-            target_id = uncategorized_id
-            target_name = 'Uncategorized'
-            
-            # Interview-related (100 points or interview notes)
-            if (100 in points_dist or has_interview_notes) and interviews_cat:
-                target_id = interviews_cat['_id']
-                target_name = 'Interviews'
-            
-            # Pre-Sales related (500 points or presales notes)
-            elif (500 in points_dist or has_presales_notes) and presales_cat:
-                target_id = presales_cat['_id']
-                target_name = 'Pre-Sales Contribution'
-            
-            # Client Appreciation (400 points or client notes)
-            elif (400 in points_dist or has_client_notes) and client_cat:
-                target_id = client_cat['_id']
-                target_name = 'Client Appreciation'
-            
-            # Update all requests with this missing category
-            result = mongo.db.points_request.update_many(
-                {'category_id': cat_oid},
-                {'$set': {'category_id': target_id}}
-            )
-            
-            if result.modified_count > 0:
-                total_fixed += result.modified_count
-                logger.info(f"✅ Fixed {result.modified_count} requests: {cat_id_str[:8]}... → {target_name}")
-        
-        if total_fixed > 0:
-            logger.info("=" * 60)
-            logger.info(f"✅ CATEGORY FIX COMPLETE: {total_fixed} requests updated")
-            logger.info("=" * 60)
-        
-    except Exception as e:
-        logger.error(f"❌ Error during category validation: {str(e)}")
-        # Don't crash the app if validation fails
-        pass
+    if show_analysis:
+        run_detailed_analysis()
+
+    state = mongo.db[STATE_COLLECTION].find_one({'_id': STATE_ID}) or {}
+    last_id = None if full else state.get('last_id')
+    stats = {'scanned': 0, 'missing_categories': 0, 'fixed': 0, 'started_after': last_id}
+    reference_categories = None
+
+    logger.info(f"CATEGORY VALIDATION: checking requests after {last_id or 'the beginning'}...")
+    while True:
+        missing, scanned, batch_last_id = _missing_categories_in_batch(last_id, batch_size)
+        if batch_last_id is None:
+            break
+
+        if missing:
+            logger.info(f"⚠️  Found {len(missing)} missing categories. Auto-fixing...")
+            reference_categories = reference_categories or _reference_categories()
+            for cat_oid in missing:
+                stats['fixed'] += _fix_missing_category(cat_oid, reference_categories)
+        stats['missing_categories'] += len(missing)
+        stats['scanned'] += scanned
+
+        # Advance the high-water mark batch by batch, so an interrupted run resumes where it stopped
+        last_id = batch_last_id
+        mongo.db[STATE_COLLECTION].update_one(
+            {'_id': STATE_ID},
+            {'$set': {'last_id': last_id, 'updated_at': datetime.utcnow()}},
+            upsert=True
+        )
+        if progress:
+            progress(stats['scanned'], f"Checked {stats['scanned']} requests")
+
+    stats['last_id'] = last_id
+    mongo.db[STATE_COLLECTION].update_one(
+        {'_id': STATE_ID},
+        {'$set': {'last_run': dict(stats, finished_at=datetime.utcnow())}},
+        upsert=True
+    )
+    if stats['fixed']:
+        logger.info(f"✅ CATEGORY FIX COMPLETE: {stats['fixed']} requests updated")
+    else:
+        logger.info(f"✅ Categories valid ({stats['scanned']} new requests checked)")
+    return stats
+
+
+@job_handler(JOB_TYPE)
+def run_category_validation(job, full=False, batch_size=DEFAULT_BATCH_SIZE):
+    """Background job: incremental category validation"""
+    stats = validate_and_fix_categories(
+        full=full, batch_size=batch_size,
+        progress=lambda scanned, message: job.progress(scanned, None, message)
+    )
+    stats['started_after'] = str(stats['started_after']) if stats['started_after'] else None
+    stats['last_id'] = str(stats['last_id']) if stats['last_id'] else None
+    return stats
+
+
+def queue_category_validation(full=False, batch_size=DEFAULT_BATCH_SIZE):
+    """Queue the validation job once for all workers (returns the job document)"""
+    from services.job_service import job_service
+    job, _ = job_service.enqueue(
+        JOB_TYPE, {'full': full, 'batch_size': batch_size},
+        idempotency_key='full' if full else 'incremental',
+        description='Validate category references'
+    )
+    return job
+
+
+@job_handler(DELETED_CATEGORY_JOB_TYPE)
+def run_fix_deleted_category(job, category_id):
+    """Background job: move the requests of a deleted category to the best matching one"""
+    cat_oid = ObjectId(category_id)
+    # Nothing to do if it exists again (e.g. restored) in either collection
+    if mongo.db.hr_categories.find_one({'_id': cat_oid}, {'_id': 1}) or \
+            mongo.db.categories.find_one({'_id': cat_oid}, {'_id': 1}):
+        return {'fixed': 0}
+    return {'fixed': _fix_missing_category(cat_oid, _reference_categories())}
+
+
+def queue_deleted_category_fix(category_id, user_id=None):
+    """Queue the fix for the requests of a category that was just deleted (returns the job document)"""
+    from services.job_service import job_service
+    job, _ = job_service.enqueue(
+        DELETED_CATEGORY_JOB_TYPE, {'category_id': str(category_id)},
+        user_id=user_id,
+        idempotency_key=str(category_id),
+        description='Re-categorize requests of a deleted category'
+    )
+    return job
 
 
 def get_category_name_safe(category_id):
@@ -407,3 +484,29 @@ def run_detailed_analysis():
                 logger.info(f"    - {note}...")
     
     logger.info("\n" + "=" * 60)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(prog='python -m utils.category_validator',
+                                     description='Fix points requests that reference missing categories')
+    parser.add_argument('--full', action='store_true', help='Re-check every request, not only new ones')
+    parser.add_argument('--batch-size', type=int, default=None)
+    parser.add_argument('--analysis', action='store_true', help='Only log the detailed analysis')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(message)s')
+    # Only the database is needed: a bare app, not app.py (whose eventlet patching must run before
+    # any other import, which is already too late here)
+    from flask import Flask
+    from config import Config
+
+    app = Flask(__name__)
+    app.config.from_object(Config)
+    mongo.init_app(app)
+    batch_size = args.batch_size or app.config.get('CATEGORY_VALIDATION_BATCH_SIZE', DEFAULT_BATCH_SIZE)
+
+    with app.app_context():
+        if args.analysis:
+            run_detailed_analysis()
+        else:
+            print(validate_and_fix_categories(full=args.full, batch_size=batch_size))
@@ -0,0 +1,133 @@
+"""
+CPU offload helpers for the eventlet hub
+
+The app runs every request and socket on one eventlet hub, so a CPU-bound call
+freezes everybody until it returns. Two tools:
+
+- ``offload(func, *args)`` runs a pure-CPU function (no MongoDB/Redis/socket I/O)
+  in eventlet's native thread pool (``eventlet.tpool``) and suspends only the
+  calling greenlet. bcrypt and zlib (xlsx compression) release the GIL, so they
+  run truly in parallel with the hub. Concurrency is bounded by
+  ``OFFLOAD_MAX_WORKERS``; at most ``OFFLOAD_MAX_QUEUE`` callers wait for a slot,
+  further calls fail fast with ``OffloadQueueFull`` instead of piling up.
+- ``cooperative(iterable)`` yields to the hub every N items for Python loops that
+  interleave database calls (analytics), which cannot leave the hub thread
+  because the monkey-patched sockets belong to it.
+
+A process pool is deliberately not used: multiprocessing's helper threads and
+pipes do not mix with ``eventlet.monkey_patch()``, and the heavy functions here
+either release the GIL or need the hub's Mongo connections anyway.
+"""
+
+import csv
+import io
+import eventlet
+from eventlet import tpool
+from eventlet.semaphore import Semaphore
+from flask import current_app, has_app_context
+from extensions import bcrypt
+
+# Defaults when called outside an app context (CLI scripts)
+DEFAULT_MAX_WORKERS = 4
+DEFAULT_MAX_QUEUE = 64
+COOPERATIVE_YIELD_EVERY = 200
+
+
+class OffloadQueueFull(Exception):
+    """Raised when too many callers are already waiting for an offload slot"""
+
+
+class _OffloadPool:
+    """Bounded gate in front of eventlet.tpool"""
+
+    def __init__(self):
+        self.slots = None
+        self.max_queue = DEFAULT_MAX_QUEUE
+        self.waiting = 0
+        self.running = 0
+
+    def _configure(self):
+        if self.slots is not None:
+            return
+        max_workers = DEFAULT_MAX_WORKERS
+        if has_app_context():
+            max_workers = current_app.config.get('OFFLOAD_MAX_WORKERS', DEFAULT_MAX_WORKERS)
+            self.max_queue = current_app.config.get('OFFLOAD_MAX_QUEUE', DEFAULT_MAX_QUEUE)
+        self.slots = Semaphore(max_workers)
+
+    def execute(self, func, *args, **kwargs):
+        self._configure()
+        if self.slots.locked() and self.waiting >= self.max_queue:
+            raise OffloadQueueFull(f"{self.waiting} offloaded calls already waiting")
+        self.waiting += 1
+        try:
+            self.slots.acquire()
+        finally:
+            self.waiting -= 1
+        self.running += 1
+        try:
+            return tpool.execute(func, *args, **kwargs)
+        finally:
+            self.running -= 1
+            self.slots.release()
+
+
+offload_pool = _OffloadPool()
+
+
+def offload(func, *args, **kwargs):
+    """
+    Run a CPU-bound, I/O-free function off the hub and return its result.
+
+    Raises:
+        OffloadQueueFull: The bounded wait queue is full
+    """
+    return offload_pool.execute(func, *args, **kwargs)
+
+
+def cooperative(iterable, every=COOPERATIVE_YIELD_EVERY):
+    """Iterate while giving other greenlets a turn every ``every`` items"""
+    for index, item in enumerate(iterable, 1):
+        if index % every == 0:
+            eventlet.sleep(0)
+        yield item
+
+
+# ============================================================================
+# Offloaded helpers
+# ============================================================================
+
+def hash_password(password):
+    """bcrypt hash of ``password`` as a str, computed off the hub"""
+    return offload(bcrypt.generate_password_hash, password).decode('utf-8')
+
+
+def verify_password(password_hash, password):
+    """bcrypt check computed off the hub"""
+    return offload(bcrypt.check_password_hash, password_hash, password)
+
+
+class ParsedCSV:
+    """Fully parsed CSV upload with the csv.DictReader interface the routes use"""
+
+    def __init__(self, fieldnames, rows):
+        self.fieldnames = fieldnames
+        self.rows = rows
+
+    def __iter__(self):
+        return iter(self.rows)
+
+    def __len__(self):
+        return len(self.rows)
+
+
+def _parse_csv(csv_content):
+    reader = csv.DictReader(io.StringIO(csv_content))
+    rows = list(reader)
+    return reader.fieldnames, rows
+
+
+def parse_csv_upload(csv_content):
+    """Parse an uploaded CSV (text) into dict rows off the hub"""
+    fieldnames, rows = offload(_parse_csv, csv_content)
+    return ParsedCSV(fieldnames, rows)
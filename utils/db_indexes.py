@@ -0,0 +1,72 @@
+"""
+Indexes behind the hot queries
+Pending queues per validator, employee history, leaderboard, duplicate checks
+and session validation all filter points_request/points/users/user_sessions on
+the fields below. They are created (background, no-op when present) at
+startup; ``python -m benchmarks.run plans`` fails when one of those queries
+stops using them.
+
+Run ``python -m utils.db_indexes`` to create them without starting the app.
+"""
+
+from pymongo.errors import ConnectionFailure
+from extensions import mongo
+from utils.error_handling import error_print
+
+# collection -> index keys (default names, so indexes created by hand are recognised)
+HOT_INDEXES = {
+    'points_request': [
+        # Employee history, per-user leaderboard totals
+        [('user_id', 1), ('status', 1)],
+        # Duplicate checks (same employee, category and event date/month)
+        [('user_id', 1), ('category_id', 1), ('event_date', 1)],
+        # Validator pending queues, oldest first
+        [('status', 1), ('category_id', 1), ('request_date', 1)],
+        # Validator history of the department that processed the request
+        [('processed_department', 1), ('status', 1), ('response_date', -1)],
+    ],
+    'points': [
+        [('user_id', 1), ('award_date', -1)],
+        [('request_id', 1)],
+    ],
+    'users': [
+        [('email', 1)],
+        [('employee_id', 1)],
+        [('manager_id', 1)],
+    ],
+    'user_sessions': [
+        [('session_token', 1)],
+    ],
+}
+
+
+def ensure_hot_indexes():
+    """Create every HOT_INDEXES entry (app context required); returns the number that failed"""
+    pending = [(collection, keys) for collection, indexes in HOT_INDEXES.items() for keys in indexes]
+    failed = 0
+    for position, (collection, keys) in enumerate(pending):
+        try:
+            mongo.db[collection].create_index(keys, background=True)
+        except ConnectionFailure as e:
+            # Unreachable server: don't wait out the selection timeout once per index
+            error_print("Error creating hot query indexes", e)
+            return failed + len(pending) - position
+        except Exception as e:
+            failed += 1
+            error_print(f"Error creating {collection} index {keys}", e)
+    return failed
+
+
+if __name__ == '__main__':
+    # Only the database is needed: a bare app, not app.py (whose eventlet patching must run before
+    # any other import, which is already too late here)
+    from flask import Flask
+    from config import Config
+
+    app = Flask(__name__)
+    app.config.from_object(Config)
+    mongo.init_app(app)
+
+    with app.app_context():
+        failures = ensure_hot_indexes()
+    print("✅ Hot query indexes are in place" if not failures else f"❌ {failures} index(es) could not be created")
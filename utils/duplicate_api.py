@@ -8,6 +8,9 @@ from datetime import datetime
 from bson import ObjectId
 from extensions import mongo
 from utils.error_handling import error_print
+from utils.request_dedupe import (
+    is_utilization_category, period_bounds, ACTIVE_STATUSES
+)
 
 duplicate_api_bp = Blueprint('duplicate_api', __name__, url_prefix='/api/duplicate')
 
@@ -86,25 +89,19 @@ def _check_duplicate_for_record(employee_id, category_id, event_date_str):
         if not category:
             return False, None
         
-        # Check for utilization category
-        category_name = category.get('name', '').lower()
         # ✅ Check both category_code (hr_categories) and code (categories) fields
-        category_code = category.get('category_code', category.get('code', '')).lower()
-        is_utilization = ('utilization' in category_name or 'utlization' in category_name or 'billable' in category_name or
-                         'utilization' in category_code or 'billable' in category_code)
+        is_utilization = is_utilization_category(category)
         
         if is_utilization:
             # For utilization, check for same month
-            start_of_month = event_date.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
-            next_month = (start_of_month.replace(month=start_of_month.month % 12 + 1) if start_of_month.month < 12 
-                         else start_of_month.replace(year=start_of_month.year + 1, month=1))
+            start_of_month, next_month = period_bounds(event_date)
             
             # ✅ FIXED: Only check points_request collection (points collection is duplicate data)
             existing_requests = list(mongo.db.points_request.find({
                 "user_id": ObjectId(employee["_id"]),
                 "category_id": ObjectId(category["_id"]),
                 "event_date": {"$gte": start_of_month, "$lt": next_month},
-                "status": {"$in": ["Approved", "Pending"]}
+                "status": {"$in": list(ACTIVE_STATUSES)}
             }))
             
             if existing_requests:
@@ -143,15 +140,14 @@ def _check_duplicate_for_record(employee_id, category_id, event_date_str):
                 }
         else:
             # For non-utilization, check exact date
-            start_of_day = event_date.replace(hour=0, minute=0, second=0, microsecond=0)
-            end_of_day = event_date.replace(hour=23, minute=59, second=59, microsecond=999999)
+            start_of_day, next_day = period_bounds(event_date, utilization=False)
             
             # ✅ FIXED: Only check points_request collection (points collection is duplicate data)
             existing_requests = list(mongo.db.points_request.find({
                 "user_id": ObjectId(employee["_id"]),
                 "category_id": ObjectId(category["_id"]),
-                "event_date": {"$gte": start_of_day, "$lte": end_of_day},
-                "status": {"$in": ["Approved", "Pending"]}
+                "event_date": {"$gte": start_of_day, "$lt": next_day},
+                "status": {"$in": list(ACTIVE_STATUSES)}
             }))
             
             if existing_requests:
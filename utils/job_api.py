@@ -0,0 +1,73 @@
+"""
+Background Job API
+Status polling, cancellation and result download for jobs queued by heavy routes
+(see services/job_service.py). Jobs are only visible to the user who started them, or
+to the users of the dashboard a job is shared with (e.g. the Central bonus analysis).
+"""
+
+import os
+from flask import Blueprint, jsonify, session, send_file
+from services.job_service import job_service, STATUS_SUCCEEDED
+from utils.error_handling import error_print
+
+job_api_bp = Blueprint('job_api', __name__, url_prefix='/jobs')
+
+
+def _current_user_job(job_id):
+    """Return (job, error_response) for the logged-in owner (or a user the job is shared with)"""
+    user_id = session.get('user_id')
+    if not user_id:
+        return None, (jsonify({'error': 'Not authenticated'}), 401)
+    job = job_service.get_job(job_id, user_id=user_id)
+    if not job:
+        return None, (jsonify({'error': 'Job not found'}), 404)
+    return job, None
+
+
+@job_api_bp.route('/<job_id>', methods=['GET'])
+def job_status(job_id):
+    """Current status and progress of a job"""
+    try:
+        job, error = _current_user_job(job_id)
+        if error:
+            return error
+        return jsonify({'success': True, 'job': job_service.public_view(job)})
+    except Exception as e:
+        error_print("Error fetching job status", e)
+        return jsonify({'error': 'Failed to fetch job status'}), 500
+
+
+@job_api_bp.route('/<job_id>/cancel', methods=['POST'])
+def cancel_job(job_id):
+    """Cancel a queued job or ask a running one to stop"""
+    try:
+        job, error = _current_user_job(job_id)
+        if error:
+            return error
+        job = job_service.cancel(job['_id'], user_id=session.get('user_id'))
+        return jsonify({'success': True, 'job': job_service.public_view(job)})
+    except Exception as e:
+        error_print("Error cancelling job", e)
+        return jsonify({'error': 'Failed to cancel job'}), 500
+
+
+@job_api_bp.route('/<job_id>/download', methods=['GET'])
+def download_job_result(job_id):
+    """Download the file produced by a finished job (e.g. an Excel export)"""
+    try:
+        job, error = _current_user_job(job_id)
+        if error:
+            return error
+        result = job.get('result') or {}
+        file_path = result.get('file_path')
+        if job.get('status') != STATUS_SUCCEEDED or not file_path or not os.path.exists(file_path):
+            return jsonify({'error': 'No file available for this job'}), 404
+        return send_file(
+            file_path,
+            mimetype=result.get('mimetype') or 'application/octet-stream',
+            as_attachment=True,
+            download_name=result.get('download_name') or os.path.basename(file_path)
+        )
+    except Exception as e:
+        error_print("Error downloading job result", e)
+        return jsonify({'error': 'Failed to download job result'}), 500
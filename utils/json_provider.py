@@ -0,0 +1,66 @@
+"""
+JSON provider for the app (``app.json``)
+
+Every ``jsonify()`` and ``|tojson`` goes through it. On top of Flask's defaults
+(datetimes as RFC 822 HTTP dates, Decimal/UUID as strings) it serializes the BSON
+types Mongo documents carry, so a view can return document values as they are:
+
+- ``ObjectId`` -> its hex string (what ``str(oid)`` gives)
+- ``Decimal128`` -> decimal string, ``Timestamp`` -> HTTP date
+- ``Binary``/``bytes`` -> base64, ``DBRef`` -> ``{"$ref": ..., "$id": ...}``
+
+Responses are encoded with orjson when it is installed - several times faster
+than the json module on the large list payloads of the dashboards' APIs - with
+the same output types (datetimes still go through ``default``). Anything orjson
+rejects (integers beyond 64 bits) falls back to the json module.
+"""
+
+import base64
+from bson import DBRef, Decimal128, ObjectId, Timestamp
+from flask.json.provider import DefaultJSONProvider
+from werkzeug.http import http_date
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+def bson_default(o):
+    """``default`` hook: BSON types first, then Flask's own conversions"""
+    if isinstance(o, ObjectId):
+        return str(o)
+    if isinstance(o, Decimal128):
+        return str(o.to_decimal())
+    if isinstance(o, Timestamp):
+        return http_date(o.as_datetime())
+    if isinstance(o, DBRef):
+        return {'$ref': o.collection, '$id': o.id}
+    if isinstance(o, (bytes, bytearray)):
+        return base64.b64encode(o).decode('ascii')
+    return DefaultJSONProvider.default(o)
+
+
+class BSONJSONProvider(DefaultJSONProvider):
+    """DefaultJSONProvider with BSON types and an orjson fast path for responses"""
+
+    default = staticmethod(bson_default)
+    # Clients read objects by key; sorting only costs time on large payloads
+    sort_keys = False
+
+    def _pretty(self):
+        return self.compact is False or (self.compact is None and self._app.debug)
+
+    def response(self, *args, **kwargs):
+        if orjson is None or self._pretty():
+            return super().response(*args, **kwargs)
+        obj = self._prepare_response_obj(args, kwargs)
+        options = orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME
+        if self.sort_keys:
+            options |= orjson.OPT_SORT_KEYS
+        try:
+            body = orjson.dumps(obj, default=self.default, option=options)
+        except TypeError:
+            # orjson.JSONEncodeError (a TypeError): let the json module try, or raise its usual error
+            return super().response(*args, **kwargs)
+        return self._app.response_class(body + b'\n', mimetype=self.mimetype)
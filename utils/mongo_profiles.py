@@ -0,0 +1,187 @@
+"""
+Mongo client profiles
+
+One MongoClient used to serve everything: a 30-second analytics aggregation and
+a sub-millisecond user lookup shared the same pool and had no server-side time
+limit. ``ProfiledMongo`` replaces Flask-PyMongo's ``PyMongo`` in extensions.py
+with one client per named profile (``MONGO_PROFILES`` in config):
+
+- its own connection pool (``maxPoolSize``/``minPoolSize``), read preference
+  (``secondaryPreferred`` for analytics on a replica set - a standalone server
+  simply serves it) and wire compression - any MongoClient option
+- ``max_time_ms``: default ``maxTimeMS`` of every find/aggregate/count/distinct
+- ``allow_disk_use``: default ``allowDiskUse`` of aggregations
+
+``mongo.db`` resolves to the profile of the running request: admission control
+maps the request's route class through ``MONGO_ROUTE_CLASS_PROFILES``; background
+code picks one with ``with mongo.use_profile('batch'):``. Explicit per-call
+options (``max_time_ms=``, ``maxTimeMS=``, ``allowDiskUse=``) still win.
+
+``with mongo.use_primary():`` sends the block's reads to the primary whatever
+the profile's read preference - the response cache computes under it, so a
+recompute right after an invalidating write never caches a lagging secondary's
+view for the whole TTL.
+"""
+
+from contextlib import contextmanager
+from flask import g, has_app_context
+from flask_pymongo import BSONObjectIdConverter
+from pymongo import MongoClient, ReadPreference, uri_parser
+from pymongo.collection import Collection
+from pymongo.database import Database
+
+DEFAULT_PROFILE = 'interactive'
+
+
+class BudgetedCollection(Collection):
+    """Collection whose reads default to the profile's maxTimeMS/allowDiskUse"""
+
+    def _budget(self):
+        return self.database.max_time_ms
+
+    def find(self, *args, **kwargs):
+        if self._budget():
+            kwargs.setdefault('max_time_ms', self._budget())
+        return super().find(*args, **kwargs)
+
+    def aggregate(self, pipeline, session=None, **kwargs):
+        if self._budget():
+            kwargs.setdefault('maxTimeMS', self._budget())
+        if self.database.allow_disk_use:
+            kwargs.setdefault('allowDiskUse', True)
+        return super().aggregate(pipeline, session=session, **kwargs)
+
+    def count_documents(self, filter, session=None, **kwargs):
+        if self._budget():
+            kwargs.setdefault('maxTimeMS', self._budget())
+        return super().count_documents(filter, session=session, **kwargs)
+
+    def estimated_document_count(self, **kwargs):
+        if self._budget():
+            kwargs.setdefault('maxTimeMS', self._budget())
+        return super().estimated_document_count(**kwargs)
+
+    def distinct(self, key, filter=None, session=None, **kwargs):
+        if self._budget():
+            kwargs.setdefault('maxTimeMS', self._budget())
+        return super().distinct(key, filter=filter, session=session, **kwargs)
+
+
+class BudgetedDatabase(Database):
+    """Database handing out BudgetedCollections (still a real Database, e.g. for GridFS)"""
+
+    def __init__(self, client, name, max_time_ms=None, allow_disk_use=False, **kwargs):
+        super().__init__(client, name, **kwargs)
+        self.max_time_ms = max_time_ms
+        self.allow_disk_use = allow_disk_use
+
+    def __getitem__(self, name):
+        return BudgetedCollection(self, name)
+
+    def get_collection(self, name, codec_options=None, read_preference=None,
+                       write_concern=None, read_concern=None):
+        return BudgetedCollection(self, name, False, codec_options, read_preference,
+                                  write_concern, read_concern)
+
+
+class MongoProfile:
+    """One named client plus the database handle carrying its query budget"""
+
+    def __init__(self, name, uri, options):
+        options = dict(options)
+        max_time_ms = options.pop('max_time_ms', None)
+        allow_disk_use = options.pop('allow_disk_use', False)
+        # Connect lazily, like Flask-PyMongo: workers may be forked after create_app
+        options.setdefault('connect', False)
+
+        self.name = name
+        self.cx = MongoClient(uri, **options)
+        database_name = uri_parser.parse_uri(uri)['database']
+        self.db = BudgetedDatabase(self.cx, database_name, max_time_ms, allow_disk_use) if database_name else None
+        self.primary_db = (BudgetedDatabase(self.cx, database_name, max_time_ms, allow_disk_use,
+                                            read_preference=ReadPreference.PRIMARY) if database_name else None)
+
+    def stats(self):
+        return {
+            'max_pool_size': self.cx.max_pool_size,
+            'read_preference': self.cx.read_preference.name,
+            'max_time_ms': self.db.max_time_ms if self.db is not None else None
+        }
+
+
+class ProfiledMongo:
+    """Drop-in for ``flask_pymongo.PyMongo`` whose ``db``/``cx`` follow the active profile"""
+
+    def __init__(self):
+        self.profiles = {}
+        self.route_class_profiles = {}
+
+    def init_app(self, app, uri=None, event_listeners=None):
+        """
+        Create one client per configured profile.
+
+        Args:
+            app: Flask app (MONGO_URI, MONGO_PROFILES, MONGO_ROUTE_CLASS_PROFILES)
+            uri: Overrides MONGO_URI
+            event_listeners: pymongo monitoring listeners attached to every client
+        """
+        uri = uri or app.config.get('MONGO_URI')
+        if not uri:
+            raise ValueError("You must specify a URI or set the MONGO_URI Flask config variable")
+
+        configured = app.config.get('MONGO_PROFILES') or {DEFAULT_PROFILE: {}}
+        for name, options in configured.items():
+            options = dict(options)
+            if event_listeners:
+                options.setdefault('event_listeners', list(event_listeners))
+            self.profiles[name] = MongoProfile(name, options.pop('uri', uri), options)
+        if DEFAULT_PROFILE not in self.profiles:
+            options = {'event_listeners': list(event_listeners)} if event_listeners else {}
+            self.profiles[DEFAULT_PROFILE] = MongoProfile(DEFAULT_PROFILE, uri, options)
+        self.route_class_profiles = app.config.get('MONGO_ROUTE_CLASS_PROFILES') or {}
+
+        app.url_map.converters['ObjectId'] = BSONObjectIdConverter
+
+    def profile_for_route_class(self, route_class):
+        """Profile name configured for an admission-control route class"""
+        name = self.route_class_profiles.get(route_class, route_class)
+        return name if name in self.profiles else DEFAULT_PROFILE
+
+    def active_profile(self):
+        name = g.get('mongo_profile') if has_app_context() else None
+        return self.profiles.get(name) or self.profiles.get(DEFAULT_PROFILE)
+
+    @property
+    def db(self):
+        profile = self.active_profile()
+        if profile is None:
+            return None
+        return profile.primary_db if has_app_context() and g.get('mongo_primary') else profile.db
+
+    @property
+    def cx(self):
+        profile = self.active_profile()
+        return profile.cx if profile else None
+
+    @contextmanager
+    def use_profile(self, name):
+        """Run the block (inside an app context) against profile ``name``"""
+        previous = g.get('mongo_profile')
+        g.mongo_profile = name
+        try:
+            yield self.profiles.get(name) or self.profiles.get(DEFAULT_PROFILE)
+        finally:
+            g.mongo_profile = previous
+
+    @contextmanager
+    def use_primary(self):
+        """Run the block (inside an app context) with reads from the primary"""
+        previous = g.get('mongo_primary')
+        g.mongo_primary = True
+        try:
+            yield
+        finally:
+            g.mongo_primary = previous
+
+    def stats(self):
+        return {name: profile.stats() for name, profile in self.profiles.items()}
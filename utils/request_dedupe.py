@@ -0,0 +1,229 @@
+"""
+Database-enforced duplicate guard for points requests
+
+Utilization is limited to one active (Pending/Approved) request per employee,
+category and month. Rather than trusting a find_one before the insert, each active
+utilization request carries a derived ``dedupe_key`` (user|category|period)
+backed by a unique partial index, so MongoDB rejects duplicates atomically.
+The key is removed when a request leaves the active states (e.g. rejection),
+which frees the slot for a new submission.
+
+Requests created before the guard existed (or by code paths that don't set the
+key) are keyed by the ``maintenance.backfill_dedupe_keys`` background job,
+queued once at startup, or by ``python -m utils.request_dedupe``. Until then
+the index can't see them, so the pre-checks (``find_active_utilization``) still
+match on user, category and month rather than on the key.
+"""
+
+from datetime import timedelta
+from bson import ObjectId
+from pymongo.errors import DuplicateKeyError
+from extensions import mongo
+from utils.error_handling import error_print
+from services.job_service import job_handler
+
+DEDUPE_KEY_FIELD = 'dedupe_key'
+DEDUPE_INDEX_NAME = 'dedupe_key_unique'
+ACTIVE_STATUSES = ('Pending', 'Approved')
+BACKFILL_JOB_TYPE = 'maintenance.backfill_dedupe_keys'
+
+# $unset fragment to merge into updates that move a request out of ACTIVE_STATUSES
+RELEASE_DEDUPE_KEY = {DEDUPE_KEY_FIELD: ""}
+
+
+class DuplicateRequestError(Exception):
+    """Raised when an insert collides with an active request for the same period"""
+
+    def __init__(self, dedupe_key, event_date=None):
+        self.dedupe_key = dedupe_key
+        self.event_date = event_date
+        super().__init__(f"Active request already exists for {dedupe_key}")
+
+    @property
+    def period_label(self):
+        """Human readable period, e.g. 'December 2025'"""
+        return self.event_date.strftime('%B %Y') if self.event_date else self.dedupe_key.rsplit('|', 1)[-1]
+
+
+def is_utilization_category(category):
+    """Check whether a category (hr_categories or legacy categories document) is utilization/billable"""
+    if not category:
+        return False
+    category_name = (category.get('name') or '').lower()
+    # hr_categories use category_code, legacy categories use code
+    category_code = (category.get('category_code') or category.get('code') or '').lower()
+    return ('utilization' in category_name or 'utlization' in category_name or 'billable' in category_name or
+            'utilization' in category_code or 'billable' in category_code)
+
+
+def dedupe_period(event_date, utilization=True):
+    """Period bucket for the key: month for utilization, day for everything else"""
+    return event_date.strftime('%Y-%m') if utilization else event_date.strftime('%Y-%m-%d')
+
+
+def period_bounds(event_date, utilization=True):
+    """Return the [start, end) datetime range covered by the period of ``event_date``"""
+    if utilization:
+        start = event_date.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+        end = (start.replace(month=start.month + 1) if start.month < 12
+               else start.replace(year=start.year + 1, month=1))
+    else:
+        start = event_date.replace(hour=0, minute=0, second=0, microsecond=0)
+        end = start + timedelta(days=1)
+    return start, end
+
+
+def build_dedupe_key(user_id, category_id, event_date, utilization=True):
+    """Build the user|category|period key"""
+    return f"{ObjectId(user_id)}|{ObjectId(category_id)}|{dedupe_period(event_date, utilization)}"
+
+
+def find_active_utilization(user_id, category_id, event_date, projection=None):
+    """
+    Pending/Approved request of the same user, category and month, keyed or not.
+
+    Matches on the fields rather than on ``dedupe_key`` so requests the backfill
+    has not keyed yet are found too (user_id/category_id/event_date index).
+    """
+    start, end = period_bounds(event_date)
+    return mongo.db.points_request.find_one({
+        "user_id": ObjectId(user_id),
+        "category_id": ObjectId(category_id),
+        "event_date": {"$gte": start, "$lt": end},
+        "status": {"$in": list(ACTIVE_STATUSES)}
+    }, projection)
+
+
+def find_awarded_utilization(user_id, category_id, event_date):
+    """Award in the points collection for the same user, category and month (approved records that were moved)"""
+    start, end = period_bounds(event_date)
+    return mongo.db.points.find_one({
+        "user_id": ObjectId(user_id),
+        "category_id": ObjectId(category_id),
+        "award_date": {"$gte": start, "$lt": end}
+    }, {"_id": 1})
+
+
+def ensure_dedupe_index():
+    """Create the unique partial index on points_request (no-op when it already exists)"""
+    try:
+        mongo.db.points_request.create_index(
+            [(DEDUPE_KEY_FIELD, 1)],
+            name=DEDUPE_INDEX_NAME,
+            unique=True,
+            partialFilterExpression={DEDUPE_KEY_FIELD: {"$exists": True}},
+            background=True
+        )
+        return True
+    except Exception as e:
+        error_print("Error creating points_request dedupe index", e)
+        return False
+
+
+def insert_unique_request(request_data):
+    """
+    Insert a utilization points_request guarded by the dedupe index.
+
+    Args:
+        request_data (dict): Document with user_id, category_id, event_date and status
+
+    Returns:
+        InsertOneResult from pymongo
+
+    Raises:
+        DuplicateRequestError: An active request already holds the same user|category|month
+    """
+    if request_data.get('status') in ACTIVE_STATUSES and request_data.get('event_date'):
+        request_data[DEDUPE_KEY_FIELD] = build_dedupe_key(
+            request_data['user_id'], request_data['category_id'], request_data['event_date']
+        )
+    try:
+        return mongo.db.points_request.insert_one(request_data)
+    except DuplicateKeyError:
+        dedupe_key = request_data.pop(DEDUPE_KEY_FIELD, None)
+        request_data.pop('_id', None)
+        raise DuplicateRequestError(dedupe_key, request_data.get('event_date'))
+
+
+def backfill_dedupe_keys(batch_size=500, progress=None):
+    """
+    Stamp dedupe keys on existing active utilization requests.
+
+    Requests are visited oldest first, so when history already contains duplicates
+    the earliest request keeps the slot and later ones are left unkeyed (reported).
+
+    Returns:
+        tuple: (keyed_count, conflict_count)
+    """
+    category_ids = []
+    for collection in (mongo.db.hr_categories, mongo.db.categories):
+        for category in collection.find({}, {"name": 1, "code": 1, "category_code": 1}):
+            if is_utilization_category(category):
+                category_ids.append(category['_id'])
+
+    if not category_ids:
+        return 0, 0
+
+    keyed_count = 0
+    conflict_count = 0
+    cursor = mongo.db.points_request.find(
+        {
+            "category_id": {"$in": category_ids},
+            "status": {"$in": list(ACTIVE_STATUSES)},
+            "event_date": {"$type": "date"},
+            DEDUPE_KEY_FIELD: {"$exists": False}
+        },
+        {"user_id": 1, "category_id": 1, "event_date": 1}
+    ).sort("request_date", 1).batch_size(batch_size)
+
+    for scanned, doc in enumerate(cursor, 1):
+        if progress and scanned % batch_size == 0:
+            progress(scanned, f"Keyed {keyed_count} requests")
+        dedupe_key = build_dedupe_key(doc['user_id'], doc['category_id'], doc['event_date'])
+        try:
+            mongo.db.points_request.update_one(
+                {"_id": doc['_id']},
+                {"$set": {DEDUPE_KEY_FIELD: dedupe_key}}
+            )
+            keyed_count += 1
+        except DuplicateKeyError:
+            conflict_count += 1
+            print(f"⚠️  Duplicate active utilization left unkeyed: {doc['_id']} ({dedupe_key})")
+
+    return keyed_count, conflict_count
+
+
+@job_handler(BACKFILL_JOB_TYPE)
+def run_dedupe_backfill(job, batch_size=500):
+    """Background job: key the active utilization requests that have no dedupe key yet"""
+    keyed, conflicts = backfill_dedupe_keys(
+        batch_size=batch_size,
+        progress=lambda scanned, message: job.progress(scanned, None, message)
+    )
+    return {'keyed': keyed, 'conflicts': conflicts}
+
+
+def queue_dedupe_backfill():
+    """Queue the backfill once for all workers (returns the job document)"""
+    from services.job_service import job_service
+    job, _ = job_service.enqueue(
+        BACKFILL_JOB_TYPE, idempotency_key='startup',
+        description='Backfill utilization dedupe keys'
+    )
+    return job
+
+
+if __name__ == '__main__':
+    # Only the database is needed: a bare app, not app.py (whose eventlet patching must run before
+    # any other import, which is already too late here)
+    from flask import Flask
+    from config import Config
+
+    app = Flask(__name__)
+    app.config.from_object(Config)
+    mongo.init_app(app)
+
+    with app.app_context():
+        ensure_dedupe_index()
+        keyed, conflicts = backfill_dedupe_keys()
+        print(f"✅ Dedupe keys backfilled: {keyed} keyed, {conflicts} pre-existing duplicates skipped")
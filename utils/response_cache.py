@@ -0,0 +1,315 @@
+"""
+Tagged response cache with stale-while-revalidate
+
+The analytics and leaderboard endpoints compute the same result for every
+viewer with the same filters. ``cached_compute`` keeps that viewer-independent
+result in a per-process LRU, keyed by a namespace and the normalized filter
+parameters; access checks and per-user bits (header name, own rank) stay in
+the route.
+
+Every entry carries scope tags - each fiscal year it covers (or ``all``)
+combined with the department/category it is filtered by. Approval events bump
+the versions of the scopes that can see them (``invalidate_points_change``), so
+e.g. an award in Engineering for FY2025 leaves other departments' and other
+years' filtered results untouched.
+
+An entry whose tag versions moved, or which is older than
+``RESPONSE_CACHE_TTL_SECONDS``, is *stale*: it is still served immediately while
+one background greenlet recomputes it, so viewers never wait on a recompute
+after invalidation. Only entries older than ``RESPONSE_CACHE_STALE_SECONDS`` (or
+missing) are computed inline.
+
+Tag versions live in a Redis hash so an invalidation on one worker reaches all
+workers; if Redis is unreachable, the process-local versions are used and the
+TTL bounds staleness.
+"""
+
+import json
+import time
+from collections import OrderedDict
+from datetime import datetime
+from flask import current_app, g, has_app_context
+from extensions import mongo
+from utils.error_handling import error_print
+from utils.single_flight import args_digest, single_flight
+from services.tracing import tracer
+
+TAG_VERSIONS_KEY = 'pbs:cache:tag_versions'
+# Carried by every entry: bumped when a change cannot be scoped
+ALL_POINTS_TAG = 'points'
+
+DEFAULT_TTL_SECONDS = 120
+DEFAULT_STALE_SECONDS = 3600
+DEFAULT_MAX_ENTRIES = 256
+REDIS_RETRY_SECONDS = 30
+
+
+# ============================================================================
+# Tags
+# ============================================================================
+
+def fiscal_year_of(date):
+    """April-March fiscal year (start calendar year) of a datetime"""
+    return date.year - 1 if date.month < 4 else date.year
+
+
+def fiscal_years_for_range(start_date=None, end_date=None, max_years=3):
+    """Fiscal years covered by a date range, or None for open/very wide ranges"""
+    if not start_date or not end_date:
+        return None
+    first, last = fiscal_year_of(start_date), fiscal_year_of(end_date)
+    if last - first >= max_years:
+        return None
+    return list(range(first, last + 1))
+
+
+def _scope(fiscal_year, department, category_id):
+    return f'fy:{fiscal_year}|dept:{department}|cat:{category_id}'
+
+
+def scope_tags(fiscal_years=None, department=None, category_id=None):
+    """
+    Tags of a cached result: one per fiscal year it covers, combined with the
+    department/category it is filtered by (``*`` when unfiltered).
+
+    Args:
+        fiscal_years: int, list of ints, or None/'all' for all-time results
+        department: Department filter, if any
+        category_id: Category filter, if any
+    """
+    if fiscal_years in (None, '', 'all'):
+        fiscal_years = ['all']
+    elif not isinstance(fiscal_years, (list, tuple, set)):
+        fiscal_years = [fiscal_years]
+    department = department if department not in (None, '', 'all') else '*'
+    category_id = category_id if category_id not in (None, '', 'all') else '*'
+    return [_scope(year, department, category_id) for year in fiscal_years]
+
+
+def dp_team_tag(dp_id):
+    """Tag of results that depend on which employees are assigned to a DP"""
+    return f'dp_team:{dp_id}'
+
+
+def change_tags(effective_date, department, category_id):
+    """
+    Every scope a points change is visible in: its fiscal year and all-time,
+    each with and without its department and category filter (8 tags).
+    """
+    tags = []
+    for year in (fiscal_year_of(effective_date), 'all'):
+        for dept in (department, '*'):
+            for cat in (category_id, '*'):
+                tags.append(_scope(year, dept, cat))
+    return tags
+
+
+# ============================================================================
+# Cache
+# ============================================================================
+
+class _Entry:
+    __slots__ = ('value', 'created', 'tags', 'versions')
+
+    def __init__(self, value, tags, versions):
+        self.value = value
+        self.created = time.monotonic()
+        self.tags = tags
+        self.versions = versions
+
+
+class ResponseCache:
+    """Per-process LRU of computed results with tag versions shared through Redis"""
+
+    def __init__(self):
+        self.entries = OrderedDict()
+        self.refreshing = set()
+        self.local_versions = {}
+        self.redis_down_until = 0
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+
+    # ---------------------------------------------------------------- config
+
+    def _config(self, name, default):
+        if has_app_context():
+            return current_app.config.get(name, default)
+        return default
+
+    def _redis(self):
+        if time.monotonic() < self.redis_down_until or not has_app_context():
+            return None
+        redis_service = current_app.config.get('redis_service')
+        return redis_service.redis if redis_service else None
+
+    def _redis_failed(self):
+        # Don't pay Redis' connect timeout on every request while it is down
+        self.redis_down_until = time.monotonic() + REDIS_RETRY_SECONDS
+
+    # ---------------------------------------------------------- tag versions
+
+    def tag_versions(self, tags):
+        """Current version of each tag (0 if never bumped)"""
+        versions = {tag: self.local_versions.get(tag, 0) for tag in tags}
+        client = self._redis()
+        if client is not None and tags:
+            try:
+                remote = client.hmget(TAG_VERSIONS_KEY, tags)
+                for tag, value in zip(tags, remote):
+                    versions[tag] = max(versions[tag], int(value or 0))
+            except Exception:
+                self._redis_failed()
+        return versions
+
+    def bump_tags(self, tags):
+        """Invalidate every entry carrying any of ``tags``"""
+        tags = sorted(set(tags))
+        for tag in tags:
+            self.local_versions[tag] = self.local_versions.get(tag, 0) + 1
+        client = self._redis()
+        if client is not None and tags:
+            try:
+                pipe = client.pipeline(transaction=False)
+                for tag in tags:
+                    pipe.hincrby(TAG_VERSIONS_KEY, tag, 1)
+                for tag, version in zip(tags, pipe.execute()):
+                    self.local_versions[tag] = max(self.local_versions[tag], int(version))
+            except Exception:
+                self._redis_failed()
+
+    # ------------------------------------------------------------ get / set
+
+    def _store(self, key, value, tags, versions):
+        self.entries[key] = _Entry(value, tags, versions)
+        self.entries.move_to_end(key)
+        max_entries = self._config('RESPONSE_CACHE_MAX_ENTRIES', DEFAULT_MAX_ENTRIES)
+        while len(self.entries) > max_entries:
+            self.entries.popitem(last=False)
+
+    def _compute_and_store(self, key, compute, tags):
+        versions = self.tag_versions(tags)  # read before computing: a bump mid-compute marks it stale
+        # Concurrent misses/refreshes of the same key (any worker) share one computation - only one
+        # started under the same tag versions, so nobody is handed a result computed before a bump
+        # From the primary: a secondary may not have the write that invalidated the entry yet
+        with mongo.use_primary():
+            value = single_flight(f'cache:{key}:{args_digest(sorted(versions.items()))}', compute)
+        self._store(key, value, tags, versions)
+        return value
+
+    def _refresh_in_background(self, key, compute, tags):
+        if key in self.refreshing:
+            return
+        self.refreshing.add(key)
+        app = current_app._get_current_object()
+        mongo_profile = g.get('mongo_profile')
+
+        def refresh():
+            try:
+                with app.app_context():
+                    # Recompute on the same Mongo profile as the request that found it stale
+                    g.mongo_profile = mongo_profile
+                    self._compute_and_store(key, compute, tags)
+            except Exception as e:
+                error_print(f"Background cache refresh failed for {key}", e)
+            finally:
+                self.refreshing.discard(key)
+
+        tracer.spawn(refresh)
+
+    def get_or_compute(self, key, compute, tags):
+        if not self._config('RESPONSE_CACHE_ENABLED', True):
+            return compute()
+
+        tags = sorted(set(tags) | {ALL_POINTS_TAG})
+        entry = self.entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return self._compute_and_store(key, compute, tags)
+
+        age = time.monotonic() - entry.created
+        if age > self._config('RESPONSE_CACHE_STALE_SECONDS', DEFAULT_STALE_SECONDS):
+            self.misses += 1
+            return self._compute_and_store(key, compute, tags)
+
+        self.entries.move_to_end(key)
+        fresh = (age <= self._config('RESPONSE_CACHE_TTL_SECONDS', DEFAULT_TTL_SECONDS) and
+                 self.tag_versions(entry.tags) == entry.versions)
+        if fresh:
+            self.hits += 1
+        else:
+            self.stale_hits += 1
+            self._refresh_in_background(key, compute, tags)
+        return entry.value
+
+    def clear(self):
+        self.entries.clear()
+
+    def stats(self):
+        return {
+            'entries': len(self.entries),
+            'hits': self.hits,
+            'stale_hits': self.stale_hits,
+            'misses': self.misses,
+            'refreshing': len(self.refreshing)
+        }
+
+
+# Global instance (one per worker process)
+response_cache = ResponseCache()
+
+
+def cache_key(namespace, params=None):
+    """Key from a namespace and filter params; empty values are dropped, order ignored"""
+    normalized = {}
+    for name, value in (params or {}).items():
+        if isinstance(value, str):
+            value = value.strip()
+        if value in (None, ''):
+            continue
+        normalized[name] = value
+    return f"{namespace}:{json.dumps(normalized, sort_keys=True, default=str)}"
+
+
+def cached_compute(namespace, params, compute, tags=()):
+    """
+    Return ``compute()`` from the cache (stale-while-revalidate).
+
+    Args:
+        namespace: Name of the computation, e.g. 'central.leaderboard'
+        params: Filter values that change the result (normalized into the key)
+        compute: Zero-argument callable; must not touch request/session, it may run
+                 in a background greenlet. The returned object is shared between
+                 viewers and must not be mutated by callers.
+        tags: Invalidation tags, normally from scope_tags()
+
+    Returns:
+        The cached or freshly computed value
+    """
+    return response_cache.get_or_compute(cache_key(namespace, params), compute, list(tags))
+
+
+def invalidate_tags(*tags):
+    """Mark every entry carrying any of ``tags`` stale"""
+    try:
+        response_cache.bump_tags(tags)
+    except Exception as e:
+        error_print("Cache invalidation failed", e)
+
+
+def invalidate_points_change(effective_date=None, department=None, category_id=None):
+    """
+    Invalidate results affected by approving/awarding/removing points.
+
+    Only results whose period, department filter and category filter can see the
+    change go stale. If any of the three is unknown, everything is invalidated.
+
+    Args:
+        effective_date: event_date/request_date/award_date of the points
+        department: Department of the employee receiving the points
+        category_id: Category of the points
+    """
+    if isinstance(effective_date, datetime) and department and category_id:
+        invalidate_tags(*change_tags(effective_date, department, str(category_id)))
+    else:
+        invalidate_tags(ALL_POINTS_TAG)
@@ -0,0 +1,203 @@
+"""
+Single-flight coalescing for expensive computations
+
+At quarter start and right after every leaderboard broadcast, dozens of clients
+ask for the same leaderboard/analytics/dashboard computation within a second.
+``single_flight(key, compute)`` runs ``compute`` once per key:
+
+- Inside a worker, concurrent greenlets asking for the same key wait on the
+  one in-flight call and receive its result (or its exception).
+- Across workers, a short Redis lock elects one worker to compute; the others
+  poll for the result, which the winner publishes under a short-lived key
+  named after its lock token. A waiter only accepts the result of the lock
+  holder it waited on - never one left behind by an earlier winner, which may
+  predate an invalidation. If the winner fails or takes longer than the lock,
+  waiters compute themselves.
+
+Results crossing workers are BSON-encoded (plain dicts, lists, datetimes and
+ObjectIds; tuples come back as lists). A result BSON cannot represent is not
+published and the waiters compute it themselves. Without Redis only the
+in-process coalescing applies.
+"""
+
+import functools
+import hashlib
+import time
+import uuid
+import bson
+import eventlet
+from eventlet.event import Event
+from flask import current_app, has_app_context
+import redis
+
+LOCK_PREFIX = 'pbs:sf:lock:'
+RESULT_PREFIX = 'pbs:sf:result:'
+DEFAULT_LOCK_SECONDS = 30
+DEFAULT_RESULT_SECONDS = 5
+POLL_INTERVAL_SECONDS = 0.05
+REDIS_RETRY_SECONDS = 30
+
+# Delete the lock only if this caller still owns it
+_RELEASE_SCRIPT = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('del', KEYS[1])
+end
+return 0
+"""
+
+
+class _SingleFlight:
+    """In-flight calls of this worker plus the cross-worker Redis protocol"""
+
+    def __init__(self):
+        self.inflight = {}
+        self.client = None
+        self.redis_down_until = 0
+        self.leader_calls = 0
+        self.coalesced_calls = 0
+        self.remote_results = 0
+
+    def _config(self, name, default):
+        if has_app_context():
+            return current_app.config.get(name, default)
+        return default
+
+    def _redis(self):
+        """Binary-safe client on the realtime Redis (BSON results are bytes)"""
+        if time.monotonic() < self.redis_down_until or not has_app_context():
+            return None
+        if self.client is None:
+            redis_service = current_app.config.get('redis_service')
+            if not redis_service:
+                return None
+            kwargs = dict(redis_service.redis.connection_pool.connection_kwargs)
+            kwargs['decode_responses'] = False
+            self.client = redis.Redis(**kwargs)
+        return self.client
+
+    def _redis_failed(self):
+        self.redis_down_until = time.monotonic() + REDIS_RETRY_SECONDS
+
+    def run(self, key, compute):
+        call = self.inflight.get(key)
+        if call is not None:
+            self.coalesced_calls += 1
+            return call.wait()
+
+        call = Event()
+        self.inflight[key] = call
+        try:
+            value = self._run_across_workers(key, compute)
+        except Exception as e:
+            call.send_exception(e)
+            raise
+        else:
+            call.send(value)
+            return value
+        finally:
+            self.inflight.pop(key, None)
+
+    def _run_across_workers(self, key, compute):
+        client = self._redis()
+        if client is None:
+            self.leader_calls += 1
+            return compute()
+
+        lock_seconds = self._config('SINGLE_FLIGHT_LOCK_SECONDS', DEFAULT_LOCK_SECONDS)
+        token = uuid.uuid4().hex
+        try:
+            is_leader = client.set(LOCK_PREFIX + key, token, nx=True, ex=lock_seconds)
+        except Exception:
+            self._redis_failed()
+            self.leader_calls += 1
+            return compute()
+
+        if is_leader:
+            self.leader_calls += 1
+            try:
+                value = compute()
+                self._publish(client, key, token, value)
+                return value
+            finally:
+                try:
+                    client.eval(_RELEASE_SCRIPT, 1, LOCK_PREFIX + key, token)
+                except Exception:
+                    self._redis_failed()
+
+        found, value = self._wait_for_result(client, key, lock_seconds)
+        if found:
+            self.remote_results += 1
+            return value
+        self.leader_calls += 1
+        return compute()
+
+    def _publish(self, client, key, token, value):
+        try:
+            result_seconds = self._config('SINGLE_FLIGHT_RESULT_SECONDS', DEFAULT_RESULT_SECONDS)
+            client.set(f'{RESULT_PREFIX}{key}:{token}', bson.encode({'v': value}), ex=result_seconds)
+        except Exception:
+            # Not BSON-encodable or Redis gone: waiters fall back to computing themselves
+            pass
+
+    def _wait_for_result(self, client, key, timeout):
+        """Poll for the current lock holder's result; gives up when its lock is gone or times out"""
+        deadline = time.monotonic() + timeout
+        try:
+            token = client.get(LOCK_PREFIX + key)
+            if token is None:
+                # The winner finished between our attempt and now: its result may predate our call
+                return False, None
+            result_key = f'{RESULT_PREFIX}{key}:{token.decode()}'
+            while time.monotonic() < deadline:
+                payload = client.get(result_key)
+                if payload is not None:
+                    return True, bson.decode(payload)['v']
+                if client.get(LOCK_PREFIX + key) != token:
+                    # Winner released its lock without publishing (failed) - one last look
+                    payload = client.get(result_key)
+                    return (True, bson.decode(payload)['v']) if payload is not None else (False, None)
+                eventlet.sleep(POLL_INTERVAL_SECONDS)
+        except Exception:
+            self._redis_failed()
+        return False, None
+
+    def stats(self):
+        return {
+            'inflight': len(self.inflight),
+            'leader_calls': self.leader_calls,
+            'coalesced_calls': self.coalesced_calls,
+            'remote_results': self.remote_results
+        }
+
+
+single_flight_group = _SingleFlight()
+
+
+def single_flight(key, compute):
+    """
+    Run ``compute()`` once for all concurrent callers with the same ``key``.
+
+    Args:
+        key: Identifies the computation and its inputs
+        compute: Zero-argument callable
+
+    Returns:
+        The shared result (callers must not mutate it)
+    """
+    return single_flight_group.run(key, compute)
+
+
+def args_digest(*args, **kwargs):
+    """Stable digest of call arguments (ObjectIds, datetimes and lists repr deterministically)"""
+    return hashlib.sha1(repr((args, sorted(kwargs.items()))).encode('utf-8')).hexdigest()
+
+
+def coalesced(namespace):
+    """Decorator: concurrent calls with equal arguments share one execution"""
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            key = f"{namespace}:{args_digest(*args, **kwargs)}"
+            return single_flight(key, lambda: func(*args, **kwargs))
+        return wrapper
+    return decorator